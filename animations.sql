@@ -6,6 +6,12 @@ create table animations (
   status text default 'pending',
   video_url text,
   error text,
+  request_key text,
+  leader_id uuid references animations (id),  -- in-flight job whose run this job shares
   created_at timestamptz default now(),
   completed_at timestamptz
 );
+
+-- Concurrent jobs with the same request key share one run (the jobs following another aren't candidates)
+create index animations_inflight_idx on animations (request_key, created_at)
+  where status in ('pending', 'processing') and leader_id is null;
@@ -1,14 +1,16 @@
 """
 Request models for the API.
 """
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
+from typing import Literal, Optional
 
 class AnimationRequest(BaseModel):
     """Request model for animation generation."""
     prompt: str
     level: str
     email: Optional[EmailStr] = None
+    latency_budget: Optional[float] = Field(None, gt=0, description="Seconds the caller is willing to wait for the video")
+    tier: Literal["standard", "quick"] = Field("standard", description="\"quick\" makes a 30-60 second video at lower cost")
 
 class FeedbackRequest(BaseModel):
     """Request model for feedback submission."""
@@ -3,7 +3,7 @@ Response models for the API.
 """
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, Optional
 
 class AnimationResponse(BaseModel):
     """Response model for animation generation."""
@@ -29,3 +29,7 @@ class HealthResponse(BaseModel):
     """Response model for health check."""
     status: str
     version: str
+
+class CacheStatsResponse(BaseModel):
+    """Response model for cache statistics."""
+    caches: Dict[str, Dict[str, Any]]
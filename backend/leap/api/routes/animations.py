@@ -38,7 +38,9 @@ async def generate_animation(
             job_id=UUID(response_data["job_id"]),
             prompt=request.prompt,
             level=request.level,
-            email=request.email
+            email=request.email,
+            latency_budget=request.latency_budget,
+            tier=request.tier
         )
         logger.info(f"Added background task to process job: {response_data['job_id']}")
         
@@ -2,7 +2,10 @@
 System health and status routes.
 """
 from fastapi import APIRouter
-from ..models.responses import HealthResponse
+from ..models.responses import HealthResponse, CacheStatsResponse
+from ...services.llm_service import get_response_cache
+from ...workflow.stage_cache import get_stage_cache
+from ...workflow.result_cache import get_result_cache
 
 router = APIRouter()
 
@@ -13,3 +16,16 @@ async def health_check():
         status="ok",
         version="0.1.0"
     )
+
+@router.get("/cache/stats", response_model=CacheStatsResponse)
+async def cache_stats():
+    """Report the entries, size and hit rate of each enabled cache."""
+    result_cache = get_result_cache()
+    caches = {
+        "llm_responses": get_response_cache(),
+        "stages": get_stage_cache(),
+        "results": result_cache.cache if result_cache else None
+    }
+    return CacheStatsResponse(
+        caches={name: cache.stats() for name, cache in caches.items() if cache is not None}
+    )
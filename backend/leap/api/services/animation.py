@@ -1,8 +1,18 @@
 """
 Animation service for handling animation generation.
+
+Identical requests (same prompt up to case, spacing and final punctuation, same
+level and tier) that are in flight at the same time are coalesced: the oldest in-flight job in the shared job store runs
+the workflow, and the others wait for it and complete with its video. Every
+replica sees the same job order, so they all agree on which job runs. A job that
+follows another records it in its row, so it is never picked to lead itself, and
+runs by itself when the leader fails (the failure may be the leader's own, such
+as its latency budget running out).
 """
+import asyncio
+import re
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict
 from dataclasses import dataclass
 from pathlib import Path
@@ -11,14 +21,32 @@ import logging
 
 from ...workflow import workflow
 from ...workflow.state import GraphState
+from ...workflow.utils import StateSummary, workflow_failure
+from ...workflow.result_cache import ResultCache, get_result_cache
+from ...core.config import (
+    DEFAULT_TIER,
+    DEFAULT_LATENCY_BUDGET,
+    COALESCE_ENABLED,
+    COALESCE_POLL_SECONDS,
+    COALESCE_MAX_WAIT_SECONDS,
+    COALESCE_WINDOW_SECONDS,
+)
 from ..models.requests import AnimationRequest
 from ..models.responses import StatusResponse
 from ...services.supabase_service import SupabaseService
 from ...services.email_service import EmailService
 from ...services.storage_service import StorageService
+from ...services.cache_service import make_cache_key
 
 logger = logging.getLogger(__name__)
 
+IN_FLIGHT_STATUSES = ("pending", "processing")
+
+def make_request_key(prompt: str, level: str, tier: Optional[str] = None) -> str:
+    """Return the key shared by identical requests: a hash of the whole normalized prompt, the level and the tier."""
+    normalized = re.sub(r"\s+", " ", prompt.lower()).strip().rstrip("?!.,;: ")
+    return make_cache_key(normalized, level, tier or DEFAULT_TIER)
+
 @dataclass
 class Job:
     """Represents an animation job."""
@@ -28,6 +56,8 @@ class Job:
     video_url: Optional[str] = None
     completed_at: Optional[datetime] = None
     error: Optional[str] = None
+    request_key: Optional[str] = None
+    leader_id: Optional[uuid.UUID] = None  # job whose run this job shares
 
 class AnimationService:
     """Service for handling animation generation."""
@@ -37,21 +67,26 @@ class AnimationService:
         self.supabase = SupabaseService()
         self.email_service = EmailService()
         self.storage_service = StorageService()
+        self.result_cache: Optional[ResultCache] = None  # defaults to the on-disk cache when enabled
     
     async def create_job(self, request: AnimationRequest) -> Dict:
         """Create a new animation job and return response data."""
+        request_key = make_request_key(request.prompt, request.level, request.tier)
+        
         # Create job in Supabase
         job_id_str = self.supabase.create_animation_job(
             prompt=request.prompt,
             level=request.level,
-            email=request.email
+            email=request.email,
+            request_key=request_key
         )
         
         job_id = uuid.UUID(job_id_str)
         job = Job(
             id=job_id,
             created_at=datetime.utcnow(),
-            status="pending"
+            status="pending",
+            request_key=request_key
         )
         self.jobs[job_id] = job
         
@@ -96,46 +131,79 @@ class AnimationService:
         job_id: uuid.UUID,
         prompt: str,
         level: str,
-        email: Optional[str] = None
+        email: Optional[str] = None,
+        latency_budget: Optional[float] = None,
+        tier: str = "standard"
     ):
-        """Process an animation job."""
+        """Process an animation job.
+        
+        The latency budget (seconds) counts from when the job was created, so time
+        spent waiting in the queue is included.
+        """
         job = self.jobs.get(job_id)
         if not job:
             raise ValueError(f"Job {job_id} not found")
             
         try:
+            # The same question asked before completes immediately with the stored video
+            cached = self._lookup_cached_video(prompt, level, tier)
+            if cached:
+                logger.info(f"Serving cached video for job {job_id}: {cached['video_url']}")
+                self._complete_job(job, job_id, cached["video_url"], email)
+                return
+            
+            # Share the run of an identical request that is already in flight
+            leader_id = self._find_leader(job)
+            if leader_id and await self._follow_leader(job, job_id, leader_id, email):
+                return
+            
+            job.status = "processing"
+            self.supabase.update_job_status(str(job_id), "processing")
+            
             # Create a simple test state
             state = GraphState(
                 user_input=prompt,
                 rendering_quality="low",
                 duration_detail="detailed",
                 user_level=level,
-                voice_model="nova"
+                voice_model="nova",
+                tier=tier
             )
+            latency_budget = latency_budget or DEFAULT_LATENCY_BUDGET
+            if latency_budget:
+                state["latency_budget"] = latency_budget
+                state["deadline"] = job.created_at.replace(tzinfo=timezone.utc).timestamp() + latency_budget
             
             logger.info("Starting workflow execution...")
-            logger.info(f"State: {state}")
+            logger.info("State: %s", StateSummary(state))
             
-            # Execute workflow
-            result = workflow.invoke(state)
-            logger.info(f"Workflow result: {result}")
+            # Execute workflow (in a thread, so coalesced jobs can keep polling meanwhile)
+            result = await asyncio.to_thread(workflow.invoke, state)
+            logger.info("Workflow result: %s", StateSummary(result))
             
-            if result.get("error"):
+            if result.get("cached_result"):
+                # Near-duplicate of an earlier question, found after reformulating it
+                self._complete_job(job, job_id, result["cached_result"]["video_url"], email)
+            elif workflow_failure(result):
+                # A job stopped early, or that ended without a video, failed even without an error
                 job.status = "failed"
-                job.error = result["error"]
-                logger.error(f"Job failed: {result['error']}")
+                job.error = workflow_failure(result)
+                # Prefix environment failures with their category so they're easy to triage
+                if result.get("failure_category"):
+                    job.error = f"[{result['failure_category']}] {job.error}"
+                logger.error(f"Job failed: {job.error}")
                 
                 # Update Supabase
                 self.supabase.update_job_status(
                     str(job_id),
                     "failed",
-                    error=result["error"]
+                    error=job.error
                 )
             else:
-                job.status = "completed"
                 # Get the output file from the execution result
-                execution_result = result.get("execution_result", {})
+                execution_result = result["execution_result"]
                 local_video_path = execution_result.get("output_file")
+                video_url = local_video_path
                 
                 if local_video_path and Path(local_video_path).exists():
                     logger.info(f"Video file exists locally at: {local_video_path}")
@@ -144,30 +212,16 @@ class AnimationService:
                     try:
                         public_url = self.storage_service.get_file_url(local_video_path)
                         logger.info(f"Video file uploaded to storage: {public_url}")
-                        job.video_url = public_url
+                        video_url = public_url
+                        self._store_cached_video(result.get("reformulated_input") or prompt, prompt, level, tier, public_url)
                     except Exception as e:
                         logger.error(f"Error uploading video to storage: {str(e)}")
-                        job.video_url = local_video_path  # Fallback to local path
+                        # Fallback to local path
                 else:
                     logger.error(f"Warning: Video file not found at: {local_video_path}")
-                    job.video_url = local_video_path  # Keep the path for debugging
+                    # Keep the path for debugging
                 
-                job.completed_at = datetime.utcnow()
-                
-                # Update Supabase
-                self.supabase.update_job_status(
-                    str(job_id),
-                    "completed",
-                    video_url=job.video_url
-                )
-                
-                # Send email notification if email is provided
-                if email and job.video_url:
-                    self.email_service.send_animation_ready_notification(
-                        email=email,
-                        job_id=str(job_id),
-                        video_url=job.video_url
-                    )
+                self._complete_job(job, job_id, video_url, email)
                 
         except Exception as e:
             job.status = "failed"
@@ -180,3 +234,107 @@ class AnimationService:
                 "failed",
                 error=str(e)
             )
+    
+    def _complete_job(self, job: Job, job_id: uuid.UUID, video_url: Optional[str], email: Optional[str] = None):
+        """Mark a job as completed with its video and notify the user."""
+        job.status = "completed"
+        job.video_url = video_url
+        job.completed_at = datetime.utcnow()
+        
+        # Update Supabase
+        self.supabase.update_job_status(
+            str(job_id),
+            "completed",
+            video_url=job.video_url
+        )
+        
+        # Send email notification if email is provided
+        if email and job.video_url:
+            self.email_service.send_animation_ready_notification(
+                email=email,
+                job_id=str(job_id),
+                video_url=job.video_url
+            )
+    
+    def _lookup_cached_video(self, prompt: str, level: str, tier: str) -> Optional[Dict]:
+        """Return the stored result for the same concept, level and tier, if any."""
+        try:
+            result_cache = get_result_cache(self.result_cache)
+            return result_cache.lookup_exact(prompt, level, tier) if result_cache else None
+        except Exception as e:
+            logger.warning(f"Result cache lookup failed: {str(e)}")
+            return None
+    
+    def _store_cached_video(self, question: str, prompt: str, level: str, tier: str, video_url: str):
+        """Remember a finished video so repeated questions are served instantly."""
+        try:
+            result_cache = get_result_cache(self.result_cache)
+            if result_cache:
+                result_cache.store(question, level, video_url, tier=tier, prompt=prompt)
+        except Exception as e:
+            logger.warning(f"Could not cache video: {str(e)}")
+    
+    def _find_leader(self, job: Job) -> Optional[uuid.UUID]:
+        """Return the oldest in-flight job with the same request, if it isn't `job` itself."""
+        if not COALESCE_ENABLED or not job.request_key:
+            return None
+        since = job.created_at - timedelta(seconds=COALESCE_WINDOW_SECONDS)
+        
+        if self.supabase.supabase:
+            # The shared job store orders the jobs the same way for every replica
+            rows = self.supabase.find_inflight_jobs(job.request_key, since.replace(tzinfo=timezone.utc))
+            leader_id = uuid.UUID(rows[0]["id"]) if rows else None
+        else:
+            # No shared store, coalesce the jobs of this process
+            inflight = [
+                other for other in self.jobs.values()
+                if other.request_key == job.request_key
+                and other.status in IN_FLIGHT_STATUSES
+                and other.leader_id is None
+                and other.created_at >= since
+            ]
+            leader = min(inflight, key=lambda other: (other.created_at, str(other.id)), default=None)
+            leader_id = leader.id if leader else None
+        
+        return leader_id if leader_id != job.id else None
+    
+    def _get_job_result(self, job_id: uuid.UUID) -> Optional[Dict]:
+        """Return the status, video URL and error of a job from memory or the job store."""
+        job = self.jobs.get(job_id)
+        if job:
+            return {"status": job.status, "video_url": job.video_url, "error": job.error}
+        if self.supabase.supabase:
+            return self.supabase.get_job(str(job_id))
+        return None
+    
+    async def _follow_leader(self, job: Job, job_id: uuid.UUID, leader_id: uuid.UUID, email: Optional[str] = None) -> bool:
+        """Wait for the leader's run and complete `job` with its video.
+        
+        Returns:
+            True if the job got the leader's video, False if it should run by itself
+            (the leader failed, disappeared or took longer than COALESCE_MAX_WAIT_SECONDS)
+        """
+        logger.info(f"Job {job_id} shares the run of identical job {leader_id}")
+        job.status = "processing"
+        job.leader_id = leader_id
+        self.supabase.update_job_status(str(job_id), "processing")
+        self.supabase.set_job_leader(str(job_id), str(leader_id))
+        
+        waited = 0.0
+        while waited < COALESCE_MAX_WAIT_SECONDS:
+            leader = self._get_job_result(leader_id)
+            if leader is None:
+                break
+            if leader.get("status") == "completed":
+                self._complete_job(job, job_id, leader.get("video_url"), email)
+                return True
+            if leader.get("status") == "failed":
+                logger.warning(f"Job {leader_id} failed: {leader.get('error')}")
+                break
+            await asyncio.sleep(COALESCE_POLL_SECONDS)
+            waited += COALESCE_POLL_SECONDS
+        
+        logger.warning(f"Stopped waiting for job {leader_id}, running job {job_id} separately")
+        job.leader_id = None
+        self.supabase.set_job_leader(str(job_id), None)
+        return False
@@ -0,0 +1,33 @@
+"""
+Process-wide concurrency limits for shared resources.
+
+Code that uses a limited resource (LLM calls, Manim renders) wraps the use in
+`concurrency_slot(name)`. Without a limit set for the name the slot is free; batch
+runs set limits so many jobs in flight don't all call the LLM or render at once.
+"""
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+_limits: Dict[str, threading.BoundedSemaphore] = {}
+_lock = threading.Lock()
+
+
+def set_concurrency_limit(name: str, limit: Optional[int]) -> None:
+    """Allow at most `limit` concurrent uses of `name` (None removes the limit)."""
+    with _lock:
+        if limit is None:
+            _limits.pop(name, None)
+        else:
+            _limits[name] = threading.BoundedSemaphore(max(1, limit))
+
+
+@contextmanager
+def concurrency_slot(name: str) -> Iterator[None]:
+    """Hold one of the slots of `name` for the duration of the block."""
+    semaphore = _limits.get(name)
+    if semaphore is None:
+        yield
+        return
+    with semaphore:
+        yield
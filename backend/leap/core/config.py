@@ -1,5 +1,6 @@
 from pathlib import Path
 from datetime import datetime
+import json
 import os
 from dotenv import load_dotenv
 from manim import *  # Import Manim's color constants
@@ -21,6 +22,72 @@ OPENAI_MODEL = os.getenv("OPENAI_MODEL", "o3-mini")
 MANIM_QUALITY = "-ql"  # Low quality for faster rendering
 EXECUTION_TIMEOUT = 180  # seconds
 MAX_ATTEMPTS = 5
+# "patch" asks the model for line edits and falls back to a full rewrite; "full" always rewrites
+CORRECTION_MODE = os.getenv("CORRECTION_MODE", "patch")
+MAX_AUTO_FIX_ATTEMPTS = 3  # rule-based fixes tried per job before always escalating to the LLM
+MAX_ATTEMPT_HISTORY = 10  # failed attempts remembered per job for the correction prompt
+MAX_ERROR_REPEATS = 3  # stop correcting once the same error has come back this many times
+TTS_MODEL = "tts-1-hd"
+
+# Generation tiers: "quick" makes 30-60 second videos with fast TTS, -ql rendering and fewer corrections
+GENERATION_TIERS = ["standard", "quick"]
+DEFAULT_TIER = "standard"
+QUICK_MAX_ATTEMPTS = 2
+
+# Job priorities for shared resources such as the LLM rate limit (lower is served first)
+QUICK_PRIORITY = 0  # interactive quick-tier jobs
+DEFAULT_PRIORITY = 1
+BATCH_PRIORITY = 2  # background batch generation
+
+# Latency budget: jobs with a budget (seconds) switch to cheaper strategies as it runs out
+DEFAULT_LATENCY_BUDGET = float(os.getenv("DEFAULT_LATENCY_BUDGET", "0")) or None  # 0 = no budget
+FAST_OPENAI_MODEL = os.getenv("FAST_OPENAI_MODEL", "gpt-4o-mini")
+FAST_TTS_MODEL = "tts-1"
+ESTIMATED_LLM_SECONDS = 60  # typical structured LLM call
+ESTIMATED_RENDER_SECONDS = {"low": 120, "medium": 300, "high": 720}  # typical render incl. voiceover
+# Render timeout: the typical render of the quality with headroom, scaled up for long (4+ minute) videos.
+# A render that times out is retried at a lower quality before the job fails. Jobs with a budget
+# never render past their deadline, but always get at least RENDER_TIMEOUT_MIN_SECONDS.
+RENDER_TIMEOUT_HEADROOM = float(os.getenv("RENDER_TIMEOUT_HEADROOM", "2"))
+RENDER_TIMEOUT_MIN_SECONDS = float(os.getenv("RENDER_TIMEOUT_MIN_SECONDS", "30"))
+RENDER_LENGTH_FACTORS = {"quick": 1.0, "short": 1.0, "long": 1.5}
+BUDGET_SHORT_VIDEO_BELOW = 900  # seconds left when planning: plan a short video instead
+BUDGET_FAST_MODEL_BELOW = 600  # seconds left: use FAST_OPENAI_MODEL
+BUDGET_FAST_TTS_BELOW = 600  # seconds left when rendering: use FAST_TTS_MODEL
+
+# Model routing: model, reasoning effort (reasoning models only) and max output tokens of each node's LLM calls
+STRONG_OPENAI_MODEL = os.getenv("STRONG_OPENAI_MODEL", "o1")  # last resort for corrections that keep failing
+_ROUTE_OVERRIDES = json.loads(os.getenv("LLM_ROUTES", "{}"))  # e.g. {"generate_code": {"model": "o1"}}
+LLM_ROUTES = {
+    node: {**route, **_ROUTE_OVERRIDES.get(node, {})}
+    for node, route in {
+        "validate_input": {"model": OPENAI_MODEL, "reasoning_effort": "low", "max_tokens": 2000},
+        "plan_scenes": {"model": OPENAI_MODEL, "reasoning_effort": "medium", "max_tokens": 8000},
+        "generate_code": {"model": OPENAI_MODEL, "reasoning_effort": "high", "max_tokens": 32000},
+        "correct_code": {"model": OPENAI_MODEL, "reasoning_effort": "low", "max_tokens": 16000},
+    }.items()
+}
+# Most output tokens each model accepts (by model name prefix): routes switching model are clamped to it
+MODEL_MAX_OUTPUT_TOKENS = {
+    "gpt-4o": 16384,
+    "gpt-4o-mini": 16384,
+    "gpt-4.1": 32768,
+    "o1": 100000,
+    "o3-mini": 100000,
+    **json.loads(os.getenv("MODEL_MAX_OUTPUT_TOKENS", "{}")),  # e.g. {"my-model": 8192}
+}
+# Corrections escalate as they fail: the n-th correction of a job applies the n-th entry (the last one after that)
+CORRECTION_ESCALATION = [
+    {},
+    {"reasoning_effort": "high"},
+    {"model": STRONG_OPENAI_MODEL, "reasoning_effort": "high"},
+]
+# Prompt token budgets: a node's prompts over budget have their trim sections cut down (see PromptTemplate)
+PROMPT_TOKEN_BUDGETS = {
+    "generate_code": 12000,
+    "correct_code": 12000,
+    **json.loads(os.getenv("PROMPT_TOKEN_BUDGETS", "{}")),  # e.g. {"correct_code": 8000}
+}
 
 
 # Directory Configuration
@@ -30,10 +97,98 @@ GENERATED_DIR = BASE_DIR / "generated"
 LOGS_DIR = GENERATED_DIR / "logs"
 ASSETS_DIR = PACKAGE_DIR / "assets"             # Updated to point to /backend/askleap/assets
 TEMPLATES_DIR = PACKAGE_DIR / "templates"       # Also update this to be consistent
+CACHE_DIR = GENERATED_DIR / "cache"             # Local caches (fixes, stage results, ...)
+METRICS_DIR = GENERATED_DIR / "metrics"         # Job latency records, per tier
 
 # Ensure directories exist
 GENERATED_DIR.mkdir(exist_ok=True)
 LOGS_DIR.mkdir(exist_ok=True)
 
+# Fix cache: fixes learned from corrections that led to a successful render
+FIX_CACHE_ENABLED = os.getenv("FIX_CACHE_ENABLED", "true").lower() == "true"
+FIX_CACHE_PATH = Path(os.getenv("FIX_CACHE_PATH", str(CACHE_DIR / "fix_cache.db")))
+FIX_CACHE_TTL_DAYS = int(os.getenv("FIX_CACHE_TTL_DAYS", "30"))  # drop fixes that haven't worked for this long
+FIX_CACHE_MAX_FAILURES = 3  # drop fixes that failed this many times and more often than they worked
+FIX_CACHE_MAX_HUNKS = 8  # larger corrections are rewrites, not reusable fixes
+
+# Stage cache: planning/generation results reused across requests with the same inputs
+STAGE_CACHE_ENABLED = os.getenv("STAGE_CACHE_ENABLED", "true").lower() == "true"
+STAGE_CACHE_PATH = Path(os.getenv("STAGE_CACHE_PATH", str(CACHE_DIR / "stage_cache.db")))
+STAGE_CACHE_TTL_HOURS = float(os.getenv("STAGE_CACHE_TTL_HOURS", "168"))
+STAGE_CACHE_MAX_ENTRIES = int(os.getenv("STAGE_CACHE_MAX_ENTRIES", "1000"))
+STAGE_CACHE_MAX_MB = float(os.getenv("STAGE_CACHE_MAX_MB", "100"))
+
+# LLM response cache: exact-match reuse of deterministic calls (input validation)
+LLM_RESPONSE_CACHE_ENABLED = os.getenv("LLM_RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+LLM_RESPONSE_CACHE_PATH = Path(os.getenv("LLM_RESPONSE_CACHE_PATH", str(CACHE_DIR / "llm_response_cache.db")))
+LLM_RESPONSE_CACHE_TTL_HOURS = float(os.getenv("LLM_RESPONSE_CACHE_TTL_HOURS", "24"))
+LLM_RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("LLM_RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+
+# Result cache: finished videos served again for the same or a near-duplicate question
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_PATH = Path(os.getenv("RESULT_CACHE_PATH", str(CACHE_DIR / "result_cache.db")))
+RESULT_CACHE_TTL_HOURS = float(os.getenv("RESULT_CACHE_TTL_HOURS", "720"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "5000"))
+RESULT_CACHE_SIMILARITY = float(os.getenv("RESULT_CACHE_SIMILARITY", "0.8"))  # min estimated Jaccard similarity of near-duplicates
+MINHASH_PERMUTATIONS = 64
+
+# Multi-scene lessons: scenes of a plan are generated and rendered in parallel, then concatenated
+MULTI_SCENE_ENABLED = os.getenv("MULTI_SCENE_ENABLED", "true").lower() == "true"
+SCENE_WORKERS = int(os.getenv("SCENE_WORKERS", "4"))  # scenes generated/rendered at the same time
+MIN_PARALLEL_SCENES = 2  # plans with fewer scenes are rendered as a single scene
+
+# Request coalescing: identical requests in flight at the same time share one run
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "true").lower() == "true"
+COALESCE_POLL_SECONDS = float(os.getenv("COALESCE_POLL_SECONDS", "5"))
+COALESCE_MAX_WAIT_SECONDS = float(os.getenv("COALESCE_MAX_WAIT_SECONDS", "1800"))  # run separately if the shared run takes longer
+COALESCE_WINDOW_SECONDS = float(os.getenv("COALESCE_WINDOW_SECONDS", "3600"))  # older in-flight jobs are considered abandoned
+
+# LLM cassettes: "record" stores every structured LLM call on disk, "replay" serves them back without the network
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "off").lower()  # off, record or replay
+LLM_CASSETTE_DIR = Path(os.getenv("LLM_CASSETTE_DIR", str(GENERATED_DIR / "cassettes")))
+LLM_REPLAY_LATENCY_SCALE = float(os.getenv("LLM_REPLAY_LATENCY_SCALE", "0"))  # 1.0 replays with the recorded latency
+
+# LLM clients: one pooled client per provider, shared by the whole process
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "120"))  # LLM calls are minutes apart within a job
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "600"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+# Attempts of a validated structured call: a response failing its validators is sent back to the model with the errors
+LLM_VALIDATION_ATTEMPTS = int(os.getenv("LLM_VALIDATION_ATTEMPTS", "3"))
+
+# LLM rate limit: requests/tokens per minute shared by all processes on the host (0 = no limit)
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+LLM_RATE_LIMIT_PATH = Path(os.getenv("LLM_RATE_LIMIT_PATH", str(CACHE_DIR / "llm_rate_limit.db")))
+LLM_EXPECTED_OUTPUT_TOKENS = 2000  # output tokens assumed when estimating a call
+LLM_RATE_LIMIT_PAUSE_SECONDS = float(os.getenv("LLM_RATE_LIMIT_PAUSE_SECONDS", "20"))  # pause after a 429
+LLM_RATE_LIMIT_RETRIES = 3  # rate limit errors waited out per call before failing
+
+# LLM request hedging: a call slower than its node's recent latency percentile is sent again and the first answer wins
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_SAMPLES = 20  # calls of a node seen before its calls are hedged
+LLM_HEDGE_HISTORY = 200  # recent calls per node the percentile is taken over
+LLM_HEDGE_MAX_EXTRA = float(os.getenv("LLM_HEDGE_MAX_EXTRA", "0.1"))  # cap on duplicate calls, as a fraction of all calls
+
+# Streaming code generation: the code is checked while it streams in and a generation with a fatal issue is restarted
+CODE_STREAMING_ENABLED = os.getenv("CODE_STREAMING_ENABLED", "true").lower() == "true"
+CODE_STREAMING_MAX_RESTARTS = int(os.getenv("CODE_STREAMING_MAX_RESTARTS", "2"))  # the last attempt always runs to the end
+
+# API reference: the Manim API documentation sections relevant to a request are retrieved (BM25) into its prompts
+API_DOCS_INDEX_PATH = Path(os.getenv("API_DOCS_INDEX_PATH", str(CACHE_DIR / "api_docs_index.bin")))
+API_REFERENCE_MAX_TOKENS = int(os.getenv("API_REFERENCE_MAX_TOKENS", "1500"))  # 0 = no API reference
+# Signature digest of the installed manim, one file per version (the image builds it outside the generated volume
+# and points API_DIGEST_DIR at it; elsewhere it's built on first use into the cache directory)
+API_DIGEST_DIR = Path(os.getenv("API_DIGEST_DIR", str(CACHE_DIR / "api_digest")))
+
+# Artifacts: large values (API docs, examples, plans in prompts) are kept out of the workflow state
+ARTIFACT_DIR = Path(os.getenv("ARTIFACT_DIR", str(GENERATED_DIR / "artifacts")))
+ARTIFACT_INLINE_CHARS = int(os.getenv("ARTIFACT_INLINE_CHARS", "1024"))  # longer values are stored and referenced
+ARTIFACT_TTL_HOURS = float(os.getenv("ARTIFACT_TTL_HOURS", "24"))  # artifacts of jobs that never finished are removed after this
+LOG_VALUE_CHARS = 200  # longer state values are logged as their size
+
 # Run timestamp
 RUN_TIMESTAMP = datetime.now().strftime("%Y%m%d_%H%M%S")
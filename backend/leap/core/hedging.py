@@ -0,0 +1,117 @@
+"""
+Hedging of slow LLM calls.
+
+A few OpenAI calls take several times the usual latency, and they dominate the
+tail of the job latency. The hedger keeps the latency of the recent calls of each
+node and model (a node's escalated or fast-model calls don't share one history);
+once a node and model have enough history, a call that hasn't answered within the
+LLM_HEDGE_PERCENTILE of their latency is sent a second time and the first answer
+wins (see LLMService). The duplicate calls are capped at LLM_HEDGE_MAX_EXTRA
+of all calls, so hedging can't multiply the spend when the API is slow overall.
+
+The history is kept per process, like the client pool.
+"""
+import math
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Hashable, Optional
+
+from leap.core.config import (
+    LLM_HEDGING_ENABLED,
+    LLM_HEDGE_PERCENTILE,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_HISTORY,
+    LLM_HEDGE_MAX_EXTRA,
+)
+
+
+class HedgeCancelledError(RuntimeError):
+    """Raised in the losing attempt of a hedged call once the other one answered."""
+
+
+class LLMHedger:
+    """Recent LLM latencies per node and model, and the budget of duplicate calls."""
+
+    def __init__(
+        self,
+        percentile: float = LLM_HEDGE_PERCENTILE,
+        min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+        history: int = LLM_HEDGE_HISTORY,
+        max_extra: float = LLM_HEDGE_MAX_EXTRA
+    ):
+        """Initialize the hedger.
+
+        Args:
+            percentile: Latency percentile (0-100) of a node after which a call is hedged
+            min_samples: Calls of a node recorded before its calls are hedged
+            history: Recent calls per node the percentile is taken over
+            max_extra: Maximum duplicate calls, as a fraction of all calls
+        """
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.history = history
+        self.max_extra = max_extra
+        self._lock = threading.Lock()
+        self._latencies: Dict[Hashable, Deque[float]] = {}
+        self._counts = {"calls": 0, "hedges": 0, "hedge_wins": 0}
+
+    def start(self, key: Hashable) -> Optional[float]:
+        """Count a new call of `key` and return how long to wait before hedging it.
+
+        Returns:
+            The seconds after which the call should be hedged, or None while the
+            node and model have too little history
+        """
+        with self._lock:
+            self._counts["calls"] += 1
+            latencies = sorted(self._latencies.get(key, ()))
+        if len(latencies) < self.min_samples:
+            return None
+        # Nearest rank, like leap.workflow.latency.percentile
+        return latencies[max(1, math.ceil(self.percentile / 100 * len(latencies))) - 1]
+
+    def allow_hedge(self) -> bool:
+        """Take a duplicate call from the budget, if it isn't spent."""
+        with self._lock:
+            if self._counts["hedges"] + 1 > self.max_extra * self._counts["calls"]:
+                return False
+            self._counts["hedges"] += 1
+            return True
+
+    def record(self, key: Hashable, seconds: float, hedge_won: bool = False):
+        """Record the latency of a call of `key` that answered.
+
+        Args:
+            key: The node (or response model) and the model of the call
+            seconds: Time the call took, from its first request to the answer
+            hedge_won: Whether the answer came from the duplicate request
+        """
+        with self._lock:
+            self._latencies.setdefault(key, deque(maxlen=self.history)).append(seconds)
+            if hedge_won:
+                self._counts["hedge_wins"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the calls, duplicate calls and how often the duplicate answered first."""
+        with self._lock:
+            counts = dict(self._counts)
+        counts["extra_rate"] = counts["hedges"] / counts["calls"] if counts["calls"] else 0.0
+        return counts
+
+
+_hedger: Optional[LLMHedger] = None
+_hedger_lock = threading.Lock()
+
+
+def get_hedger(hedger: Optional[LLMHedger] = None) -> Optional[LLMHedger]:
+    """Return the given hedger, the process-wide one, or None when hedging is disabled."""
+    global _hedger
+    if hedger is not None:
+        return hedger
+    if not LLM_HEDGING_ENABLED:
+        return None
+    if _hedger is None:
+        with _hedger_lock:
+            if _hedger is None:
+                _hedger = LLMHedger()
+    return _hedger
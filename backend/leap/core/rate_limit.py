@@ -0,0 +1,239 @@
+"""
+LLM requests/min and tokens/min budgets shared by all processes on a host.
+
+Every replica and worker process on the host draws from the same two token
+buckets, kept in a SQLite file (LLM_RATE_LIMIT_PATH) whose write lock serializes
+the bookkeeping. A bucket holds up to a minute's worth of its limit and refills
+continuously. A call first estimates its tokens (prompt characters / 4 plus the
+expected output) and joins a shared queue; the queue is served in priority
+order (lower first, then first come), and each call waits, never fails, until
+it is at the head and both buckets can pay for it. When OpenAI still answers
+with a rate limit error, `pause` stops every process for a while instead of
+letting client retries pile onto the overload.
+
+Waiters refresh a heartbeat while they wait, so the entries of processes that
+died are dropped after STALE_WAITER_SECONDS.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from leap.core.config import (
+    CACHE_DIR,
+    DEFAULT_PRIORITY,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_TOKENS_PER_MINUTE,
+    LLM_RATE_LIMIT_PATH,
+    LLM_EXPECTED_OUTPUT_TOKENS,
+)
+
+CHARS_PER_TOKEN = 4
+POLL_SECONDS = 0.5
+STALE_WAITER_SECONDS = 30
+
+logger = logging.getLogger("leap")
+
+
+def estimate_tokens(*texts: str, expected_output: int = LLM_EXPECTED_OUTPUT_TOKENS) -> int:
+    """Return the estimated tokens of a call: its prompt texts plus the expected output."""
+    return sum(len(text) for text in texts) // CHARS_PER_TOKEN + expected_output
+
+
+class RateLimiter:
+    """Token buckets for requests and tokens per minute, shared through a SQLite file."""
+
+    def __init__(
+        self,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+        db_path: Optional[Path] = None,
+        poll_seconds: float = POLL_SECONDS
+    ):
+        """Initialize the limiter.
+
+        Args:
+            requests_per_minute: Requests allowed per minute (0 for no limit)
+            tokens_per_minute: Tokens allowed per minute (0 for no limit)
+            db_path: Path of the SQLite file shared by the processes
+            poll_seconds: Longest sleep between checks while waiting
+        """
+        self.limits = {"requests": requests_per_minute, "tokens": tokens_per_minute}
+        self.db_path = Path(db_path or CACHE_DIR / "llm_rate_limit.db")
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.poll_seconds = poll_seconds
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode, so transactions are opened explicitly with BEGIN IMMEDIATE
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS limiter (
+                    key TEXT PRIMARY KEY,
+                    value REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS waiters (
+                    ticket INTEGER PRIMARY KEY AUTOINCREMENT,
+                    priority INTEGER NOT NULL,
+                    heartbeat_at REAL NOT NULL
+                );
+            """)
+        finally:
+            conn.close()
+
+    def _read(self, conn: sqlite3.Connection) -> Dict[str, float]:
+        return {key: value for key, value in conn.execute("SELECT key, value FROM limiter")}
+
+    def _write(self, conn: sqlite3.Connection, values: Dict[str, float]):
+        conn.executemany(
+            "INSERT OR REPLACE INTO limiter (key, value) VALUES (?, ?)", list(values.items())
+        )
+
+    def _refill(self, values: Dict[str, float], now: float) -> Dict[str, float]:
+        """Return the bucket levels at `now` (a bucket starts full)."""
+        elapsed = now - values.get("updated_at", now)
+        levels = {}
+        for name, limit in self.limits.items():
+            if limit:
+                level = values.get(f"{name}_level", limit)
+                levels[name] = min(limit, level + elapsed * limit / 60)
+        return levels
+
+    def _try_acquire(self, ticket: int, tokens: int, priority: int) -> Optional[float]:
+        """Take the call's share of both buckets if it's its turn.
+
+        Returns:
+            None once acquired, otherwise the seconds to wait before trying again
+        """
+        cost = {"requests": 1, "tokens": tokens}
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            conn.execute("DELETE FROM waiters WHERE heartbeat_at < ?", (now - STALE_WAITER_SECONDS,))
+            if not conn.execute("UPDATE waiters SET heartbeat_at = ? WHERE ticket = ?", (now, ticket)).rowcount:
+                # Dropped as stale (e.g. the process was suspended), so queue again in the same place
+                conn.execute(
+                    "INSERT INTO waiters (ticket, priority, heartbeat_at) VALUES (?, ?, ?)", (ticket, priority, now)
+                )
+            values = self._read(conn)
+            levels = self._refill(values, now)
+
+            head = conn.execute("SELECT ticket FROM waiters ORDER BY priority, ticket LIMIT 1").fetchone()
+            paused_until = values.get("paused_until", 0)
+            if now < paused_until:
+                wait = paused_until - now
+            elif head is not None and head[0] != ticket:
+                wait = self.poll_seconds
+            else:
+                # A call larger than a whole bucket would never fit, so it waits for a full bucket
+                shortfalls = [
+                    (min(cost[name], self.limits[name]) - level) * 60 / self.limits[name]
+                    for name, level in levels.items()
+                    if level < min(cost[name], self.limits[name])
+                ]
+                wait = max(shortfalls) if shortfalls else None
+                if wait is None:
+                    for name in levels:
+                        levels[name] -= min(cost[name], self.limits[name])
+                    conn.execute("DELETE FROM waiters WHERE ticket = ?", (ticket,))
+
+            self._write(conn, {**{f"{name}_level": level for name, level in levels.items()}, "updated_at": now})
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def acquire(self, tokens: int, priority: int = DEFAULT_PRIORITY) -> float:
+        """Wait until the call may be sent, then charge it to the buckets.
+
+        Args:
+            tokens: Estimated tokens of the call (see estimate_tokens)
+            priority: Queue priority of the call's job (lower is served first)
+
+        Returns:
+            The seconds spent waiting
+        """
+        start = time.time()
+        conn = self._connect()
+        try:
+            ticket = conn.execute(
+                "INSERT INTO waiters (priority, heartbeat_at) VALUES (?, ?)", (priority, start)
+            ).lastrowid
+        finally:
+            conn.close()
+
+        try:
+            while True:
+                wait = self._try_acquire(ticket, tokens, priority)
+                if wait is None:
+                    break
+                time.sleep(min(max(wait, 0.01), self.poll_seconds))
+        except BaseException:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM waiters WHERE ticket = ?", (ticket,))
+            finally:
+                conn.close()
+            raise
+
+        waited = time.time() - start
+        if waited >= 1:
+            logger.info(f"Waited {waited:.1f}s for the LLM rate limit (priority {priority}, ~{tokens} tokens)")
+        return waited
+
+    def adjust(self, tokens: int):
+        """Correct the tokens bucket once a call's actual usage is known (positive takes more)."""
+        if not self.limits["tokens"] or not tokens:
+            return
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            values = self._read(conn)
+            levels = self._refill(values, now)
+            levels["tokens"] = min(self.limits["tokens"], levels["tokens"] - tokens)
+            self._write(conn, {**{f"{name}_level": level for name, level in levels.items()}, "updated_at": now})
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def pause(self, seconds: float):
+        """Stop every process from sending calls for `seconds` (after a rate limit error)."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            paused_until = max(self._read(conn).get("paused_until", 0), time.time() + seconds)
+            self._write(conn, {"paused_until": paused_until})
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        logger.warning(f"LLM rate limit hit, pausing LLM calls for {seconds:.0f}s")
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter(rate_limiter: Optional[RateLimiter] = None) -> Optional[RateLimiter]:
+    """Return the given limiter, the process-wide one, or None when no limit is configured."""
+    global _limiter
+    if rate_limiter is not None:
+        return rate_limiter
+    if not LLM_REQUESTS_PER_MINUTE and not LLM_TOKENS_PER_MINUTE:
+        return None
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter(LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, db_path=LLM_RATE_LIMIT_PATH)
+    return _limiter
@@ -0,0 +1,40 @@
+"""
+Accounting of LLM token use per workflow node.
+
+`track_llm_usage()` opens a meter for the code running in the block (a workflow
+node, see leap.workflow.budget.timed_node), and LLMService adds the usage the API
+reports for every call it sends inside it. The meter is a context variable, so
+jobs running in other threads are counted separately. Calls served from a cache
+or a cassette cost nothing and aren't counted.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+_meter: ContextVar[Optional[Dict[str, int]]] = ContextVar("llm_usage_meter", default=None)
+
+
+@contextmanager
+def track_llm_usage() -> Iterator[Dict[str, int]]:
+    """Count the LLM calls and tokens used in the block.
+
+    Yields:
+        The usage so far: calls, prompt_tokens, completion_tokens and total_tokens
+    """
+    usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    token = _meter.set(usage)
+    try:
+        yield usage
+    finally:
+        _meter.reset(token)
+
+
+def record_llm_usage(prompt_tokens: int = 0, completion_tokens: int = 0) -> None:
+    """Add an LLM call and its tokens to the open meter, if any."""
+    usage = _meter.get()
+    if usage is None:
+        return
+    usage["calls"] += 1
+    usage["prompt_tokens"] += prompt_tokens
+    usage["completion_tokens"] += completion_tokens
+    usage["total_tokens"] += prompt_tokens + completion_tokens
@@ -6,6 +6,7 @@ This script demonstrates how to use the workflow to generate Manim animations.
 
 import os
 import argparse
+import json
 import logging
 import sys
 from pathlib import Path
@@ -20,7 +21,7 @@ if str(backend_dir) not in sys.path:
 from leap.workflow.graph import workflow
 from leap.workflow.state import GraphState
 from leap.core.logging import setup_question_logger
-from leap.core.config import GENERATED_DIR
+from leap.core.config import GENERATED_DIR, DEFAULT_LATENCY_BUDGET, GENERATION_TIERS, DEFAULT_TIER
 
 # Setup logger - will be replaced with question-specific logger later
 logger = logging.getLogger("leap")
@@ -67,6 +68,62 @@ def parse_arguments():
         default=None,
         help="User email for notifications"
     )
+    run_parser.add_argument(
+        "--tier",
+        type=str,
+        choices=GENERATION_TIERS,
+        default=DEFAULT_TIER,
+        help="Generation tier: \"quick\" makes a 30-60 second video at lower cost"
+    )
+    run_parser.add_argument(
+        "--latency-budget",
+        type=float,
+        default=DEFAULT_LATENCY_BUDGET,
+        help="Seconds to spend on the job; cheaper strategies are used as the budget runs out"
+    )
+    
+    # Batch command - many prompts from a JSONL file
+    batch_parser = subparsers.add_parser("batch", help="Run the workflow for every prompt in a JSONL file")
+    batch_parser.add_argument(
+        "input",
+        type=str,
+        help="JSONL file with one {\"prompt\", \"level\", \"quality\"} object per line"
+    )
+    batch_parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Results file (JSONL); defaults to <input>.results.jsonl. Prompts already in it are skipped"
+    )
+    batch_parser.add_argument(
+        "--report",
+        type=str,
+        default=None,
+        help="Report file (JSON); defaults to <input>.report.json"
+    )
+    batch_parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Prompts processed at the same time"
+    )
+    batch_parser.add_argument(
+        "--llm-concurrency",
+        type=int,
+        default=None,
+        help="Maximum concurrent LLM calls (default: no limit)"
+    )
+    batch_parser.add_argument(
+        "--render-concurrency",
+        type=int,
+        default=2,
+        help="Maximum concurrent Manim renders"
+    )
+    batch_parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="Also rerun prompts whose recorded result is a failure"
+    )
     
     # Visualize workflow command - for developers
     vis_parser = subparsers.add_parser("visualize-workflow", help="Generate a visualization of the workflow graph")
@@ -81,13 +138,17 @@ def parse_arguments():
 
 def create_initial_state(args) -> GraphState:
     """Create the initial state from args."""
-    return GraphState(
+    state = GraphState(
         user_input=args.prompt,
         quality=args.quality,
         level=args.level,
         voice=args.voice,
-        email=args.email
+        email=args.email,
+        tier=args.tier
     )
+    if args.latency_budget:
+        state["latency_budget"] = args.latency_budget
+    return state
 
 def run_workflow(state: GraphState) -> Dict[str, Any]:
     """Run the workflow with the given initial state."""
@@ -101,6 +162,43 @@ def run_workflow(state: GraphState) -> Dict[str, Any]:
     # Return the final state
     return result
 
+def run_batch_command(args):
+    """Run a batch of prompts and print its report."""
+    from leap.workflow.batch import load_batch, run_batch
+    
+    input_path = Path(args.input)
+    results_path = Path(args.output) if args.output else input_path.with_suffix(".results.jsonl")
+    report_path = Path(args.report) if args.report else input_path.with_suffix(".report.json")
+    
+    items = load_batch(input_path)
+    report = run_batch(
+        items,
+        results_path,
+        invoke=workflow.invoke,
+        concurrency=args.concurrency,
+        llm_concurrency=args.llm_concurrency,
+        render_concurrency=args.render_concurrency,
+        retry_failed=args.retry_failed
+    )
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    
+    print("\n" + "="*50)
+    print("BATCH SUMMARY")
+    print("="*50)
+    print(f"Prompts: {report['jobs']} ({report['succeeded']} succeeded, {report['failed']} failed)")
+    print(f"First-pass success rate: {report['first_pass_success_rate']:.0%}")
+    print(f"Throughput: {report['jobs_per_hour']} jobs/hour ({report['ran_this_run']} run in {report['wall_seconds']:.0f}s)")
+    if report['latency']['p50_seconds'] is not None:
+        print(f"Job latency: p50 {report['latency']['p50_seconds']:.0f}s, p95 {report['latency']['p95_seconds']:.0f}s")
+    if report['stages']:
+        print("\nPer stage (p50 / p95):")
+        for stage, latency in report['stages'].items():
+            print(f"  {stage}: {latency['p50_seconds']:.1f}s / {latency['p95_seconds']:.1f}s")
+    print(f"\nResults: {results_path}")
+    print(f"Report: {report_path}")
+    print("="*50)
+
 def visualize_workflow(output_path):
     """Generate a PNG visualization of the workflow graph.
     
@@ -138,6 +236,10 @@ def main():
         visualize_workflow(output_path)
         return
     
+    if args.command == "batch":
+        run_batch_command(args)
+        return
+    
     # Default command: run
     # Create initial state
     initial_state = create_initial_state(args)
@@ -155,7 +257,24 @@ def main():
         print(f"\nError encountered: {result['error']}")
     else:
         print("\nWorkflow completed successfully!")
+    
+    if result.get('stop_reason'):
+        print(f"\nStopped early: {result['stop_reason']}")
+    
+    if result.get('node_timings'):
+        print("\nTime per step:")
+        for node, seconds in result['node_timings'].items():
+            print(f"  {node}: {seconds:.1f}s")
         
+    if result.get('scene_results'):
+        print("\nScenes:")
+        for scene in result['scene_results']:
+            status = "ok" if scene['success'] else f"failed ({scene['error'][:80]})"
+            print(f"  {scene['index'] + 1}. {scene['title']}: {status}, {scene['correction_attempts']} correction(s)")
+    
+    if result.get('cached_result'):
+        print(f"\nServed from the result cache ({result['cached_result']['match']} match): {result['cached_result']['video_url']}")
+    
     if result.get('execution_result'):
         if result['execution_result'].get('success'):
             output_file = result['execution_result'].get('output_file')
@@ -1,5 +1,9 @@
 from leap.models.responses import (
+    CHECK_CODE_CONTEXT,
     ManimCodeResponse,
+    CodeEdit,
+    CodePatchResponse,
+    PlannedScene,
     ScenePlanResponse,
     CodeIssue,
     CodeValidationResult,
@@ -7,7 +11,11 @@ from leap.models.responses import (
 )
 
 __all__ = [
+    "CHECK_CODE_CONTEXT",
     "ManimCodeResponse",
+    "CodeEdit",
+    "CodePatchResponse",
+    "PlannedScene",
     "ScenePlanResponse",
     "CodeIssue",
     "CodeValidationResult",
@@ -1,5 +1,26 @@
-from typing import Dict, Optional, List, Literal
-from pydantic import BaseModel, Field
+from typing import Any, Dict, Optional, List, Literal
+from pydantic import BaseModel, Field, ValidationInfo, field_validator, model_validator
+
+# Validation context of responses whose code is checked as they are parsed, so the
+# model fixes the problems within the same call (see LLMService). Patch responses
+# also need the code their edits apply to, as "original_code".
+CHECK_CODE_CONTEXT = {"check_code": True}
+
+
+def _check_code(code: str) -> str:
+    """Raise the problems the static checks find in the code, for the model to fix them."""
+    # The validation rules are part of the workflow, which imports the models
+    from leap.workflow.nodes.validation import find_response_issues
+    problems = find_response_issues(code)
+    if problems:
+        raise ValueError("The code fails these checks, fix all of them:\n" + "\n".join(f"- {p}" for p in problems))
+    return code
+
+
+def _checks_code(info: ValidationInfo) -> bool:
+    context: Dict[str, Any] = info.context or {}
+    return bool(context.get("check_code"))
+
 
 class ManimCodeResponse(BaseModel):
     code: str = Field(..., description="The complete, valid Python code for the Manim animation")
@@ -7,10 +28,51 @@ class ManimCodeResponse(BaseModel):
     error_fixes: Optional[List[str]] = Field(None, description="List of errors fixed in the code")
     fixed_issues: Optional[List[Dict[str, str]]] = Field(None, description="Detailed information about each fixed issue")
     validation_checks: Optional[List[str]] = Field(None, description="List of validation checks performed on the code")
+    
+    @field_validator("code")
+    @classmethod
+    def code_passes_checks(cls, code: str, info: ValidationInfo) -> str:
+        """Compile the code and apply the static rules, when validated with CHECK_CODE_CONTEXT."""
+        return _check_code(code) if _checks_code(info) else code
+
+class CodeEdit(BaseModel):
+    """A single line-range replacement applied to existing code."""
+    start_line: int = Field(..., description="First line to replace (1-based, inclusive)")
+    end_line: int = Field(..., description="Last line to replace (1-based, inclusive). Use start_line - 1 to insert before start_line")
+    replacement: str = Field(..., description="New text for the line range; an empty string deletes the lines")
+    original: Optional[str] = Field(None, description="The exact lines being replaced, used to verify the edit targets the right code")
+
+class CodePatchResponse(BaseModel):
+    """Model for a correction expressed as edits against the current code."""
+    edits: List[CodeEdit] = Field(..., description="Line-range edits to apply to the original code")
+    explanation: Optional[str] = Field(None, description="Explanation of the changes made")
+    error_fixes: Optional[List[str]] = Field(None, description="List of errors fixed by the edits")
+    
+    @model_validator(mode="after")
+    def edits_apply_and_pass_checks(self, info: ValidationInfo) -> "CodePatchResponse":
+        """Apply the edits to the original code and check the result, when validated with
+        CHECK_CODE_CONTEXT and the original code."""
+        original_code = (info.context or {}).get("original_code")
+        if not _checks_code(info) or original_code is None:
+            return self
+        from leap.workflow.patching import PatchError, apply_code_edits
+        try:
+            patched_code = apply_code_edits(original_code, self.edits)
+        except PatchError as e:
+            raise ValueError(f"The edits can't be applied to the original code: {e}")
+        _check_code(patched_code)
+        return self
+
+class PlannedScene(BaseModel):
+    """A single scene of the plan, generated and rendered on its own."""
+    title: str = Field(..., description="Short title of the scene")
+    description: str = Field(..., description="The scene's part of the plan: visual elements, exact narration text and transitions")
+    target_seconds: int = Field(..., description="Target duration of the scene in seconds")
 
 class ScenePlanResponse(BaseModel):
     """Model for scene planning response."""
     plan: str = Field(..., description="The detailed plan for the animation scenes")
+    scenes: Optional[List[PlannedScene]] = Field(None, description="The plan split into its scenes, in order, each with a target duration")
     reasoning: Optional[str] = Field(None, description="Reasoning behind the scene planning decisions")
 
 class CodeIssue(BaseModel):
@@ -3,14 +3,31 @@ Centralized prompt management system for AskLeap.
 This module provides access to all prompts used in the application.
 """
 
-from leap.prompts.planning import SCENE_PLANNING_PROMPTS
-from leap.prompts.generation import CODE_GENERATION_PROMPTS
-from leap.prompts.correction import ERROR_CORRECTION_PROMPTS
+from leap.prompts.planning import SCENE_PLANNING_PROMPTS, QUICK_SCENE_PLANNING_PROMPTS, DURATION_INSTRUCTIONS, SCENE_DURATION_INSTRUCTION
+from leap.prompts.generation import CODE_GENERATION_PROMPTS, QUICK_CODE_GENERATION_PROMPTS
+from leap.prompts.correction import ERROR_CORRECTION_PROMPTS, ERROR_CORRECTION_PATCH_PROMPTS
 from leap.prompts.validation import VALIDATION_PROMPTS
 
+# Map of prompt collection names (template ids) to their objects
+PROMPT_COLLECTIONS = {
+    "scene_planning": SCENE_PLANNING_PROMPTS,
+    "quick_scene_planning": QUICK_SCENE_PLANNING_PROMPTS,
+    "code_generation": CODE_GENERATION_PROMPTS,
+    "quick_code_generation": QUICK_CODE_GENERATION_PROMPTS,
+    "error_correction": ERROR_CORRECTION_PROMPTS,
+    "error_correction_patch": ERROR_CORRECTION_PATCH_PROMPTS,
+    "validation": VALIDATION_PROMPTS
+}
+
 __all__ = [
     "SCENE_PLANNING_PROMPTS",
+    "QUICK_SCENE_PLANNING_PROMPTS",
+    "DURATION_INSTRUCTIONS",
+    "SCENE_DURATION_INSTRUCTION",
     "CODE_GENERATION_PROMPTS", 
+    "QUICK_CODE_GENERATION_PROMPTS",
     "ERROR_CORRECTION_PROMPTS",
-    "VALIDATION_PROMPTS"
+    "ERROR_CORRECTION_PATCH_PROMPTS",
+    "VALIDATION_PROMPTS",
+    "PROMPT_COLLECTIONS"
 ] 
\ No newline at end of file
@@ -3,12 +3,15 @@ Base classes and utilities for prompt management.
 """
 
 from typing import Dict, Any, Optional, List, Union
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from enum import Enum
 import json
+import logging
 import os
 from pathlib import Path
 
+from leap.prompts.tokens import count_tokens, trim_text
+
 
 class PromptVersion(str, Enum):
     """Enum for prompt versions."""
@@ -16,31 +19,126 @@ class PromptVersion(str, Enum):
     V2 = "v2"
     V3 = "v3"
     V4 = "v4"
+    V5 = "v5"
+    V6 = "v6"
+    V7 = "v7"
     EXPERIMENTAL = "experimental"
     PRODUCTION = "production"
     
 
+class FormattedPrompt(dict):
+    """The system and user messages of a formatted prompt.
+    
+    Also carries the parameters the messages were formatted with (after trimming)
+    and the token accounting of the prompt: the tokens of each parameter and of
+    both messages, the budget and the tokens trimmed from each trimmed parameter.
+    """
+    
+    def __init__(self, messages: Dict[str, str], params: Dict[str, Any], tokens: Dict[str, Any]):
+        super().__init__(messages)
+        self.params = params
+        self.tokens = tokens
+
+
 class PromptTemplate(BaseModel):
-    """Base class for prompt templates."""
+    """Base class for prompt templates.
+    
+    Static sections are parameters whose values are the same for every request
+    (API docs, examples, code templates). They are emitted verbatim, under their
+    heading, right after the system message, so every request with the template
+    starts with the same bytes and the provider can cache that prefix. The system
+    message of such templates should have no placeholders, and the per-request
+    fields go in the user message.
+    
+    Context sections are per-request parameters appended to the user message under
+    their heading (the API reference retrieved for a request, for example), and are
+    left out when not given or empty.
+    
+    A prompt formatted with a token budget that it exceeds has its trim sections
+    cut down, lowest priority first, until it fits (see leap.prompts.tokens).
+    Static sections can't be trimmed: a trimmed section would change the prefix.
+    """
     system: str = Field(..., description="System message content")
     user: str = Field(..., description="User message template with placeholders")
+    static_sections: Dict[str, str] = Field(
+        default_factory=dict,
+        description="Parameters emitted first, verbatim, after the system message, mapped to their headings"
+    )
+    context_sections: Dict[str, str] = Field(
+        default_factory=dict,
+        description="Optional per-request parameters appended to the user message, mapped to their headings"
+    )
+    trim_sections: Dict[str, str] = Field(
+        default_factory=dict,
+        description="Parameters trimmed to fit a token budget, lowest priority first, mapped to the end they keep (head or tail)"
+    )
     version: PromptVersion = Field(default=PromptVersion.V1, description="Version of this prompt")
     description: Optional[str] = Field(None, description="Description of what this prompt does")
     tags: List[str] = Field(default_factory=list, description="Tags for categorizing prompts (optional)")
     
-    def format(self, **kwargs) -> Dict[str, str]:
+    @model_validator(mode="after")
+    def static_sections_are_not_trimmed(self) -> "PromptTemplate":
+        overlap = [name for name in self.trim_sections if name in self.static_sections]
+        if overlap:
+            raise ValueError(f"Static sections can't be trim sections: {', '.join(overlap)}")
+        return self
+    
+    def format(self, token_budget: Optional[int] = None, **kwargs) -> FormattedPrompt:
         """
         Format the prompt template with the provided values.
         
         Args:
+            token_budget: Maximum tokens of the prompt; over it, the trim sections are cut down
             **kwargs: Values to fill in the template placeholders
             
         Returns:
-            Dict with formatted system and user messages
+            Dict with formatted system and user messages, with the parameters used
+            and the token accounting as attributes
         """
+        params = dict(kwargs)
+        messages = self._render(params)
+        total = count_tokens(messages["system"]) + count_tokens(messages["user"])
+        
+        trimmed = {}
+        if token_budget and total > token_budget:
+            for name, keep in self.trim_sections.items():
+                if total <= token_budget:
+                    break
+                value = params.get(name)
+                if not isinstance(value, str) or not value:
+                    continue
+                size = count_tokens(value)
+                params[name] = trim_text(value, max(0, size - (total - token_budget)), keep)
+                trimmed[name] = size - count_tokens(params[name])
+                messages = self._render(params)
+                total = count_tokens(messages["system"]) + count_tokens(messages["user"])
+        
+        tokens = {
+            "system": count_tokens(messages["system"]),
+            "user": count_tokens(messages["user"]),
+            "total": total,
+            "budget": token_budget,
+            "sections": {name: count_tokens(value) for name, value in params.items() if isinstance(value, str)},
+            "trimmed": trimmed
+        }
+        logger = logging.getLogger("leap")
+        logger.info(
+            f"Prompt tokens: {total} (system {tokens['system']}, user {tokens['user']}, budget {token_budget})"
+            + (f", trimmed {trimmed}" if trimmed else "")
+        )
+        if token_budget and total > token_budget:
+            logger.warning(f"Prompt is over its token budget after trimming: {total} > {token_budget}")
+        return FormattedPrompt(messages, params=params, tokens=tokens)
+    
+    def _render(self, params: Dict[str, Any]) -> Dict[str, str]:
         try:
-            formatted_system = self.system.format(**kwargs)
-            formatted_user = self.user.format(**kwargs)
+            formatted_system = self.system.format(**params) + "".join(
+                f"\n\n{heading}:\n{params[name]}" for name, heading in self.static_sections.items()
+            )
+            formatted_user = self.user.format(**params) + "".join(
+                f"\n\n{heading}:\n{params[name]}" for name, heading in self.context_sections.items()
+                if params.get(name)
+            )
             return {
                 "system": formatted_system,
                 "user": formatted_user
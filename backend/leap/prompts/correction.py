@@ -212,12 +212,280 @@ ERROR_CORRECTION_V4 = PromptTemplate(
     description="Error correction prompt with explicit background creation prohibition"
 )
 
+# Error correction prompt that also lists the approaches that already failed
+ERROR_CORRECTION_V5 = PromptTemplate(
+    system="""You are an expert Manim developer and debugging specialist. Your task is to fix code errors while preserving the educational intent of the animation.""",
+    user="""
+        Fix the following Manim code that has encountered errors. Maintain the original educational intent while making it technically correct.
+        
+        ERROR DETAILS:
+        {error}
+        
+        ORIGINAL ANIMATION PLAN:
+        {plan}
+        
+        ORIGINAL CODE:
+        {generated_code}
+        
+        PREVIOUS ATTEMPTS THAT FAILED (do not repeat these approaches or reintroduce their errors):
+        {previous_attempts}
+        
+        DEBUGGING APPROACH:
+        1. First identify the root cause of the error
+        2. Fix the immediate issue
+        3. Check for related issues that might cause problems
+        4. Verify the fix doesn't break other parts of the code or recreate previous errors
+        5. Ensure the educational intent is preserved
+        6. See if the code is using deprecated or removed methods and update it accordingly, here are some of the breaking changes: {manim_api_context}
+        
+        
+        CRITICAL RESTRICTIONS:
+        - NEVER create any background rectangles, images, or shapes that cover the entire screen
+        - The base class already provides a background image - do not create your own
+        - NEVER use Rectangle, ImageMobject, or any other object as a full-screen background
+        - NEVER use self.camera.background or try to modify the camera background
+        - NEVER use self.camera.frame or any attempt to animate or scale the camera frame
+        - The Camera object does NOT have a 'frame' attribute that can be animated
+        - For zoom effects, scale the objects themselves: self.play(mobject.animate.scale(0.8))
+        - For perspective changes, move objects: self.play(mobject.animate.shift(direction))
+        - For transitions, use transforms: self.play(Transform(group1, group2))
+        
+        
+        RESPONSE FORMAT:
+        Return a structured response with:
+        1. Complete fixed code (ready to run without modifications)
+        2. Explanation of what was fixed
+        3. List of specific errors addressed
+        4. Validation checks performed
+        """,
+    version=PromptVersion.V5,
+    description="Error correction prompt with a summary of previously failed attempts"
+)
+
+# Error correction prompt laid out for provider prompt caching: the instructions and the Manim
+# breaking changes come first and are identical for every request, the failing code comes last
+ERROR_CORRECTION_V6 = PromptTemplate(
+    system="""You are an expert Manim developer and debugging specialist. Your task is to fix code errors while preserving the educational intent of the animation.
+
+Fix the Manim code given by the user, which has encountered errors. Maintain the original educational intent while making it technically correct.
+
+DEBUGGING APPROACH:
+1. First identify the root cause of the error
+2. Fix the immediate issue
+3. Check for related issues that might cause problems
+4. Verify the fix doesn't break other parts of the code or recreate previous errors
+5. Ensure the educational intent is preserved
+6. See if the code is using deprecated or removed methods and update it accordingly, using the breaking changes listed below
+
+CRITICAL RESTRICTIONS:
+- NEVER create any background rectangles, images, or shapes that cover the entire screen
+- The base class already provides a background image - do not create your own
+- NEVER use Rectangle, ImageMobject, or any other object as a full-screen background
+- NEVER use self.camera.background or try to modify the camera background
+- NEVER use self.camera.frame or any attempt to animate or scale the camera frame
+- The Camera object does NOT have a 'frame' attribute that can be animated
+- For zoom effects, scale the objects themselves: self.play(mobject.animate.scale(0.8))
+- For perspective changes, move objects: self.play(mobject.animate.shift(direction))
+- For transitions, use transforms: self.play(Transform(group1, group2))
+
+RESPONSE FORMAT:
+Return a structured response with:
+1. Complete fixed code (ready to run without modifications)
+2. Explanation of what was fixed
+3. List of specific errors addressed
+4. Validation checks performed""",
+    user="""
+        ERROR DETAILS:
+        {error}
+        
+        ORIGINAL ANIMATION PLAN:
+        {plan}
+        
+        ORIGINAL CODE:
+        {generated_code}
+        
+        PREVIOUS ATTEMPTS THAT FAILED (do not repeat these approaches or reintroduce their errors):
+        {previous_attempts}
+        """,
+    static_sections={"manim_api_context": "MANIM BREAKING CHANGES"},
+    version=PromptVersion.V6,
+    description="Error correction prompt with a static prefix (instructions, breaking changes) for prompt caching"
+)
+
+# V6 with the Manim API sections relevant to the failing code and error after the request's fields
+ERROR_CORRECTION_V7 = ERROR_CORRECTION_V6.model_copy(update={
+    "context_sections": {"api_reference": "RELEVANT MANIM API"},
+    "trim_sections": {"api_reference": "head", "previous_attempts": "tail", "plan": "head", "error": "tail"},
+    "version": PromptVersion.V7,
+    "description": "Error correction prompt with a static prefix and the API reference retrieved for the error"
+})
+
+# Patch-based error correction prompt: the model returns line edits instead of the full file
+ERROR_CORRECTION_PATCH_V1 = PromptTemplate(
+    system="""You are an expert Manim developer and debugging specialist. Your task is to fix code errors with the smallest possible set of line edits while preserving the educational intent of the animation.""",
+    user="""
+        Fix the following Manim code that has encountered errors. Do NOT rewrite the whole file - return only the line edits needed to fix it.
+        
+        ERROR DETAILS:
+        {error}
+        
+        ORIGINAL ANIMATION PLAN:
+        {plan}
+        
+        ORIGINAL CODE (each line is prefixed with its line number and " | ", the prefix is NOT part of the code):
+        {numbered_code}
+        
+        DEBUGGING APPROACH:
+        1. First identify the root cause of the error
+        2. Fix the immediate issue and any closely related issues
+        3. Verify the fix doesn't break other parts of the code or recreate previous errors
+        4. See if the code is using deprecated or removed methods and update it accordingly, here are some of the breaking changes: {manim_api_context}
+        
+        CRITICAL RESTRICTIONS:
+        - NEVER create any background rectangles, images, or shapes that cover the entire screen
+        - NEVER use self.camera.background or self.camera.frame
+        - Keep the class inheriting from ManimVoiceoverBase and keep every animation inside a voiceover block
+        
+        EDIT FORMAT:
+        - Each edit replaces the lines start_line..end_line (1-based, inclusive) of the ORIGINAL CODE with `replacement`
+        - Set `original` to the exact lines you are replacing, without the line number prefixes
+        - To insert new lines before line N without replacing anything, use start_line=N and end_line=N-1
+        - To delete lines, use an empty replacement
+        - Line numbers always refer to the ORIGINAL CODE; edits must not overlap
+        - `replacement` must contain complete lines with correct indentation and no line number prefixes
+        
+        RESPONSE FORMAT:
+        Return a structured response with:
+        1. The list of edits
+        2. Explanation of what was fixed
+        3. List of specific errors addressed
+        """,
+    version=PromptVersion.V1,
+    description="Error correction prompt returning line-range edits instead of the full code"
+)
+
+# Patch-based error correction prompt that also lists the approaches that already failed
+ERROR_CORRECTION_PATCH_V2 = PromptTemplate(
+    system="""You are an expert Manim developer and debugging specialist. Your task is to fix code errors with the smallest possible set of line edits while preserving the educational intent of the animation.""",
+    user="""
+        Fix the following Manim code that has encountered errors. Do NOT rewrite the whole file - return only the line edits needed to fix it.
+        
+        ERROR DETAILS:
+        {error}
+        
+        ORIGINAL ANIMATION PLAN:
+        {plan}
+        
+        ORIGINAL CODE (each line is prefixed with its line number and " | ", the prefix is NOT part of the code):
+        {numbered_code}
+        
+        PREVIOUS ATTEMPTS THAT FAILED (do not repeat these approaches or reintroduce their errors):
+        {previous_attempts}
+        
+        DEBUGGING APPROACH:
+        1. First identify the root cause of the error
+        2. Fix the immediate issue and any closely related issues
+        3. Verify the fix doesn't break other parts of the code or recreate previous errors
+        4. See if the code is using deprecated or removed methods and update it accordingly, here are some of the breaking changes: {manim_api_context}
+        
+        CRITICAL RESTRICTIONS:
+        - NEVER create any background rectangles, images, or shapes that cover the entire screen
+        - NEVER use self.camera.background or self.camera.frame
+        - Keep the class inheriting from ManimVoiceoverBase and keep every animation inside a voiceover block
+        
+        EDIT FORMAT:
+        - Each edit replaces the lines start_line..end_line (1-based, inclusive) of the ORIGINAL CODE with `replacement`
+        - Set `original` to the exact lines you are replacing, without the line number prefixes
+        - To insert new lines before line N without replacing anything, use start_line=N and end_line=N-1
+        - To delete lines, use an empty replacement
+        - Line numbers always refer to the ORIGINAL CODE; edits must not overlap
+        - `replacement` must contain complete lines with correct indentation and no line number prefixes
+        
+        RESPONSE FORMAT:
+        Return a structured response with:
+        1. The list of edits
+        2. Explanation of what was fixed
+        3. List of specific errors addressed
+        """,
+    version=PromptVersion.V2,
+    description="Line-edit error correction prompt with a summary of previously failed attempts"
+)
+
+# Patch-based error correction prompt laid out for provider prompt caching: the instructions and
+# the Manim breaking changes come first and are identical for every request
+ERROR_CORRECTION_PATCH_V3 = PromptTemplate(
+    system="""You are an expert Manim developer and debugging specialist. Your task is to fix code errors with the smallest possible set of line edits while preserving the educational intent of the animation.
+
+Fix the Manim code given by the user, which has encountered errors. Do NOT rewrite the whole file - return only the line edits needed to fix it.
+
+DEBUGGING APPROACH:
+1. First identify the root cause of the error
+2. Fix the immediate issue and any closely related issues
+3. Verify the fix doesn't break other parts of the code or recreate previous errors
+4. See if the code is using deprecated or removed methods and update it accordingly, using the breaking changes listed below
+
+CRITICAL RESTRICTIONS:
+- NEVER create any background rectangles, images, or shapes that cover the entire screen
+- NEVER use self.camera.background or self.camera.frame
+- Keep the class inheriting from ManimVoiceoverBase and keep every animation inside a voiceover block
+
+EDIT FORMAT:
+- Each edit replaces the lines start_line..end_line (1-based, inclusive) of the ORIGINAL CODE with `replacement`
+- Set `original` to the exact lines you are replacing, without the line number prefixes
+- To insert new lines before line N without replacing anything, use start_line=N and end_line=N-1
+- To delete lines, use an empty replacement
+- Line numbers always refer to the ORIGINAL CODE; edits must not overlap
+- `replacement` must contain complete lines with correct indentation and no line number prefixes
+
+RESPONSE FORMAT:
+Return a structured response with:
+1. The list of edits
+2. Explanation of what was fixed
+3. List of specific errors addressed""",
+    user="""
+        ERROR DETAILS:
+        {error}
+        
+        ORIGINAL ANIMATION PLAN:
+        {plan}
+        
+        ORIGINAL CODE (each line is prefixed with its line number and " | ", the prefix is NOT part of the code):
+        {numbered_code}
+        
+        PREVIOUS ATTEMPTS THAT FAILED (do not repeat these approaches or reintroduce their errors):
+        {previous_attempts}
+        """,
+    static_sections={"manim_api_context": "MANIM BREAKING CHANGES"},
+    version=PromptVersion.V3,
+    description="Line-edit error correction prompt with a static prefix for prompt caching"
+)
+
+# V3 with the Manim API sections relevant to the failing code and error after the request's fields
+ERROR_CORRECTION_PATCH_V4 = ERROR_CORRECTION_PATCH_V3.model_copy(update={
+    "context_sections": {"api_reference": "RELEVANT MANIM API"},
+    "trim_sections": {"api_reference": "head", "previous_attempts": "tail", "plan": "head", "error": "tail"},
+    "version": PromptVersion.V4,
+    "description": "Line-edit error correction prompt with a static prefix and the API reference retrieved for the error"
+})
+
+# Collection of patch-based error correction prompts
+ERROR_CORRECTION_PATCH_PROMPTS = PromptCollection({
+    PromptVersion.V1: ERROR_CORRECTION_PATCH_V1,
+    PromptVersion.V2: ERROR_CORRECTION_PATCH_V2,
+    PromptVersion.V3: ERROR_CORRECTION_PATCH_V3,
+    PromptVersion.V4: ERROR_CORRECTION_PATCH_V4,
+    PromptVersion.PRODUCTION: ERROR_CORRECTION_PATCH_V4,
+})
+
 # Collection of all error correction prompts
 ERROR_CORRECTION_PROMPTS = PromptCollection({
     PromptVersion.V1: ERROR_CORRECTION_V1,
     PromptVersion.V2: ERROR_CORRECTION_V2,
     PromptVersion.V3: ERROR_CORRECTION_V3,
     PromptVersion.V4: ERROR_CORRECTION_V4,
-    PromptVersion.PRODUCTION: ERROR_CORRECTION_V4,  # Now using V4 in production
+    PromptVersion.V5: ERROR_CORRECTION_V5,
+    PromptVersion.V6: ERROR_CORRECTION_V6,
+    PromptVersion.V7: ERROR_CORRECTION_V7,
+    PromptVersion.PRODUCTION: ERROR_CORRECTION_V7,  # Now using V7 in production
     PromptVersion.EXPERIMENTAL: ERROR_CORRECTION_V4,  # Testing V4
 }) 
\ No newline at end of file
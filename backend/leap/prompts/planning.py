@@ -144,10 +144,83 @@ For EACH scene, provide:
     description="Enhanced scene planning prompt with more detailed instructions and expanded scene structure for significantly longer videos"
 )
 
+# V2 plus the scenes as a structured list, so each scene can be generated and rendered on its own
+SCENE_PLANNING_V3 = PromptTemplate(
+    system=SCENE_PLANNING_V2.system + """
+
+Besides the full plan, return the same plan split into its scenes, in order. For each scene give
+a short title, its complete part of the plan (visual elements, exact narration text, transitions)
+and its target duration in seconds. Each scene will be animated as a separate video by someone who
+only sees that scene's description, so make every description self-contained.""",
+    user="{user_input}",
+    version=PromptVersion.V3,
+    description="V2 with the plan also returned as a list of self-contained scenes with target durations"
+)
+
+# V3 with a system message that is the same for every request, so the provider can cache it:
+# the audience level and the target length go in the user message
+SCENE_PLANNING_V4 = PromptTemplate(
+    system=SCENE_PLANNING_V3.system.replace("\n\n{user_level_instruction}\n\n{duration_instruction}", ""),
+    user="""{user_input}
+
+AUDIENCE LEVEL:
+{user_level_instruction}
+
+DURATION CONSTRAINTS:
+{duration_instruction}""",
+    version=PromptVersion.V4,
+    description="V3 with a static system message for prompt caching and the request's level and length in the user message"
+)
+
+# Scene planning prompt for the quick tier: one short video on the core idea
+QUICK_SCENE_PLANNING_V1 = PromptTemplate(
+    system="""You are a manim expert and a great teacher. Plan a short manim animation that explains the core idea of the concept in 30-60 seconds.
+Break it down into **2-3 short scenes**:
+- A one-sentence introduction of the question
+- One clear visual explanation of the key idea, with a single concrete example
+- A one-sentence takeaway
+
+For EACH scene, provide:
+- The few visual elements to include (keep them simple: text, shapes, arrows, simple graphs)
+- Exact narration text (1-3 short sentences per scene)
+
+Do not plan 3D scenes, camera movements or elaborate transitions.
+
+{user_level_instruction}
+
+{duration_instruction}""",
+    user="{user_input}",
+    version=PromptVersion.V1,
+    description="Scene planning prompt for 30-60 second quick-tier videos"
+)
+
+# Target video length instructions: "long" by default, "short" when the latency budget
+# is tight, "quick" for the quick tier
+DURATION_INSTRUCTIONS = {
+    "long": "The video should be at least 4 minutes long. Elaborate on the concepts and provide detailed explanations and examples.",
+    "short": "The video should be about 1-2 minutes long. Focus on the core idea with one clear example and keep the narration concise.",
+    "quick": "The video should be 30-60 seconds long. Cover only the core idea and keep the narration to a few short sentences.",
+}
+
+# Length instruction for one scene of a multi-scene lesson
+SCENE_DURATION_INSTRUCTION = (
+    "This video is scene {index} of {count} of a longer lesson and should be about {seconds} seconds long. "
+    "Animate only this scene, the other scenes are separate videos: don't add an introduction or a summary "
+    "for the whole lesson unless the scene asks for it."
+)
+
 # Collection of all scene planning prompts
 SCENE_PLANNING_PROMPTS = PromptCollection({
     PromptVersion.V1: SCENE_PLANNING_V1,
     PromptVersion.V2: SCENE_PLANNING_V2,
-    PromptVersion.PRODUCTION: SCENE_PLANNING_V2,  # Currently using V2 in production
+    PromptVersion.V3: SCENE_PLANNING_V3,
+    PromptVersion.V4: SCENE_PLANNING_V4,
+    PromptVersion.PRODUCTION: SCENE_PLANNING_V4,  # Currently using V4 in production
     PromptVersion.EXPERIMENTAL: SCENE_PLANNING_V1,  # Testing V1
+})
+
+# Collection of quick-tier scene planning prompts
+QUICK_SCENE_PLANNING_PROMPTS = PromptCollection({
+    PromptVersion.V1: QUICK_SCENE_PLANNING_V1,
+    PromptVersion.PRODUCTION: QUICK_SCENE_PLANNING_V1,
 }) 
\ No newline at end of file
@@ -0,0 +1,67 @@
+"""
+Token counting and trimming of prompt sections.
+
+Tokens are counted with tiktoken when it's installed (with the encoding of the
+current OpenAI models), and estimated from the number of characters otherwise.
+"""
+import math
+from functools import lru_cache
+from typing import Any, Optional
+
+# Try to import tiktoken, but fall back to an estimate if it's not available
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+ENCODING_NAME = "o200k_base"
+CHARS_PER_TOKEN = 4
+TRIM_MARKER = "[... {tokens} tokens trimmed ...]"
+
+
+@lru_cache(maxsize=1)
+def _encoding() -> Optional[Any]:
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    try:
+        return tiktoken.get_encoding(ENCODING_NAME)
+    except Exception:  # the encoding is downloaded on first use
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count the tokens of a text."""
+    encoding = _encoding()
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def trim_text(text: str, max_tokens: int, keep: str = "head") -> str:
+    """Cut a text down to `max_tokens`, marking where it was cut.
+
+    Args:
+        text: The text to trim
+        max_tokens: Tokens of the result, marker included
+        keep: "head" keeps the beginning of the text, "tail" its end
+
+    Returns:
+        The text itself if it fits, "" if not even the marker fits
+    """
+    size = count_tokens(text)
+    if size <= max_tokens:
+        return text
+    kept = max_tokens - count_tokens(TRIM_MARKER.format(tokens=size)) - 1
+    if kept <= 0:
+        return ""
+    marker = TRIM_MARKER.format(tokens=size - kept)
+
+    encoding = _encoding()
+    if encoding is None:
+        chars = kept * CHARS_PER_TOKEN
+        part = text[:chars] if keep == "head" else text[-chars:]
+    else:
+        tokens = encoding.encode(text, disallowed_special=())
+        part = encoding.decode(tokens[:kept] if keep == "head" else tokens[-kept:])
+    return f"{part}\n{marker}" if keep == "head" else f"{marker}\n{part}"
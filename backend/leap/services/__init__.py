@@ -1,9 +1,20 @@
 from leap.services.llm_service import LLMService
 from leap.services.file_service import FileService
 from leap.services.manim_service import ManimService
+from leap.services.fix_cache_service import FixCacheService
+from leap.services.cache_service import CacheService
+from leap.services.llm_cassette import LLMCassette
+from leap.services.llm_clients import LLMClientRegistry, get_client_registry
+from leap.services.api_docs_index import ApiDocsIndex
 
 __all__ = [
     "LLMService",
     "FileService",
-    "ManimService"
+    "ManimService",
+    "FixCacheService",
+    "CacheService",
+    "LLMCassette",
+    "LLMClientRegistry",
+    "get_client_registry",
+    "ApiDocsIndex"
 ]
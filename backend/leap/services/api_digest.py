@@ -0,0 +1,187 @@
+"""
+Signature digest of the installed Manim API.
+
+The digest is built by introspecting the installed manim package: for every
+public class its bases, the keyword arguments of its constructor with their
+defaults, the complete set of keyword arguments it accepts (only when no
+constructor takes **kwargs, which may go anywhere), its public methods and the
+first line of its docstring. It's written to API_DIGEST_DIR as
+manim-<version>.json, built once per Manim version (by
+`python -m leap.tools.api_digest`, or on first use), so the signatures given to
+the model and checked by the validator always match the version that renders. A
+digest that can't be written (a read-only directory) is still used in memory.
+"""
+import importlib
+import inspect
+import json
+import logging
+import os
+import threading
+from importlib import metadata
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Dict, List, Optional, Tuple
+
+from leap.core.config import API_DIGEST_DIR
+
+DIGEST_FORMAT = 2
+MAX_DEFAULT_CHARS = 40
+
+
+def _format_parameter(parameter: inspect.Parameter) -> str:
+    if parameter.kind is inspect.Parameter.VAR_POSITIONAL:
+        return f"*{parameter.name}"
+    if parameter.kind is inspect.Parameter.VAR_KEYWORD:
+        return f"**{parameter.name}"
+    if parameter.default is inspect.Parameter.empty:
+        return parameter.name
+    default = repr(parameter.default)
+    if len(default) > MAX_DEFAULT_CHARS:
+        default = "..."
+    return f"{parameter.name}={default}"
+
+
+def _parameters(function: Any) -> Optional[List[inspect.Parameter]]:
+    """Return the parameters of a function without self, or None if it has no signature."""
+    try:
+        parameters = list(inspect.signature(function).parameters.values())
+    except (TypeError, ValueError):
+        return None
+    if parameters and parameters[0].name in ("self", "cls"):
+        parameters = parameters[1:]
+    return parameters
+
+
+def _accepted_keywords(cls: type) -> Optional[List[str]]:
+    """Return every keyword argument the constructor of `cls` accepts, when that set is known.
+
+    Only a constructor without **kwargs has a known set: one with **kwargs may
+    pass them to its parent, pop them or hand them to another object, so an
+    unknown keyword may still be valid. None means the set isn't known (or the
+    constructor can't be introspected).
+    """
+    for klass in cls.__mro__[:-1]:
+        init = klass.__dict__.get("__init__")
+        if init is None:
+            continue
+        parameters = _parameters(init)
+        if parameters is None or any(parameter.kind is inspect.Parameter.VAR_KEYWORD for parameter in parameters):
+            return None
+        return sorted(
+            parameter.name for parameter in parameters
+            if parameter.kind in (inspect.Parameter.POSITIONAL_OR_KEYWORD, inspect.Parameter.KEYWORD_ONLY)
+        )
+    return None
+
+
+def _describe_class(cls: type) -> Dict[str, Any]:
+    init = cls.__dict__.get("__init__")
+    parameters = _parameters(init) if init is not None else []
+    methods = []
+    for name, member in cls.__dict__.items():
+        if name.startswith("_"):
+            continue
+        if isinstance(member, property):
+            methods.append(name)
+            continue
+        if isinstance(member, (staticmethod, classmethod)):
+            member = member.__func__
+        if inspect.isfunction(member):
+            method_parameters = _parameters(member) or []
+            methods.append(f"{name}({', '.join(_format_parameter(p) for p in method_parameters)})")
+
+    doc = (cls.__doc__ or "").strip()
+    return {
+        "bases": [base.__name__ for base in cls.__bases__ if base is not object],
+        "doc": doc.splitlines()[0].strip() if doc else "",
+        "params": [_format_parameter(parameter) for parameter in parameters or []],
+        "accepts": _accepted_keywords(cls),
+        "methods": methods
+    }
+
+
+def build_api_digest(module: ModuleType, version: str) -> Dict[str, Any]:
+    """Introspect the public classes exported by a package.
+
+    Args:
+        module: The package (manim)
+        version: Its installed version
+
+    Returns:
+        The digest: format, version and the classes by exported name
+    """
+    prefix = module.__name__ + "."
+    classes = {}
+    for name, value in sorted(vars(module).items()):
+        if name.startswith("_") or not inspect.isclass(value):
+            continue
+        if not (value.__module__ or "").startswith(prefix) and value.__module__ != module.__name__:
+            continue
+        classes[name] = _describe_class(value)
+    return {"format": DIGEST_FORMAT, "package": module.__name__, "version": version, "classes": classes}
+
+
+def digest_path(version: str, digest_dir: Optional[Path] = None) -> Path:
+    """Return the file of the digest of a Manim version."""
+    return Path(digest_dir or API_DIGEST_DIR) / f"manim-{version}.v{DIGEST_FORMAT}.json"
+
+
+def write_api_digest(digest: Dict[str, Any], digest_dir: Optional[Path] = None) -> Path:
+    """Write a digest to its versioned file (atomically, other processes may be reading it)."""
+    path = digest_path(digest["version"], digest_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.{id(digest)}.tmp")
+    tmp_path.write_text(json.dumps(digest, separators=(",", ":"), sort_keys=True))
+    tmp_path.replace(path)
+    return path
+
+
+def render_class(name: str, info: Dict[str, Any]) -> str:
+    """Render the digest entry of a class as a few compact lines."""
+    lines = [f"class {name}({', '.join(info['bases'])})" + (f": {info['doc']}" if info["doc"] else "")]
+    lines.append(f"{name}({', '.join(info['params'])})")
+    if info["methods"]:
+        lines.append(f"methods: {', '.join(info['methods'])}")
+    return "\n".join(lines)
+
+
+def digest_chunks(digest: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """Return the (title, text) chunks of a digest, one per class."""
+    return [(name, render_class(name, info)) for name, info in digest["classes"].items()]
+
+
+_digests: Dict[Path, Optional[Dict[str, Any]]] = {}
+_digest_lock = threading.Lock()
+
+
+def load_api_digest(digest_dir: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """Return the digest of the installed Manim version, building it on first use.
+
+    Returns:
+        The digest, or None if Manim isn't installed or can't be introspected
+    """
+    try:
+        version = metadata.version("manim")
+    except metadata.PackageNotFoundError:
+        return None
+    path = digest_path(version, digest_dir)
+    if path in _digests:
+        return _digests[path]
+
+    with _digest_lock:
+        if path not in _digests:
+            digest = None
+            try:
+                if path.exists():
+                    digest = json.loads(path.read_text())
+                else:
+                    digest = build_api_digest(importlib.import_module("manim"), version)
+            except Exception as e:
+                logging.getLogger("leap").warning(f"Could not load the Manim API digest for {version}: {e}")
+            if digest is not None and not path.exists():
+                try:
+                    write_api_digest(digest, digest_dir)
+                except OSError as e:
+                    logging.getLogger("leap").warning(f"Could not write the Manim API digest to {path.parent}: {e}")
+            _digests[path] = digest
+    return _digests[path]
@@ -0,0 +1,307 @@
+"""
+BM25 retrieval over the Manim API documentation.
+
+The API documentation is too large to send with every prompt. It's split into
+chunks and indexed with BM25, and a request gets only the chunks relevant to its
+plan, the classes its code uses or its error, within a token budget. The chunks
+are the classes of the digest of the installed Manim version (see
+leap.services.api_digest) or, without Manim, of the documentation sources in
+templates/api_docs (one chunk per class and one per public method).
+
+The index is built once, written to API_DOCS_INDEX_PATH and memory-mapped by
+every process; it is rebuilt when its sources change. File layout:
+a magic number, the header length, a JSON header (source hash, chunk titles and
+lengths, term postings offsets), the postings as native uint32 (chunk, term
+frequency) pairs, then the chunk texts.
+"""
+import ast
+import hashlib
+import json
+import logging
+import math
+import mmap
+import re
+import struct
+import sys
+import threading
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from leap.core.config import API_DOCS_INDEX_PATH, API_REFERENCE_MAX_TOKENS
+from leap.services.api_digest import digest_chunks, load_api_digest
+from leap.templates import API_DOCS_DIR
+
+MAGIC = b"LEAPBM25"
+INDEX_VERSION = 1
+CHARS_PER_TOKEN = 4
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = {
+    "the", "a", "an", "and", "or", "of", "to", "in", "is", "it", "be", "for", "on", "with", "as",
+    "by", "this", "that", "are", "from", "at", "if", "not", "self", "none", "true", "false", "def",
+    "return", "returns", "import", "class", "kwargs", "args", "parameters", "type", "default"
+}
+
+# Weight of the query terms taken from each part of a request
+ERROR_WEIGHT = 3.0
+CODE_WEIGHT = 2.0
+PLAN_WEIGHT = 1.0
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase terms, also splitting CamelCase and snake_case identifiers."""
+    terms = []
+    for word in re.findall(r"[A-Za-z_][A-Za-z0-9_]*", text):
+        parts = re.findall(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+", word)
+        candidates = [word.lower()] + ([part.lower() for part in parts] if len(parts) > 1 else [])
+        terms.extend(term for term in candidates if len(term) > 1 and term not in STOPWORDS)
+    return terms
+
+
+def code_identifiers(code: str) -> str:
+    """Return the classes and methods a piece of code calls, as query text."""
+    classes = re.findall(r"\b([A-Z][A-Za-z0-9_]*)\s*\(", code)
+    methods = re.findall(r"\.([a-z_][A-Za-z0-9_]*)\s*\(", code)
+    return " ".join(classes + methods)
+
+
+def _strip_examples(docstring: str) -> str:
+    # The rendered examples are long and the signatures and parameters are what the model needs
+    return re.split(r"\n\s*Examples\n\s*-{3,}", docstring)[0].strip()
+
+
+def _signature(function: ast.FunctionDef) -> str:
+    return f"({ast.unparse(function.args)})".replace("(self, ", "(").replace("(self)", "()")
+
+
+def chunk_python_docs(source: str) -> List[Tuple[str, str]]:
+    """Split a documentation source file into (title, text) chunks.
+
+    Every class gives a chunk with its constructor signature and docstring, and
+    every public method one with its signature and docstring.
+    """
+    chunks = []
+    for node in ast.parse(source).body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        bases = ", ".join(ast.unparse(base) for base in node.bases)
+        methods = [item for item in node.body if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef))]
+        init = next((method for method in methods if method.name == "__init__"), None)
+        signature = _signature(init) if init else ""
+        docstring = _strip_examples(ast.get_docstring(node) or "")
+        chunks.append((node.name, f"class {node.name}({bases})\n{node.name}{signature}\n{docstring}".strip()))
+
+        for method in methods:
+            if method.name.startswith("_") or any(ast.unparse(d).endswith(".setter") for d in method.decorator_list):
+                continue
+            title = f"{node.name}.{method.name}"
+            method_doc = _strip_examples(ast.get_docstring(method) or "")
+            chunks.append((title, f"{title}{_signature(method)}\n{method_doc}".strip()))
+    return chunks
+
+
+class ApiDocsIndex:
+    """Memory-mapped BM25 index of the API documentation chunks."""
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        docs_dir: Optional[Path] = None,
+        api_digest: Optional[Dict[str, Any]] = None
+    ):
+        """Open the index, building it first if it's missing or out of date.
+
+        Args:
+            path: Index file
+            docs_dir: Directory of the documentation sources (*.py), used without a digest
+            api_digest: Digest of the installed Manim API (see leap.services.api_digest)
+        """
+        self.path = Path(path or API_DOCS_INDEX_PATH)
+        self.docs_dir = Path(docs_dir or API_DOCS_DIR)
+        self.api_digest = api_digest
+        self.logger = logging.getLogger("leap")
+
+        source_hash = hashlib.sha256(f"{INDEX_VERSION}:{sys.byteorder}".encode())
+        if api_digest is not None:
+            source_hash.update(json.dumps(api_digest, sort_keys=True).encode())
+            self._sources: List[Path] = []
+        else:
+            self._sources = sorted(self.docs_dir.glob("*.py"))
+            for source in self._sources:
+                source_hash.update(source.name.encode() + b"\0" + source.read_bytes())
+        self.source_hash = source_hash.hexdigest()
+
+        if not self._load():
+            self._build()
+            if not self._load():
+                raise RuntimeError(f"Could not load the API docs index {self.path}")
+
+    def _chunks(self) -> List[Tuple[str, str]]:
+        if self.api_digest is not None:
+            return digest_chunks(self.api_digest)
+        chunks: List[Tuple[str, str]] = []
+        for source in self._sources:
+            chunks.extend(chunk_python_docs(source.read_text()))
+        return chunks
+
+    def _build(self):
+        chunks = self._chunks()
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths = []
+        for index, (_, text) in enumerate(chunks):
+            terms = tokenize(text)
+            lengths.append(len(terms))
+            counts: Dict[str, int] = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, count in counts.items():
+                postings.setdefault(term, []).append((index, count))
+
+        packed = array("I")
+        terms = {}
+        for term, entries in postings.items():
+            terms[term] = [len(packed) // 2, len(entries)]
+            for entry in entries:
+                packed.extend(entry)
+
+        texts = [text.encode("utf-8") for _, text in chunks]
+        offsets, position = [], 0
+        for text in texts:
+            offsets.append([position, len(text)])
+            position += len(text)
+
+        header = json.dumps({
+            "source_hash": self.source_hash,
+            "titles": [title for title, _ in chunks],
+            "lengths": lengths,
+            "texts": offsets,
+            "terms": terms,
+            "postings_bytes": len(packed) * packed.itemsize
+        }).encode("utf-8")
+        # Pad the header so the postings start 4-byte aligned
+        header += b" " * (-(len(MAGIC) + 4 + len(header)) % 4)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{id(self)}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC + struct.pack("<I", len(header)) + header)
+            f.write(packed.tobytes())
+            f.write(b"".join(texts))
+        tmp_path.replace(self.path)
+        self.logger.info(f"Built the API docs index: {len(chunks)} chunks, {len(terms)} terms")
+
+    def _load(self) -> bool:
+        """Map the index file, returning False if it's missing or out of date."""
+        if not self.path.exists():
+            return False
+        with open(self.path, "rb") as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                return False
+        try:
+            if data[:len(MAGIC)] != MAGIC:
+                return False
+            header_length = struct.unpack("<I", data[len(MAGIC):len(MAGIC) + 4])[0]
+            start = len(MAGIC) + 4
+            header = json.loads(data[start:start + header_length])
+            if header["source_hash"] != self.source_hash:
+                return False
+        except (ValueError, struct.error):
+            return False
+
+        postings_start = start + header_length
+        self._data = data
+        self._postings = memoryview(data)[postings_start:postings_start + header["postings_bytes"]].cast("I")
+        self._texts_start = postings_start + header["postings_bytes"]
+        self.titles: List[str] = header["titles"]
+        self._lengths: List[int] = header["lengths"]
+        self._text_offsets: List[List[int]] = header["texts"]
+        self._terms: Dict[str, List[int]] = header["terms"]
+        self._average_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+        return True
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def text(self, index: int) -> str:
+        """Return the text of a chunk."""
+        offset, length = self._text_offsets[index]
+        start = self._texts_start + offset
+        return self._data[start:start + length].decode("utf-8")
+
+    def search(self, query: Dict[str, float], limit: int = 20) -> List[Tuple[int, float]]:
+        """Return the best chunks for weighted query terms.
+
+        Args:
+            query: Query terms and their weights
+            limit: Maximum number of chunks
+
+        Returns:
+            (chunk index, score) pairs, best first
+        """
+        scores: Dict[int, float] = {}
+        count = len(self.titles)
+        for term, weight in query.items():
+            entry = self._terms.get(term)
+            if entry is None:
+                continue
+            offset, frequency = entry
+            idf = math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+            for i in range(offset, offset + frequency):
+                chunk, tf = self._postings[2 * i], self._postings[2 * i + 1]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[chunk] / self._average_length)
+                scores[chunk] = scores.get(chunk, 0.0) + weight * idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: -item[1])[:limit]
+
+    def reference(
+        self,
+        plan: str = "",
+        code: str = "",
+        error: str = "",
+        max_tokens: int = API_REFERENCE_MAX_TOKENS
+    ) -> str:
+        """Return the documentation relevant to a request, within a token budget.
+
+        Args:
+            plan: The animation plan (or the question)
+            code: The current code, whose called classes and methods are looked up
+            error: The current error message
+
+        Returns:
+            The selected chunks in documentation order, or "" if nothing matched
+        """
+        query: Dict[str, float] = {}
+        for text, weight in [(error, ERROR_WEIGHT), (code_identifiers(code), CODE_WEIGHT), (plan, PLAN_WEIGHT)]:
+            for term in tokenize(text):
+                query[term] = query.get(term, 0.0) + weight
+
+        selected, used = [], 0
+        for chunk, _ in self.search(query, limit=50):
+            size = len(self.text(chunk)) // CHARS_PER_TOKEN + 1
+            if used + size > max_tokens:
+                continue
+            selected.append(chunk)
+            used += size
+        return "\n\n".join(self.text(chunk) for chunk in sorted(selected))
+
+
+_index: Optional[ApiDocsIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_api_docs_index() -> ApiDocsIndex:
+    """Return the process-wide index, opening (or building) it on first use.
+
+    The index is built from the digest of the installed Manim version when there
+    is one, and from the documentation sources otherwise.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = ApiDocsIndex(api_digest=load_api_digest())
+    return _index
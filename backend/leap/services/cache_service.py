@@ -0,0 +1,193 @@
+"""
+Local key-value cache with TTL and size limits.
+
+Values are JSON-serializable objects stored in a SQLite database, grouped by
+namespace so several caches can share one file. Expired entries are dropped on
+read and when pruning; when a namespace grows past its entry or byte limit the
+least recently used entries are evicted.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from leap.core.config import CACHE_DIR
+
+
+def make_cache_key(*parts: Any) -> str:
+    """Return a stable hash of the given JSON-serializable parts."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CacheService:
+    """SQLite-backed cache with per-namespace TTL, entry and size limits."""
+
+    def __init__(
+        self,
+        namespace: str,
+        db_path: Optional[Path] = None,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None
+    ):
+        """Initialize the cache.
+
+        Args:
+            namespace: Name separating this cache's entries from others in the same file
+            db_path: Path of the SQLite database
+            ttl_seconds: Entries older than this are expired (None for no expiry)
+            max_entries: Maximum number of entries kept in the namespace
+            max_bytes: Maximum total size of the stored values in the namespace
+        """
+        self.namespace = namespace
+        self.db_path = Path(db_path or CACHE_DIR / "cache.db")
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.logger = logging.getLogger("leap")
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                );
+                CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (namespace, accessed_at);
+                CREATE TABLE IF NOT EXISTS counters (
+                    namespace TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    value INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (namespace, name)
+                );
+            """)
+
+    def _bump(self, conn: sqlite3.Connection, name: str):
+        conn.execute(
+            "INSERT INTO counters (namespace, name, value) VALUES (?, ?, 1) "
+            "ON CONFLICT(namespace, name) DO UPDATE SET value = value + 1",
+            (self.namespace, name)
+        )
+
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for `key`, or None on a miss or expired entry."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, created_at FROM entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+
+            if row is None or self._is_expired(row["created_at"]):
+                if row is not None:
+                    conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+                self._bump(conn, "misses")
+                return None
+
+            conn.execute(
+                "UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (time.time(), self.namespace, key)
+            )
+            self._bump(conn, "hits")
+            return json.loads(row["value"])
+
+    def set(self, key: str, value: Any):
+        """Store a JSON-serializable value under `key` and enforce the size limits."""
+        data = json.dumps(value)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self.namespace, key, data, len(data.encode("utf-8")), now, now)
+            )
+        self.prune()
+
+    def items(self) -> List[Tuple[str, Any]]:
+        """Return all unexpired (key, value) pairs, without counting them as hits."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT key, value, created_at FROM entries WHERE namespace = ?",
+                (self.namespace,)
+            ).fetchall()
+        return [(row["key"], json.loads(row["value"])) for row in rows if not self._is_expired(row["created_at"])]
+
+    def delete(self, key: str):
+        """Remove `key` from the cache."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def prune(self) -> int:
+        """Drop expired entries, then the least recently used ones over the limits.
+
+        Returns:
+            The number of removed entries
+        """
+        removed = 0
+        with self._connect() as conn:
+            if self.ttl_seconds is not None:
+                removed += conn.execute(
+                    "DELETE FROM entries WHERE namespace = ? AND created_at < ?",
+                    (self.namespace, time.time() - self.ttl_seconds)
+                ).rowcount
+
+            if self.max_entries is not None or self.max_bytes is not None:
+                rows = conn.execute(
+                    "SELECT key, size FROM entries WHERE namespace = ? ORDER BY accessed_at DESC",
+                    (self.namespace,)
+                ).fetchall()
+                kept_entries, kept_bytes, evict = 0, 0, []
+                for row in rows:
+                    over_entries = self.max_entries is not None and kept_entries + 1 > self.max_entries
+                    over_bytes = self.max_bytes is not None and kept_bytes + row["size"] > self.max_bytes
+                    if over_entries or over_bytes:
+                        evict.append((self.namespace, row["key"]))
+                    else:
+                        kept_entries += 1
+                        kept_bytes += row["size"]
+                if evict:
+                    conn.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", evict)
+                    removed += len(evict)
+
+        if removed:
+            self.logger.debug(f"Cache '{self.namespace}' pruned {removed} entries")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return entry count, stored bytes, hits, misses and the hit rate."""
+        with self._connect() as conn:
+            counters = {
+                row["name"]: row["value"]
+                for row in conn.execute("SELECT name, value FROM counters WHERE namespace = ?", (self.namespace,))
+            }
+            totals = conn.execute(
+                "SELECT COUNT(*) AS entries, COALESCE(SUM(size), 0) AS bytes FROM entries WHERE namespace = ?",
+                (self.namespace,)
+            ).fetchone()
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "namespace": self.namespace,
+            "entries": totals["entries"],
+            "bytes": totals["bytes"],
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0
+        }
@@ -24,22 +24,19 @@ class FileService:
         self.media_dir = self.base_dir / "media"
         self.media_dir.mkdir(exist_ok=True, parents=True)
     
-    def save_generated_code(self, code: str, name_base: str) -> str:
+    def save_generated_code(self, code: str, name_base: str, suffix: Optional[str] = None) -> str:
         """Save the generated code to a file with proper naming.
         
         Args:
             code: The code to save
             name_base: The base name for the file
+            suffix: Optional suffix keeping files of the same job apart (e.g. "scene_2")
             
         Returns:
             The path to the saved file
         """
-        # Create a sanitized filename
-        safe_name = self.sanitize_filename(name_base)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
         # Create the file path
-        file_path = self.code_dir / f"{safe_name}_{timestamp}.py"
+        file_path = self.code_dir / self._code_filename(name_base, suffix)
         
         # Write the code to the file
         with open(file_path, "w") as f:
@@ -48,6 +45,28 @@ class FileService:
         self.logger.info(f"Generated code saved to: {file_path}")
         return str(file_path)
     
+    def draft_path(self, name_base: str, suffix: Optional[str] = None) -> Path:
+        """Return the path the code of a generation in progress is written to.
+        
+        Args:
+            name_base: The base name for the file
+            suffix: Optional suffix keeping files of the same job apart (e.g. "scene_2")
+            
+        Returns:
+            A path in the drafts directory
+        """
+        drafts_dir = self.code_dir / "drafts"
+        drafts_dir.mkdir(exist_ok=True)
+        return drafts_dir / self._code_filename(name_base, suffix)
+    
+    def _code_filename(self, name_base: str, suffix: Optional[str] = None) -> str:
+        # Create a sanitized filename
+        safe_name = self.sanitize_filename(name_base)
+        if suffix:
+            safe_name = f"{safe_name}_{self.sanitize_filename(suffix)}"
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return f"{safe_name}_{timestamp}.py"
+    
     @staticmethod
     def sanitize_filename(name: str) -> str:
         """Create a safe filename from input text.
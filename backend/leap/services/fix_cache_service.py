@@ -0,0 +1,261 @@
+"""
+Local cache of fixes learned from successful corrections.
+
+Whenever a correction leads to a successful render, the fix is stored as a set of
+line hunks (failing snippet -> replacement) indexed by the fingerprint of the
+error it fixed. Later failures with the same fingerprint replay the fix if its
+snippets are present in the new code. Fixes that keep failing or haven't worked
+for a long time are aged out.
+"""
+import difflib
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from leap.core.config import (
+    FIX_CACHE_PATH,
+    FIX_CACHE_TTL_DAYS,
+    FIX_CACHE_MAX_FAILURES,
+    FIX_CACHE_MAX_HUNKS,
+)
+
+Hunk = Dict[str, str]
+
+
+def compute_fix_hunks(before: str, after: str) -> List[Hunk]:
+    """Describe the change from `before` to `after` as snippet replacements.
+
+    Insertions are anchored on the preceding line so they can be located again.
+
+    Args:
+        before: The failing code
+        after: The corrected code
+
+    Returns:
+        A list of hunks with "before" and "after" snippets
+    """
+    a, b = before.split("\n"), after.split("\n")
+    hunks = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal":
+            continue
+        if tag == "insert":
+            if i1 == 0:
+                # Nothing to anchor on, use the first line instead
+                hunks.append({"before": a[0], "after": "\n".join(b[j1:j2] + [a[0]])})
+            else:
+                hunks.append({"before": a[i1 - 1], "after": "\n".join([a[i1 - 1]] + b[j1:j2])})
+        else:
+            hunks.append({"before": "\n".join(a[i1:i2]), "after": "\n".join(b[j1:j2])})
+    return hunks
+
+
+def _indent(line: str) -> str:
+    return line[:len(line) - len(line.lstrip())]
+
+
+def apply_fix_hunks(code: str, hunks: List[Hunk]) -> Optional[str]:
+    """Apply stored hunks to new code.
+
+    Snippets are matched line by line ignoring indentation; replacements are
+    re-indented relative to where the snippet was found.
+
+    Args:
+        code: The code to fix
+        hunks: The hunks to apply
+
+    Returns:
+        The fixed code, or None if any hunk's snippet can't be found
+    """
+    lines = code.split("\n")
+    for hunk in hunks:
+        old = hunk["before"].split("\n")
+        new = hunk["after"].split("\n") if hunk["after"] else []
+        stripped_old = [line.strip() for line in old]
+        if not any(stripped_old):
+            return None
+
+        position = None
+        for start in range(len(lines) - len(old) + 1):
+            if [line.strip() for line in lines[start:start + len(old)]] == stripped_old:
+                position = start
+                break
+        if position is None:
+            return None
+
+        # Shift the replacement by the difference in indentation at the match
+        stored_indent, found_indent = _indent(old[0]), _indent(lines[position])
+        reindented = []
+        for line in new:
+            if line.startswith(stored_indent):
+                line = found_indent + line[len(stored_indent):]
+            reindented.append(line)
+        lines[position:position + len(old)] = reindented
+
+    fixed = "\n".join(lines)
+    return fixed if fixed != code else None
+
+
+class FixCacheService:
+    """SQLite-backed store of error fingerprint -> fix mappings."""
+
+    def __init__(self, db_path: Optional[Path] = None):
+        """Initialize the fix cache.
+
+        Args:
+            db_path: Path of the SQLite database
+        """
+        self.db_path = Path(db_path or FIX_CACHE_PATH)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.logger = logging.getLogger("leap")
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS fixes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    fingerprint TEXT NOT NULL,
+                    error TEXT,
+                    hunks TEXT NOT NULL,
+                    hunks_hash TEXT NOT NULL,
+                    successes INTEGER NOT NULL DEFAULT 0,
+                    failures INTEGER NOT NULL DEFAULT 0,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL,
+                    last_success_at REAL,
+                    UNIQUE (fingerprint, hunks_hash)
+                );
+                CREATE INDEX IF NOT EXISTS idx_fixes_fingerprint ON fixes (fingerprint);
+                CREATE TABLE IF NOT EXISTS stats (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL DEFAULT 0
+                );
+            """)
+
+    def _bump_stat(self, conn: sqlite3.Connection, key: str):
+        conn.execute(
+            "INSERT INTO stats (key, value) VALUES (?, 1) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + 1",
+            (key,)
+        )
+
+    def record_fix(self, fingerprint: str, error: str, hunks: List[Hunk]) -> Optional[int]:
+        """Store a fix that led to a successful render.
+
+        Args:
+            fingerprint: Fingerprint of the error that was fixed
+            error: The distilled error, kept for inspection
+            hunks: The hunks that fixed it
+
+        Returns:
+            The id of the stored fix, or None if the fix is too large to be reusable
+        """
+        if not hunks or len(hunks) > FIX_CACHE_MAX_HUNKS:
+            return None
+
+        hunks_json = json.dumps(hunks, sort_keys=True)
+        hunks_hash = hashlib.sha1(hunks_json.encode("utf-8")).hexdigest()
+        now = time.time()
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO fixes (fingerprint, error, hunks, hunks_hash, successes, created_at, last_success_at) "
+                "VALUES (?, ?, ?, ?, 1, ?, ?) "
+                "ON CONFLICT(fingerprint, hunks_hash) DO UPDATE SET "
+                "successes = successes + 1, last_success_at = excluded.last_success_at",
+                (fingerprint, error, hunks_json, hunks_hash, now, now)
+            )
+            row = conn.execute(
+                "SELECT id FROM fixes WHERE fingerprint = ? AND hunks_hash = ?",
+                (fingerprint, hunks_hash)
+            ).fetchone()
+
+        self.prune()
+        return row["id"] if row else None
+
+    def lookup(self, fingerprint: str, code: str) -> Optional[Tuple[int, str]]:
+        """Find a cached fix for the error and apply it to the code.
+
+        Args:
+            fingerprint: Fingerprint of the current error
+            code: The failing code
+
+        Returns:
+            A tuple of (fix id, fixed code), or None on a miss
+        """
+        with self._connect() as conn:
+            self._bump_stat(conn, "lookups")
+            rows = conn.execute(
+                "SELECT id, hunks FROM fixes WHERE fingerprint = ? "
+                "ORDER BY (successes - failures) DESC, last_success_at DESC",
+                (fingerprint,)
+            ).fetchall()
+
+            for row in rows:
+                fixed = apply_fix_hunks(code, json.loads(row["hunks"]))
+                if fixed is None:
+                    continue
+                self._bump_stat(conn, "hits")
+                conn.execute(
+                    "UPDATE fixes SET hits = hits + 1, last_used_at = ? WHERE id = ?",
+                    (time.time(), row["id"])
+                )
+                return row["id"], fixed
+
+        return None
+
+    def record_outcome(self, fix_id: int, success: bool):
+        """Record whether a replayed fix worked."""
+        column = "successes" if success else "failures"
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE fixes SET {column} = {column} + 1"
+                + (", last_success_at = ?" if success else "")
+                + " WHERE id = ?",
+                (time.time(), fix_id) if success else (fix_id,)
+            )
+        if not success:
+            self.prune()
+
+    def prune(self) -> int:
+        """Age out fixes that keep failing or haven't worked within the TTL.
+
+        Returns:
+            The number of removed fixes
+        """
+        cutoff = time.time() - FIX_CACHE_TTL_DAYS * 86400
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM fixes WHERE (failures >= ? AND failures > successes) "
+                "OR COALESCE(last_success_at, created_at) < ?",
+                (FIX_CACHE_MAX_FAILURES, cutoff)
+            )
+            removed = cursor.rowcount
+        if removed:
+            self.logger.info(f"Fix cache pruned {removed} stale fix(es)")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return lookup/hit counters and the hit rate."""
+        with self._connect() as conn:
+            counters = {row["key"]: row["value"] for row in conn.execute("SELECT key, value FROM stats")}
+            entries = conn.execute("SELECT COUNT(*) AS n FROM fixes").fetchone()["n"]
+        lookups = counters.get("lookups", 0)
+        hits = counters.get("hits", 0)
+        return {
+            "entries": entries,
+            "lookups": lookups,
+            "hits": hits,
+            "hit_rate": hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,125 @@
+"""
+Record/replay of structured LLM calls.
+
+In record mode every structured request and its response are written to the
+cassette directory, one JSON file per request, keyed by the model, the response
+model and a hash of the messages. In replay mode the responses are served from
+those files without touching the network, optionally after sleeping for the
+recorded latency, so workflow runs are deterministic (and work offline) in CI and
+benchmarks. Run-specific details in the messages (file timestamps, memory
+addresses) are masked in the key, so e.g. correction requests quoting an error
+from another run still match.
+"""
+import json
+import logging
+import re
+import time
+from pathlib import Path
+from typing import Optional, Type, TypeVar
+
+from pydantic import BaseModel
+
+from leap.core.config import LLM_CASSETTE_MODE, LLM_CASSETTE_DIR, LLM_REPLAY_LATENCY_SCALE
+from leap.services.cache_service import make_cache_key
+
+T = TypeVar("T", bound=BaseModel)
+
+CASSETTE_MODES = ("off", "record", "replay")
+
+# Parts of a message that differ between otherwise identical runs
+VOLATILE_PATTERN = re.compile(r"\d{8}_\d{6}|0x[0-9a-fA-F]+")
+
+
+class CassetteMissError(LookupError):
+    """Raised in replay mode when a request was never recorded."""
+
+
+class LLMCassette:
+    """Directory of recorded structured LLM calls."""
+
+    def __init__(self, mode: str, directory: Optional[Path] = None, latency_scale: float = 0.0):
+        """Initialize the cassette.
+
+        Args:
+            mode: "record" or "replay"
+            directory: Directory of the recorded calls
+            latency_scale: In replay mode, sleep this fraction of the recorded latency
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Invalid cassette mode: {mode} (expected one of {', '.join(CASSETTE_MODES)})")
+        self.mode = mode
+        self.directory = Path(directory or LLM_CASSETTE_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.latency_scale = latency_scale
+        self.logger = logging.getLogger("leap")
+
+    @staticmethod
+    def request_key(model: str, response_model: Type[BaseModel], system_content: str, user_content: str) -> str:
+        """Return the key of a structured request."""
+        return make_cache_key(
+            model,
+            response_model.__name__,
+            VOLATILE_PATTERN.sub("#", system_content),
+            VOLATILE_PATTERN.sub("#", user_content)
+        )
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def record(
+        self,
+        model: str,
+        response_model: Type[BaseModel],
+        system_content: str,
+        user_content: str,
+        response: BaseModel,
+        latency_seconds: float
+    ) -> str:
+        """Store a request and its response.
+
+        Returns:
+            The request key
+        """
+        key = self.request_key(model, response_model, system_content, user_content)
+        entry = {
+            "model": model,
+            "response_model": response_model.__name__,
+            "messages_hash": key,
+            "latency_seconds": round(latency_seconds, 3),
+            "recorded_at": time.time(),
+            "response": response.model_dump(mode="json")
+        }
+        # Write then rename, so concurrent runs never read a half-written file
+        tmp_path = self._path(key).with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f, indent=2)
+        tmp_path.replace(self._path(key))
+        return key
+
+    def replay(self, model: str, response_model: Type[T], system_content: str, user_content: str) -> T:
+        """Return the recorded response of a request.
+
+        Raises:
+            CassetteMissError: If the request was never recorded
+        """
+        key = self.request_key(model, response_model, system_content, user_content)
+        path = self._path(key)
+        if not path.exists():
+            raise CassetteMissError(
+                f"No recorded {response_model.__name__} response for model {model} (key {key[:12]}) in {self.directory}; "
+                "run with LLM_CASSETTE_MODE=record to record it"
+            )
+
+        with open(path) as f:
+            entry = json.load(f)
+        if self.latency_scale > 0:
+            time.sleep(entry.get("latency_seconds", 0) * self.latency_scale)
+        self.logger.info(f"Replayed {response_model.__name__} response from cassette {key[:12]}")
+        return response_model.model_validate(entry["response"])
+
+
+def get_default_cassette() -> Optional[LLMCassette]:
+    """Return the cassette configured by LLM_CASSETTE_MODE, or None when it's off."""
+    if LLM_CASSETTE_MODE == "off":
+        return None
+    return LLMCassette(LLM_CASSETTE_MODE, LLM_CASSETTE_DIR, LLM_REPLAY_LATENCY_SCALE)
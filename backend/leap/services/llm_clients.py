@@ -0,0 +1,168 @@
+"""
+Process-wide pool of LLM API clients.
+
+Creating an OpenAI client creates its own HTTP connection pool, so building one
+per LLMService (or per call) meant a new TLS handshake for most requests. The
+registry keeps one sync and one async client per provider, created on first use
+and shared by every service and thread, with keep-alive connection pools sized
+by LLM_MAX_CONNECTIONS / LLM_MAX_KEEPALIVE_CONNECTIONS and explicit timeouts.
+The clients aren't tied to a model (the model is a request parameter), so all
+models of a provider share the same pool.
+
+Connection reuse is measurable: `stats()` counts the requests sent and the TCP
+connections opened.
+"""
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+import instructor
+from openai import AsyncOpenAI, OpenAI
+
+from leap.core.config import (
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_KEEPALIVE_SECONDS,
+    LLM_TIMEOUT_SECONDS,
+    LLM_CONNECT_TIMEOUT_SECONDS,
+    LLM_MAX_RETRIES,
+)
+
+# Client classes (sync, async) of each supported provider
+PROVIDERS = {"openai": (OpenAI, AsyncOpenAI)}
+
+
+class LLMClientRegistry:
+    """Shared, lazily created LLM clients with pooled keep-alive connections."""
+
+    def __init__(
+        self,
+        max_connections: int = LLM_MAX_CONNECTIONS,
+        max_keepalive_connections: int = LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_seconds: float = LLM_KEEPALIVE_SECONDS,
+        timeout_seconds: float = LLM_TIMEOUT_SECONDS,
+        connect_timeout_seconds: float = LLM_CONNECT_TIMEOUT_SECONDS,
+        max_retries: int = LLM_MAX_RETRIES
+    ):
+        """Initialize the registry.
+
+        Args:
+            max_connections: Maximum open connections per client
+            max_keepalive_connections: Idle connections kept open per client
+            keepalive_seconds: How long an idle connection is kept open
+            timeout_seconds: Timeout of a request (structured generations can take minutes)
+            connect_timeout_seconds: Timeout for opening a connection
+            max_retries: Retries of failed requests, done by the client
+        """
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_seconds
+        )
+        self.timeout = httpx.Timeout(timeout_seconds, connect=connect_timeout_seconds)
+        self.max_retries = max_retries
+        self.logger = logging.getLogger("leap")
+        # Reentrant: creating a client creates the HTTP client it uses
+        self._lock = threading.RLock()
+        self._clients: Dict[Any, Any] = {}
+        self._counts = {"requests": 0, "connections_opened": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _on_connection_event(self, event: str, info: Dict[str, Any]):
+        if event == "connection.connect_tcp.complete":
+            self._count("connections_opened")
+
+    async def _on_connection_event_async(self, event: str, info: Dict[str, Any]):
+        self._on_connection_event(event, info)
+
+    def _on_request(self, request: httpx.Request):
+        # The trace extension is how httpcore reports when it opens a new connection
+        request.extensions["trace"] = self._on_connection_event
+        self._count("requests")
+
+    async def _on_request_async(self, request: httpx.Request):
+        request.extensions["trace"] = self._on_connection_event_async
+        self._count("requests")
+
+    def http_client(self) -> httpx.Client:
+        """Return the shared sync HTTP client (also usable for other HTTP APIs)."""
+        return self._get("http", lambda: httpx.Client(
+            limits=self.limits, timeout=self.timeout, event_hooks={"request": [self._on_request]}
+        ))
+
+    def async_http_client(self) -> httpx.AsyncClient:
+        """Return the shared async HTTP client."""
+        return self._get("async_http", lambda: httpx.AsyncClient(
+            limits=self.limits, timeout=self.timeout, event_hooks={"request": [self._on_request_async]}
+        ))
+
+    def _get(self, key: Any, create):
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = self._clients[key] = create()
+        return client
+
+    def _provider(self, provider: str):
+        if provider not in PROVIDERS:
+            raise ValueError(f"Unknown LLM provider: {provider}")
+        return PROVIDERS[provider]
+
+    def sync_client(self, provider: str = "openai") -> OpenAI:
+        """Return the shared sync client of a provider."""
+        client_class, _ = self._provider(provider)
+        return self._get((provider, "sync"), lambda: client_class(
+            http_client=self.http_client(), timeout=self.timeout, max_retries=self.max_retries
+        ))
+
+    def async_client(self, provider: str = "openai") -> AsyncOpenAI:
+        """Return the shared async client of a provider."""
+        _, client_class = self._provider(provider)
+        return self._get((provider, "async"), lambda: client_class(
+            http_client=self.async_http_client(), timeout=self.timeout, max_retries=self.max_retries
+        ))
+
+    def structured_client(self, provider: str = "openai") -> instructor.Instructor:
+        """Return the shared instructor client (structured output) of a provider."""
+        return self._get((provider, "structured"), lambda: instructor.from_openai(self.sync_client(provider)))
+
+    def async_structured_client(self, provider: str = "openai") -> instructor.AsyncInstructor:
+        """Return the shared async instructor client of a provider."""
+        return self._get((provider, "async_structured"), lambda: instructor.from_openai(self.async_client(provider)))
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the requests sent, connections opened and the share of requests on a reused connection."""
+        with self._lock:
+            requests, opened = self._counts["requests"], self._counts["connections_opened"]
+        return {
+            "requests": requests,
+            "connections_opened": opened,
+            "connection_reuse_rate": max(0.0, 1 - opened / requests) if requests else 0.0
+        }
+
+    def close(self):
+        """Close the shared sync connections (async ones are closed by their event loop)."""
+        http_client = self._clients.get("http")
+        if http_client is not None:
+            http_client.close()
+        self._clients.clear()
+
+
+_registry: Optional[LLMClientRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_client_registry() -> LLMClientRegistry:
+    """Return the process-wide client registry."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = LLMClientRegistry()
+    return _registry
@@ -1,28 +1,214 @@
+import contextvars
 import logging
-from typing import Dict, Type, TypeVar
-from openai import OpenAI
-import instructor
-from pydantic import BaseModel
-import os
+import threading
+import time
+from types import SimpleNamespace
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Hashable, List, Optional, Type, TypeVar
+from instructor.exceptions import InstructorRetryException
+from instructor.function_calls import openai_schema
+from openai import RateLimitError
+from openai.types import CompletionUsage
+from pydantic import BaseModel, ValidationError
 
-from leap.core.config import OPENAI_MODEL
+from leap.core.config import (
+    OPENAI_MODEL,
+    DEFAULT_PRIORITY,
+    LLM_RATE_LIMIT_PAUSE_SECONDS,
+    LLM_RATE_LIMIT_RETRIES,
+    LLM_RESPONSE_CACHE_ENABLED,
+    LLM_RESPONSE_CACHE_PATH,
+    LLM_RESPONSE_CACHE_TTL_HOURS,
+    LLM_RESPONSE_CACHE_MAX_ENTRIES,
+    LLM_VALIDATION_ATTEMPTS,
+)
+from leap.core.concurrency import concurrency_slot
+from leap.core.hedging import HedgeCancelledError, LLMHedger, get_hedger
+from leap.core.rate_limit import RateLimiter, estimate_tokens, get_rate_limiter
+from leap.core.usage import record_llm_usage
+from leap.prompts.tokens import count_tokens
+from leap.services.llm_clients import get_client_registry
+from leap.services.cache_service import CacheService, make_cache_key
+from leap.services.llm_cassette import LLMCassette, get_default_cassette
 from leap.workflow.tracing import traceable  # Import the traceable decorator
 
 T = TypeVar('T', bound=BaseModel)
 
+# Models that accept a reasoning effort
+REASONING_MODEL_PREFIXES = ("o1", "o3", "o4")
+
+def get_response_cache(response_cache: Optional[CacheService] = None) -> Optional[CacheService]:
+    """Return the given cache, the default LLM response cache, or None when it's disabled."""
+    if response_cache is not None:
+        return response_cache
+    if not LLM_RESPONSE_CACHE_ENABLED:
+        return None
+    return CacheService(
+        "llm_responses",
+        db_path=LLM_RESPONSE_CACHE_PATH,
+        ttl_seconds=LLM_RESPONSE_CACHE_TTL_HOURS * 3600,
+        max_entries=LLM_RESPONSE_CACHE_MAX_ENTRIES
+    )
+
+def _is_rate_limit_error(error: Exception) -> bool:
+    """Return True for a 429 from the API, also when wrapped by instructor."""
+    for candidate in (error, error.__cause__):
+        if isinstance(candidate, RateLimitError) or getattr(candidate, "status_code", None) == 429:
+            return True
+    return False
+
+class StreamAbortedError(RuntimeError):
+    """Raised when a streamed response is abandoned because its partial content failed the check."""
+
+def _usage(response: Any) -> Optional[Any]:
+    """Return the token usage the API reported for a response, if available."""
+    raw_response = getattr(response, "_raw_response", response)
+    usage = getattr(raw_response, "usage", None)
+    return usage if isinstance(getattr(usage, "total_tokens", None), int) else None
+
+def _counted_usage(messages: List[Dict[str, str]], output: str) -> CompletionUsage:
+    """Return the usage of a call counted from its messages and output (streams don't report it)."""
+    prompt_tokens = sum(count_tokens(message["content"]) for message in messages)
+    completion_tokens = count_tokens(output)
+    return CompletionUsage(
+        prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, total_tokens=prompt_tokens + completion_tokens
+    )
+
 class LLMService:
     """Service for interacting with language models."""
     
-    def __init__(self, model: str = OPENAI_MODEL):
+    def __init__(
+        self,
+        model: str = OPENAI_MODEL,
+        node: Optional[str] = None,
+        reasoning_effort: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        cassette: Optional[LLMCassette] = None,
+        client: Optional[Any] = None,
+        priority: Optional[int] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        response_cache: Optional[CacheService] = None,
+        partial_check: Optional[Callable[[BaseModel], Optional[str]]] = None,
+        stream_restarts: int = 0,
+        hedger: Optional[LLMHedger] = None,
+        validation_context: Optional[Dict[str, Any]] = None
+    ):
         """Initialize the LLM service.
         
+        The service is cheap to create: it uses the process-wide pooled client
+        (see leap.services.llm_clients) unless one is given. Calls wait for the
+        shared LLM rate limit (see leap.core.rate_limit) when one is configured.
+        Services given a response cache serve repeated structured calls (same
+        model, response model and messages) from it, except while recording a
+        cassette; use it only for calls whose answer shouldn't vary, like input
+        validation.
+        
+        Services given a partial check stream their structured responses and
+        pass each partial response to it as it grows. When the check reports a
+        problem the generation is abandoned and started again, up to
+        `stream_restarts` times; the last attempt always runs to the end.
+        
+        With hedging enabled (see leap.core.hedging), a structured call that
+        takes longer than usual for its node is sent a second time and the first
+        answer wins; the other request is streamed and stops at its next chunk.
+        Only the first request gets the partial check.
+        
+        Services given a validation context validate their structured responses
+        with it, so the response models' validators that need it run (see
+        ManimCodeResponse). A response failing them is sent back to the model with
+        the errors, within the same conversation, up to LLM_VALIDATION_ATTEMPTS
+        attempts in all; after that the last response is returned unchecked, for
+        the workflow's own validation to handle.
+        
         Args:
             model: The OpenAI model to use
+            node: Workflow node making the calls (keys their latency history for hedging, with the model)
+            reasoning_effort: Reasoning effort (low, medium, high), ignored by models without one
+            max_tokens: Maximum output tokens of a call, reasoning included (None for the model's limit)
+            cassette: Optional cassette recording or replaying the structured calls
+                (defaults to the one configured by LLM_CASSETTE_MODE)
+            client: Optional instructor client for dependency injection
+            priority: Priority of the job's calls in the rate limit queue (lower is served first)
+            rate_limiter: Optional rate limiter for dependency injection
+            response_cache: Optional cache of structured responses (see get_response_cache)
+            partial_check: Optional check of the partial responses, returning why
+                to abandon the generation or None to go on
+            stream_restarts: Abandoned generations started again before giving up on the check
+            hedger: Optional hedger for dependency injection
+            validation_context: Optional context the structured responses are validated with
         """
         self.model = model
-        self.client = instructor.from_openai(OpenAI())
+        self.node = node
+        self.reasoning_effort = reasoning_effort
+        self.max_tokens = max_tokens
+        self.cassette = cassette or get_default_cassette()
+        # Replaying never reaches OpenAI, so it doesn't need a client (or an API key)
+        replaying = self.cassette is not None and self.cassette.mode == "replay"
+        if client is None and not replaying:
+            client = get_client_registry().structured_client()
+        self.client = client
+        self.priority = DEFAULT_PRIORITY if priority is None else priority
+        self.rate_limiter = None if replaying else get_rate_limiter(rate_limiter)
+        self.response_cache = response_cache
+        self.partial_check = partial_check
+        self.stream_restarts = stream_restarts
+        self.hedger = None if replaying else get_hedger(hedger)
+        self.validation_context = validation_context
         self.logger = logging.getLogger("leap")
     
+    def _send(self, send: Callable[[], Any], *texts: str, cancel: Optional[threading.Event] = None) -> Any:
+        """Send a call once it fits in the rate limit, waiting out rate limit errors.
+        
+        Args:
+            send: Makes the API call
+            *texts: The call's message contents, to estimate its tokens
+            cancel: Set when the call is no longer needed (the other request of a hedging race answered)
+        
+        Raises:
+            HedgeCancelledError: If `cancel` was set while the call waited for the rate limit or a slot
+        """
+        estimated = estimate_tokens(*texts)
+        for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(estimated, self.priority)
+            try:
+                with concurrency_slot("llm"):
+                    if cancel is not None and cancel.is_set():
+                        # Give back the tokens the request won't use
+                        if self.rate_limiter is not None:
+                            self.rate_limiter.adjust(-estimated)
+                        raise HedgeCancelledError("The other request answered first")
+                    response = send()
+            except Exception as e:
+                if (
+                    self.rate_limiter is None
+                    or attempt == LLM_RATE_LIMIT_RETRIES
+                    or isinstance(e, HedgeCancelledError)
+                    or not _is_rate_limit_error(e)
+                ):
+                    raise
+                # Every process backs off, instead of each retrying into the overload
+                self.rate_limiter.pause(LLM_RATE_LIMIT_PAUSE_SECONDS)
+                continue
+            
+            usage = _usage(response)
+            if usage is not None:
+                record_llm_usage(usage.prompt_tokens, usage.completion_tokens)
+            else:
+                record_llm_usage()
+            if self.rate_limiter is not None and usage is not None:
+                self.rate_limiter.adjust(usage.total_tokens - estimated)
+            return response
+    
+    def _request_options(self) -> Dict[str, Any]:
+        """Return the routing options of the calls (see LLM_ROUTES)."""
+        options: Dict[str, Any] = {}
+        if self.max_tokens:
+            options["max_completion_tokens"] = self.max_tokens
+        if self.reasoning_effort and self.model.startswith(REASONING_MODEL_PREFIXES):
+            options["reasoning_effort"] = self.reasoning_effort
+        return options
+    
     @traceable(run_type="llm", tags=["llm", "structured"])
     def generate_structured_response(
         self, 
@@ -42,17 +228,220 @@ class LLMService:
         """
         self.logger.info(f"Generating structured response with model: {self.model}")
         
-        response = self.client.chat.completions.create(
+        if self.cassette is not None and self.cassette.mode == "replay":
+            return self.cassette.replay(self.model, response_model, system_content, user_content)
+        
+        # A recording must capture every call, so it doesn't reuse cached responses
+        cache_key = None
+        recording = self.cassette is not None and self.cassette.mode == "record"
+        if self.response_cache is not None and not recording:
+            try:
+                cache_key = make_cache_key(self.model, response_model.__name__, system_content, user_content)
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    self.logger.info(f"Reusing cached {response_model.__name__} response")
+                    return response_model.model_validate(cached)
+            except Exception as e:
+                self.logger.warning(f"LLM response cache lookup failed: {str(e)}")
+                cache_key = None
+        
+        start = time.time()
+        if self.partial_check is not None:
+            response = self._generate_streamed(system_content, user_content, response_model)
+        else:
+            response = self._race(
+                (self.node or response_model.__name__, self.model),
+                lambda cancel, primary: self._send(
+                    lambda: self._attempt(system_content, user_content, response_model, False, cancel, primary),
+                    system_content,
+                    user_content,
+                    cancel=cancel
+                )
+            )
+        
+        if recording:
+            self.cassette.record(self.model, response_model, system_content, user_content, response, time.time() - start)
+        
+        if cache_key is not None:
+            try:
+                self.response_cache.set(cache_key, response.model_dump(mode="json"))
+            except Exception as e:
+                self.logger.warning(f"Could not cache LLM response: {str(e)}")
+        
+        return response
+        
+    def _attempt(
+        self,
+        system_content: str,
+        user_content: str,
+        response_model: Type[T],
+        abort: bool,
+        cancel: Optional[threading.Event],
+        primary: bool
+    ) -> T:
+        """Make one request for a structured response.
+        
+        Requests that may be abandoned (by the partial check, or because they are
+        in a hedging race) are streamed, so they can stop early.
+        
+        Args:
+            abort: Abandon the request when the partial check fails
+            cancel: Set when the other request of a hedging race answered first
+            primary: Whether this is the first request of the call (the one checked)
+        """
+        messages = [
+            {"role": "system", "content": system_content},
+            {"role": "user", "content": user_content}
+        ]
+        if cancel is None and self.partial_check is None:
+            return self._create(messages, response_model, LLM_VALIDATION_ATTEMPTS)
+        
+        check = self.partial_check if primary else None
+        stream = self.client.chat.completions.create_partial(
             model=self.model,
             response_model=response_model,
-            messages=[
-                {"role": "system", "content": system_content},
-                {"role": "user", "content": user_content}
-            ]
+            messages=messages,
+            **self._request_options()
         )
-        
+        partial = None
+        try:
+            for partial in stream:
+                if cancel is not None and cancel.is_set():
+                    raise HedgeCancelledError("The other request answered first")
+                problem = check(partial) if check is not None else None
+                if problem and abort:
+                    raise StreamAbortedError(problem)
+        finally:
+            # Closing the stream ends the request
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+        if partial is None:
+            raise ValueError(f"The stream ended without a {response_model.__name__}")
+        # The partial model has every field optional, the complete one must be valid
+        try:
+            response = response_model.model_validate(partial.model_dump(), context=self.validation_context)
+        except ValidationError as e:
+            if self.validation_context is None or LLM_VALIDATION_ATTEMPTS < 2:
+                raise
+            # Send the streamed answer back with the errors, like instructor does for its own attempts
+            self.logger.info(f"Streamed {response_model.__name__} failed validation, asking the model to fix it")
+            return self._create(messages + [
+                {"role": "assistant", "content": partial.model_dump_json()},
+                {"role": "user", "content": f"Recall the function correctly, fix the errors found in your response:\n{e}"}
+            ], response_model, LLM_VALIDATION_ATTEMPTS - 1)
+        # Instructor drops the stream's usage chunk, so the tokens are counted (for the node's
+        # token count and the rate limit's correction of its estimate)
+        response._raw_response = SimpleNamespace(usage=_counted_usage(messages, partial.model_dump_json()))
         return response
+    
+    def _create(self, messages: List[Dict[str, str]], response_model: Type[T], attempts: int) -> T:
+        """Make a (non-streamed) request, validated with the service's validation context."""
+        if self.validation_context is None:
+            return self.client.chat.completions.create(
+                model=self.model,
+                response_model=response_model,
+                messages=messages,
+                **self._request_options()
+            )
+        try:
+            return self.client.chat.completions.create(
+                model=self.model,
+                response_model=response_model,
+                messages=messages,
+                context=self.validation_context,
+                max_retries=attempts,
+                **self._request_options()
+            )
+        except InstructorRetryException as e:
+            if e.last_completion is None:
+                raise
+            try:
+                unchecked = openai_schema(response_model).from_response(e.last_completion, mode=self.client.mode)
+            except Exception:
+                raise e
+            self.logger.warning(
+                f"{response_model.__name__} still failed validation after {e.n_attempts} attempts, returning it unchecked"
+            )
+            response = response_model.model_validate(unchecked.model_dump())
+            response._raw_response = e.last_completion
+            return response
+    
+    def _race(self, key: Hashable, attempt: Callable[[Optional[threading.Event], bool], T]) -> T:
+        """Make a call, hedged with a second request when it's slow for its node and model.
+        
+        Args:
+            key: The node (or response model) and model whose latency history applies
+            attempt: Makes one request, given its cancel event (None when not
+                racing) and whether it is the first request
+        
+        Raises:
+            StreamAbortedError: If the first request failed the partial check
+        """
+        delay = self.hedger.start(key) if self.hedger is not None else None
+        start = time.time()
+        if delay is None:
+            response = attempt(None, True)
+            if self.hedger is not None:
+                self.hedger.record(key, time.time() - start)
+            return response
+        
+        pool = ThreadPoolExecutor(max_workers=2)
+        requests: Dict[Future, Any] = {}
         
+        def submit(primary: bool):
+            cancel = threading.Event()
+            # The requests run in the caller's context, so their tokens count for its node
+            future = pool.submit(contextvars.copy_context().run, attempt, cancel, primary)
+            requests[future] = (cancel, primary)
+        
+        try:
+            submit(True)
+            done, _ = wait(requests, timeout=delay)
+            if not done and self.hedger.allow_hedge():
+                self.logger.info(f"No {key} answer after {delay:.1f}s, sending a second request")
+                submit(False)
+            
+            error: Optional[BaseException] = None
+            pending = set(requests)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    _, primary = requests[future]
+                    error = future.exception()
+                    if error is None or isinstance(error, StreamAbortedError):
+                        for other in pending:
+                            requests[other][0].set()
+                    if error is None:
+                        # The call's latency, from its first request, whichever request answered
+                        self.hedger.record(key, time.time() - start, hedge_won=not primary)
+                        return future.result()
+                    if isinstance(error, StreamAbortedError):
+                        raise error
+            raise error
+        finally:
+            pool.shutdown(wait=False)
+    
+    def _generate_streamed(self, system_content: str, user_content: str, response_model: Type[T]) -> T:
+        """Stream a structured response, starting again when the partial check fails."""
+        for attempt in range(self.stream_restarts + 1):
+            abort = attempt < self.stream_restarts
+            try:
+                return self._race(
+                    (self.node or response_model.__name__, self.model),
+                    lambda cancel, primary: self._send(
+                        lambda: self._attempt(system_content, user_content, response_model, abort, cancel, primary),
+                        system_content,
+                        user_content,
+                        cancel=cancel
+                    )
+                )
+            except StreamAbortedError as e:
+                self.logger.warning(
+                    f"Abandoned {response_model.__name__} generation "
+                    f"({attempt + 1}/{self.stream_restarts}): {str(e)}"
+                )
+    
     @traceable(run_type="llm", tags=["llm", "chat"])
     def chat(self, prompt: str, system_message: str = "You are a helpful assistant.") -> Dict[str, str]:
         """Generate a simple text response using the LLM.
@@ -66,13 +455,17 @@ class LLMService:
         """
         self.logger.info(f"Generating chat response with model: {self.model}")
         
-        client = OpenAI()
-        response = client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": prompt}
-            ]
+        client = get_client_registry().sync_client()
+        response = self._send(
+            lambda: client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system_message},
+                    {"role": "user", "content": prompt}
+                ]
+            ),
+            system_message,
+            prompt
         )
         
         return {"content": response.choices[0].message.content} 
\ No newline at end of file
@@ -1,11 +1,20 @@
 import logging
+import os
 import subprocess
 import ast
 import re
 from pathlib import Path
 from typing import Dict, Any, Optional, List
 
-from leap.core.config import GENERATED_DIR
+from leap.core.config import (
+    GENERATED_DIR,
+    EXECUTION_TIMEOUT,
+    TTS_MODEL,
+    ESTIMATED_RENDER_SECONDS,
+    RENDER_TIMEOUT_HEADROOM,
+    RENDER_LENGTH_FACTORS,
+)
+from leap.core.concurrency import concurrency_slot
 
 class ManimService:
     """Service for executing Manim code."""
@@ -26,6 +35,12 @@ class ManimService:
             "medium": "-qm",
             "high": "-qh"
         }
+        # Resolution and frame rate of each quality (width, height, fps)
+        self.quality_formats = {
+            "low": (854, 480, 15),
+            "medium": (1280, 720, 30),
+            "high": (1920, 1080, 60)
+        }
     
     def extract_class_name(self, code_content: str) -> str:
         """Extract the class name from Python code using AST parsing.
@@ -66,18 +81,31 @@ class ManimService:
                 return class_match.group(1)
             raise ValueError(f"Could not extract class name: {str(e)}")
     
-    def execute_manim_code(self, file_path: str, quality: str) -> Dict[str, Any]:
+    def execute_manim_code(
+        self,
+        file_path: str,
+        quality: str,
+        tts_model: str = TTS_MODEL,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
         """Execute the Manim code and return the result.
         
         Args:
             file_path: The path to the Python file containing Manim code
             quality: The rendering quality ("low", "medium", or "high")
+            tts_model: The text-to-speech model used for the voiceover
+            timeout: Seconds the render may take (defaults to the timeout of a long video at `quality`)
             
         Returns:
             A dictionary containing the execution result
         """
         # Get the quality flag
         quality_flag = self.quality_flags.get(quality, "-ql")
+        if timeout is None:
+            timeout = (
+                ESTIMATED_RENDER_SECONDS.get(quality, ESTIMATED_RENDER_SECONDS["low"])
+                * RENDER_TIMEOUT_HEADROOM * RENDER_LENGTH_FACTORS["long"]
+            )
         
         # Execute the Manim code
         try:
@@ -103,12 +131,16 @@ class ManimService:
             self.logger.info(f"Running Manim with quality: {quality}")
             
             # Execute the command
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True
-            )
+            with concurrency_slot("render"):
+                result = subprocess.run(
+                    cmd,
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                    timeout=timeout,
+                    # The scene base class reads the voiceover model from the environment
+                    env={**os.environ, "LEAP_TTS_MODEL": tts_model}
+                )
             
             # Log a summary of the execution instead of the full output
             output_lines = result.stdout.strip().split("\n")
@@ -116,8 +148,9 @@ class ManimService:
             
             # Find the output file
             # Manim typically outputs to media_dir/videos/[file_name]/[quality]/[class_name].mp4
+            # (looking under this file's folder keeps scenes of other files with the same class name apart)
             file_name = Path(file_path).stem
-            output_file = list(self.media_dir.glob(f"videos/**/{class_name}.mp4"))
+            output_file = list(self.media_dir.glob(f"videos/{file_name}/**/{class_name}.mp4"))
             
             if not output_file:
                 self.logger.warning("Could not find output video file")
@@ -136,6 +169,14 @@ class ManimService:
                 "output_file": str(output_file[0])
             }
             
+        except subprocess.TimeoutExpired:
+            self.logger.error(f"Manim execution timed out after {timeout:.0f} seconds")
+            return {
+                "success": False,
+                "output": None,
+                "error": f"Manim execution timed out after {timeout:.0f} seconds",
+                "output_file": None
+            }
         except subprocess.CalledProcessError as e:
             # Log a summary of the error instead of the full stderr
             error_lines = e.stderr.strip().split("\n") if e.stderr else []
@@ -145,7 +186,8 @@ class ManimService:
                 "success": False,
                 "output": e.stdout,
                 "error": e.stderr,
-                "output_file": None
+                "output_file": None,
+                "returncode": e.returncode
             }
         except Exception as e:
             self.logger.error(f"Error executing Manim code: {str(e)}")
@@ -154,4 +196,81 @@ class ManimService:
                 "output": None,
                 "error": str(e),
                 "output_file": None
-            } 
\ No newline at end of file
+            } 
+    
+    def concatenate_videos(self, video_files: List[str], output_file: str, quality: Optional[str] = None) -> Dict[str, Any]:
+        """Concatenate rendered clips into one video with ffmpeg.
+        
+        Clips rendered with the same settings have their streams copied without
+        re-encoding. Clips of different qualities can't be joined that way: given a
+        quality, every clip (video and voiceover) is scaled, padded and re-encoded
+        to that quality's resolution and frame rate before they are joined.
+        
+        Args:
+            video_files: Paths of the clips, in order
+            output_file: Path of the concatenated video
+            quality: Quality to re-encode the clips to, None to copy their streams
+            
+        Returns:
+            A dictionary containing the result, like execute_manim_code
+        """
+        output_path = Path(output_file)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        if quality:
+            width, height, fps = self.quality_formats.get(quality, self.quality_formats["low"])
+            inputs = [arg for video_file in video_files for arg in ("-i", str(Path(video_file).resolve()))]
+            filters = [
+                f"[{i}:v]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={fps},format=yuv420p[v{i}];"
+                f"[{i}:a]aresample=48000,aformat=channel_layouts=stereo[a{i}]"
+                for i in range(len(video_files))
+            ]
+            streams = "".join(f"[v{i}][a{i}]" for i in range(len(video_files)))
+            graph = ";".join(filters) + f";{streams}concat=n={len(video_files)}:v=1:a=1[v][a]"
+            cmd = [
+                "ffmpeg", "-y", *inputs, "-filter_complex", graph, "-map", "[v]", "-map", "[a]",
+                "-c:v", "libx264", "-c:a", "aac", str(output_path)
+            ]
+        else:
+            list_file = output_path.with_suffix(".txt")
+            with open(list_file, "w") as f:
+                for video_file in video_files:
+                    escaped = str(Path(video_file).resolve()).replace("'", "'\\''")
+                    f.write(f"file '{escaped}'\n")
+            cmd = ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(list_file), "-c", "copy", str(output_path)]
+        
+        try:
+            self.logger.info(f"Concatenating {len(video_files)} clips into {output_path.name}")
+            subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=EXECUTION_TIMEOUT)
+            return {
+                "success": True,
+                "output": None,
+                "error": None,
+                "output_file": str(output_path)
+            }
+        except subprocess.TimeoutExpired:
+            self.logger.error(f"Concatenation timed out after {EXECUTION_TIMEOUT} seconds")
+            return {
+                "success": False,
+                "output": None,
+                "error": f"Concatenation timed out after {EXECUTION_TIMEOUT} seconds",
+                "output_file": None
+            }
+        except subprocess.CalledProcessError as e:
+            self.logger.error(f"Concatenation failed: {e.stderr}")
+            return {
+                "success": False,
+                "output": e.stdout,
+                "error": e.stderr,
+                "output_file": None,
+                "returncode": e.returncode
+            }
+        except Exception as e:
+            self.logger.error(f"Error concatenating videos: {str(e)}")
+            return {
+                "success": False,
+                "output": None,
+                "error": str(e),
+                "output_file": None
+            }
@@ -1,5 +1,6 @@
 import os
-from typing import Dict, Any, Optional
+from datetime import datetime
+from typing import Dict, Any, List, Optional
 import logging
 from supabase import create_client, Client
 
@@ -16,8 +17,11 @@ class SupabaseService:
         else:
             self.supabase: Client = create_client(url, key)
     
-    def create_animation_job(self, prompt: str, level: str, email: Optional[str] = None) -> str:
-        """Create a new animation job in Supabase."""
+    def create_animation_job(self, prompt: str, level: str, email: Optional[str] = None, request_key: Optional[str] = None) -> str:
+        """Create a new animation job in Supabase.
+        
+        Jobs with the same request key (normalized prompt and level) can share one run.
+        """
         if not self.supabase:
             # Mock implementation for local development
             import uuid
@@ -27,7 +31,8 @@ class SupabaseService:
             "prompt": prompt,
             "level": level,
             "email": email,
-            "status": "pending"
+            "status": "pending",
+            "request_key": request_key
         }
         
         try:
@@ -58,6 +63,17 @@ class SupabaseService:
         except Exception as e:
             logger.error(f"Error updating job status: {str(e)}")
     
+    def set_job_leader(self, job_id: str, leader_id: Optional[str]):
+        """Record the job whose run an animation job shares, or clear it when the job runs by itself."""
+        if not self.supabase:
+            # Mock implementation for local development
+            return
+            
+        try:
+            self.supabase.table("animations").update({"leader_id": leader_id}).eq("id", job_id).execute()
+        except Exception as e:
+            logger.error(f"Error updating job leader: {str(e)}")
+    
     def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
         """Get job details by ID."""
         if not self.supabase:
@@ -75,6 +91,28 @@ class SupabaseService:
             logger.error(f"Error getting job: {str(e)}")
             return None
     
+    def find_inflight_jobs(self, request_key: str, since: datetime) -> List[Dict[str, Any]]:
+        """Get the pending and processing jobs with a request key that run the workflow themselves, oldest first."""
+        if not self.supabase:
+            # Mock implementation for local development
+            return []
+            
+        try:
+            result = (
+                self.supabase.table("animations")
+                .select("id, status, created_at")
+                .eq("request_key", request_key)
+                .in_("status", ["pending", "processing"])
+                .is_("leader_id", "null")
+                .gte("created_at", since.isoformat())
+                .order("created_at")
+                .execute()
+            )
+            return result.data or []
+        except Exception as e:
+            logger.error(f"Error finding in-flight jobs: {str(e)}")
+            return []
+    
     def save_feedback(self, job_id: str, rating: int, comment: Optional[str] = None):
         """Save user feedback."""
         if not self.supabase:
@@ -1,3 +1,4 @@
+import os
 from manim import *
 from manim_voiceover import VoiceoverScene
 from manim_voiceover.services.openai import OpenAIService
@@ -10,13 +11,18 @@ class ManimVoiceoverBase(VoiceoverScene):
 
         # No background image is added, keeping scene plain black.
 
-        # Setup voice service
-        self.set_speech_service(
-            OpenAIService(
-                voice=voice_model,
-                model="tts-1-hd"
+        # Setup voice service (LEAP_SPEECH_SERVICE=offline makes silent narration of the
+        # right length without the network, for benchmarks and CI)
+        if os.getenv("LEAP_SPEECH_SERVICE", "openai") == "offline":
+            from leap.templates.offline_speech import OfflineSpeechService
+            self.set_speech_service(OfflineSpeechService())
+        else:
+            self.set_speech_service(
+                OpenAIService(
+                    voice=voice_model,
+                    model=os.getenv("LEAP_TTS_MODEL", "tts-1-hd")
+                )
             )
-        )
 
     def create_title(self, text: str) -> VGroup:
         """Creates a title, using MathTex if mathematical notation is detected."""
@@ -0,0 +1,40 @@
+"""
+Offline speech service for the voiceover scenes.
+
+Instead of calling a text-to-speech API, it writes silence lasting as long as the
+narration would take to read, so scenes keep realistic timings while rendering
+needs no network, credentials or money.
+"""
+from pathlib import Path
+
+from manim_voiceover.services.base import SpeechService
+from pydub import AudioSegment
+
+WORDS_PER_MINUTE = 150
+
+
+class OfflineSpeechService(SpeechService):
+    """Speech service producing silent narration of the expected duration."""
+
+    def __init__(self, words_per_minute: int = WORDS_PER_MINUTE, **kwargs):
+        self.words_per_minute = words_per_minute
+        super().__init__(transcription_model=None, **kwargs)
+
+    def generate_from_text(self, text: str, cache_dir: str = None, path: str = None) -> dict:
+        if cache_dir is None:
+            cache_dir = self.cache_dir
+
+        input_data = {"input_text": text, "service": "offline", "words_per_minute": self.words_per_minute}
+        cached_result = self.get_cached_result(input_data, cache_dir)
+        if cached_result is not None:
+            return cached_result
+
+        audio_path = path or self.get_audio_basename(input_data) + ".mp3"
+        duration_ms = max(500, int(len(text.split()) / self.words_per_minute * 60_000))
+        AudioSegment.silent(duration=duration_ms).export(str(Path(cache_dir) / audio_path), format="mp3")
+
+        return {
+            "input_text": text,
+            "input_data": input_data,
+            "original_audio": audio_path,
+        }
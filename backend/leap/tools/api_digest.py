@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Manim API Digest Builder
+
+Introspects the installed manim package and writes its signature digest (see
+leap.services.api_digest) to API_DIGEST_DIR. Run at image build time so the
+workers don't build it on their first request; a digest that already exists for
+the installed version is kept unless --force is given.
+
+Usage:
+    python -m leap.tools.api_digest
+    python -m leap.tools.api_digest --output-dir /tmp/digest --force
+"""
+
+import argparse
+import importlib
+import sys
+from importlib import metadata
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from leap.core.config import API_DIGEST_DIR
+from leap.services.api_digest import build_api_digest, digest_chunks, digest_path, write_api_digest
+
+
+def main():
+    """Main entry point for the digest builder."""
+    parser = argparse.ArgumentParser(description="Build the signature digest of the installed Manim API")
+    parser.add_argument("--output-dir", type=str, default=str(API_DIGEST_DIR), help="Directory of the digests")
+    parser.add_argument("--force", action="store_true", help="Rebuild the digest even if it exists")
+    args = parser.parse_args()
+
+    try:
+        version = metadata.version("manim")
+    except metadata.PackageNotFoundError:
+        print("Error: manim is not installed")
+        sys.exit(1)
+
+    path = digest_path(version, Path(args.output_dir))
+    if path.exists() and not args.force:
+        print(f"Digest for manim {version} already exists: {path}")
+        return
+
+    digest = build_api_digest(importlib.import_module("manim"), version)
+    path = write_api_digest(digest, Path(args.output_dir))
+    size = sum(len(text) for _, text in digest_chunks(digest))
+    print(f"Wrote the digest of manim {version} ({len(digest['classes'])} classes, ~{size // 4} tokens) to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Generation Pipeline Benchmark
+
+Runs the whole workflow graph on a fixed prompt corpus with replayed LLM responses
+(see leap.services.llm_cassette) and the offline speech service, so timings only
+depend on the code and the machine. For every prompt it records the wall time of
+each node, how often each node ran and the render time; the run also records the
+peak RSS of the process and of the render subprocesses and the bytes written to
+the generated directory. The results are written as JSON, and can be compared
+with an earlier results file to catch regressions.
+
+Usage:
+    # Record the cassettes once (needs OPENAI_API_KEY)
+    python -m leap.tools.benchmark --record
+    # Benchmark the current commit and compare with a baseline
+    python -m leap.tools.benchmark --output bench.json --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+BENCHMARK_DIR = Path(__file__).resolve().parent.parent.parent / "benchmarks"
+DEFAULT_CORPUS = BENCHMARK_DIR / "corpus.jsonl"
+DEFAULT_CASSETTES = BENCHMARK_DIR / "cassettes"
+
+# Stages compared between runs (the render time is the execute_code node)
+TRACKED_METRICS = ["total_seconds", "execute_code", "generate_code", "plan_scenes", "validate_input", "correct_code"]
+
+
+def configure_environment(cassette_dir: Path, record: bool, latency_scale: float) -> None:
+    """Configure a deterministic, offline run. Must be called before importing the workflow."""
+    os.environ["LLM_CASSETTE_MODE"] = "record" if record else "replay"
+    os.environ["LLM_CASSETTE_DIR"] = str(cassette_dir)
+    os.environ["LLM_REPLAY_LATENCY_SCALE"] = str(latency_scale)
+    os.environ["LEAP_SPEECH_SERVICE"] = "offline"
+    # Caches would make later prompts (and later runs) faster than the first
+    for cache in ["STAGE_CACHE_ENABLED", "RESULT_CACHE_ENABLED", "FIX_CACHE_ENABLED", "LLM_RESPONSE_CACHE_ENABLED"]:
+        os.environ[cache] = "false"
+
+
+def peak_rss_mb() -> Dict[str, float]:
+    """Return the peak resident set size of this process and of its finished children, in MB."""
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit, 1)
+    }
+
+
+def bytes_written_since(directory: Path, since: float) -> int:
+    """Return the total size of the files under `directory` modified after `since`."""
+    total = 0
+    for path in directory.rglob("*"):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        if path.is_file() and stat.st_mtime >= since:
+            total += stat.st_size
+    return total
+
+
+def git_commit() -> Optional[str]:
+    """Return the current commit hash, if available."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def summarize_runs(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aggregate the per-prompt records of a benchmark run.
+
+    Returns:
+        Success rate, p50/p95/mean time per node, render time per quality and
+        correction loop counts
+    """
+    from leap.workflow.latency import percentile
+
+    def stats(values: List[float]) -> Dict[str, Optional[float]]:
+        return {
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "mean": round(sum(values) / len(values), 3) if values else None
+        }
+
+    nodes: Dict[str, List[float]] = {}
+    renders: Dict[str, List[float]] = {}
+    for record in records:
+        for node, seconds in record["node_timings"].items():
+            nodes.setdefault(node, []).append(seconds)
+        if "execute_code" in record["node_timings"]:
+            renders.setdefault(record["quality"], []).append(record["node_timings"]["execute_code"])
+
+    succeeded = sum(1 for record in records if record["success"])
+    return {
+        "prompts": len(records),
+        "success_rate": succeeded / len(records) if records else 0.0,
+        "first_pass_success_rate": sum(1 for record in records if record["first_pass"]) / len(records) if records else 0.0,
+        "total_seconds": stats([record["total_seconds"] for record in records]),
+        "nodes": {node: stats(values) for node, values in nodes.items()},
+        "render_seconds_by_quality": {quality: stats(values) for quality, values in renders.items()},
+        "correction_loops": {
+            "total": sum(record["node_calls"].get("correct_code", 0) for record in records),
+            "auto_fixes": sum(record["node_calls"].get("auto_fix", 0) for record in records),
+            "max_per_prompt": max((record["node_calls"].get("correct_code", 0) for record in records), default=0)
+        }
+    }
+
+
+def run_benchmark(
+    items: List[Dict[str, Any]],
+    invoke: Callable[[Dict[str, Any]], Dict[str, Any]],
+    generated_dir: Path
+) -> Dict[str, Any]:
+    """Run every corpus prompt through the workflow, one at a time, and collect the metrics."""
+    from leap.workflow.batch import run_item
+    from leap.services.llm_clients import get_client_registry
+
+    start = time.time()
+    records = []
+    for index, item in enumerate(items, 1):
+        record = run_item(item, invoke)
+        records.append(record)
+        status = "ok" if record["success"] else f"failed: {(record['error'] or '')[:80]}"
+        print(f"[{index}/{len(items)}] {item['id']}: {record['total_seconds']:.1f}s {status}")
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "wall_seconds": round(time.time() - start, 3),
+        "peak_rss_mb": peak_rss_mb(),
+        "bytes_written": bytes_written_since(generated_dir, start),
+        "llm_connections": get_client_registry().stats(),
+        "summary": summarize_runs(records),
+        "prompts": records
+    }
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Return the metrics whose p50 got slower than the baseline by more than `threshold` (a fraction)."""
+    regressions = []
+    for metric in TRACKED_METRICS:
+        if metric == "total_seconds":
+            now, before = current["summary"]["total_seconds"]["p50"], baseline["summary"]["total_seconds"]["p50"]
+        else:
+            now = current["summary"]["nodes"].get(metric, {}).get("p50")
+            before = baseline["summary"]["nodes"].get(metric, {}).get("p50")
+        if now is None or not before:
+            continue
+        change = (now - before) / before
+        if change > threshold:
+            regressions.append(f"{metric}: p50 {before:.2f}s -> {now:.2f}s (+{change:.0%})")
+
+    if current["summary"]["success_rate"] < baseline["summary"]["success_rate"]:
+        regressions.append(
+            f"success rate: {baseline['summary']['success_rate']:.0%} -> {current['summary']['success_rate']:.0%}"
+        )
+    return regressions
+
+
+def main():
+    """Main entry point for the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark the generation pipeline on a fixed prompt corpus")
+    parser.add_argument("--corpus", type=str, default=str(DEFAULT_CORPUS), help="JSONL prompt corpus")
+    parser.add_argument("--cassettes", type=str, default=str(DEFAULT_CASSETTES), help="Directory of recorded LLM responses")
+    parser.add_argument("--record", action="store_true", help="Call the LLM and record its responses instead of replaying them")
+    parser.add_argument("--latency-scale", type=float, default=0.0, help="Replay this fraction of the recorded LLM latency")
+    parser.add_argument("--output", type=str, default="benchmark_results.json", help="Results file (JSON)")
+    parser.add_argument("--compare", type=str, default=None, help="Earlier results file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Slowdown (fraction) reported as a regression")
+    args = parser.parse_args()
+
+    configure_environment(Path(args.cassettes), args.record, args.latency_scale)
+
+    # Imported after configuring the environment, which the configuration reads at import time
+    from leap.core.config import GENERATED_DIR
+    from leap.workflow.batch import load_batch
+    from leap.workflow.graph import workflow
+
+    results = run_benchmark(load_batch(Path(args.corpus)), workflow.invoke, GENERATED_DIR)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    summary = results["summary"]
+    print(f"\nPrompts: {summary['prompts']}, success rate {summary['success_rate']:.0%}")
+    print(f"Total time p50: {summary['total_seconds']['p50']}s, wall {results['wall_seconds']:.1f}s")
+    print(f"Peak RSS: {results['peak_rss_mb']['self']} MB (renders: {results['peak_rss_mb']['children']} MB)")
+    print(f"Bytes written: {results['bytes_written']}")
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.threshold)
+        if regressions:
+            print("\nRegressions against", args.compare)
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
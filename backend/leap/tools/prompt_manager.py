@@ -25,20 +25,7 @@ from tabulate import tabulate
 sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
 
 from leap.prompts.base import PromptTemplate, PromptCollection, PromptVersion
-from leap.prompts import (
-    SCENE_PLANNING_PROMPTS,
-    CODE_GENERATION_PROMPTS,
-    ERROR_CORRECTION_PROMPTS,
-    VALIDATION_PROMPTS
-)
-
-# Map of prompt collection names to their objects
-PROMPT_COLLECTIONS = {
-    "scene_planning": SCENE_PLANNING_PROMPTS,
-    "code_generation": CODE_GENERATION_PROMPTS,
-    "error_correction": ERROR_CORRECTION_PROMPTS,
-    "validation": VALIDATION_PROMPTS
-}
+from leap.prompts import PROMPT_COLLECTIONS
 
 
 def list_prompts(args):
@@ -0,0 +1,181 @@
+"""
+Content-addressed storage for the large values of a job.
+
+The workflow state is copied by every node, sent to the tracer and logged, so
+large values that are only needed for tracing (the formatted prompts, which
+repeat the Manim API documentation, the one-shot example and the plan at every
+stage) are kept out of it. They are written to a directory of the job under
+ARTIFACT_DIR, named by the hash of their content, and the state holds a short
+reference ("artifact:<job id>/<sha256>") instead. Identical content, like the API
+documentation, is stored only once for all stages of a job.
+
+The artifacts live as long as their job: the workflow deletes them when it ends,
+and the directories of jobs that never ended (a crashed worker) are removed once
+they are ARTIFACT_TTL_HOURS old.
+
+Prompts are recorded as the template id and version plus their parameters, with
+the large parameters replaced by references; `render_prompt` rebuilds the exact
+messages that were sent.
+"""
+import hashlib
+import logging
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from leap.core.config import ARTIFACT_DIR, ARTIFACT_INLINE_CHARS, ARTIFACT_TTL_HOURS
+from leap.prompts import PROMPT_COLLECTIONS
+from leap.prompts.base import PromptVersion
+
+ARTIFACT_PREFIX = "artifact:"
+
+# Path of an artifact in a reference: the job's directory (if any) and the content hash
+_ARTIFACT_PATH = re.compile(r"(?:[0-9a-f]{32}/)?[0-9a-f]{64}")
+
+# Template id of prompts written in the node itself rather than taken from a collection
+INLINE_TEMPLATE = "inline"
+
+
+def is_artifact_ref(value: Any) -> bool:
+    """Return True if `value` is a reference to a stored artifact."""
+    return isinstance(value, str) and value.startswith(ARTIFACT_PREFIX)
+
+
+class ArtifactStore:
+    """Text artifacts of a job stored on disk by the SHA-256 of their content."""
+
+    def __init__(self, directory: Optional[Path] = None, inline_limit: Optional[int] = None, job_id: Optional[str] = None):
+        """Initialize the store.
+
+        Args:
+            directory: Directory of the artifact files (one subdirectory per job)
+            inline_limit: Values up to this many characters are kept inline by `reference`
+            job_id: Job the stored artifacts belong to (None to store them in `directory` itself)
+        """
+        self.root = Path(directory or ARTIFACT_DIR)
+        self.job_id = job_id
+        self.directory = self.root / job_id if job_id else self.root
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.inline_limit = ARTIFACT_INLINE_CHARS if inline_limit is None else inline_limit
+        self.logger = logging.getLogger("leap")
+
+    def put(self, content: str) -> str:
+        """Store `content` (once per job) and return its reference."""
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        path = self.directory / f"{digest}.txt"
+        if not path.exists():
+            # Written under a temporary name so readers never see a partial file
+            tmp_path = path.with_suffix(f".{id(content)}.tmp")
+            tmp_path.write_text(content, encoding="utf-8")
+            tmp_path.replace(path)
+        return ARTIFACT_PREFIX + (f"{self.job_id}/{digest}" if self.job_id else digest)
+
+    def get(self, ref: str) -> str:
+        """Return the content of a reference.
+
+        Raises:
+            KeyError: If the reference is malformed or the artifact doesn't exist
+        """
+        if not is_artifact_ref(ref) or not _ARTIFACT_PATH.fullmatch(ref[len(ARTIFACT_PREFIX):]):
+            raise KeyError(f"Not an artifact reference: {ref[:80]}")
+        path = self.root / f"{ref[len(ARTIFACT_PREFIX):]}.txt"
+        if not path.exists():
+            raise KeyError(f"Artifact {ref} not found")
+        return path.read_text(encoding="utf-8")
+
+    def reference(self, value: Any) -> Any:
+        """Return a reference for strings longer than the inline limit, other values unchanged."""
+        if isinstance(value, str) and len(value) > self.inline_limit:
+            return self.put(value)
+        return value
+
+    def resolve(self, value: Any) -> Any:
+        """Return the content of a reference, other values unchanged."""
+        return self.get(value) if is_artifact_ref(value) else value
+
+    def remove_job(self, job_id: str) -> None:
+        """Delete the artifacts of a job."""
+        shutil.rmtree(self.root / job_id, ignore_errors=True)
+
+    def prune(self, max_age_seconds: Optional[float] = None) -> int:
+        """Delete the artifacts of jobs last written more than `max_age_seconds` ago (default ARTIFACT_TTL_HOURS).
+
+        Returns:
+            The number of job directories deleted
+        """
+        max_age = ARTIFACT_TTL_HOURS * 3600 if max_age_seconds is None else max_age_seconds
+        cutoff = time.time() - max_age
+        removed = 0
+        for path in self.root.iterdir():
+            try:
+                if path.is_dir() and path.stat().st_mtime < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+
+def get_artifact_store(store: Optional[ArtifactStore] = None, job_id: Optional[str] = None) -> ArtifactStore:
+    """Return the given store or the default one of the job."""
+    return store if store is not None else ArtifactStore(job_id=job_id)
+
+
+def cleanup_job_artifacts(state: Dict[str, Any], store: Optional[ArtifactStore] = None) -> None:
+    """Delete the artifacts of a finished job, and those of abandoned jobs."""
+    store = get_artifact_store(store)
+    if state.get("job_id"):
+        store.remove_job(state["job_id"])
+    store.prune()
+
+
+def record_prompt(
+    state: Dict[str, Any],
+    stage: str,
+    template: str,
+    version: Optional[PromptVersion],
+    params: Dict[str, Any],
+    store: Optional[ArtifactStore] = None,
+    tokens: Optional[Dict[str, Any]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Return the state's prompts with the prompt of `stage` recorded.
+
+    Args:
+        state: The current workflow state
+        stage: Name of the step that sent the prompt (planning, generation, ...)
+        template: Id of the prompt collection (see PROMPT_COLLECTIONS), or INLINE_TEMPLATE
+            with the messages themselves as "system" and "user" parameters
+        version: Version of the template in the collection
+        params: Parameters the template was formatted with
+        store: Store for the large parameters
+        tokens: Token accounting of the prompt (see FormattedPrompt)
+
+    Returns:
+        The prompts of every stage, by stage
+    """
+    store = get_artifact_store(store, state.get("job_id"))
+    prompts = dict(state.get("prompts") or {})
+    prompts[stage] = {
+        "template": template,
+        "version": version.value if version is not None else None,
+        "params": {name: store.reference(value) for name, value in params.items()}
+    }
+    if tokens is not None:
+        prompts[stage]["tokens"] = tokens
+    return prompts
+
+
+def render_prompt(record: Dict[str, Any], store: Optional[ArtifactStore] = None) -> Dict[str, str]:
+    """Rebuild the system and user messages of a recorded prompt.
+
+    Raises:
+        KeyError: If the template, its version or a referenced artifact doesn't exist
+    """
+    store = get_artifact_store(store)
+    params = {name: store.resolve(value) for name, value in record["params"].items()}
+    if record["template"] == INLINE_TEMPLATE:
+        return {"system": params["system"], "user": params["user"]}
+    version = PromptVersion(record["version"]) if record.get("version") else None
+    return PROMPT_COLLECTIONS[record["template"]].get(version).format(**params)
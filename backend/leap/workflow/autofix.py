@@ -0,0 +1,272 @@
+"""
+Deterministic, rule-based fixes for common Manim failures.
+
+Many execution and validation failures are mechanical (a deprecated class name,
+a color constant that doesn't exist, a renamed keyword argument, a missing
+import). Each rule below pairs an error signature, matched against the distilled
+error, with a codemod that locates the offending nodes with ``ast`` and rewrites
+only those source spans, so formatting and comments are preserved.
+"""
+import ast
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from leap.workflow.errors import distill_error
+
+MANIM_IMPORT = "from manim import *"
+BASE_SCENE_IMPORT = "from leap.templates.base_scene import ManimVoiceoverBase"
+
+# Colors that models commonly invent, mapped to the closest Manim constant
+COLOR_ALIASES: Dict[str, str] = {
+    "LIGHT_BLUE": "BLUE_B",
+    "SKY_BLUE": "BLUE_B",
+    "NAVY": "DARK_BLUE",
+    "NAVY_BLUE": "DARK_BLUE",
+    "CYAN": "TEAL",
+    "AQUA": "TEAL",
+    "TURQUOISE": "TEAL",
+    "MAGENTA": "PINK",
+    "VIOLET": "PURPLE",
+    "INDIGO": "PURPLE",
+    "LAVENDER": "PURPLE_A",
+    "LIME": "GREEN_B",
+    "LIGHT_GREEN": "GREEN_B",
+    "DARK_GREEN": "GREEN_E",
+    "BROWN": "DARK_BROWN",
+    "LIGHT_RED": "RED_B",
+    "DARK_RED": "RED_E",
+    "CRIMSON": "RED_D",
+    "SILVER": "LIGHT_GRAY",
+    "LIGHT_YELLOW": "YELLOW_B",
+    "DARK_YELLOW": "GOLD",
+    "DARK_PURPLE": "PURPLE_E",
+    "LIGHT_PURPLE": "PURPLE_B",
+    "DARK_ORANGE": "ORANGE",
+    "LIGHT_ORANGE": "ORANGE",
+}
+
+# Keyword arguments that were renamed in Manim, optionally restricted to the callees
+# they apply to (matched against the called name or attribute)
+KWARG_RENAMES: Dict[str, Tuple[str, Optional[Set[str]]]] = {
+    "size": ("font_size", {"Text", "MathTex", "Tex", "MarkupText", "Paragraph", "Title", "BulletedList"}),
+    "hex": ("hex_str", {"from_hex"}),
+    "type": ("section_type", {"next_section"}),
+    "outer_radius": ("radius", {"Sector"}),
+    "colour": ("color", None),
+    "fill_colour": ("fill_color", None),
+    "stroke_colour": ("stroke_color", None),
+    "runtime": ("run_time", None),
+    "rate_function": ("rate_func", None),
+}
+
+# (lineno, col_offset, end_lineno, end_col_offset, replacement) using ast positions
+Span = Tuple[int, int, int, int, str]
+
+
+@dataclass
+class FixRule:
+    """A known error signature and the codemod that fixes it."""
+    name: str
+    signature: re.Pattern
+    fix: Callable[[str, ast.AST, re.Match], List[Span]]
+    description: str = ""
+
+
+def _replace_spans(code: str, spans: List[Span]) -> str:
+    """Replace source spans given as ast positions (1-based lines, UTF-8 byte columns)."""
+    data = code.encode("utf-8")
+    line_starts = [0]
+    for index, byte in enumerate(data):
+        if byte == 0x0A:
+            line_starts.append(index + 1)
+
+    def offset(lineno: int, col: int) -> int:
+        if lineno > len(line_starts):
+            return len(data)
+        return line_starts[lineno - 1] + col
+
+    for lineno, col, end_lineno, end_col, text in sorted(set(spans), reverse=True):
+        start, end = offset(lineno, col), offset(end_lineno, end_col)
+        data = data[:start] + text.encode("utf-8") + data[end:]
+    return data.decode("utf-8")
+
+
+def _callee_name(call: ast.Call) -> Optional[str]:
+    """Return the called name for `Name(...)` or `obj.attr(...)` calls."""
+    if isinstance(call.func, ast.Name):
+        return call.func.id
+    if isinstance(call.func, ast.Attribute):
+        return call.func.attr
+    return None
+
+
+def _rename_names(tree: ast.AST, old: str, new: str, calls_only: bool = False) -> List[Span]:
+    """Spans renaming every load of the name `old` (optionally only when called)."""
+    if calls_only:
+        nodes = [n.func for n in ast.walk(tree) if isinstance(n, ast.Call) and isinstance(n.func, ast.Name)]
+    else:
+        nodes = [n for n in ast.walk(tree) if isinstance(n, ast.Name)]
+    return [
+        (n.lineno, n.col_offset, n.end_lineno, n.end_col_offset, new)
+        for n in nodes
+        if n.id == old
+    ]
+
+
+def _fix_show_creation(code: str, tree: ast.AST, match: re.Match) -> List[Span]:
+    return _rename_names(tree, "ShowCreation", "Create")
+
+
+def _fix_unknown_color(code: str, tree: ast.AST, match: re.Match) -> List[Span]:
+    name = match.group(1)
+    if name not in COLOR_ALIASES:
+        return []
+    return _rename_names(tree, name, COLOR_ALIASES[name])
+
+
+def _fix_tex(code: str, tree: ast.AST, match: re.Match) -> List[Span]:
+    return _rename_names(tree, "Tex", "MathTex", calls_only=True)
+
+
+def _fix_renamed_kwarg(code: str, tree: ast.AST, match: re.Match) -> List[Span]:
+    old = match.group(1)
+    if old not in KWARG_RENAMES:
+        return []
+    new, callees = KWARG_RENAMES[old]
+
+    spans = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        if callees is not None and _callee_name(node) not in callees:
+            continue
+        for keyword in node.keywords:
+            if keyword.arg == old:
+                # The keyword node spans `old=value`; only the name is rewritten
+                spans.append((
+                    keyword.lineno, keyword.col_offset,
+                    keyword.lineno, keyword.col_offset + len(old.encode("utf-8")),
+                    new
+                ))
+    return spans
+
+
+def _fix_clear(code: str, tree: ast.AST, match: re.Match) -> List[Span]:
+    spans = []
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Call)
+            and not node.args
+            and isinstance(node.func, ast.Attribute)
+            and node.func.attr == "clear"
+            and isinstance(node.func.value, ast.Name)
+            and node.func.value.id == "self"
+        ):
+            func = node.func
+            spans.append((func.lineno, func.col_offset, func.end_lineno, func.end_col_offset, "self.fade_out_scene"))
+    return spans
+
+
+def _has_import(tree: ast.AST, module: str, name: str) -> bool:
+    return any(
+        isinstance(node, ast.ImportFrom)
+        and node.module == module
+        and any(alias.name == name for alias in node.names)
+        for node in ast.walk(tree)
+    )
+
+
+def _fix_manim_import(code: str, tree: ast.AST, match: re.Match) -> List[Span]:
+    if _has_import(tree, "manim", "*"):
+        return []
+    return [(1, 0, 1, 0, MANIM_IMPORT + "\n")]
+
+
+def _fix_base_import(code: str, tree: ast.AST, match: re.Match) -> List[Span]:
+    if _has_import(tree, "leap.templates.base_scene", "ManimVoiceoverBase"):
+        return []
+    # Insert right after `from manim import *` when present, otherwise at the top
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and node.module == "manim":
+            return [(node.end_lineno + 1, 0, node.end_lineno + 1, 0, BASE_SCENE_IMPORT + "\n")]
+    return [(1, 0, 1, 0, BASE_SCENE_IMPORT + "\n")]
+
+
+FIX_RULES: List[FixRule] = [
+    FixRule(
+        name="show_creation",
+        signature=re.compile(r"ShowCreation"),
+        fix=_fix_show_creation,
+        description="Replace the removed ShowCreation animation with Create"
+    ),
+    FixRule(
+        name="unknown_color",
+        signature=re.compile(r"name '([A-Z][A-Z0-9_]*)' is not defined"),
+        fix=_fix_unknown_color,
+        description="Map color constants that don't exist in Manim to the closest one"
+    ),
+    FixRule(
+        name="tex_to_mathtex",
+        signature=re.compile(r"Tex instead of MathTex"),
+        fix=_fix_tex,
+        description="Use MathTex instead of Tex for mathematical expressions"
+    ),
+    FixRule(
+        name="renamed_kwarg",
+        signature=re.compile(r"got an unexpected keyword argument '(\w+)'"),
+        fix=_fix_renamed_kwarg,
+        description="Rename keyword arguments that changed name in Manim"
+    ),
+    FixRule(
+        name="clear_to_fade_out",
+        signature=re.compile(r"self\.clear\(\) removes the background"),
+        fix=_fix_clear,
+        description="Replace self.clear() with self.fade_out_scene()"
+    ),
+    FixRule(
+        name="missing_manim_import",
+        signature=re.compile(r"Code must import all Manim classes|name '[A-Z][A-Za-z0-9_]*' is not defined"),
+        fix=_fix_manim_import,
+        description="Add `from manim import *`"
+    ),
+    FixRule(
+        name="missing_base_import",
+        signature=re.compile(r"Code must import ManimVoiceoverBase|name 'ManimVoiceoverBase' is not defined"),
+        fix=_fix_base_import,
+        description="Add the ManimVoiceoverBase import"
+    ),
+]
+
+
+def apply_auto_fixes(code: str, error: str) -> Tuple[str, List[str]]:
+    """Apply every rule whose signature matches the error.
+
+    Args:
+        code: The code that failed
+        error: The error message from validation or execution
+
+    Returns:
+        A tuple of the (possibly) fixed code and the names of the rules that changed it
+    """
+    distilled = distill_error(error)
+    applied = []
+
+    for rule in FIX_RULES:
+        match = rule.signature.search(distilled)
+        if not match:
+            continue
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            # Codemods need a parseable module; leave syntax errors to the LLM
+            break
+        spans = rule.fix(code, tree, match)
+        if not spans:
+            continue
+        fixed = _replace_spans(code, spans)
+        if fixed != code:
+            code = fixed
+            applied.append(rule.name)
+
+    return code, applied
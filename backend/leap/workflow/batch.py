@@ -0,0 +1,199 @@
+"""
+Batch generation of many prompts.
+
+Prompts are read from a JSONL file (one `{"prompt", "level", "quality"}` object
+per line, optionally with "id", "tier", "voice" and "priority") and run through
+the workflow with a bounded number of jobs in flight, while LLM calls and renders
+have their own limits. Batch jobs queue behind interactive ones for the shared
+LLM rate limit (BATCH_PRIORITY). Every finished prompt is appended to a results file right away, so an
+interrupted batch resumes where it stopped. The report aggregates the results
+file: jobs per hour, per-stage latency percentiles and the first-pass success
+rate (videos rendered without any correction).
+"""
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from leap.core.concurrency import set_concurrency_limit
+from leap.core.config import DEFAULT_TIER, BATCH_PRIORITY
+from leap.services.cache_service import make_cache_key
+from leap.workflow.latency import percentile
+from leap.workflow.utils import workflow_failure
+
+logger = logging.getLogger("leap")
+
+
+def load_batch(path: Path) -> List[Dict[str, Any]]:
+    """Read the batch's prompts, filling in defaults and a stable id for each.
+
+    Raises:
+        ValueError: If a line isn't valid JSON or has no prompt
+    """
+    items = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Line {line_number} of {path} is not valid JSON: {e}")
+            if not item.get("prompt"):
+                raise ValueError(f"Line {line_number} of {path} has no prompt")
+
+            item = {
+                "prompt": item["prompt"],
+                "level": item.get("level", "normal"),
+                "quality": item.get("quality", "low"),
+                "tier": item.get("tier", DEFAULT_TIER),
+                "voice": item.get("voice", "nova"),
+                "priority": item.get("priority", BATCH_PRIORITY),
+                "id": item.get("id")
+            }
+            # The id identifies the prompt when resuming, so it must not depend on the line order
+            item["id"] = str(item["id"] or make_cache_key(item["prompt"], item["level"], item["quality"], item["tier"])[:12])
+            items.append(item)
+    return items
+
+
+def load_results(path: Path) -> Dict[str, Dict[str, Any]]:
+    """Read the results recorded so far, by prompt id (the latest one wins)."""
+    results = {}
+    if path.exists():
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    results[record["id"]] = record
+    return results
+
+
+def run_item(item: Dict[str, Any], invoke: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+    """Run one prompt through the workflow and return its result record."""
+    state = {
+        "user_input": item["prompt"],
+        "user_level": item["level"],
+        "rendering_quality": item["quality"],
+        "voice_model": item["voice"],
+        "tier": item["tier"],
+        "priority": item.get("priority", BATCH_PRIORITY),
+        "duration_detail": "detailed"
+    }
+    start = time.time()
+    try:
+        result = invoke(state)
+    except Exception as e:
+        result = {"error": f"Workflow failed: {str(e)}"}
+    elapsed = time.time() - start
+
+    execution_result = result.get("execution_result") or {}
+    success = workflow_failure(result) is None
+    return {
+        **item,
+        "success": success,
+        "first_pass": success and not result.get("correction_attempts") and not result.get("last_correction"),
+        "error": result.get("error"),
+        "failure_category": result.get("failure_category"),
+        "output_file": execution_result.get("output_file"),
+        "cached": bool(result.get("cached_result")),
+        "correction_attempts": result.get("correction_attempts", 0),
+        "total_seconds": round(elapsed, 3),
+        "node_timings": result.get("node_timings") or {},
+        "node_calls": result.get("node_calls") or {},
+        "node_tokens": result.get("node_tokens") or {},
+        "finished_at": time.time()
+    }
+
+
+def run_batch(
+    items: List[Dict[str, Any]],
+    results_path: Path,
+    invoke: Callable[[Dict[str, Any]], Dict[str, Any]],
+    concurrency: int = 4,
+    llm_concurrency: Optional[int] = None,
+    render_concurrency: Optional[int] = None,
+    retry_failed: bool = False
+) -> Dict[str, Any]:
+    """Run the prompts that have no result yet and return the report.
+
+    Args:
+        items: The batch's prompts (from load_batch)
+        results_path: JSONL file the result of each prompt is appended to
+        invoke: Runs the workflow on an initial state
+        concurrency: Prompts in flight at the same time
+        llm_concurrency: Maximum concurrent LLM calls (None for no limit)
+        render_concurrency: Maximum concurrent Manim renders (None for no limit)
+        retry_failed: Also rerun prompts whose recorded result is a failure
+
+    Returns:
+        The batch report (see summarize_batch)
+    """
+    done = load_results(results_path)
+    pending = [
+        item for item in items
+        if item["id"] not in done or (retry_failed and not done[item["id"]]["success"])
+    ]
+    logger.info(f"Batch: {len(items)} prompts, {len(items) - len(pending)} already done, {len(pending)} to run")
+
+    set_concurrency_limit("llm", llm_concurrency)
+    set_concurrency_limit("render", render_concurrency)
+    results_path.parent.mkdir(parents=True, exist_ok=True)
+    write_lock = threading.Lock()
+    start = time.time()
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            futures = {pool.submit(run_item, item, invoke): item for item in pending}
+            for count, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                with write_lock, open(results_path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+                status = "ok" if record["success"] else f"failed: {(record['error'] or '')[:100]}"
+                logger.info(f"[{count}/{len(pending)}] {record['prompt'][:60]} {status} ({record['total_seconds']:.0f}s)")
+    finally:
+        set_concurrency_limit("llm", None)
+        set_concurrency_limit("render", None)
+
+    ids = {item["id"] for item in items}
+    records = [record for record in load_results(results_path).values() if record["id"] in ids]
+    return summarize_batch(records, wall_seconds=time.time() - start, ran=len(pending))
+
+
+def summarize_batch(records: List[Dict[str, Any]], wall_seconds: float, ran: int) -> Dict[str, Any]:
+    """Aggregate the results of a batch.
+
+    Args:
+        records: The result records of the batch's prompts
+        wall_seconds: Wall time of this run
+        ran: Number of prompts run in this run
+
+    Returns:
+        Job counts, success and first-pass success rates, throughput and
+        p50/p95 latencies in total and per workflow stage
+    """
+    stages: Dict[str, List[float]] = {}
+    for record in records:
+        for stage, seconds in record.get("node_timings", {}).items():
+            stages.setdefault(stage, []).append(seconds)
+
+    totals = [record["total_seconds"] for record in records]
+    succeeded = sum(1 for record in records if record["success"])
+    return {
+        "jobs": len(records),
+        "succeeded": succeeded,
+        "failed": len(records) - succeeded,
+        "success_rate": succeeded / len(records) if records else 0.0,
+        "first_pass_success_rate": sum(1 for record in records if record["first_pass"]) / len(records) if records else 0.0,
+        "ran_this_run": ran,
+        "wall_seconds": round(wall_seconds, 1),
+        "jobs_per_hour": round(ran / wall_seconds * 3600, 1) if ran and wall_seconds > 0 else 0.0,
+        "latency": {"p50_seconds": percentile(totals, 50), "p95_seconds": percentile(totals, 95)},
+        "stages": {
+            stage: {"p50_seconds": percentile(values, 50), "p95_seconds": percentile(values, 95)}
+            for stage, values in stages.items()
+        }
+    }
@@ -0,0 +1,259 @@
+"""
+Per-job latency budget.
+
+A job may carry a latency budget (seconds). The deadline is fixed when the first
+node runs; every node's wall time is recorded in `state["node_timings"]` (and its
+LLM tokens in `state["node_tokens"]`), and the nodes use the time that is left to
+pick cheaper strategies: a shorter video, a faster model, a lower render quality,
+a faster voice and fewer correction attempts. Once the budget is spent the workflow stops, keeping the best code it
+has produced so far in its final state (the job itself fails, as there is no video). Jobs without a budget behave exactly as before.
+
+The quick tier always uses the cheap end of these choices: a 30-60 second video,
+the fast voice, low quality rendering and at most QUICK_MAX_ATTEMPTS corrections.
+
+Each node's LLM calls use the model, reasoning effort and output limit of its
+route (see select_route), so cheap steps like input validation don't pay for the
+effort code generation needs.
+"""
+import functools
+import logging
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from leap.core.config import (
+    MAX_ATTEMPTS,
+    QUICK_MAX_ATTEMPTS,
+    OPENAI_MODEL,
+    FAST_OPENAI_MODEL,
+    TTS_MODEL,
+    FAST_TTS_MODEL,
+    ESTIMATED_LLM_SECONDS,
+    ESTIMATED_RENDER_SECONDS,
+    RENDER_TIMEOUT_HEADROOM,
+    RENDER_TIMEOUT_MIN_SECONDS,
+    RENDER_LENGTH_FACTORS,
+    BUDGET_SHORT_VIDEO_BELOW,
+    BUDGET_FAST_MODEL_BELOW,
+    BUDGET_FAST_TTS_BELOW,
+    QUICK_PRIORITY,
+    DEFAULT_PRIORITY,
+    LLM_ROUTES,
+    CORRECTION_ESCALATION,
+    MODEL_MAX_OUTPUT_TOKENS,
+)
+from leap.core.usage import track_llm_usage
+
+QUALITY_ORDER = ["low", "medium", "high"]
+
+logger = logging.getLogger("leap")
+
+
+def is_quick_tier(state: Dict[str, Any]) -> bool:
+    """Return True if the job was requested in the quick tier."""
+    return state.get("tier") == "quick"
+
+
+def job_priority(state: Dict[str, Any]) -> int:
+    """Return the job's priority for shared resources (lower is served first)."""
+    if state.get("priority") is not None:
+        return state["priority"]
+    return QUICK_PRIORITY if is_quick_tier(state) else DEFAULT_PRIORITY
+
+
+def remaining_seconds(state: Dict[str, Any]) -> Optional[float]:
+    """Return the seconds left in the job's budget, or None if the job has no budget."""
+    deadline = state.get("deadline")
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def is_budget_exhausted(state: Dict[str, Any]) -> bool:
+    """Return True if the job has a budget and it has run out."""
+    remaining = remaining_seconds(state)
+    return remaining is not None and remaining <= 0
+
+
+def select_model(state: Dict[str, Any]) -> str:
+    """Return the LLM to use, switching to the fast model when time is short."""
+    remaining = remaining_seconds(state)
+    if remaining is not None and remaining < BUDGET_FAST_MODEL_BELOW:
+        return FAST_OPENAI_MODEL
+    return OPENAI_MODEL
+
+
+def max_output_tokens(model: str) -> Optional[int]:
+    """Return the most output tokens `model` accepts, from its longest prefix in MODEL_MAX_OUTPUT_TOKENS."""
+    prefixes = [prefix for prefix in MODEL_MAX_OUTPUT_TOKENS if model.startswith(prefix)]
+    return MODEL_MAX_OUTPUT_TOKENS[max(prefixes, key=len)] if prefixes else None
+
+
+def select_route(state: Dict[str, Any], node: str) -> Dict[str, Any]:
+    """Return the model, reasoning effort and max output tokens of a node's LLM calls.
+
+    The node's route comes from LLM_ROUTES. Corrections escalate along
+    CORRECTION_ESCALATION as the earlier ones fail, and every node switches to the
+    fast model when time is short. The output limit is clamped to what the chosen
+    model accepts.
+
+    Returns:
+        The LLMService arguments: node, model, reasoning_effort and max_tokens
+    """
+    route = {"node": node, "model": OPENAI_MODEL, "reasoning_effort": None, "max_tokens": None, **LLM_ROUTES.get(node, {})}
+    if node == "correct_code" and CORRECTION_ESCALATION:
+        step = min(state.get("correction_attempts", 0), len(CORRECTION_ESCALATION) - 1)
+        route.update(CORRECTION_ESCALATION[step])
+    remaining = remaining_seconds(state)
+    if remaining is not None and remaining < BUDGET_FAST_MODEL_BELOW:
+        route.update(model=FAST_OPENAI_MODEL, reasoning_effort=None)
+    cap = max_output_tokens(route["model"])
+    if cap is not None and route["max_tokens"] is not None and route["max_tokens"] > cap:
+        route["max_tokens"] = cap
+    return route
+
+
+def select_video_length(state: Dict[str, Any]) -> str:
+    """Return "quick" for the quick tier, otherwise "long" or "short" when there isn't time for a long video."""
+    if is_quick_tier(state):
+        return "quick"
+    remaining = remaining_seconds(state)
+    if remaining is not None and remaining < BUDGET_SHORT_VIDEO_BELOW:
+        return "short"
+    return "long"
+
+
+def select_tts_model(state: Dict[str, Any]) -> str:
+    """Return the text-to-speech model, switching to the fast one when time is short."""
+    if is_quick_tier(state):
+        return FAST_TTS_MODEL
+    remaining = remaining_seconds(state)
+    if remaining is not None and remaining < BUDGET_FAST_TTS_BELOW:
+        return FAST_TTS_MODEL
+    return TTS_MODEL
+
+
+def select_rendering_quality(state: Dict[str, Any]) -> str:
+    """Return the requested quality, lowered until the render is expected to fit the budget."""
+    if is_quick_tier(state):
+        return "low"
+    quality = state.get("rendering_quality", "low")
+    remaining = remaining_seconds(state)
+    if remaining is None or quality not in QUALITY_ORDER:
+        return quality
+
+    index = QUALITY_ORDER.index(quality)
+    while index > 0 and ESTIMATED_RENDER_SECONDS[QUALITY_ORDER[index]] > remaining:
+        index -= 1
+    return QUALITY_ORDER[index]
+
+
+def lower_rendering_quality(quality: str) -> Optional[str]:
+    """Return the next lower rendering quality, or None if `quality` is already the lowest."""
+    if quality not in QUALITY_ORDER or QUALITY_ORDER.index(quality) == 0:
+        return None
+    return QUALITY_ORDER[QUALITY_ORDER.index(quality) - 1]
+
+
+def render_timeout(state: Dict[str, Any], quality: str) -> float:
+    """Return the seconds a render at `quality` may take, for the length of video the job planned.
+
+    With a budget, the render may not run past the deadline (but gets at least RENDER_TIMEOUT_MIN_SECONDS).
+    """
+    estimate = ESTIMATED_RENDER_SECONDS.get(quality, ESTIMATED_RENDER_SECONDS["low"])
+    length_factor = RENDER_LENGTH_FACTORS.get(state.get("video_length") or "long", 1.0)
+    timeout = estimate * RENDER_TIMEOUT_HEADROOM * length_factor
+    remaining = remaining_seconds(state)
+    if remaining is not None:
+        timeout = min(timeout, max(RENDER_TIMEOUT_MIN_SECONDS, remaining))
+    return timeout
+
+
+def max_correction_attempts(state: Dict[str, Any]) -> int:
+    """Return how many correction attempts the job may use in total.
+
+    Without a budget this is MAX_ATTEMPTS (QUICK_MAX_ATTEMPTS for the quick tier).
+    With one, only the attempts whose correction and re-render are expected to fit
+    in the remaining time are allowed.
+    """
+    limit = QUICK_MAX_ATTEMPTS if is_quick_tier(state) else MAX_ATTEMPTS
+    remaining = remaining_seconds(state)
+    if remaining is None:
+        return limit
+
+    quality = select_rendering_quality(state)
+    cycle = ESTIMATED_LLM_SECONDS + ESTIMATED_RENDER_SECONDS.get(quality, ESTIMATED_RENDER_SECONDS["low"])
+    affordable = max(0, int(remaining // cycle))
+    return min(limit, state.get("correction_attempts", 0) + affordable)
+
+
+def record_node_time(state: Dict[str, Any], node: str, elapsed: float) -> Dict[str, float]:
+    """Return the node timings with `elapsed` seconds added to `node`."""
+    timings = dict(state.get("node_timings") or {})
+    timings[node] = round(timings.get(node, 0.0) + elapsed, 3)
+    return timings
+
+
+def record_node_call(state: Dict[str, Any], node: str) -> Dict[str, int]:
+    """Return the node call counts with one more call of `node`."""
+    calls = dict(state.get("node_calls") or {})
+    calls[node] = calls.get(node, 0) + 1
+    return calls
+
+
+def record_node_tokens(state: Dict[str, Any], node: str, usage: Dict[str, int]) -> Dict[str, int]:
+    """Return the node token counts with the tokens of `usage` added to `node` (nodes without LLM calls are left out)."""
+    tokens = dict(state.get("node_tokens") or {})
+    if usage["calls"]:
+        tokens[node] = tokens.get(node, 0) + usage["total_tokens"]
+    return tokens
+
+
+def timed_node(name: str, node: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+    """Wrap a graph node to record its wall time, calls and LLM tokens, and enforce the job's latency budget.
+
+    The deadline (and the job id) is fixed the first time a node runs. A node that would start
+    after the deadline is skipped and the workflow is stopped with the artifacts
+    produced so far (the last validated code, or the plan).
+    """
+    @functools.wraps(node)
+    def wrapper(state, *args, **kwargs):
+        updates: Dict[str, Any] = {}
+        if state.get("started_at") is None:
+            updates["started_at"] = time.time()
+        if state.get("job_id") is None:
+            updates["job_id"] = uuid.uuid4().hex
+        if state.get("latency_budget") and state.get("deadline") is None:
+            updates["deadline"] = time.time() + state["latency_budget"]
+        state = {**state, **updates}
+
+        if is_budget_exhausted(state) and not state.get("stop_reason"):
+            stop_reason = f"Latency budget of {state['latency_budget']:.0f}s exhausted before {name}"
+            logger.warning(stop_reason)
+            best_code = state.get("last_valid_code") or state.get("generated_code")
+            return {
+                **updates,
+                "stop_reason": stop_reason,
+                "generated_code": best_code,
+                "error": state.get("error") or stop_reason
+            }
+
+        start = time.time()
+        with track_llm_usage() as usage:
+            result = node(state, *args, **kwargs)
+        elapsed = time.time() - start
+        if usage["calls"]:
+            logger.info(f"Node {name} took {elapsed:.1f}s, {usage['calls']} LLM call(s), {usage['total_tokens']} tokens")
+        else:
+            logger.info(f"Node {name} took {elapsed:.1f}s")
+        # A node may return counters of its own (the scenes' of a lesson), add to those
+        counters = {**state, **result}
+        return {
+            **result,
+            **updates,
+            "node_timings": record_node_time(counters, name, elapsed),
+            "node_calls": record_node_call(counters, name),
+            "node_tokens": record_node_tokens(counters, name, usage)
+        }
+
+    return wrapper
@@ -0,0 +1,137 @@
+"""
+Helpers for working with execution and validation errors.
+
+Manim failures arrive as full (often rich-formatted) tracebacks. The helpers in
+this module reduce them to the part that identifies the failure so it can be
+matched against known fixes, and recognize failures caused by the environment
+that no code change can fix.
+"""
+import hashlib
+import re
+from typing import Optional
+
+# Box drawing characters rich uses to frame tracebacks
+_BOX_CHARS = "│╭╮╰╯─❱"
+
+_EXCEPTION_LINE = re.compile(
+    r"^(?:[A-Za-z_][\w.]*\.)?(?:[A-Z]\w*(?:Error|Exception|Exit)|KeyboardInterrupt|StopIteration)(?::\s.*)?$"
+)
+
+_EXECUTION_PREFIX = "Error executing code: "
+
+MAX_DISTILLED_LENGTH = 500
+
+
+def distill_error(error: str) -> str:
+    """Reduce an error message to the lines that identify the failure.
+
+    For tracebacks this is the final exception line, e.g.
+    "NameError: name 'ShowCreation' is not defined". Validation errors and
+    other messages without a traceback are returned as-is (stripped).
+
+    Args:
+        error: The raw error message from the workflow state
+
+    Returns:
+        The distilled error message
+    """
+    if not error:
+        return ""
+
+    text = error
+    if text.startswith(_EXECUTION_PREFIX):
+        text = text[len(_EXECUTION_PREFIX):]
+
+    lines = [line.strip().strip(_BOX_CHARS).strip() for line in text.strip().split("\n")]
+    for line in reversed(lines):
+        if _EXCEPTION_LINE.match(line):
+            return line[:MAX_DISTILLED_LENGTH]
+
+    return text.strip()
+
+
+def normalize_error(error: str) -> str:
+    """Normalize a distilled error so the same failure in different jobs compares equal.
+
+    File paths, memory addresses and numbers are replaced with placeholders while
+    identifiers (which usually determine the fix) are kept.
+
+    Args:
+        error: The raw or distilled error message
+
+    Returns:
+        The normalized error message
+    """
+    text = distill_error(error)
+    text = re.sub(r"(?:[A-Za-z]:)?(?:[\\/][^\s:'\"\\/]+)+\.\w+", "<file>", text)
+    text = re.sub(r"0x[0-9a-fA-F]+", "<addr>", text)
+    text = re.sub(r"(?<![A-Za-z_])\d+(?:\.\d+)?", "<n>", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def fingerprint_error(error: str) -> str:
+    """Return a short stable hash of the normalized error."""
+    return hashlib.sha1(normalize_error(error).encode("utf-8")).hexdigest()[:16]
+
+
+# Failures caused by the environment rather than the scene code. Editing the code
+# can't fix them, so the workflow stops instead of sending them to correction.
+UNRECOVERABLE_ERRORS = [
+    ("latex_missing", "LaTeX or a required LaTeX package is not installed", re.compile(
+        r"LaTeX Error: File `[^']+' not found"
+        r"|No such file or directory: '(?:latex|xelatex|dvisvgm)'"
+        r"|(?:latex|xelatex|dvisvgm): (?:command )?not found",
+        re.IGNORECASE
+    )),
+    ("tts_credentials", "The text-to-speech service rejected the credentials", re.compile(
+        r"AuthenticationError|Incorrect API key|invalid_api_key"
+        r"|api_key client option must be set|OPENAI_API_KEY environment variable"
+    )),
+    ("ffmpeg_missing", "ffmpeg is not installed", re.compile(
+        r"No such file or directory: '(?:ffmpeg|ffprobe)'"
+        r"|(?:ffmpeg|ffprobe): (?:command )?not found"
+        r"|(?:Couldn't|Could not|Unable to) find (?:ffmpeg|ffprobe)",
+        re.IGNORECASE
+    )),
+    ("out_of_memory", "The render ran out of memory", re.compile(
+        r"^MemoryError\b|Out of memory|Cannot allocate memory|Killed$",
+        re.IGNORECASE | re.MULTILINE
+    )),
+    ("timeout", "The render exceeded its timeout, even at the lowest quality", re.compile(
+        r"timed out after \d+ seconds"
+    )),
+    ("disk_full", "The disk is full", re.compile(
+        r"No space left on device|\[Errno 28\]|Disk quota exceeded",
+        re.IGNORECASE
+    )),
+]
+
+# Return codes of a render killed by SIGKILL (usually the OOM killer)
+_KILLED_RETURN_CODES = {-9, 137}
+
+
+def classify_error(error: str, returncode: Optional[int] = None) -> Optional[str]:
+    """Return the failure category of an unrecoverable environment error.
+
+    Args:
+        error: The raw error message
+        returncode: The render process return code, if known
+
+    Returns:
+        A category from UNRECOVERABLE_ERRORS, or None if the error may be fixed
+        by changing the code
+    """
+    if returncode in _KILLED_RETURN_CODES:
+        return "out_of_memory"
+    for category, _, pattern in UNRECOVERABLE_ERRORS:
+        if pattern.search(error or ""):
+            return category
+    return None
+
+
+def describe_failure_category(category: str) -> str:
+    """Return a human readable description of a failure category."""
+    for name, description, _ in UNRECOVERABLE_ERRORS:
+        if name == category:
+            return description
+    return category
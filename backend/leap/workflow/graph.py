@@ -8,9 +8,16 @@ from leap.workflow.nodes import (
     validate_code,
     execute_code,
     error_correction,
+    auto_fix_code,
+    check_result_cache,
+    render_scenes,
 )
 from leap.core.logging import setup_question_logger
 from leap.workflow.tracing import traceable
+from leap.workflow.budget import timed_node, max_correction_attempts
+from leap.workflow.latency import record_job_latency
+from leap.workflow.artifacts import cleanup_job_artifacts
+from leap.workflow.scenes import use_multi_scene
 
 @traceable(name="log_workflow_end", tags=["logging"])
 def log_workflow_end(state: GraphState) -> GraphState:
@@ -24,89 +31,200 @@ def log_workflow_end(state: GraphState) -> GraphState:
     """
     logger = setup_question_logger(state["user_input"])
     
-    # Check if there was an error
-    if state.get("error"):
-        # Check if we reached max correction attempts
-        if state.get("correction_attempts", 0) >= MAX_ATTEMPTS:
+    output_file = (state.get("execution_result") or {}).get("output_file")
+    
+    # Check if there was an error (a job stopped early failed even if its last step didn't set one)
+    if state.get("error") or state.get("stop_reason"):
+        # Check if correction stopped early or reached max correction attempts
+        if state.get("stop_reason"):
+            logger.error(f"Workflow stopped early: {state['stop_reason']}")
+            if state.get("error"):
+                logger.error(f"Final error: {state['error'][:200]}...")
+            if state.get("last_valid_code"):
+                logger.info("The last validated code is kept in the final state, but no video was rendered from it")
+        elif state.get("correction_attempts", 0) >= MAX_ATTEMPTS:
             logger.error(f"Workflow ended after {MAX_ATTEMPTS} correction attempts with unresolved error.")
             logger.error(f"Final error: {state['error'][:200]}...")
         else:
             logger.error(f"Workflow ended with error: {state['error'][:200]}...")
+    elif state.get("cached_result"):
+        logger.info(f"Workflow completed from the result cache: {state['cached_result']['video_url']}")
+    elif not output_file:
+        logger.error("Workflow ended without producing a video")
     else:
         # Success case
         logger.info("Workflow completed successfully!")
         
-        # Log output file if available
-        if state.get("execution_result") and state.get("execution_result").get("output_file"):
-            logger.info(f"Output file: {state['execution_result']['output_file']}")
+        if state.get("scene_results"):
+            logger.info(f"Rendered {len(state['scene_results'])} scenes in parallel")
+        
+        logger.info(f"Output file: {output_file}")
+    
+    if state.get("node_timings"):
+        timings = ", ".join(f"{node}={seconds:.1f}s" for node, seconds in state["node_timings"].items())
+        logger.info(f"Time per node: {timings}")
+    
+    if state.get("node_tokens"):
+        tokens = ", ".join(f"{node}={count}" for node, count in state["node_tokens"].items())
+        logger.info(f"LLM tokens per node: {tokens}")
+    
+    # Latency is recorded per tier so quick and standard jobs are tracked separately
+    try:
+        record = record_job_latency(state)
+        if record["total_seconds"] is not None:
+            logger.info(f"Total time ({record['tier']} tier): {record['total_seconds']:.1f}s")
+    except Exception as e:
+        logger.warning(f"Could not record job latency: {str(e)}")
+    
+    # The prompts' artifacts are only kept while the job runs
+    try:
+        cleanup_job_artifacts(state)
+    except Exception as e:
+        logger.warning(f"Could not delete the job's artifacts: {str(e)}")
     
     return state
 
-def create_workflow() -> StateGraph:
-    """Create and return the workflow graph."""
-    workflow = StateGraph(GraphState)
-    
-    # Add nodes
-    workflow.add_node("validate_input", validate_input)
-    workflow.add_node("plan_scenes", plan_scenes)
-    workflow.add_node("generate_code", generate_code)
-    workflow.add_node("validate_code", validate_code)
-    workflow.add_node("execute_code", execute_code)
-    workflow.add_node("correct_code", error_correction)
-    workflow.add_node("log_end", log_workflow_end)
+def can_correct(state: GraphState) -> bool:
+    """Return True if the job may start another correction (it hasn't stopped and one more fits its budget)."""
+    return not state.get("stop_reason") and state.get("correction_attempts", 0) < max_correction_attempts(state)
 
+def _add_code_pipeline(workflow: StateGraph, end: str) -> None:
+    """Add the code nodes (generate, validate, execute, auto-fix, correct) and their edges.
     
-    # Set entry point and basic flow
-    workflow.set_entry_point("validate_input")
+    Args:
+        workflow: The graph to add the nodes to
+        end: Node (or END) the pipeline finishes at
+    """
+    # Add nodes (timed, and stopped once the job's latency budget runs out)
+    workflow.add_node("generate_code", timed_node("generate_code", generate_code))
+    workflow.add_node("validate_code", timed_node("validate_code", validate_code))
+    workflow.add_node("execute_code", timed_node("execute_code", execute_code))
+    workflow.add_node("auto_fix", timed_node("auto_fix", auto_fix_code))
+    workflow.add_node("correct_code", timed_node("correct_code", error_correction))
     
-    # Add conditional edges from input validation
+    # Every step ends the workflow once it has been stopped early (e.g. latency budget spent)
     workflow.add_conditional_edges(
-        "validate_input",
-        lambda state: "plan_scenes" if state.get("validation_status") == "valid" else "log_end",
+        "generate_code",
+        lambda state: "log_end" if state.get("stop_reason") else "validate_code",
         {
-            "plan_scenes": "plan_scenes",
-            "log_end": "log_end"
+            "validate_code": "validate_code",
+            "log_end": end
         }
     )
     
-    workflow.add_edge("plan_scenes", "generate_code")
-    workflow.add_edge("generate_code", "validate_code")
-    
     # Add conditional edges
+    # Errors go through the rule-based auto-fixer first; only unmatched errors reach the LLM
     workflow.add_conditional_edges(
         "validate_code",
-        lambda state: "correct_code" if state.get("error") else "execute_code",
+        lambda state: "log_end" if state.get("stop_reason") else ("auto_fix" if state.get("error") else "execute_code"),
         {
+            "auto_fix": "auto_fix",
+            "execute_code": "execute_code",
+            "log_end": end
+        }
+    )
+    
+    workflow.add_conditional_edges(
+        "auto_fix",
+        lambda state: "log_end" if state.get("stop_reason") else (
+            "validate_code" if state.get("auto_fix_applied") else ("correct_code" if can_correct(state) else "log_end")
+        ),
+        {
+            "validate_code": "validate_code",
             "correct_code": "correct_code",
-            "execute_code": "execute_code"
+            "log_end": end
         }
     )
     
+    # Correction stops early when it starts repeating failed attempts. Whether another
+    # correction fits the budget is checked before it runs (in the auto_fix and
+    # execute_code edges), so a correction that ran is always validated and rendered.
     workflow.add_conditional_edges(
         "correct_code",
-        lambda state: "validate_code" if state["correction_attempts"] < MAX_ATTEMPTS else "log_end",
+        lambda state: "log_end" if state.get("stop_reason") else "validate_code",
         {
             "validate_code": "validate_code",
-            "log_end": "log_end"
+            "log_end": end
         }
     )
     
+    # Environment failures (missing LaTeX, OOM, timeout, ...) can't be fixed by correction
     workflow.add_conditional_edges(
         "execute_code",
-        lambda state: "correct_code" if (state.get("error") and state["correction_attempts"] < MAX_ATTEMPTS) else "log_end",
+        lambda state: "auto_fix" if (
+            state.get("error")
+            and not state.get("failure_category")
+            and can_correct(state)
+        ) else "log_end",
         {
-            "correct_code": "correct_code",
+            "auto_fix": "auto_fix",
+            "log_end": end
+        }
+    )
+
+def create_workflow() -> StateGraph:
+    """Create and return the workflow graph."""
+    workflow = StateGraph(GraphState)
+    
+    # Add nodes (timed, and stopped once the job's latency budget runs out)
+    workflow.add_node("validate_input", timed_node("validate_input", validate_input))
+    workflow.add_node("check_result_cache", timed_node("check_result_cache", check_result_cache))
+    workflow.add_node("plan_scenes", timed_node("plan_scenes", plan_scenes))
+    workflow.add_node("render_scenes", timed_node("render_scenes", render_scenes))
+    workflow.add_node("log_end", log_workflow_end)
+    _add_code_pipeline(workflow, "log_end")
+    
+    # Set entry point and basic flow
+    workflow.set_entry_point("validate_input")
+    
+    # Add conditional edges from input validation
+    workflow.add_conditional_edges(
+        "validate_input",
+        lambda state: "check_result_cache" if state.get("validation_status") == "valid" else "log_end",
+        {
+            "check_result_cache": "check_result_cache",
             "log_end": "log_end"
         }
     )
     
+    # A question answered before (or a near-duplicate of one) is served from the result cache
+    workflow.add_conditional_edges(
+        "check_result_cache",
+        lambda state: "log_end" if (state.get("cached_result") or state.get("stop_reason")) else "plan_scenes",
+        {
+            "plan_scenes": "plan_scenes",
+            "log_end": "log_end"
+        }
+    )
+    
+    # Plans split into several scenes are generated and rendered scene by scene, in parallel
+    workflow.add_conditional_edges(
+        "plan_scenes",
+        lambda state: "log_end" if state.get("stop_reason") else ("render_scenes" if use_multi_scene(state) else "generate_code"),
+        {
+            "generate_code": "generate_code",
+            "render_scenes": "render_scenes",
+            "log_end": "log_end"
+        }
+    )
+    
+    workflow.add_edge("render_scenes", "log_end")
+    
     # Add final logging step before ending
     workflow.add_edge("log_end", END)
     
     return workflow.compile()
 
-# Create the compiled workflow
+def create_scene_workflow() -> StateGraph:
+    """Create and return the code pipeline run for each scene of a multi-scene lesson."""
+    workflow = StateGraph(GraphState)
+    _add_code_pipeline(workflow, END)
+    workflow.set_entry_point("generate_code")
+    return workflow.compile()
+
+# Create the compiled workflows
 workflow = create_workflow()
+scene_workflow = create_scene_workflow()
 
 # Note: For workflow visualization, use the CLI command:
 # python -m leap.main visualize-workflow --output workflow_graph.png
\ No newline at end of file
@@ -0,0 +1,83 @@
+"""
+Compact history of correction attempts.
+
+Every time code fails and is sent to correction, the attempt is recorded as the
+hash of the failing code and the fingerprint of its error. The history is used to
+tell the model which approaches already failed and to detect when the correction
+loop starts oscillating between variants it has already tried.
+"""
+import hashlib
+from typing import Any, Dict, List, Optional
+
+from leap.core.config import MAX_ATTEMPT_HISTORY
+from leap.workflow.errors import distill_error, fingerprint_error
+
+Attempt = Dict[str, Any]
+
+NO_PREVIOUS_ATTEMPTS = "None - this is the first correction attempt."
+
+
+def hash_code(code: str) -> str:
+    """Return a short hash of the code, ignoring trailing whitespace and blank lines."""
+    lines = [line.rstrip() for line in (code or "").strip().split("\n")]
+    normalized = "\n".join(line for line in lines if line)
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def record_attempt(
+    history: Optional[List[Attempt]],
+    code: str,
+    error: str,
+    strategy: Optional[str] = None,
+    summary: Optional[str] = None
+) -> List[Attempt]:
+    """Return the history with a failed attempt appended.
+
+    Args:
+        history: The attempts recorded so far
+        code: The code that failed
+        error: The error it failed with
+        strategy: How the code was produced ("generation", "auto_fix", "patch", "full")
+        summary: Short description of what the attempt changed
+
+    Returns:
+        The new history, capped at the most recent MAX_ATTEMPT_HISTORY entries
+    """
+    attempts = list(history or [])
+    attempts.append({
+        "code_hash": hash_code(code),
+        "error_fingerprint": fingerprint_error(error),
+        "error": distill_error(error)[:200],
+        "strategy": strategy,
+        "summary": (summary or "")[:200] or None
+    })
+    return attempts[-MAX_ATTEMPT_HISTORY:]
+
+
+def find_code_repeat(history: Optional[List[Attempt]], code: str) -> Optional[Attempt]:
+    """Return the earlier attempt that failed with exactly this code, if any."""
+    code_hash = hash_code(code)
+    for attempt in history or []:
+        if attempt["code_hash"] == code_hash:
+            return attempt
+    return None
+
+
+def count_error_repeats(history: Optional[List[Attempt]], error: str) -> int:
+    """Return how many recorded attempts failed with the same error."""
+    fingerprint = fingerprint_error(error)
+    return sum(1 for attempt in history or [] if attempt["error_fingerprint"] == fingerprint)
+
+
+def summarize_attempts(history: Optional[List[Attempt]]) -> str:
+    """Describe the failed attempts for the correction prompt."""
+    if not history:
+        return NO_PREVIOUS_ATTEMPTS
+
+    lines = []
+    for number, attempt in enumerate(history, start=1):
+        line = f"{number}. Failed with: {attempt['error']}"
+        if attempt.get("summary"):
+            line += f" (approach: {attempt['summary']})"
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,80 @@
+"""
+Job latency records, kept separately per generation tier.
+
+At the end of every workflow run the total wall time and the time spent in each
+node are appended to `METRICS_DIR/latency_<tier>.jsonl`, so quick-tier and
+standard jobs can be compared without mixing their distributions.
+"""
+import json
+import math
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from leap.core.config import METRICS_DIR, DEFAULT_TIER
+from leap.workflow.utils import workflow_failure
+
+
+def _latency_file(tier: str, metrics_dir: Optional[Path] = None) -> Path:
+    return Path(metrics_dir or METRICS_DIR) / f"latency_{tier}.jsonl"
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Return the `pct` percentile (0-100) of `values` using nearest-rank, or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def record_job_latency(state: Dict[str, Any], metrics_dir: Optional[Path] = None) -> Dict[str, Any]:
+    """Append the latency of a finished workflow run to its tier's record file.
+
+    Args:
+        state: The final workflow state
+        metrics_dir: Directory for the record files (defaults to METRICS_DIR)
+
+    Returns:
+        The record that was written
+    """
+    tier = state.get("tier") or DEFAULT_TIER
+    started_at = state.get("started_at")
+    record = {
+        "timestamp": time.time(),
+        "tier": tier,
+        "total_seconds": round(time.time() - started_at, 3) if started_at else None,
+        "node_timings": state.get("node_timings") or {},
+        "node_tokens": state.get("node_tokens") or {},
+        "success": workflow_failure(state) is None,
+        "correction_attempts": state.get("correction_attempts", 0),
+        "stop_reason": state.get("stop_reason")
+    }
+
+    path = _latency_file(tier, metrics_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+    return record
+
+
+def summarize_latency(tier: str, metrics_dir: Optional[Path] = None) -> Dict[str, Any]:
+    """Summarize the recorded job latencies of a tier.
+
+    Returns:
+        Job count, success rate and p50/p95 of the total job time
+    """
+    path = _latency_file(tier, metrics_dir)
+    records = []
+    if path.exists():
+        with open(path) as f:
+            records = [json.loads(line) for line in f if line.strip()]
+
+    totals = [r["total_seconds"] for r in records if r.get("total_seconds") is not None]
+    return {
+        "tier": tier,
+        "jobs": len(records),
+        "success_rate": sum(1 for r in records if r.get("success")) / len(records) if records else 0.0,
+        "p50_seconds": percentile(totals, 50),
+        "p95_seconds": percentile(totals, 95)
+    }
@@ -0,0 +1,85 @@
+"""
+Bookkeeping between the workflow and the learned fix cache.
+
+Fixes are kept in `state["pending_fixes"]` until the job renders successfully.
+A pending fix whose error shows up again didn't work and is discarded (and, if it
+was replayed from the cache, counted as a failure).
+"""
+from typing import Any, Dict, List, Optional
+
+from leap.core.config import FIX_CACHE_ENABLED
+from leap.services.fix_cache_service import FixCacheService, compute_fix_hunks
+from leap.workflow.errors import distill_error, fingerprint_error
+
+
+def get_fix_cache(fix_cache: Optional[FixCacheService] = None) -> Optional[FixCacheService]:
+    """Return the given cache, a new one, or None when the cache is disabled."""
+    if fix_cache is not None:
+        return fix_cache
+    return FixCacheService() if FIX_CACHE_ENABLED else None
+
+
+def remember_fix(
+    state: Dict[str, Any],
+    error: str,
+    before: str,
+    after: str,
+    fix_id: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Return the pending fixes with the change from `before` to `after` added.
+
+    Args:
+        state: The current workflow state
+        error: The error the change is meant to fix
+        before: The failing code
+        after: The corrected code
+        fix_id: Id of the cached fix when the change was replayed from the cache
+    """
+    pending = list(state.get("pending_fixes") or [])
+    if not error or not before or not after or before == after:
+        return pending
+    pending.append({
+        "fingerprint": fingerprint_error(error),
+        "error": distill_error(error)[:500],
+        "hunks": compute_fix_hunks(before, after),
+        "fix_id": fix_id
+    })
+    return pending
+
+
+def discard_failed_fixes(
+    state: Dict[str, Any],
+    error: str,
+    fix_cache: Optional[FixCacheService] = None
+) -> List[Dict[str, Any]]:
+    """Drop pending fixes for an error that occurred again.
+
+    Returns:
+        The remaining pending fixes
+    """
+    fingerprint = fingerprint_error(error)
+    remaining = []
+    for fix in state.get("pending_fixes") or []:
+        if fix["fingerprint"] != fingerprint:
+            remaining.append(fix)
+        elif fix.get("fix_id") is not None and fix_cache is not None:
+            fix_cache.record_outcome(fix["fix_id"], success=False)
+    return remaining
+
+
+def commit_fixes(state: Dict[str, Any], fix_cache: Optional[FixCacheService] = None) -> int:
+    """Store all pending fixes after a successful render.
+
+    Returns:
+        The number of fixes stored or confirmed
+    """
+    if fix_cache is None:
+        return 0
+    committed = 0
+    for fix in state.get("pending_fixes") or []:
+        if fix.get("fix_id") is not None:
+            fix_cache.record_outcome(fix["fix_id"], success=True)
+            committed += 1
+        elif fix_cache.record_fix(fix["fingerprint"], fix["error"], fix["hunks"]) is not None:
+            committed += 1
+    return committed
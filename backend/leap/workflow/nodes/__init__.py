@@ -5,6 +5,9 @@ from leap.workflow.nodes.generation import generate_code as _generate_code
 from leap.workflow.nodes.validation import validate_code as _validate_code
 from leap.workflow.nodes.execution import execute_code as _execute_code
 from leap.workflow.nodes.correction import error_correction as _error_correction
+from leap.workflow.nodes.auto_fix import auto_fix_code as _auto_fix_code
+from leap.workflow.nodes.result_cache import check_result_cache as _check_result_cache
+from leap.workflow.nodes.scenes import render_scenes as _render_scenes
 
 # Apply traceable decorator to all node functions
 validate_input = traceable(name="validate_input", tags=["input_validation"])(_validate_input)
@@ -13,6 +16,9 @@ generate_code = traceable(name="generate_code", tags=["generation"])(_generate_c
 validate_code = traceable(name="validate_code", tags=["validation"])(_validate_code)
 execute_code = traceable(name="execute_code", tags=["execution"])(_execute_code)
 error_correction = traceable(name="error_correction", tags=["correction"])(_error_correction)
+auto_fix_code = traceable(name="auto_fix_code", tags=["correction", "auto_fix"])(_auto_fix_code)
+check_result_cache = traceable(name="check_result_cache", tags=["cache"])(_check_result_cache)
+render_scenes = traceable(name="render_scenes", tags=["generation", "execution"])(_render_scenes)
 
 __all__ = [
     "validate_input",
@@ -20,5 +26,8 @@ __all__ = [
     "generate_code",
     "validate_code",
     "execute_code",
-    "error_correction"
+    "error_correction",
+    "auto_fix_code",
+    "check_result_cache",
+    "render_scenes"
 ]
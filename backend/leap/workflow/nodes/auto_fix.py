@@ -0,0 +1,113 @@
+"""
+Rule-based auto-fix node for the workflow.
+
+Runs ahead of the LLM correction step. It first replays fixes learned from
+earlier successful corrections, then tries the deterministic rules, and only
+escalates to the LLM when neither changes the code.
+"""
+from typing import Dict, Any, Optional
+
+from leap.workflow.state import GraphState
+from leap.core.logging import setup_question_logger
+from leap.core.config import MAX_AUTO_FIX_ATTEMPTS
+from leap.services import FileService, FixCacheService, CacheService
+from leap.workflow.autofix import apply_auto_fixes
+from leap.workflow.errors import fingerprint_error
+from leap.workflow.learned_fixes import get_fix_cache, remember_fix, discard_failed_fixes
+from leap.workflow.stage_cache import get_stage_cache, discard_stage_result
+
+
+def auto_fix_code(
+    state: GraphState,
+    config: Optional[Dict[str, Any]] = None,
+    file_service: Optional[FileService] = None,
+    fix_cache: Optional[FixCacheService] = None,
+    stage_cache: Optional[CacheService] = None,
+    **kwargs
+) -> GraphState:
+    """Try to fix the current error with cached or rule-based fixes before calling the LLM.
+
+    Args:
+        state: The current workflow state
+        config: Optional configuration parameters
+        file_service: Optional file service for dependency injection
+        fix_cache: Optional fix cache for dependency injection
+        stage_cache: Optional stage cache for dependency injection
+
+    Returns:
+        The updated workflow state. `auto_fix_applied` tells the graph whether the
+        code was changed (re-validate) or the error must go to LLM correction.
+    """
+    logger = setup_question_logger(state["user_input"])
+
+    code = state.get("generated_code")
+    error = state.get("error")
+    attempts = state.get("auto_fix_attempts", 0)
+
+    if not code or not error:
+        return {**state, "auto_fix_applied": False}
+    
+    # The generated code is broken, don't serve it to later requests from the stage cache
+    if (state.get("stage_cache_keys") or {}).get("generate_code"):
+        try:
+            state = {**state, "stage_cache_keys": discard_stage_result(state, "generate_code", get_stage_cache(stage_cache))}
+        except Exception as e:
+            logger.warning(f"Could not discard cached code: {str(e)}")
+
+    try:
+        fix_cache = get_fix_cache(fix_cache)
+        pending_fixes = discard_failed_fixes(state, error, fix_cache)
+    except Exception as e:
+        logger.warning(f"Fix cache unavailable: {str(e)}")
+        fix_cache = None
+        pending_fixes = list(state.get("pending_fixes") or [])
+
+    if attempts >= MAX_AUTO_FIX_ATTEMPTS:
+        logger.info(f"Auto-fix limit ({MAX_AUTO_FIX_ATTEMPTS}) reached, escalating to LLM correction")
+        return {**state, "auto_fix_applied": False, "pending_fixes": pending_fixes}
+
+    fixed_code = None
+    summary = None
+
+    # Replay a fix learned from an earlier successful correction
+    if fix_cache is not None:
+        try:
+            cached = fix_cache.lookup(fingerprint_error(error), code)
+            if cached:
+                fix_id, fixed_code = cached
+                logger.info(f"Replaying cached fix #{fix_id} for this error")
+                summary = f"cached fix #{fix_id}"
+                pending_fixes = remember_fix(
+                    {"pending_fixes": pending_fixes}, error, code, fixed_code, fix_id=fix_id
+                )
+        except Exception as e:
+            logger.warning(f"Fix cache lookup failed: {str(e)}")
+
+    if fixed_code is None:
+        try:
+            fixed_code, applied_rules = apply_auto_fixes(code, error)
+        except Exception as e:
+            logger.warning(f"Auto-fix failed, escalating to LLM correction: {str(e)}")
+            applied_rules = []
+
+        if not applied_rules:
+            logger.info("No auto-fix rule matched the error, escalating to LLM correction")
+            return {**state, "auto_fix_applied": False, "pending_fixes": pending_fixes}
+
+        logger.info(f"Auto-fix applied rules: {', '.join(applied_rules)}")
+        summary = ", ".join(applied_rules)
+
+    file_service = file_service or FileService()
+    file_path = file_service.save_generated_code(fixed_code, state["user_input"])
+    logger.info(f"Auto-fixed code saved to: {file_path}")
+
+    return {
+        **state,
+        "generated_code": fixed_code,
+        "error": None,
+        "execution_result": None,
+        "auto_fix_applied": True,
+        "auto_fix_attempts": attempts + 1,
+        "pending_fixes": pending_fixes,
+        "last_correction": {"strategy": "auto_fix", "summary": summary}
+    }
@@ -1,13 +1,101 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple, Union
 
 from leap.workflow.state import GraphState
 from leap.core.logging import setup_question_logger
-from leap.models import ManimCodeResponse
+from leap.models import CHECK_CODE_CONTEXT, ManimCodeResponse, CodePatchResponse
 from leap.services import LLMService, FileService
-from leap.core.config import  MAX_ATTEMPTS
-from leap.prompts import ERROR_CORRECTION_PROMPTS
+from leap.core.config import  MAX_ATTEMPTS, CORRECTION_MODE, MAX_ERROR_REPEATS, PROMPT_TOKEN_BUDGETS
+from leap.prompts import ERROR_CORRECTION_PROMPTS, ERROR_CORRECTION_PATCH_PROMPTS
 from leap.prompts.base import PromptVersion
-from leap.workflow.utils import get_manim_api_context
+from leap.workflow.utils import get_manim_api_context, get_api_reference
+from leap.workflow.patching import PatchError, apply_code_edits, number_code_lines
+from leap.workflow.learned_fixes import remember_fix
+from leap.workflow.budget import select_route, job_priority
+from leap.workflow.artifacts import record_prompt
+from leap.workflow.history import record_attempt, find_code_repeat, count_error_repeats, summarize_attempts
+
+
+def _correct_with_patch(
+    state: GraphState,
+    error_msg: str,
+    manim_api_context: str,
+    previous_attempts: str,
+    llm_service: LLMService,
+    logger
+) -> Tuple[CodePatchResponse, str]:
+    """Ask the model for line edits and apply them to the current code.
+    
+    Raises:
+        PatchError: If the returned edits don't apply cleanly
+    """
+    prompt_template = ERROR_CORRECTION_PATCH_PROMPTS.get(PromptVersion.PRODUCTION)
+    params = {
+        "error": error_msg,
+        "numbered_code": number_code_lines(state["generated_code"]),
+        "plan": state["plan"],
+        "manim_api_context": manim_api_context,
+        "api_reference": get_api_reference(code=state["generated_code"], error=error_msg),
+        "previous_attempts": previous_attempts
+    }
+    formatted_prompt = prompt_template.format(token_budget=PROMPT_TOKEN_BUDGETS.get("correct_code"), **params)
+    
+    # Record the prompt as sent in the state for tracing
+    state["prompts"] = record_prompt(
+        state, "correction", "error_correction_patch", PromptVersion.PRODUCTION, formatted_prompt.params,
+        tokens=formatted_prompt.tokens
+    )
+    
+    logger.info("Generating code edits...")
+    response = llm_service.generate_structured_response(
+        system_content=formatted_prompt["system"],
+        user_content=formatted_prompt["user"],
+        response_model=CodePatchResponse
+    )
+    
+    patched_code = apply_code_edits(state["generated_code"], response.edits)
+    logger.info(f"Applied {len(response.edits)} edit(s) to the code")
+    return response, patched_code
+
+
+def _correct_with_full_regeneration(
+    state: GraphState,
+    error_msg: str,
+    manim_api_context: str,
+    previous_attempts: str,
+    llm_service: LLMService,
+    logger
+) -> Tuple[ManimCodeResponse, str]:
+    """Ask the model for the complete corrected code."""
+    # Get the prompt template (using production version by default)
+    prompt_template = ERROR_CORRECTION_PROMPTS.get(PromptVersion.PRODUCTION)
+    
+    # Format the prompt with our parameters
+    params = {
+        "error": error_msg,
+        "generated_code": state["generated_code"],
+        "plan": state["plan"],
+        "manim_api_context": manim_api_context,
+        "api_reference": get_api_reference(code=state["generated_code"], error=error_msg),
+        "previous_attempts": previous_attempts
+    }
+    formatted_prompt = prompt_template.format(token_budget=PROMPT_TOKEN_BUDGETS.get("correct_code"), **params)
+    
+    # Record the prompt as sent in the state for tracing
+    state["prompts"] = record_prompt(
+        state, "correction", "error_correction", PromptVersion.PRODUCTION, formatted_prompt.params,
+        tokens=formatted_prompt.tokens
+    )
+    
+    # Generate the corrected code with structured output
+    logger.info("Generating corrected code...")
+    
+    # Use the LLM service to generate the corrected code
+    response = llm_service.generate_structured_response(
+        system_content=formatted_prompt["system"],
+        user_content=formatted_prompt["user"],
+        response_model=ManimCodeResponse
+    )
+    return response, response.code
 
 
 def error_correction(
@@ -46,41 +134,81 @@ def error_correction(
     if current_attempts >= MAX_ATTEMPTS - 1:
         logger.warning(f"This is the final correction attempt (maximum is {MAX_ATTEMPTS}).")
     
+    # Record the failed attempt so the model sees what was already tried
+    last_correction = state.get("last_correction") or {}
+    attempt_history = record_attempt(
+        state.get("attempt_history"),
+        state.get("generated_code"),
+        error_msg,
+        strategy=last_correction.get("strategy", "generation"),
+        summary=last_correction.get("summary")
+    )
+    error_repeats = count_error_repeats(attempt_history, error_msg)
+    
+    # The same error keeps coming back: further attempts are unlikely to help
+    if error_repeats >= MAX_ERROR_REPEATS:
+        stop_reason = f"The same error occurred {error_repeats} times, stopping correction early"
+        logger.warning(stop_reason)
+        return {
+            **state,
+            "attempt_history": attempt_history,
+            "stop_reason": stop_reason
+        }
+    
+    previous_attempts = summarize_attempts(attempt_history[:-1])
     manim_api_context = get_manim_api_context()
     
-    # Use provided services or create new ones
-    llm_service = llm_service or LLMService()
+    # Use provided services or create new ones (checking the corrected code as it's parsed, so the
+    # model fixes what the static rules find, or edits that don't apply, in the same call)
+    llm_service = llm_service or LLMService(
+        **select_route(state, "correct_code"),
+        priority=job_priority(state),
+        validation_context={**CHECK_CODE_CONTEXT, "original_code": state.get("generated_code")}
+    )
     file_service = file_service or FileService()
     
     try:
-        # Get the prompt template (using production version by default)
-        prompt_template = ERROR_CORRECTION_PROMPTS.get(PromptVersion.PRODUCTION)
-        
-        # Format the prompt with our parameters
-        formatted_prompt = prompt_template.format(
-            error=error_msg,
-            generated_code=state["generated_code"],
-            plan=state["plan"],
-            manim_api_context=manim_api_context
-        )
+        response: Optional[Union[CodePatchResponse, ManimCodeResponse]] = None
+        corrected_code = None
+        strategy = "full"
         
-        # Store the prompts in the state for tracing
-        if "prompts" not in state:
-            state["prompts"] = {}
-        state["prompts"]["correction"] = {
-            "system": formatted_prompt["system"],
-            "user": formatted_prompt["user"]
-        }
-        
-        # Generate the corrected code with structured output
-        logger.info("Generating corrected code...")
+        # Prefer small edits over a full rewrite; fall back if they don't apply.
+        # If the error survived an earlier fix, small edits aren't working: rewrite instead.
+        if CORRECTION_MODE == "patch" and state.get("generated_code") and error_repeats < 2:
+            try:
+                response, corrected_code = _correct_with_patch(
+                    state, error_msg, manim_api_context, previous_attempts, llm_service, logger
+                )
+                strategy = "patch"
+            except PatchError as e:
+                logger.warning(f"Patch could not be applied, falling back to full regeneration: {str(e)}")
+            except Exception as e:
+                logger.warning(f"Patch correction failed, falling back to full regeneration: {str(e)}")
+            
+            repeat = find_code_repeat(attempt_history, corrected_code) if corrected_code is not None else None
+            if repeat:
+                logger.warning(f"Patched code repeats a failed attempt ({repeat['error']}), falling back to full regeneration")
+                response, corrected_code = None, None
+        elif error_repeats >= 2:
+            logger.info(f"Error occurred {error_repeats} times, switching to full regeneration")
         
-        # Use the LLM service to generate the corrected code
-        response = llm_service.generate_structured_response(
-            system_content=formatted_prompt["system"],
-            user_content=formatted_prompt["user"],
-            response_model=ManimCodeResponse
-        )
+        if corrected_code is None:
+            response, corrected_code = _correct_with_full_regeneration(
+                state, error_msg, manim_api_context, previous_attempts, llm_service, logger
+            )
+            strategy = "full"
+            
+            # Rendering code that already failed would only reproduce the failure
+            repeat = find_code_repeat(attempt_history, corrected_code)
+            if repeat:
+                stop_reason = f"Correction repeated code that already failed with: {repeat['error']}"
+                logger.warning(f"{stop_reason}, stopping correction early")
+                return {
+                    **state,
+                    "correction_attempts": state.get("correction_attempts", 0) + 1,
+                    "attempt_history": attempt_history,
+                    "stop_reason": stop_reason
+                }
         
         # Log the corrected code and explanation
         if response.explanation:
@@ -94,18 +222,18 @@ def error_correction(
             logger.info(f"Errors fixed: {', '.join(response.error_fixes[:5])}" + 
                        (f" and {len(response.error_fixes) - 5} more..." if len(response.error_fixes) > 5 else ""))
         
-        if response.validation_checks:
+        if getattr(response, "validation_checks", None):
             logger.info(f"Validation checks performed: {len(response.validation_checks)}")
         
         # Save the corrected code to a file
-        file_path = file_service.save_generated_code(response.code, state["user_input"])
+        file_path = file_service.save_generated_code(corrected_code, state["user_input"])
         logger.info(f"Corrected code saved to: {file_path}")
         
         # Create a new state with the corrected code
         new_state = GraphState(
             user_input=state["user_input"],
             plan=state["plan"],
-            generated_code=response.code,
+            generated_code=corrected_code,
             execution_result=None,
             error=None,
             correction_attempts=state.get("correction_attempts", 0) + 1,
@@ -113,7 +241,14 @@ def error_correction(
             duration_detail="detailed",  # Changed from short
             user_level=state.get("user_level", "normal"),
             voice_model=state.get("voice_model", "nova"),
-            email=state.get("email")
+            email=state.get("email"),
+            # Remember the fix so it can be cached if the code renders
+            pending_fixes=remember_fix(state, error_msg, state.get("generated_code"), corrected_code),
+            attempt_history=attempt_history,
+            last_correction={
+                "strategy": strategy,
+                "summary": "; ".join(response.error_fixes or []) or response.explanation
+            }
         )
         
         # Check if this was the last allowed attempt
@@ -144,5 +279,6 @@ def error_correction(
             duration_detail="detailed",  # Changed from short
             user_level=state.get("user_level", "normal"),
             voice_model=state.get("voice_model", "nova"),
-            email=state.get("email")
+            email=state.get("email"),
+            attempt_history=attempt_history
         ) 
\ No newline at end of file
@@ -1,14 +1,33 @@
 from typing import Optional
 from leap.workflow.state import GraphState
 from leap.core.logging import setup_question_logger
-from leap.services import FileService, ManimService
+from leap.services import FileService, ManimService, FixCacheService
 from leap.core.config import MAX_ATTEMPTS
+from leap.workflow.learned_fixes import get_fix_cache, commit_fixes
+from leap.workflow.errors import classify_error, describe_failure_category
+from leap.workflow.budget import (
+    select_rendering_quality,
+    select_tts_model,
+    lower_rendering_quality,
+    render_timeout,
+    is_budget_exhausted,
+)
+
+
+def _mark_unrecoverable(state: GraphState, error: str, returncode: Optional[int], logger) -> None:
+    """Flag environment failures that no code correction can fix."""
+    category = classify_error(error, returncode)
+    if category:
+        state["failure_category"] = category
+        state["stop_reason"] = f"Unrecoverable {category} error: {describe_failure_category(category)}"
+        logger.error(f"{state['stop_reason']}, skipping correction")
 
 
 def execute_code(
     state: GraphState, 
     file_service: Optional[FileService] = None,
-    manim_service: Optional[ManimService] = None
+    manim_service: Optional[ManimService] = None,
+    fix_cache: Optional[FixCacheService] = None
 ) -> GraphState:
     """Execute the generated Manim code and return the result.
     
@@ -16,6 +35,7 @@ def execute_code(
         state: The current workflow state
         file_service: Optional file service for dependency injection
         manim_service: Optional Manim service for dependency injection
+        fix_cache: Optional fix cache for dependency injection
         
     Returns:
         The updated workflow state
@@ -42,21 +62,46 @@ def execute_code(
             }
             return state
             
-        # Get rendering quality from state
-        rendering_quality = state.get("rendering_quality", "low")
+        # Get rendering quality from state, lowered if it wouldn't fit the latency budget
+        rendering_quality = select_rendering_quality(state)
+        if rendering_quality != state.get("rendering_quality", "low"):
+            logger.info("Lowering rendering quality to fit the latency budget")
         logger.info(f"Using rendering quality: {rendering_quality}")
+        tts_model = select_tts_model(state)
         
         # Get voice model from state
         voice_model = state.get("voice_model", "nova")
         logger.info(f"Using voice model: {voice_model}")
         
         # Save the generated code to a file
-        file_path = file_service.save_generated_code(code, state["user_input"])
+        scene = state.get("scene")
+        file_path = file_service.save_generated_code(
+            code, state["user_input"], suffix=f"scene_{scene['index'] + 1}" if scene else None
+        )
         logger.info(f"Generated code saved to: {file_path}")
         
         # Execute the Manim code
         logger.info("Starting Manim execution...")
-        execution_result = manim_service.execute_manim_code(file_path, rendering_quality)
+        execution_result = manim_service.execute_manim_code(
+            file_path, rendering_quality, tts_model=tts_model, timeout=render_timeout(state, rendering_quality)
+        )
+        
+        # A render that timed out may fit at a lower quality; only the lowest one timing out is fatal
+        while (
+            not execution_result["success"]
+            and classify_error(execution_result.get("error"), execution_result.get("returncode")) == "timeout"
+            and lower_rendering_quality(rendering_quality)
+            and not is_budget_exhausted(state)
+        ):
+            lower = lower_rendering_quality(rendering_quality)
+            logger.warning(f"Render timed out at {rendering_quality} quality, retrying at {lower} quality")
+            rendering_quality = lower
+            execution_result = manim_service.execute_manim_code(
+                file_path, rendering_quality, tts_model=tts_model, timeout=render_timeout(state, rendering_quality)
+            )
+        
+        # The quality the video was rendered at (multi-scene lessons join clips of one quality)
+        execution_result["quality"] = rendering_quality
         
         # Update the state with the execution result
         if execution_result["success"]:
@@ -64,6 +109,15 @@ def execute_code(
             logger.info(f"Execution completed successfully. Output file: {output_file}")
             state["execution_result"] = execution_result
             state["error"] = None
+            
+            # The fixes that got us here worked, add them to the fix cache
+            if state.get("pending_fixes"):
+                try:
+                    committed = commit_fixes(state, get_fix_cache(fix_cache))
+                    logger.info(f"Recorded {committed} successful fix(es) in the fix cache")
+                except Exception as e:
+                    logger.warning(f"Could not record fixes in the fix cache: {str(e)}")
+                state["pending_fixes"] = []
         else:
             error = execution_result.get("error", "Unknown error")
             # Don't truncate error messages anymore to preserve important details
@@ -77,6 +131,7 @@ def execute_code(
             
             state["execution_result"] = execution_result
             state["error"] = f"Error executing code: {error}"
+            _mark_unrecoverable(state, error, execution_result.get("returncode"), logger)
         
     except Exception as e:
         logger.error(f"Error executing code: {str(e)}", exc_info=True)
@@ -95,5 +150,6 @@ def execute_code(
             "error": str(e),
             "output_file": None
         }
+        _mark_unrecoverable(state, str(e), None, logger)
     
     return state 
\ No newline at end of file
@@ -2,12 +2,17 @@ import re
 from typing import Dict, Any, Optional
 
 # from leap.workflow.state import GraphState
+from leap.core.config import CODE_STREAMING_MAX_RESTARTS, PROMPT_TOKEN_BUDGETS
 from leap.core.logging import setup_question_logger
-from leap.models import ManimCodeResponse
-from leap.services import LLMService
-from leap.workflow.utils import log_state_transition, get_manim_api_context
-from leap.prompts import CODE_GENERATION_PROMPTS
+from leap.models import CHECK_CODE_CONTEXT, ManimCodeResponse
+from leap.services import LLMService, CacheService
+from leap.workflow.utils import log_state_transition, get_api_reference
+from leap.prompts import CODE_GENERATION_PROMPTS, QUICK_CODE_GENERATION_PROMPTS, DURATION_INSTRUCTIONS, SCENE_DURATION_INSTRUCTION
 from leap.prompts.base import PromptVersion
+from leap.workflow.budget import select_route, is_quick_tier, job_priority
+from leap.workflow.stage_cache import get_stage_cache, generate_with_stage_cache, remember_stage_key
+from leap.workflow.artifacts import record_prompt
+from leap.workflow.streaming import get_code_stream_check
 
 def read_gcf_example() -> str:
     """Read the GCF example from templates."""
@@ -57,23 +62,31 @@ def _sanitize_generated_code(code: str) -> str:
 
 def generate_code(
     state: Dict[str, Any],
-    llm_service: Optional[LLMService] = None
+    llm_service: Optional[LLMService] = None,
+    stage_cache: Optional[CacheService] = None
 ) -> Dict[str, Any]:
     """Generate Manim code based on the plan using structured output.
     
     Args:
         state: The current workflow state
         llm_service: Optional LLM service for dependency injection
+        stage_cache: Optional stage cache for dependency injection
         
     Returns:
         The updated workflow state
     """
     logger = setup_question_logger(state["user_input"])
     logger.info("Generating Manim code from plan")
-    api_context = get_manim_api_context()
     
-    # Use provided service or create a new one
-    llm_service = llm_service or LLMService()
+    # Use provided service or create a new one (streaming, so a generation going wrong is restarted early,
+    # and checking the code as it's parsed, so the model fixes what the static rules find in the same call)
+    llm_service = llm_service or LLMService(
+        **select_route(state, "generate_code"),
+        priority=job_priority(state),
+        partial_check=get_code_stream_check(state, logger),
+        stream_restarts=CODE_STREAMING_MAX_RESTARTS,
+        validation_context=CHECK_CODE_CONTEXT
+    )
     
     try:
         # Get user level from state
@@ -88,8 +101,14 @@ def generate_code(
         else:  # normal
             user_level_instruction = "The explanation should be suitable for a high school/early college student. You can use appropriate terminology but still make it accessible."
         
-        # Add duration instruction
-        duration_instruction = "The video should be at least 4 minutes long. Elaborate on the concepts and provide detailed explanations and examples."
+        # Add duration instruction (the length chosen when planning, or the scene's own length)
+        scene = state.get("scene")
+        if scene:
+            duration_instruction = SCENE_DURATION_INSTRUCTION.format(
+                index=scene["index"] + 1, count=scene["count"], seconds=scene["target_seconds"]
+            )
+        else:
+            duration_instruction = DURATION_INSTRUCTIONS[state.get("video_length") or "long"]
         
         # Get example code for one-shot learning
         example_code = read_gcf_example()
@@ -170,30 +189,33 @@ class SCENE_NAME(ManimVoiceoverBase): # Or use ThreeDScene if 3D visuals are app
         self.fade_out_scene()
 """
         
-        # Format the prompt with our parameters
-        formatted_prompt = CODE_GENERATION_PROMPTS.get(PromptVersion.PRODUCTION).format(
-            user_input=state["user_input"],
-            plan=state["plan"],
-            user_level_instruction=user_level_instruction,
-            duration_instruction=duration_instruction,
-            code_template=code_template,
-            example_code=example_code
+        # Format the prompt with our parameters (the quick tier has its own, shorter prompt)
+        template = "quick_code_generation" if is_quick_tier(state) else "code_generation"
+        prompts = QUICK_CODE_GENERATION_PROMPTS if is_quick_tier(state) else CODE_GENERATION_PROMPTS
+        params = {
+            "user_input": state["user_input"],
+            "plan": state["plan"],
+            "user_level_instruction": user_level_instruction,
+            "duration_instruction": duration_instruction,
+            "code_template": code_template,
+            "example_code": example_code,
+            "api_reference": get_api_reference(plan=f"{state['user_input']}\n{state['plan']}")
+        }
+        formatted_prompt = prompts.get(PromptVersion.PRODUCTION).format(
+            token_budget=PROMPT_TOKEN_BUDGETS.get("generate_code"), **params
         )
         
-        # Store the prompts in the state for tracing
-        if "prompts" not in state:
-            state["prompts"] = {}
-        state["prompts"]["generation"] = {
-            "system": formatted_prompt["system"],
-            "user": formatted_prompt["user"]
-        }
+        # Record the prompt as sent in the state for tracing (large parameters as artifact references)
+        state["prompts"] = record_prompt(
+            state, "generation", template, PromptVersion.PRODUCTION, formatted_prompt.params,
+            tokens=formatted_prompt.tokens
+        )
         
         # Generate the code with structured output
         logger.info("Generating code with Instructor...")
-        response = llm_service.generate_structured_response(
-            system_content=formatted_prompt["system"],
-            user_content=formatted_prompt["user"],
-            response_model=ManimCodeResponse
+        response, cache_key = generate_with_stage_cache(
+            "generate_code", llm_service, formatted_prompt, ManimCodeResponse,
+            stage_cache=get_stage_cache(stage_cache), logger=logger
         )
         
         # Sanitize the generated code
@@ -207,7 +229,8 @@ class SCENE_NAME(ManimVoiceoverBase): # Or use ThreeDScene if 3D visuals are app
         output_state = {
             **state, 
             "generated_code": sanitized_code,
-            "correction_attempts": 0
+            "correction_attempts": 0,
+            "stage_cache_keys": remember_stage_key(state, "generate_code", cache_key)
         }
         
         # Log explanation if provided
@@ -7,8 +7,10 @@ from typing import Dict, Any, Optional, List
 import re
 from leap.workflow.state import GraphState
 from leap.core.logging import setup_question_logger
-from leap.services.llm_service import LLMService
+from leap.services.llm_service import LLMService, get_response_cache
 from leap.models import ValidationResult
+from leap.workflow.budget import select_route, job_priority
+from leap.workflow.artifacts import record_prompt, INLINE_TEMPLATE
 
 
 def validate_input(state: GraphState, llm_service: Optional[LLMService] = None, **kwargs) -> GraphState:
@@ -51,8 +53,10 @@ def validate_input(state: GraphState, llm_service: Optional[LLMService] = None,
             validation_status="invalid"
         )
 
-    # Use provided service or create a new one
-    llm_service = llm_service or LLMService()
+    # Use provided service or create a new one (repeated inputs reuse the earlier classification)
+    llm_service = llm_service or LLMService(
+        **select_route(state, "validate_input"), priority=job_priority(state), response_cache=get_response_cache()
+    )
     
     logger.info("Using LLM to validate input")
     
@@ -90,13 +94,11 @@ def validate_input(state: GraphState, llm_service: Optional[LLMService] = None,
     - reformulated_question: A clearer, more specific version of the user's question
     """
     
-    # Store the prompts in the state for tracing
-    if "prompts" not in state:
-        state["prompts"] = {}
-    state["prompts"]["input_validation"] = {
+    # Record the prompt in the state for tracing
+    state["prompts"] = record_prompt(state, "input_validation", INLINE_TEMPLATE, None, {
         "system": "You are evaluating whether a user's input is suitable for generating an educational animation.",
         "user": prompt
-    }
+    })
     
     try:
         # Use the structured response instead of chat
@@ -4,20 +4,28 @@ from langsmith import traceable
 from leap.workflow.state import GraphState
 from leap.core.logging import setup_question_logger
 from leap.models import ScenePlanResponse
-from leap.services import LLMService
-from leap.prompts import SCENE_PLANNING_PROMPTS
+from leap.services import LLMService, CacheService
+from leap.prompts import SCENE_PLANNING_PROMPTS, QUICK_SCENE_PLANNING_PROMPTS, DURATION_INSTRUCTIONS
 from leap.prompts.base import PromptVersion
+from leap.workflow.budget import select_route, select_video_length, job_priority
+from leap.workflow.stage_cache import get_stage_cache, generate_with_stage_cache, remember_stage_key
+from leap.workflow.artifacts import record_prompt
 
 
 
 # Each scene should have clear objectives and specific animation notes."""
 
-def plan_scenes(state: GraphState, llm_service: Optional[LLMService] = None) -> GraphState:
+def plan_scenes(
+    state: GraphState,
+    llm_service: Optional[LLMService] = None,
+    stage_cache: Optional[CacheService] = None
+) -> GraphState:
     """Plan the scenes based on user input.
     
     Args:
         state: The current workflow state
         llm_service: Optional LLM service for dependency injection
+        stage_cache: Optional stage cache for dependency injection
         
     Returns:
         The updated workflow state
@@ -26,7 +34,7 @@ def plan_scenes(state: GraphState, llm_service: Optional[LLMService] = None) ->
     logger.info(f"Planning scenes for input: {state['user_input']}")
     
     # Use provided service or create a new one
-    llm_service = llm_service or LLMService()
+    llm_service = llm_service or LLMService(**select_route(state, "plan_scenes"), priority=job_priority(state))
     
     try:
         # Get user level from state
@@ -41,8 +49,9 @@ def plan_scenes(state: GraphState, llm_service: Optional[LLMService] = None) ->
         else:  # normal
             user_level_instruction = "Explain this concept at a high school/early college level. You can use appropriate terminology but still make it accessible."
         
-        # Fixed duration instruction for initial release
-        duration_instruction = "The video should be at least 4 minutes long. Elaborate on the concepts and provide detailed explanations and examples."
+        # Plan a quick-tier video, or a shorter one when the job's latency budget doesn't allow a long one
+        video_length = select_video_length(state)
+        duration_instruction = DURATION_INSTRUCTIONS[video_length]
         
         logger.info(f"Generating scene plan with user level: {user_level}")
         
@@ -50,29 +59,34 @@ def plan_scenes(state: GraphState, llm_service: Optional[LLMService] = None) ->
         input_for_planning = state.get("reformulated_input") or state["user_input"]
         logger.info(f"Using {'reformulated' if 'reformulated_input' in state else 'original'} input for planning: {input_for_planning}")
         
-        # Get the prompt template (using production version by default)
-        prompt_template = SCENE_PLANNING_PROMPTS.get(PromptVersion.PRODUCTION)
+        # Get the prompt template (using production version by default). The production
+        # prompt asks for a long video, short videos use the length-neutral V1 prompt
+        # and the quick tier has its own prompts.
+        if video_length == "quick":
+            template, version = "quick_scene_planning", PromptVersion.PRODUCTION
+            prompt_template = QUICK_SCENE_PLANNING_PROMPTS.get(version)
+        elif video_length == "short":
+            template, version = "scene_planning", PromptVersion.V1
+            prompt_template = SCENE_PLANNING_PROMPTS.get(version)
+        else:
+            template, version = "scene_planning", PromptVersion.PRODUCTION
+            prompt_template = SCENE_PLANNING_PROMPTS.get(version)
         
         # Format the prompt with our parameters
-        formatted_prompt = prompt_template.format(
-            user_input=input_for_planning,
-            user_level_instruction=user_level_instruction,
-            duration_instruction=duration_instruction
-        )
-        
-        # Store the prompts in the state for tracing
-        if "prompts" not in state:
-            state["prompts"] = {}
-        state["prompts"]["planning"] = {
-            "system": formatted_prompt["system"],
-            "user": formatted_prompt["user"]
+        params = {
+            "user_input": input_for_planning,
+            "user_level_instruction": user_level_instruction,
+            "duration_instruction": duration_instruction
         }
+        formatted_prompt = prompt_template.format(**params)
+        
+        # Record the prompt in the state for tracing
+        state["prompts"] = record_prompt(state, "planning", template, version, params, tokens=formatted_prompt.tokens)
         
-        # Use instructor with a response model
-        response = llm_service.generate_structured_response(
-            system_content=formatted_prompt["system"],
-            user_content=formatted_prompt["user"],
-            response_model=ScenePlanResponse
+        # Use instructor with a response model, reusing an earlier plan for the same inputs
+        response, cache_key = generate_with_stage_cache(
+            "plan_scenes", llm_service, formatted_prompt, ScenePlanResponse,
+            stage_cache=get_stage_cache(stage_cache), logger=logger
         )
         
         # Log a summary of the plan
@@ -93,7 +107,10 @@ def plan_scenes(state: GraphState, llm_service: Optional[LLMService] = None) ->
             user_level=state.get("user_level", "normal"),
             voice_model=state.get("voice_model", "nova"),
             email=state.get("email"),
-            prompts=state.get("prompts", {})  # Preserve prompts from previous steps
+            prompts=state.get("prompts", {}),  # Preserve prompts from previous steps
+            video_length=video_length,
+            scenes=[scene.model_dump() for scene in response.scenes] if response.scenes else None,
+            stage_cache_keys=remember_stage_key(state, "plan_scenes", cache_key)
         )
         
     except Exception as e:
@@ -0,0 +1,42 @@
+"""
+Result cache node for the workflow.
+
+This module contains the function that serves a finished video for a question that
+has been answered before, skipping planning, generation and rendering.
+"""
+from typing import Optional
+
+from leap.workflow.state import GraphState
+from leap.core.logging import setup_question_logger
+from leap.workflow.result_cache import ResultCache, get_result_cache
+
+
+def check_result_cache(state: GraphState, result_cache: Optional[ResultCache] = None, **kwargs) -> GraphState:
+    """Look up a finished video for the same or a near-duplicate question.
+    
+    Args:
+        state: The current workflow state
+        result_cache: Optional result cache for dependency injection
+        
+    Returns:
+        The updated workflow state, with `cached_result` set on a hit
+    """
+    logger = setup_question_logger(state["user_input"])
+    
+    try:
+        result_cache = get_result_cache(result_cache)
+        if result_cache is None:
+            return {}
+        
+        question = state.get("reformulated_input") or state["user_input"]
+        cached = result_cache.lookup(question, state.get("user_level", "normal"), state.get("tier"))
+    except Exception as e:
+        logger.warning(f"Result cache lookup failed: {str(e)}")
+        return {}
+    
+    if cached is None:
+        logger.info("No cached video for this question")
+        return {}
+    
+    logger.info(f"Serving cached video ({cached['match']} match): {cached['video_url']}")
+    return {"cached_result": cached}
@@ -0,0 +1,103 @@
+"""
+Multi-scene rendering node for the workflow.
+
+This module contains the function that runs the code pipeline of every scene of
+the plan in parallel and concatenates the rendered clips into the final video.
+"""
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from leap.workflow.state import GraphState
+from leap.core.config import SCENE_WORKERS
+from leap.core.logging import setup_question_logger
+from leap.services import FileService, ManimService
+from leap.workflow.scenes import build_scene_state, summarize_scene, combine_scene_code, merge_scene_counters
+from leap.workflow.errors import classify_error
+from leap.workflow.budget import select_rendering_quality
+
+
+def render_scenes(
+    state: GraphState,
+    scene_workflow: Optional[Any] = None,
+    manim_service: Optional[ManimService] = None,
+    **kwargs
+) -> Dict[str, Any]:
+    """Generate, validate, correct and render the plan's scenes in parallel, then join them.
+    
+    Args:
+        state: The current workflow state
+        scene_workflow: Optional compiled per-scene pipeline for dependency injection
+        manim_service: Optional Manim service for dependency injection
+        
+    Returns:
+        The updated workflow state
+    """
+    logger = setup_question_logger(state["user_input"])
+    scenes = state["scenes"]
+    # Every scene renders at the same quality, so the clips can be joined as they are
+    quality = select_rendering_quality(state)
+    lesson_state = {**state, "rendering_quality": quality}
+    logger.info(f"Rendering {len(scenes)} scenes at {quality} quality with up to {SCENE_WORKERS} in parallel")
+    
+    if scene_workflow is None:
+        from leap.workflow.graph import scene_workflow
+    manim_service = manim_service or ManimService()
+    
+    def run_scene(index: int) -> Dict[str, Any]:
+        try:
+            result = scene_workflow.invoke(build_scene_state(lesson_state, index))
+        except Exception as e:
+            result = {"error": f"Scene pipeline failed: {str(e)}"}
+        summary = summarize_scene(index, scenes[index], result)
+        status = "rendered" if summary["success"] else f"failed: {summary['error'][:200]}"
+        logger.info(f"Scene {index + 1}/{len(scenes)} ({summary['title']}) {status}")
+        return summary
+    
+    # Each scene runs in a copy of the caller's context (tracing, usage meters)
+    with ThreadPoolExecutor(max_workers=max(1, min(SCENE_WORKERS, len(scenes)))) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, run_scene, index) for index in range(len(scenes))]
+        scene_results = [future.result() for future in futures]
+    
+    updates = {
+        "scene_results": scene_results,
+        "generated_code": combine_scene_code(scene_results),
+        "correction_attempts": max(result["correction_attempts"] for result in scene_results),
+        **merge_scene_counters(state, scene_results)
+    }
+    
+    failed = [result for result in scene_results if not result["success"]]
+    if failed:
+        first = failed[0]
+        error = f"Scene {first['index'] + 1} ({first['title']}) failed: {first['error']}"
+        logger.error(f"{len(failed)} of {len(scenes)} scenes failed")
+        updates.update({
+            "error": error,
+            "failure_category": first["failure_category"],
+            "execution_result": {"success": False, "output": None, "error": error, "output_file": None}
+        })
+        return updates
+    
+    # Join the clips in plan order
+    name = FileService.sanitize_filename(state["user_input"])
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_file = manim_service.media_dir / "lessons" / f"{name}_{timestamp}.mp4"
+    # A scene that timed out may have been rendered at a lower quality, re-encode the clips to match
+    mixed = any(result.get("quality") not in (None, quality) for result in scene_results)
+    if mixed:
+        logger.warning(f"Scenes were rendered at different qualities, re-encoding them to {quality}")
+    execution_result = manim_service.concatenate_videos(
+        [result["output_file"] for result in scene_results], str(output_file), quality=quality if mixed else None
+    )
+    
+    if execution_result["success"]:
+        logger.info(f"Lesson video: {execution_result['output_file']}")
+        updates.update({"execution_result": execution_result, "error": None})
+    else:
+        updates.update({
+            "execution_result": execution_result,
+            "error": f"Error joining scenes: {execution_result['error']}",
+            "failure_category": classify_error(execution_result["error"] or "", execution_result.get("returncode"))
+        })
+    return updates
@@ -1,3 +1,4 @@
+import ast
 import re
 
 from typing import Dict, Any, Optional, List
@@ -5,6 +6,232 @@ from typing import Dict, Any, Optional, List
 from leap.workflow.state import GraphState
 from leap.core.logging import setup_question_logger
 from leap.models import CodeIssue, CodeValidationResult
+from leap.services.api_digest import load_api_digest
+
+SCENE_CLASS_PATTERN = re.compile(r'^class\s+(\w+)\s*\(([^)]*)\)', re.MULTILINE)
+
+# Issues the generation node fixes itself (see _sanitize_generated_code), not worth asking the model
+SANITIZED_ISSUE_PREFIXES = (
+    "Using Tex instead of MathTex",
+)
+
+# Issues that more code can't fix, so they already fail a partial generation
+FATAL_ISSUE_PREFIXES = (
+    "self.clear() removes the background",
+    "Code creates a background element",
+    "Scene classes must inherit from ManimVoiceoverBase",
+)
+
+def find_keyword_issues(code: str, api_digest: Dict[str, Any]) -> List[CodeIssue]:
+    """Check the keyword arguments given to Manim constructors against the API digest.
+    
+    Only classes whose complete set of accepted keywords is known (no constructor
+    takes **kwargs, see leap.services.api_digest) are checked, so a valid call is
+    never rejected; code that doesn't parse yet is skipped.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+    classes = api_digest["classes"]
+    defined = {node.name for node in ast.walk(tree) if isinstance(node, ast.ClassDef)}
+    
+    issues, seen = [], set()
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)):
+            continue
+        name = node.func.id
+        if name not in classes or name in defined or classes[name]["accepts"] is None:
+            continue
+        for keyword in node.keywords:
+            if keyword.arg is None or keyword.arg in classes[name]["accepts"] or (name, keyword.arg) in seen:
+                continue
+            seen.add((name, keyword.arg))
+            issues.append(CodeIssue(
+                message=f"{name}() got an unexpected keyword argument '{keyword.arg}'",
+                severity="error",
+                suggestion=f"Use the arguments of {name}({', '.join(classes[name]['params'])}) or its parents"
+            ))
+    return issues
+
+
+def find_code_issues(code: str, api_digest: Optional[Dict[str, Any]] = None) -> List[CodeIssue]:
+    """Check the code against the static validation rules.
+    
+    Args:
+        code: The generated code
+        api_digest: Digest of the Manim API the keyword arguments are checked
+            against (defaults to the digest of the installed Manim version)
+        
+    Returns:
+        The issues found (any issue makes the code invalid)
+    """
+    issues = []
+    
+    # Skip AST parsing for syntax validation to avoid string literal errors
+    # We'll rely on execution to catch syntax errors
+    
+    # Continue with other validations that don't require AST parsing
+    if "from manim import *" not in code:
+        issues.append(CodeIssue(
+            message="Code must import all Manim classes",
+            severity="error",
+            suggestion="Add 'from manim import *' at the top of the file"
+        ))
+
+    # Check for ManimVoiceoverBase import - accept multiple possible paths
+    valid_base_imports = [
+        "from leap.templates.base_scene import ManimVoiceoverBase",
+    ]
+    
+    has_valid_import = any(import_path in code for import_path in valid_base_imports)
+    if not has_valid_import:
+        issues.append(CodeIssue(
+            message="Code must import ManimVoiceoverBase",
+            severity="error",
+            suggestion="Add 'from leap.templates.base_scene import ManimVoiceoverBase' at the top of the file"
+        ))
+        
+
+        
+    if "def construct(self)" not in code:
+        issues.append(CodeIssue(
+            message="Scene class must have a construct method",
+            severity="error",
+            suggestion="Add a 'def construct(self):' method to your Scene class"
+        ))
+        
+    # Check for deprecated methods
+    deprecated_methods = ["self.clear()", "ShowCreation"]
+    for method in deprecated_methods:
+        if method in code:
+            if method == "self.clear()":
+                issues.append(CodeIssue(
+                    message="self.clear() removes the background. Use self.fade_out_scene() instead.",
+                    severity="error",
+                    suggestion="Replace self.clear() with self.fade_out_scene()"
+                ))
+            elif method == "ShowCreation":
+                issues.append(CodeIssue(
+                    message="ShowCreation is deprecated. Use Create() instead.",
+                    severity="warning",
+                    suggestion="Replace ShowCreation with Create"
+                ))
+    
+    # Check for voiceover blocks
+    if "with self.voiceover" not in code:
+        issues.append(CodeIssue(
+            message="Code must use voiceover blocks for animations",
+            severity="error",
+            suggestion="Wrap animations in 'with self.voiceover(text=\"...\") as tracker:' blocks"
+        ))
+    
+    # Check for Tex vs MathTex usage (using regex instead of AST)
+    if re.search(r'(?<![A-Za-z])Tex\s*\(', code) and not re.search(r'MathTex\s*\(', code):
+        issues.append(CodeIssue(
+            message="Using Tex instead of MathTex for mathematical expressions",
+            severity="error",
+            suggestion="Replace Tex with MathTex for mathematical expressions"
+        ))
+    
+
+    
+    # Check for background creation
+    background_patterns = [
+        r'Rectangle\s*\(\s*width\s*=\s*FRAME_WIDTH',
+        r'Rectangle\s*\(\s*width\s*=\s*config\.frame_width',
+        r'Rectangle\s*\(\s*height\s*=\s*FRAME_HEIGHT',
+        r'Rectangle\s*\(\s*height\s*=\s*config\.frame_height',
+        r'ImageMobject\s*\(\s*.*\s*\)\s*.*\s*background',
+        r'self\.camera\.background',
+        r'ReplacementTransform\s*\(\s*self\.camera\.background'
+    ]
+    
+    for pattern in background_patterns:
+        if re.search(pattern, code):
+            issues.append(CodeIssue(
+                message="Code creates a background element which will conflict with the base scene background",
+                severity="error",
+                suggestion="Remove all background creation. The base class already provides a background image."
+            ))
+            break
+    
+    # Check that scene classes build on the base scene (voiceover, background and layout helpers)
+    for match in SCENE_CLASS_PATTERN.finditer(code):
+        if "Scene" in match.group(2) and "ManimVoiceoverBase" not in match.group(2):
+            issues.append(CodeIssue(
+                message="Scene classes must inherit from ManimVoiceoverBase",
+                severity="error",
+                suggestion=f"Declare the scene as 'class {match.group(1)}(ManimVoiceoverBase):'"
+            ))
+            break
+    
+    # Check the keyword arguments of Manim constructors against the installed version
+    api_digest = api_digest or load_api_digest()
+    if api_digest is not None:
+        issues.extend(find_keyword_issues(code, api_digest))
+    
+    # # Check for color values in constructor arguments (using regex)
+    # color_params = ['color', 'fill_color', 'stroke_color', 'background_stroke_color']
+    # # Continue with the rest of the validation
+    # for param in color_params:
+    #     if re.search(rf'{param}=\s*(?![\'"])([A-Za-z_]+)(?=\s*[,)])', code):
+    #         issues.append(CodeIssue(
+    #             message=f"Unquoted color value in {param} parameter",
+    #             severity="error",
+    #             suggestion=f"Use quoted color values: {param}=\"blue\" instead of {param}=blue"
+    #         ))
+    #         is_valid = False
+    
+    # # Check for unquoted color values in set_color method
+    # if re.search(r'\.set_color\(\s*(?![\'"])([A-Za-z_]+)\s*\)', code):
+    #     issues.append(CodeIssue(
+    #         message="Unquoted color value in set_color method",
+    #         severity="error",
+    #         suggestion="Use quoted color values: .set_color(\"blue\") instead of .set_color(blue)"
+    #     ))
+    #     is_valid = False
+
+    return issues
+
+
+def find_fatal_issues(code_prefix: str) -> List[CodeIssue]:
+    """Check the beginning of code that is still being generated.
+    
+    Only the rules that can't be fixed by the rest of the code are applied (a
+    missing construct method may still come, a background element won't go away).
+    
+    Args:
+        code_prefix: The code generated so far
+        
+    Returns:
+        The fatal issues found
+    """
+    return [
+        issue for issue in find_code_issues(code_prefix)
+        if issue.message.startswith(FATAL_ISSUE_PREFIXES)
+    ]
+
+
+def find_response_issues(code: str) -> List[str]:
+    """Check code returned by the model while its response is being parsed.
+    
+    The code must compile and pass the static rules (see CHECK_CODE_CONTEXT in
+    leap.models.responses); warnings and the issues the generation node fixes
+    itself are left out.
+    
+    Returns:
+        The problems found, with how to fix them
+    """
+    try:
+        compile(code, "<generated>", "exec")
+    except SyntaxError as e:
+        return [f"Syntax error on line {e.lineno}: {e.msg}"]
+    return [
+        f"{issue.message}" + (f" ({issue.suggestion})" if issue.suggestion else "")
+        for issue in find_code_issues(code)
+        if issue.severity == "error" and not issue.message.startswith(SANITIZED_ISSUE_PREFIXES)
+    ]
 
 
 def validate_code(state: GraphState, config: Optional[Dict[str, Any]] = None, **kwargs) -> GraphState:
@@ -35,125 +262,9 @@ def validate_code(state: GraphState, config: Optional[Dict[str, Any]] = None, **
         code_lines = state["generated_code"].split("\n")
         logger.info(f"Validating code ({len(code_lines)} lines)")
         
-        # Perform basic validation using AST
-        issues = []
-        is_valid = True
-        
-        # Skip AST parsing for syntax validation to avoid string literal errors
-        # We'll rely on execution to catch syntax errors
-        
-        # Continue with other validations that don't require AST parsing
-        if "from manim import *" not in state["generated_code"]:
-            issues.append(CodeIssue(
-                message="Code must import all Manim classes",
-                severity="error",
-                suggestion="Add 'from manim import *' at the top of the file"
-            ))
-            is_valid = False
-
-        # Check for ManimVoiceoverBase import - accept multiple possible paths
-        valid_base_imports = [
-            "from leap.templates.base_scene import ManimVoiceoverBase",
-        ]
-        
-        has_valid_import = any(import_path in state["generated_code"] for import_path in valid_base_imports)
-        if not has_valid_import:
-            issues.append(CodeIssue(
-                message="Code must import ManimVoiceoverBase",
-                severity="error",
-                suggestion="Add 'from leap.templates.base_scene import ManimVoiceoverBase' at the top of the file"
-            ))
-            is_valid = False
-            
-
-            
-        if "def construct(self)" not in state["generated_code"]:
-            issues.append(CodeIssue(
-                message="Scene class must have a construct method",
-                severity="error",
-                suggestion="Add a 'def construct(self):' method to your Scene class"
-            ))
-            is_valid = False
-            
-        # Check for deprecated methods
-        deprecated_methods = ["self.clear()", "ShowCreation"]
-        for method in deprecated_methods:
-            if method in state["generated_code"]:
-                if method == "self.clear()":
-                    issues.append(CodeIssue(
-                        message="self.clear() removes the background. Use self.fade_out_scene() instead.",
-                        severity="error",
-                        suggestion="Replace self.clear() with self.fade_out_scene()"
-                    ))
-                    is_valid = False
-                elif method == "ShowCreation":
-                    issues.append(CodeIssue(
-                        message="ShowCreation is deprecated. Use Create() instead.",
-                        severity="warning",
-                        suggestion="Replace ShowCreation with Create"
-                    ))
-                    is_valid = False
-        
-        # Check for voiceover blocks
-        if "with self.voiceover" not in state["generated_code"]:
-            issues.append(CodeIssue(
-                message="Code must use voiceover blocks for animations",
-                severity="error",
-                suggestion="Wrap animations in 'with self.voiceover(text=\"...\") as tracker:' blocks"
-            ))
-            is_valid = False
-        
-        # Check for Tex vs MathTex usage (using regex instead of AST)
-        if re.search(r'(?<![A-Za-z])Tex\s*\(', state["generated_code"]) and not re.search(r'MathTex\s*\(', state["generated_code"]):
-            issues.append(CodeIssue(
-                message="Using Tex instead of MathTex for mathematical expressions",
-                severity="error",
-                suggestion="Replace Tex with MathTex for mathematical expressions"
-            ))
-            is_valid = False
-        
-
-        
-        # Check for background creation
-        background_patterns = [
-            r'Rectangle\s*\(\s*width\s*=\s*FRAME_WIDTH',
-            r'Rectangle\s*\(\s*width\s*=\s*config\.frame_width',
-            r'Rectangle\s*\(\s*height\s*=\s*FRAME_HEIGHT',
-            r'Rectangle\s*\(\s*height\s*=\s*config\.frame_height',
-            r'ImageMobject\s*\(\s*.*\s*\)\s*.*\s*background',
-            r'self\.camera\.background',
-            r'ReplacementTransform\s*\(\s*self\.camera\.background'
-        ]
-        
-        for pattern in background_patterns:
-            if re.search(pattern, state["generated_code"]):
-                issues.append(CodeIssue(
-                    message="Code creates a background element which will conflict with the base scene background",
-                    severity="error",
-                    suggestion="Remove all background creation. The base class already provides a background image."
-                ))
-                is_valid = False
-                break
-        # # Check for color values in constructor arguments (using regex)
-        # color_params = ['color', 'fill_color', 'stroke_color', 'background_stroke_color']
-        # # Continue with the rest of the validation
-        # for param in color_params:
-        #     if re.search(rf'{param}=\s*(?![\'"])([A-Za-z_]+)(?=\s*[,)])', state["generated_code"]):
-        #         issues.append(CodeIssue(
-        #             message=f"Unquoted color value in {param} parameter",
-        #             severity="error",
-        #             suggestion=f"Use quoted color values: {param}=\"blue\" instead of {param}=blue"
-        #         ))
-        #         is_valid = False
-        
-        # # Check for unquoted color values in set_color method
-        # if re.search(r'\.set_color\(\s*(?![\'"])([A-Za-z_]+)\s*\)', state["generated_code"]):
-        #     issues.append(CodeIssue(
-        #         message="Unquoted color value in set_color method",
-        #         severity="error",
-        #         suggestion="Use quoted color values: .set_color(\"blue\") instead of .set_color(blue)"
-        #     ))
-        #     is_valid = False
+        # Perform basic validation
+        issues = find_code_issues(state["generated_code"])
+        is_valid = not issues
         
         # Create validation result
         validation_result = CodeValidationResult(
@@ -193,7 +304,8 @@ def validate_code(state: GraphState, config: Optional[Dict[str, Any]] = None, **
             generated_code=state["generated_code"],
             execution_result=None,
             error=None,
-            correction_attempts=state.get("correction_attempts", 0)
+            correction_attempts=state.get("correction_attempts", 0),
+            last_valid_code=state["generated_code"]
         )
         
     except Exception as e:
@@ -0,0 +1,88 @@
+"""
+Utilities for applying line-range edits to generated code.
+
+The correction node can ask the model for a list of edits instead of a full
+rewrite of the scene. This module numbers the code for the prompt, validates the
+returned edits and applies them locally.
+"""
+from typing import List
+
+from leap.models import CodeEdit
+
+
+class PatchError(ValueError):
+    """Raised when a set of edits cannot be applied cleanly."""
+
+
+def number_code_lines(code: str) -> str:
+    """Prefix every line of the code with its 1-based line number.
+
+    Args:
+        code: The code to number
+
+    Returns:
+        The code with a "NNNN | " prefix on every line
+    """
+    lines = code.split("\n")
+    width = max(4, len(str(len(lines))))
+    return "\n".join(f"{i:>{width}} | {line}" for i, line in enumerate(lines, 1))
+
+
+def _normalize(text: str) -> List[str]:
+    """Normalize text for comparing an edit's original lines with the code."""
+    return [line.rstrip() for line in text.strip("\n").split("\n")]
+
+
+def apply_code_edits(code: str, edits: List[CodeEdit]) -> str:
+    """Apply line-range edits to the code.
+
+    Edits refer to line numbers of the original code, so they are validated
+    against it and applied from the bottom up.
+
+    Args:
+        code: The original code
+        edits: The edits to apply
+
+    Returns:
+        The patched code
+
+    Raises:
+        PatchError: If the edits are empty, out of range, overlapping, don't match
+            the original code or produce code that doesn't compile
+    """
+    if not edits:
+        raise PatchError("No edits provided")
+
+    lines = code.split("\n")
+    line_count = len(lines)
+
+    ordered = sorted(edits, key=lambda edit: (edit.start_line, edit.end_line))
+    previous_end = 0
+    for edit in ordered:
+        if edit.start_line < 1 or edit.start_line > line_count + 1:
+            raise PatchError(f"Edit start line {edit.start_line} is outside the code (1-{line_count})")
+        if edit.end_line < edit.start_line - 1 or edit.end_line > line_count:
+            raise PatchError(f"Edit range {edit.start_line}-{edit.end_line} is invalid for {line_count} lines")
+        if edit.start_line <= previous_end:
+            raise PatchError(f"Edit starting at line {edit.start_line} overlaps a previous edit")
+        if edit.original is not None and edit.end_line >= edit.start_line:
+            current = "\n".join(lines[edit.start_line - 1:edit.end_line])
+            if _normalize(current) != _normalize(edit.original):
+                raise PatchError(f"Lines {edit.start_line}-{edit.end_line} don't match the edit's original text")
+        previous_end = max(previous_end, edit.end_line)
+
+    for edit in reversed(ordered):
+        text = edit.replacement[:-1] if edit.replacement.endswith("\n") else edit.replacement
+        replacement = text.split("\n") if edit.replacement else []
+        lines[edit.start_line - 1:edit.end_line] = replacement
+
+    patched = "\n".join(lines)
+    if patched == code:
+        raise PatchError("Edits did not change the code")
+
+    try:
+        compile(patched, "<patched>", "exec")
+    except SyntaxError as e:
+        raise PatchError(f"Patched code has a syntax error: {e.msg} (line {e.lineno})")
+
+    return patched
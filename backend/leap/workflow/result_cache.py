@@ -0,0 +1,193 @@
+"""
+Cache of finished videos, served again for repeated and near-duplicate questions.
+
+Exact matches are keyed on a hash of the whole normalized question
+(`extract_concept` without its length limit, which drops operators, plus its
+math terms), the user level and the tier.
+Near-duplicates ("explain derivatives" vs "what is a derivative?") are found by
+comparing MinHash signatures of the questions' character shingles; the estimated
+Jaccard similarity has to reach RESULT_CACHE_SIMILARITY, and the questions must
+have the same math terms (numbers, variables and operators), which the shingles
+barely tell apart ("derivative of x^2" vs "derivative of x^3"). The cache is
+bounded by RESULT_CACHE_MAX_ENTRIES, so the signatures are compared with a linear
+scan.
+"""
+import hashlib
+import logging
+import random
+import re
+from typing import Any, Dict, List, Optional, Set
+
+from leap.core.config import (
+    DEFAULT_TIER,
+    RESULT_CACHE_ENABLED,
+    RESULT_CACHE_PATH,
+    RESULT_CACHE_TTL_HOURS,
+    RESULT_CACHE_MAX_ENTRIES,
+    RESULT_CACHE_SIMILARITY,
+    MINHASH_PERMUTATIONS,
+)
+from leap.services.cache_service import CacheService, make_cache_key
+from leap.workflow.utils import extract_concept
+
+# Words that don't change what a question is about
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "of", "to", "in", "on", "for", "and", "or",
+    "what", "how", "why", "does", "do", "work", "works", "me", "about", "it"
+}
+
+# Numbers, single-letter variables and operators of a question
+MATH_TERM_PATTERN = re.compile(r"\d+(?:\.\d+)?|\b(?![ai]\b)[a-z]\b|[+\-*/^=<>%√∫∑∏π∞]")
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(1234)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+]
+
+
+def _singular(word: str) -> str:
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def normalize_question(text: str) -> str:
+    """Return the concept of a question as plain singular words, without stopwords."""
+    words = extract_concept(text, max_length=None).replace("_", " ").split()
+    kept = [word for word in words if word not in STOPWORDS] or words
+    return " ".join(_singular(word) for word in kept)
+
+
+def math_terms(text: str) -> List[str]:
+    """Return the numbers, variables and operators of a question, in order."""
+    return MATH_TERM_PATTERN.findall(text.lower())
+
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    """Return the character shingles of the normalized question."""
+    normalized = f" {normalize_question(text)} "
+    if len(normalized) <= size:
+        return {normalized}
+    return {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+
+def minhash_signature(text: str) -> List[int]:
+    """Return the MinHash signature of the question's shingles."""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for shingle in shingles(text)
+    ]
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def estimate_similarity(first: List[int], second: List[int]) -> float:
+    """Return the Jaccard similarity estimated from two MinHash signatures."""
+    if not first or len(first) != len(second):
+        return 0.0
+    return sum(1 for a, b in zip(first, second) if a == b) / len(first)
+
+
+def concept_key(question: str, level: str, tier: Optional[str] = None) -> str:
+    """Return the key shared by questions with the same normalized text, math terms, level and tier."""
+    return make_cache_key(extract_concept(question, max_length=None), math_terms(question), level, tier or DEFAULT_TIER)
+
+
+class ResultCache:
+    """Finished videos indexed by concept and by MinHash signature."""
+
+    def __init__(self, cache: Optional[CacheService] = None, similarity_threshold: Optional[float] = None):
+        """Initialize the result cache.
+
+        Args:
+            cache: Storage for the results (defaults to the on-disk result cache)
+            similarity_threshold: Minimum estimated similarity of a near-duplicate
+        """
+        self.cache = cache or CacheService(
+            "results",
+            db_path=RESULT_CACHE_PATH,
+            ttl_seconds=RESULT_CACHE_TTL_HOURS * 3600,
+            max_entries=RESULT_CACHE_MAX_ENTRIES
+        )
+        self.similarity_threshold = RESULT_CACHE_SIMILARITY if similarity_threshold is None else similarity_threshold
+        self.logger = logging.getLogger("leap")
+
+    def lookup_exact(self, question: str, level: str, tier: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Return the stored result for the same concept, level and tier, if any."""
+        result = self.cache.get(concept_key(question, level, tier))
+        if result is not None:
+            result["match"] = "exact"
+        return result
+
+    def lookup(self, question: str, level: str, tier: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Return the stored result for the same or the most similar question, if any.
+
+        Args:
+            question: The (reformulated) question
+            level: The user level the video was made for
+            tier: The generation tier
+
+        Returns:
+            The stored result with its "match" ("exact" or "similar") and "similarity",
+            or None on a miss
+        """
+        result = self.lookup_exact(question, level, tier)
+        if result is not None:
+            result["similarity"] = 1.0
+            return result
+
+        tier = tier or DEFAULT_TIER
+        signature = minhash_signature(question)
+        terms = math_terms(question)
+        best_key, best_similarity = None, 0.0
+        for key, value in self.cache.items():
+            if value.get("level") != level or value.get("tier") != tier:
+                continue
+            if value.get("terms", math_terms(value.get("question", ""))) != terms:
+                continue
+            similarity = estimate_similarity(signature, value.get("signature", []))
+            if similarity > best_similarity:
+                best_key, best_similarity = key, similarity
+
+        if best_key is None or best_similarity < self.similarity_threshold:
+            return None
+
+        # Read it through get() so the hit is counted and the entry stays recent
+        result = self.cache.get(best_key)
+        if result is None:
+            return None
+        self.logger.info(f"Near-duplicate of \"{result['question']}\" (similarity {best_similarity:.2f})")
+        return {**result, "match": "similar", "similarity": best_similarity}
+
+    def store(self, question: str, level: str, video_url: str, tier: Optional[str] = None, prompt: Optional[str] = None):
+        """Store a finished video for a question.
+
+        Args:
+            question: The (reformulated) question the video answers
+            level: The user level the video was made for
+            video_url: Public URL of the video
+            tier: The generation tier
+            prompt: The original prompt, also indexed for exact matches when it differs
+        """
+        tier = tier or DEFAULT_TIER
+        value = {
+            "question": question,
+            "level": level,
+            "tier": tier,
+            "video_url": video_url,
+            "signature": minhash_signature(question),
+            "terms": math_terms(question)
+        }
+        self.cache.set(concept_key(question, level, tier), value)
+        if prompt and concept_key(prompt, level, tier) != concept_key(question, level, tier):
+            self.cache.set(concept_key(prompt, level, tier), {
+                **value, "signature": minhash_signature(prompt), "terms": math_terms(prompt)
+            })
+
+
+def get_result_cache(result_cache: Optional[ResultCache] = None) -> Optional[ResultCache]:
+    """Return the given cache, the default result cache, or None when it's disabled."""
+    if result_cache is not None:
+        return result_cache
+    return ResultCache() if RESULT_CACHE_ENABLED else None
@@ -0,0 +1,101 @@
+"""
+Multi-scene lessons.
+
+When the plan comes with a list of scenes, each scene runs its own copy of the
+code pipeline (generate, validate, execute, auto-fix and correct) on a state of its
+own, in parallel with the other scenes. A failing scene only retries itself; once
+every scene has rendered, the clips are concatenated in plan order. The rendering
+quality is chosen once for the whole lesson; clips that still came out at another
+quality (a render that timed out is retried lower) are re-encoded to the lesson's
+quality when they're joined. The scenes' node timings, calls and tokens are added
+to the job's.
+"""
+from typing import Any, Dict, List
+
+from leap.core.config import MULTI_SCENE_ENABLED, MIN_PARALLEL_SCENES
+from leap.workflow.budget import is_quick_tier
+
+# Job-wide fields that every scene's state inherits
+SHARED_FIELDS = [
+    "user_input",
+    "reformulated_input",
+    "rendering_quality",
+    "duration_detail",
+    "user_level",
+    "voice_model",
+    "email",
+    "tier",
+    "priority",
+    "video_length",
+    "latency_budget",
+    "deadline",
+    "started_at",
+    "job_id",
+]
+
+
+def use_multi_scene(state: Dict[str, Any]) -> bool:
+    """Return True if the plan should be rendered as separate, parallel scenes."""
+    if not MULTI_SCENE_ENABLED or is_quick_tier(state):
+        return False
+    return len(state.get("scenes") or []) >= MIN_PARALLEL_SCENES
+
+
+def build_scene_state(state: Dict[str, Any], index: int) -> Dict[str, Any]:
+    """Return the initial state of the code pipeline for one scene of the plan."""
+    scenes = state["scenes"]
+    scene = scenes[index]
+    scene_state = {field: state[field] for field in SHARED_FIELDS if state.get(field) is not None}
+    scene_state.update({
+        "plan": f"{scene['title']}\n\n{scene['description']}",
+        "scene": {**scene, "index": index, "count": len(scenes)},
+        "correction_attempts": 0,
+        "prompts": {}
+    })
+    return scene_state
+
+
+def summarize_scene(index: int, scene: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the outcome of a scene's pipeline."""
+    execution_result = result.get("execution_result") or {}
+    success = not result.get("error") and bool(execution_result.get("success"))
+    return {
+        "index": index,
+        "title": scene["title"],
+        "success": success,
+        "output_file": execution_result.get("output_file") if success else None,
+        "error": None if success else (result.get("error") or "Scene did not render"),
+        "failure_category": result.get("failure_category"),
+        "correction_attempts": result.get("correction_attempts", 0),
+        "code": result.get("generated_code"),
+        "quality": execution_result.get("quality"),
+        "node_timings": result.get("node_timings") or {},
+        "node_calls": result.get("node_calls") or {},
+        "node_tokens": result.get("node_tokens") or {}
+    }
+
+
+def merge_scene_counters(state: Dict[str, Any], scene_results: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Return the job's node timings, calls and tokens with those of every scene's pipeline added.
+
+    The scenes run in parallel, so a node's time is the sum over the scenes, not wall time.
+    """
+    counters = {}
+    for field in ("node_timings", "node_calls", "node_tokens"):
+        totals = dict(state.get(field) or {})
+        for result in scene_results:
+            for node, value in (result.get(field) or {}).items():
+                totals[node] = totals.get(node, 0) + value
+        if field == "node_timings":
+            totals = {node: round(seconds, 3) for node, seconds in totals.items()}
+        counters[field] = totals
+    return counters
+
+
+def combine_scene_code(scene_results: List[Dict[str, Any]]) -> str:
+    """Return the code of all scenes as one module, in plan order."""
+    parts = [
+        f"# Scene {result['index'] + 1}: {result['title']}\n{result['code']}"
+        for result in scene_results if result.get("code")
+    ]
+    return "\n\n\n".join(parts)
@@ -0,0 +1,140 @@
+"""
+Memoization of expensive workflow stages.
+
+Planning and code generation are keyed by their actual inputs: the node, the
+model with its reasoning effort and output limit, the response model and the fully formatted prompt (which captures the
+prompt version, the (reformulated) input, the user level, the target length and,
+for generation, the plan). Requests that share these inputs reuse the earlier
+structured response instead of calling the LLM again.
+
+The key of each cached result is kept in `state["stage_cache_keys"]`; generated
+code that turns out to be broken is dropped from the cache so later requests get
+a fresh generation (failures caused by the environment keep it).
+"""
+import logging
+from typing import Any, Dict, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel
+
+from leap.core.config import (
+    STAGE_CACHE_ENABLED,
+    STAGE_CACHE_PATH,
+    STAGE_CACHE_TTL_HOURS,
+    STAGE_CACHE_MAX_ENTRIES,
+    STAGE_CACHE_MAX_MB,
+)
+from leap.services import LLMService
+from leap.services.cache_service import CacheService, make_cache_key
+
+T = TypeVar("T", bound=BaseModel)
+
+
+def get_stage_cache(stage_cache: Optional[CacheService] = None) -> Optional[CacheService]:
+    """Return the given cache, the default stage cache, or None when it's disabled."""
+    if stage_cache is not None:
+        return stage_cache
+    if not STAGE_CACHE_ENABLED:
+        return None
+    return CacheService(
+        "stages",
+        db_path=STAGE_CACHE_PATH,
+        ttl_seconds=STAGE_CACHE_TTL_HOURS * 3600,
+        max_entries=STAGE_CACHE_MAX_ENTRIES,
+        max_bytes=int(STAGE_CACHE_MAX_MB * 1024 * 1024)
+    )
+
+
+def stage_cache_key(
+    node: str,
+    model: str,
+    formatted_prompt: Dict[str, str],
+    response_model: Type[BaseModel],
+    reasoning_effort: Optional[str] = None,
+    max_tokens: Optional[int] = None
+) -> str:
+    """Return the cache key of a stage's LLM call (a response made with less effort or a lower output limit isn't reused)."""
+    return make_cache_key(
+        node,
+        model,
+        reasoning_effort,
+        max_tokens,
+        response_model.__name__,
+        formatted_prompt["system"],
+        formatted_prompt["user"]
+    )
+
+
+def generate_with_stage_cache(
+    node: str,
+    llm_service: LLMService,
+    formatted_prompt: Dict[str, str],
+    response_model: Type[T],
+    stage_cache: Optional[CacheService] = None,
+    logger: Optional[logging.Logger] = None
+) -> Tuple[T, Optional[str]]:
+    """Return the stage's structured response, from the cache when possible.
+
+    Cache errors never fail the stage; they are logged and the LLM is called.
+
+    Returns:
+        A tuple of the response and its cache key (None when caching is disabled)
+    """
+    logger = logger or logging.getLogger("leap")
+    key = None
+
+    if stage_cache is not None:
+        try:
+            key = stage_cache_key(
+                node,
+                str(llm_service.model),
+                formatted_prompt,
+                response_model,
+                reasoning_effort=getattr(llm_service, "reasoning_effort", None),
+                max_tokens=getattr(llm_service, "max_tokens", None)
+            )
+            cached = stage_cache.get(key)
+            if cached is not None:
+                logger.info(f"Reusing cached {node} result")
+                return response_model.model_validate(cached), key
+        except Exception as e:
+            logger.warning(f"Stage cache lookup failed for {node}: {str(e)}")
+            key = None
+
+    response = llm_service.generate_structured_response(
+        system_content=formatted_prompt["system"],
+        user_content=formatted_prompt["user"],
+        response_model=response_model
+    )
+
+    if stage_cache is not None and key is not None:
+        try:
+            stage_cache.set(key, response.model_dump(mode="json"))
+        except Exception as e:
+            logger.warning(f"Could not cache {node} result: {str(e)}")
+
+    return response, key
+
+
+def remember_stage_key(state: Dict[str, Any], node: str, key: Optional[str]) -> Dict[str, str]:
+    """Return the state's stage cache keys with `node`'s key added."""
+    keys = dict(state.get("stage_cache_keys") or {})
+    if key is not None:
+        keys[node] = key
+    return keys
+
+
+def discard_stage_result(
+    state: Dict[str, Any],
+    node: str,
+    stage_cache: Optional[CacheService] = None
+) -> Dict[str, str]:
+    """Drop `node`'s cached result for this job, e.g. because its output was broken.
+
+    Returns:
+        The remaining stage cache keys
+    """
+    keys = dict(state.get("stage_cache_keys") or {})
+    key = keys.pop(node, None)
+    if key is not None and stage_cache is not None:
+        stage_cache.delete(key)
+    return keys
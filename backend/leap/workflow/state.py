@@ -9,6 +9,18 @@ class GraphState(TypedDict, total=False):
     execution_result: Optional[Dict[str, Any]] = Field(None, description="Result of the execution")
     error: Optional[str] = Field(None, description="Error message")
     correction_attempts: int = Field(0, description="Number of correction attempts")
+    auto_fix_attempts: int = Field(0, description="Number of rule-based auto-fix rounds applied")
+    auto_fix_applied: Optional[bool] = Field(None, description="Whether the last auto-fix round changed the code")
+    attempt_history: Optional[List[Dict[str, Any]]] = Field(None, description="Compact history of failed attempts (code hash, error fingerprint)")
+    last_correction: Optional[Dict[str, Any]] = Field(None, description="Strategy and summary of the change that produced the current code")
+    stop_reason: Optional[str] = Field(None, description="Why the workflow stopped before running out of attempts")
+    failure_category: Optional[str] = Field(None, description="Category of an unrecoverable environment failure (latex_missing, timeout, ...)")
+    scenes: Optional[List[Dict[str, Any]]] = Field(None, description="The plan split into scenes (title, description, target_seconds)")
+    scene: Optional[Dict[str, Any]] = Field(None, description="The scene this state renders, in a multi-scene lesson (with its index and count)")
+    scene_results: Optional[List[Dict[str, Any]]] = Field(None, description="Outcome of each scene of a multi-scene lesson")
+    cached_result: Optional[Dict[str, Any]] = Field(None, description="Finished video served from the result cache (video_url, question, match, similarity)")
+    stage_cache_keys: Optional[Dict[str, str]] = Field(None, description="Stage cache keys of the results this job used or produced, per node")
+    pending_fixes: Optional[List[Dict[str, Any]]] = Field(None, description="Fixes waiting for a successful render before being added to the fix cache")
     rendering_quality: str = Field("low", description="Rendering quality")
     duration_detail: str = Field("short", description="Duration of the animation")
     user_level: str = Field("normal", description="Explanation level")
@@ -16,5 +28,16 @@ class GraphState(TypedDict, total=False):
     email: Optional[str] = Field(None, description="User email")
     validation_status: Optional[str] = Field(None, description="Status of input validation (valid, invalid, needs_clarification)")
     suggestion: Optional[str] = Field(None, description="Suggestion for improving the input")
-    prompts: Optional[Dict[str, Dict[str, str]]] = Field(None, description="Prompts used in each step")
+    tier: str = Field("standard", description="Generation tier (standard, quick)")
+    priority: Optional[int] = Field(None, description="Priority for shared resources like the LLM rate limit (lower first; defaults by tier)")
+    job_id: Optional[str] = Field(None, description="Id of the workflow run, scoping its artifacts (set by the first node)")
+    started_at: Optional[float] = Field(None, description="Epoch time at which the first node started")
+    latency_budget: Optional[float] = Field(None, description="Latency budget for the job in seconds (None for no budget)")
+    deadline: Optional[float] = Field(None, description="Epoch time at which the latency budget runs out")
+    node_timings: Optional[Dict[str, float]] = Field(None, description="Wall time spent in each node, in seconds")
+    node_calls: Optional[Dict[str, int]] = Field(None, description="Number of times each node ran")
+    node_tokens: Optional[Dict[str, int]] = Field(None, description="LLM tokens used by each node (prompt and output)")
+    video_length: Optional[str] = Field(None, description="Target video length chosen when planning (long, short)")
+    last_valid_code: Optional[str] = Field(None, description="Most recent code that passed validation")
+    prompts: Optional[Dict[str, Dict[str, Any]]] = Field(None, description="Prompt of each step: template id, version and parameters (large ones as artifact references)")
 
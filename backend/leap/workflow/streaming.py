@@ -0,0 +1,94 @@
+"""
+Checks of generated code while it streams in.
+
+A full code generation takes thousands of tokens, and some mistakes are visible
+in its first lines: a scene class that doesn't inherit from ManimVoiceoverBase,
+a background element, `self.clear()`. The generation node streams the
+ManimCodeResponse (see LLMService's partial_check) and passes every partial
+response to a CodeStreamCheck, which mirrors the growing code to a draft file and
+applies the fatal validation rules to its complete lines, so such a generation is
+abandoned and started again right away instead of after the last token.
+"""
+import logging
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+
+from leap.core.config import CODE_STREAMING_ENABLED
+from leap.services import FileService
+from leap.workflow.nodes.validation import find_fatal_issues
+
+
+class CodeStreamCheck:
+    """Partial check of a streamed code generation."""
+
+    def __init__(self, draft_path: Optional[Path] = None, logger: Optional[logging.Logger] = None):
+        """Initialize the check.
+
+        Args:
+            draft_path: File the code is written to as it grows (None to not write it)
+            logger: Logger of the job
+        """
+        self.draft_path = draft_path
+        self.logger = logger or logging.getLogger("leap")
+        self._written = ""
+        self._checked_chars = 0
+
+    def _write_draft(self, code: str):
+        if self.draft_path is None or code == self._written:
+            return
+        try:
+            if code.startswith(self._written):
+                with open(self.draft_path, "a") as f:
+                    f.write(code[len(self._written):])
+            else:
+                # A new attempt started
+                self.draft_path.write_text(code)
+        except OSError as e:
+            self.logger.warning(f"Could not write the code draft: {str(e)}")
+            self.draft_path = None
+        self._written = code
+
+    def __call__(self, partial: BaseModel) -> Optional[str]:
+        """Check a partial response.
+
+        Args:
+            partial: The response generated so far (its code may end mid-line)
+
+        Returns:
+            The fatal issues found, or None to go on
+        """
+        code = getattr(partial, "code", None) or ""
+        if len(code) < self._checked_chars:
+            self._checked_chars = 0
+        self._write_draft(code)
+
+        # Only complete lines are checked, and only once a new one is complete
+        complete = code[:code.rfind("\n") + 1]
+        if len(complete) <= self._checked_chars:
+            return None
+        self._checked_chars = len(complete)
+
+        issues = find_fatal_issues(complete)
+        if not issues:
+            return None
+        problem = "; ".join(issue.message for issue in issues)
+        self.logger.info(f"Fatal issue after {complete.count(chr(10))} lines of code: {problem}")
+        return problem
+
+
+def get_code_stream_check(
+    state: Dict[str, Any],
+    logger: Optional[logging.Logger] = None,
+    file_service: Optional[FileService] = None
+) -> Optional[CodeStreamCheck]:
+    """Return the check of the job's code generation, or None when streaming is disabled."""
+    if not CODE_STREAMING_ENABLED:
+        return None
+    file_service = file_service or FileService()
+    scene = state.get("scene")
+    draft_path = file_service.draft_path(
+        state["user_input"], suffix=f"scene_{scene['index'] + 1}" if scene else None
+    )
+    return CodeStreamCheck(draft_path, logger=logger)
@@ -1,7 +1,8 @@
 import re
 import tempfile
 import logging
-from leap.core.config import GENERATED_DIR, LOGS_DIR, RUN_TIMESTAMP
+from typing import Optional
+from leap.core.config import GENERATED_DIR, LOGS_DIR, RUN_TIMESTAMP, LOG_VALUE_CHARS
 from leap.templates import get_api_doc
 
 def get_manim_api_context() -> str:
@@ -9,36 +10,71 @@ def get_manim_api_context() -> str:
     # Read the API documentation from the templates directory
     return get_api_doc("breaking_changes")
 
+def get_api_reference(plan: str = "", code: str = "", error: str = "") -> str:
+    """Get the Manim API documentation relevant to a plan, a piece of code or an error.
+    
+    Returns:
+        The retrieved sections, or "" when the reference is disabled or the index can't be opened
+    """
+    from leap.core.config import API_REFERENCE_MAX_TOKENS
+    if API_REFERENCE_MAX_TOKENS <= 0:
+        return ""
+    try:
+        from leap.services.api_docs_index import get_api_docs_index
+        return get_api_docs_index().reference(plan=plan, code=code, error=error, max_tokens=API_REFERENCE_MAX_TOKENS)
+    except Exception as e:
+        logging.getLogger("leap").warning(f"Could not retrieve the API reference: {e}")
+        return ""
+
+def compact_value(value, limit: int = LOG_VALUE_CHARS) -> str:
+    """Return a short representation of a state value for logging.
+    
+    Long strings are shown as their size, and containers are summarized
+    recursively, so large code, plans and prompts are never formatted in full.
+    """
+    if isinstance(value, str):
+        return value if len(value) <= limit else f"<{len(value)} chars>"
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{k}: {compact_value(v, limit)}" for k, v in value.items()) + "}"
+    if isinstance(value, (list, tuple)):
+        if len(value) > 10:
+            return f"<{len(value)} items>"
+        return "[" + ", ".join(compact_value(v, limit) for v in value) + "]"
+    return repr(value)
+
+class StateSummary:
+    """Lazily formatted, compact view of a workflow state for log messages.
+    
+    Pass it as a logging argument (`logger.info("State: %s", StateSummary(state))`)
+    so the state is only formatted when the record is actually emitted.
+    """
+    
+    def __init__(self, state: dict, limit: int = LOG_VALUE_CHARS):
+        self.state = state
+        self.limit = limit
+    
+    def __str__(self) -> str:
+        return compact_value(dict(self.state or {}), self.limit)
+
 def log_state_transition(node_name: str, input_state: dict, output_state: dict):
     """Log the state transition for a node, showing what changed."""
     logger = logging.getLogger(__name__)
-    logger.info(f"\n{'='*50}\nNode: {node_name}")
-    
-    # Log input state
-    logger.info("Input State:")
-    for k, v in input_state.items():
-        if k in ['generated_code', 'plan'] and v:
-            logger.info(f"  {k}: <{len(str(v))} chars>")
-        else:
-            logger.info(f"  {k}: {v}")
-    
-    # Log changes between input and output states
-    logger.info("Changes:")
-    for k in output_state:
-        if k in input_state:
-            if output_state[k] != input_state[k]:
-                if k in ['generated_code', 'plan']:
-                    logger.info(f"  {k}: <updated - {len(str(output_state[k]))} chars>")
-                else:
-                    logger.info(f"  {k}: {input_state[k]} -> {output_state[k]}")
-        else:
-            logger.info(f"  + {k}: {output_state[k]}")
+    if logger.isEnabledFor(logging.INFO):
+        changes = []
+        for k in output_state:
+            if k not in input_state:
+                changes.append(f"  + {k}: {compact_value(output_state[k])}")
+            elif output_state[k] is not input_state[k] and output_state[k] != input_state[k]:
+                changes.append(f"  {k}: {compact_value(input_state[k])} -> {compact_value(output_state[k])}")
+        logger.info(
+            "\n%s\nNode: %s\nInput State: %s\nChanges:\n%s\n%s\n",
+            "=" * 50, node_name, StateSummary(input_state), "\n".join(changes), "=" * 50
+        )
     
     # Log error if present
     if output_state.get('error'):
         logger.error(f"Error in {node_name}: {output_state['error']}")
     
-    logger.info(f"{'='*50}\n")
     return output_state
 
 def create_temp_dir():
@@ -47,7 +83,7 @@ def create_temp_dir():
     logging.getLogger(__name__).info(f"Created temporary directory at: {temp_dir}")
     return temp_dir
 
-def extract_concept(text: str) -> str:
+def extract_concept(text: str, max_length: Optional[int] = 50) -> str:
     """
     Extract the underlying concept from a user input string.
     
@@ -59,6 +95,7 @@ def extract_concept(text: str) -> str:
     
     Args:
         text: The user input text
+        max_length: Maximum length of the concept (for file names), None to keep it whole
         
     Returns:
         A cleaned, normalized string representing the core concept
@@ -94,8 +131,8 @@ def extract_concept(text: str) -> str:
     concept = re.sub(r'\s+', '_', text)
     
     # Limit length to avoid excessively long filenames
-    if len(concept) > 50:
-        concept = concept[:50]
+    if max_length is not None and len(concept) > max_length:
+        concept = concept[:max_length]
     
     # Ensure we don't have trailing underscores
     concept = concept.strip('_')
@@ -106,6 +143,21 @@ def extract_concept(text: str) -> str:
     
     return concept
 
+def workflow_failure(state: dict) -> Optional[str]:
+    """Return why a finished workflow run failed, or None if it produced a video.
+    
+    A run fails with an error, when it was stopped early (e.g. its latency budget
+    ran out) and when it ends without an output file, unless it was answered from
+    the result cache.
+    """
+    if state.get("cached_result"):
+        return None
+    if state.get("error") or state.get("stop_reason"):
+        return state.get("error") or state.get("stop_reason")
+    if not (state.get("execution_result") or {}).get("output_file"):
+        return "The workflow finished without producing a video"
+    return None
+
 def generate_scene_filename(topic: str) -> str:
     """Generate a unique scene filename from the user input."""
     concept = extract_concept(topic)
@@ -26,8 +26,17 @@ def test_api_health():
     assert response.status_code == 200
     assert response.json()["status"] == "ok"
 
+def test_api_cache_stats():
+    """Test that the cache statistics endpoint reports each enabled cache."""
+    response = client.get("/api/system/cache/stats")
+    assert response.status_code == 200
+    caches = response.json()["caches"]
+    assert "llm_responses" in caches
+    assert set(caches["llm_responses"]) >= {"entries", "hits", "misses", "hit_rate"}
+
 if __name__ == "__main__":
     logger.info("Starting API test...")
     test_animation_generation()
     test_api_health()
+    test_api_cache_stats()
     logger.info("API test completed.")
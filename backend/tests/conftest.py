@@ -25,6 +25,33 @@ def setup_test_environment():
     
     yield
 
+@pytest.fixture(autouse=True)
+def isolated_caches(tmp_path, monkeypatch):
+    """Keep the on-disk caches, artifacts, metrics and logs of each test in its own temporary directory."""
+    (tmp_path / "logs").mkdir()
+    monkeypatch.setattr("leap.core.logging.LOGS_DIR", tmp_path / "logs")
+    monkeypatch.setattr("leap.services.fix_cache_service.FIX_CACHE_PATH", tmp_path / "fix_cache.db")
+    monkeypatch.setattr("leap.workflow.stage_cache.STAGE_CACHE_PATH", tmp_path / "stage_cache.db")
+    monkeypatch.setattr("leap.workflow.result_cache.RESULT_CACHE_PATH", tmp_path / "result_cache.db")
+    monkeypatch.setattr("leap.workflow.artifacts.ARTIFACT_DIR", tmp_path / "artifacts")
+    monkeypatch.setattr("leap.workflow.latency.METRICS_DIR", tmp_path / "metrics")
+    monkeypatch.setattr("leap.services.llm_service.LLM_RESPONSE_CACHE_PATH", tmp_path / "llm_response_cache.db")
+    monkeypatch.setattr("leap.services.llm_cassette.LLM_CASSETTE_DIR", tmp_path / "cassettes")
+    monkeypatch.setattr("leap.core.rate_limit.LLM_RATE_LIMIT_PATH", tmp_path / "llm_rate_limit.db")
+    monkeypatch.setattr("leap.core.rate_limit._limiter", None)
+    monkeypatch.setattr("leap.services.api_docs_index.API_DOCS_INDEX_PATH", tmp_path / "api_docs_index.bin")
+    monkeypatch.setattr("leap.services.api_docs_index._index", None)
+    monkeypatch.setattr("leap.services.api_digest.API_DIGEST_DIR", tmp_path / "api_digest")
+    monkeypatch.setattr("leap.services.api_digest._digests", {})
+    yield
+    # The question loggers are cached with their file handler, drop them with the directory
+    from leap.core.logging import _loggers
+    for logger in _loggers.values():
+        for handler in logger.handlers:
+            handler.close()
+        logger.handlers = []
+    _loggers.clear()
+
 @pytest.fixture
 def sample_manim_code():
     """Return sample Manim code for testing."""
@@ -0,0 +1,116 @@
+"""
+Unit tests for the Manim API digest and the checks based on it.
+"""
+import types
+import leap.workflow.nodes  # noqa: F401 (the services import the workflow package)
+from leap.services import ApiDocsIndex
+from leap.services.api_digest import build_api_digest, digest_chunks, digest_path, write_api_digest
+from leap.workflow.nodes.validation import find_code_issues
+
+
+class Mobject:
+    """Base class of all objects.
+
+    Long description that isn't part of the digest.
+    """
+
+    def __init__(self, color="#FFFFFF", name=None, z_index=0):
+        pass
+
+    def shift(self, *vectors):
+        pass
+
+    def _private(self):
+        pass
+
+
+class Circle(Mobject):
+    """A circle."""
+
+    def __init__(self, radius: float = 1.0, points=list(range(100)), **kwargs):
+        super().__init__(**kwargs)
+
+    @property
+    def width(self):
+        return 2
+
+
+class Open:
+    def __init__(self, **kwargs):
+        pass
+
+
+def fake_manim():
+    module = types.ModuleType("fakemanim")
+    for cls in (Mobject, Circle, Open):
+        cls.__module__ = "fakemanim.mobject"
+        setattr(module, cls.__name__, cls)
+    module.helper = lambda: None
+    module.OrderedDict = dict
+    return module
+
+def test_digest_describes_the_public_classes():
+    """Test that the digest keeps signatures, inherited keywords and one-line docs of the package's classes."""
+    digest = build_api_digest(fake_manim(), "0.19.0")
+    assert digest["version"] == "0.19.0"
+    assert list(digest["classes"]) == ["Circle", "Mobject", "Open"]
+
+    circle = digest["classes"]["Circle"]
+    assert circle == {
+        "bases": ["Mobject"],
+        "doc": "A circle.",
+        "params": ["radius=1.0", "points=...", "**kwargs"],
+        "accepts": None,
+        "methods": ["width"]
+    }
+    assert digest["classes"]["Mobject"]["methods"] == ["shift(*vectors)"]
+    assert digest["classes"]["Mobject"]["accepts"] == ["color", "name", "z_index"]
+    assert digest["classes"]["Open"]["accepts"] is None
+    assert dict(digest_chunks(digest))["Circle"] == (
+        "class Circle(Mobject): A circle.\nCircle(radius=1.0, points=..., **kwargs)\nmethods: width"
+    )
+
+def test_digest_is_versioned_on_disk(tmp_path):
+    """Test that each Manim version has its own digest file."""
+    digest = build_api_digest(fake_manim(), "0.19.0")
+    assert write_api_digest(digest, tmp_path) == digest_path("0.19.0", tmp_path)
+    assert digest_path("0.18.1", tmp_path) != digest_path("0.19.0", tmp_path)
+
+def test_unknown_keywords_are_reported():
+    """Test that keywords a class with a known set of arguments doesn't accept are validation issues."""
+    digest = build_api_digest(fake_manim(), "0.19.0")
+    code = (
+        "class Scene(ManimVoiceoverBase):\n"
+        "    def construct(self):\n"
+        "        a = Mobject(color=BLUE, size=3)\n"
+        "        b = Mobject(size=1, **style)\n"
+        "        c = Open(size=2)\n"
+        "        d = Circle(radius=2, size=3)\n"
+    )
+    messages = [issue.message for issue in find_code_issues(code, api_digest=digest)]
+    assert "Mobject() got an unexpected keyword argument 'size'" in messages
+    # Circle and Open take **kwargs, so their keywords can't be known to be wrong
+    assert sum("unexpected keyword" in message for message in messages) == 1
+    assert not any("unexpected keyword" in issue.message for issue in find_code_issues(code + "    x = (", digest))
+
+def test_index_uses_the_digest(tmp_path):
+    """Test that the API reference comes from the digest when there is one."""
+    index = ApiDocsIndex(path=tmp_path / "index.bin", api_digest=build_api_digest(fake_manim(), "0.19.0"))
+    assert index.titles == ["Circle", "Mobject", "Open"]
+    assert index.reference(code="Circle(radius=1)").startswith("class Circle(Mobject): A circle.")
+
+def test_digest_is_built_outside_the_package(monkeypatch, tmp_path):
+    """Test that the digest built on first use goes to the cache directory, and a read-only one doesn't lose it."""
+    from leap.core.config import API_DIGEST_DIR, CACHE_DIR
+    from leap.services import api_digest
+    assert CACHE_DIR in API_DIGEST_DIR.parents
+
+    monkeypatch.setattr(api_digest.metadata, "version", lambda package: "0.19.0")
+    monkeypatch.setattr(api_digest.importlib, "import_module", lambda name: fake_manim())
+    assert api_digest.load_api_digest()["classes"]["Circle"]["doc"] == "A circle."
+    assert digest_path("0.19.0").parent == tmp_path / "api_digest" and digest_path("0.19.0").exists()
+
+    def read_only(digest, digest_dir=None):
+        raise PermissionError("Read-only file system")
+    monkeypatch.setattr(api_digest, "write_api_digest", read_only)
+    assert api_digest.load_api_digest(tmp_path / "other")["version"] == "0.19.0"
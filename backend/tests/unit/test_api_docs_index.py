@@ -0,0 +1,94 @@
+"""
+Unit tests for the retrieval of Manim API documentation into prompts.
+"""
+from unittest.mock import MagicMock
+from leap.workflow.nodes import generate_code
+from leap.models import ManimCodeResponse
+from leap.prompts.base import PromptTemplate
+from leap.services import ApiDocsIndex
+from leap.services.api_docs_index import tokenize
+
+DOCS = '''
+class Circle(Arc):
+    """A circle.
+
+    Parameters
+    ----------
+    radius
+        The radius of the circle.
+
+    Examples
+    --------
+    A long rendered example about squares and squares.
+    """
+
+    def __init__(self, radius: float = 1.0, color=RED, **kwargs):
+        pass
+
+    def surround(self, mobject, buffer: float = 0.2):
+        """Move and resize the circle to surround a mobject."""
+
+
+class Square(Rectangle):
+    """A rectangle with equal side lengths."""
+
+    def __init__(self, side_length: float = 2.0, **kwargs):
+        pass
+'''
+
+
+def make_index(tmp_path, docs=DOCS):
+    docs_dir = tmp_path / "docs"
+    docs_dir.mkdir(exist_ok=True)
+    (docs_dir / "shapes.py").write_text(docs)
+    return ApiDocsIndex(path=tmp_path / "index.bin", docs_dir=docs_dir)
+
+def test_tokenize_splits_identifiers():
+    """Test that CamelCase and snake_case identifiers are also indexed by their parts."""
+    assert tokenize("RoundedRectangle(corner_radius=1)") == [
+        "roundedrectangle", "rounded", "rectangle", "corner_radius", "corner", "radius"
+    ]
+
+def test_reference_picks_the_relevant_sections(tmp_path):
+    """Test that the classes and methods the code calls or the error names come first, within the budget."""
+    index = make_index(tmp_path)
+    assert index.titles == ["Circle", "Circle.surround", "Square"]
+    assert "Examples" not in index.text(0)
+
+    reference = index.reference(code="c = Circle(radius=2)\nc.surround(title)", error="", max_tokens=1000)
+    assert reference.startswith("class Circle(Arc)\nCircle(radius: float=1.0, color=RED, **kwargs)")
+    assert "Circle.surround(mobject, buffer: float=0.2)" in reference
+    assert "Square" not in reference
+
+    reference = index.reference(error="TypeError: Square.__init__() got an unexpected keyword argument 'size'")
+    assert reference.startswith("class Square(Rectangle)")
+    assert index.reference(plan="circle", max_tokens=5) == ""
+    assert index.reference(plan="photosynthesis") == ""
+
+def test_index_file_is_reused_until_the_docs_change(tmp_path):
+    """Test that the index is built once, mapped by later instances, and rebuilt for new docs."""
+    make_index(tmp_path)
+    built = (tmp_path / "index.bin").stat().st_mtime_ns
+    assert make_index(tmp_path).titles == ["Circle", "Circle.surround", "Square"]
+    assert (tmp_path / "index.bin").stat().st_mtime_ns == built
+
+    index = make_index(tmp_path, docs=DOCS + '\nclass Dot(Circle):\n    """A small circle."""\n')
+    assert index.titles[-1] == "Dot"
+
+def test_context_sections_follow_the_request():
+    """Test that context sections are appended to the user message, and left out when empty."""
+    template = PromptTemplate(system="You are a teacher.", user="Explain {topic}", context_sections={"api": "API"})
+    assert template.format(topic="gravity", api="Circle(radius)")["user"] == "Explain gravity\n\nAPI:\nCircle(radius)"
+    assert template.format(topic="gravity", api="")["user"] == "Explain gravity"
+    assert template.format(topic="gravity")["user"] == "Explain gravity"
+
+def test_generation_prompt_includes_the_api_reference(sample_state):
+    """Test that the generation request carries the API sections relevant to its plan."""
+    llm_service = MagicMock()
+    llm_service.model = "gpt-4o"
+    llm_service.generate_structured_response.return_value = ManimCodeResponse(code="from manim import *", explanation="")
+    generate_code({**sample_state, "plan": "1. Draw a Star and a RoundedRectangle"}, llm_service=llm_service)
+
+    user_content = llm_service.generate_structured_response.call_args.kwargs["user_content"]
+    assert "RELEVANT MANIM API:\n" in user_content
+    assert "class Star(Polygon)" in user_content
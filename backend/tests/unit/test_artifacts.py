@@ -0,0 +1,126 @@
+"""
+Unit tests for the artifact store and reference-based prompt records.
+"""
+import logging
+import os
+import time
+import pytest
+from unittest.mock import MagicMock
+from leap.workflow.nodes import generate_code
+from leap.models import ManimCodeResponse
+from leap.prompts import CODE_GENERATION_PROMPTS
+from leap.prompts.base import PromptVersion
+from leap.workflow.artifacts import ArtifactStore, cleanup_job_artifacts, is_artifact_ref, record_prompt, render_prompt
+from leap.workflow.graph import log_workflow_end
+from leap.workflow.utils import StateSummary, compact_value, get_manim_api_context
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(tmp_path / "artifacts", inline_limit=100)
+
+def test_put_is_content_addressed(store):
+    """Test that identical content is stored once under the same reference."""
+    ref = store.put("x" * 500)
+    assert is_artifact_ref(ref)
+    assert store.put("x" * 500) == ref
+    assert store.get(ref) == "x" * 500
+    assert len(list(store.directory.iterdir())) == 1
+    with pytest.raises(KeyError):
+        store.get("artifact:" + "0" * 64)
+
+def test_artifacts_are_scoped_and_removed_per_job(tmp_path):
+    """Test that a job's artifacts live in its own directory and are deleted with it, or once abandoned."""
+    job = ArtifactStore(tmp_path / "artifacts", job_id="a" * 32)
+    other = ArtifactStore(tmp_path / "artifacts", job_id="b" * 32)
+    ref = job.put("x" * 500)
+    other_ref = other.put("x" * 500)
+    assert ref != other_ref and ref.startswith("artifact:" + "a" * 32 + "/")
+    assert ArtifactStore(tmp_path / "artifacts").get(ref) == "x" * 500
+    with pytest.raises(KeyError):
+        job.get("artifact:../../etc/passwd")
+
+    cleanup_job_artifacts({"job_id": "a" * 32}, ArtifactStore(tmp_path / "artifacts"))
+    with pytest.raises(KeyError):
+        job.get(ref)
+    assert other.get(other_ref) == "x" * 500
+
+    assert other.prune(max_age_seconds=3600) == 0
+    os.utime(other.directory, (time.time() - 7200, time.time() - 7200))
+    assert other.prune(max_age_seconds=3600) == 1
+    assert not other.directory.exists()
+
+def test_reference_keeps_small_values_inline(store):
+    """Test that only long strings are replaced by references."""
+    assert store.reference("short") == "short"
+    assert store.reference(42) == 42
+    assert is_artifact_ref(store.reference("y" * 101))
+    assert store.resolve(store.reference("y" * 101)) == "y" * 101
+
+def test_record_and_render_prompt(store):
+    """Test that a recorded prompt is small and renders to the messages that were sent."""
+    params = {
+        "user_input": "What is a derivative?",
+        "plan": "1. Slope\n2. Limit",
+        "user_level_instruction": "Normal level",
+        "duration_instruction": "Keep it short",
+        "code_template": "class SCENE_NAME: pass",
+        "example_code": get_manim_api_context()
+    }
+    prompts = record_prompt({"prompts": {"planning": {}}}, "generation", "code_generation", PromptVersion.PRODUCTION, params, store)
+
+    record = prompts["generation"]
+    assert "planning" in prompts
+    assert record["template"] == "code_generation" and record["version"] == "production"
+    assert record["params"]["user_input"] == "What is a derivative?"
+    assert is_artifact_ref(record["params"]["example_code"])
+    assert render_prompt(record, store) == CODE_GENERATION_PROMPTS.get(PromptVersion.PRODUCTION).format(**params)
+
+def test_generate_code_records_prompt_references(sample_state):
+    """Test that the generation node keeps the API docs and example out of the state."""
+    llm_service = MagicMock()
+    llm_service.model = "gpt-4o"
+    llm_service.generate_structured_response.return_value = ManimCodeResponse(code="from manim import *", explanation="")
+    result = generate_code({**sample_state, "plan": "1. Intro"}, llm_service=llm_service)
+
+    record = result["prompts"]["generation"]
+    assert record["template"] == "code_generation"
+    assert is_artifact_ref(record["params"]["example_code"])
+    assert len(str(result["prompts"])) < 2000
+    sent = llm_service.generate_structured_response.call_args.kwargs
+    assert render_prompt(record) == {"system": sent["system_content"], "user": sent["user_content"]}
+
+def test_prompt_artifacts_are_deleted_when_the_job_ends(sample_state):
+    """Test that the artifacts of a job's prompts are kept while it runs and deleted by the end of the workflow."""
+    llm_service = MagicMock()
+    llm_service.model = "gpt-4o"
+    llm_service.generate_structured_response.return_value = ManimCodeResponse(code="from manim import *", explanation="")
+    state = {**sample_state, "plan": "1. Intro", "job_id": "c" * 32}
+    result = generate_code(state, llm_service=llm_service)
+    ref = result["prompts"]["generation"]["params"]["example_code"]
+    assert ref.startswith("artifact:" + "c" * 32 + "/")
+    assert ArtifactStore().get(ref)
+
+    log_workflow_end(result)
+    with pytest.raises(KeyError):
+        ArtifactStore().get(ref)
+
+def test_state_summary_is_compact_and_lazy(caplog):
+    """Test that large values are logged as their size, and only when the record is emitted."""
+    state = {"user_input": "test", "generated_code": "x" * 5000, "prompts": {"generation": {"plan": "y" * 300}}}
+    summary = compact_value(state)
+    assert "<5000 chars>" in summary and "<300 chars>" in summary and "x" * 300 not in summary
+
+    formatted = []
+
+    class CountingSummary(StateSummary):
+        def __str__(self):
+            formatted.append(True)
+            return super().__str__()
+
+    logger = logging.getLogger("leap.test_artifacts")
+    logger.setLevel(logging.WARNING)
+    logger.info("State: %s", CountingSummary(state))
+    assert not formatted
+    logger.warning("State: %s", CountingSummary(state))
+    assert formatted
+    assert "<5000 chars>" in caplog.text
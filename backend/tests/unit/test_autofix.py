@@ -0,0 +1,86 @@
+"""
+Unit tests for the rule-based auto-fixer.
+"""
+import pytest
+from unittest.mock import MagicMock
+from leap.workflow.autofix import apply_auto_fixes
+from leap.workflow.errors import distill_error
+from leap.workflow.nodes.auto_fix import auto_fix_code
+
+SCENE_CODE = """from manim import *
+from leap.templates.base_scene import ManimVoiceoverBase
+
+class GravityScene(ManimVoiceoverBase):
+    def construct(self):
+        # A comment that must survive the fix
+        circle = Circle(color=LIGHT_BLUE)
+        title = Text("Gravity", size=42)
+        with self.voiceover(text="Gravity") as tracker:
+            self.play(ShowCreation(circle), run_time=tracker.duration)
+        self.clear()
+"""
+
+RICH_TRACEBACK = """Error executing code: Traceback (most recent call last)
+│ /app/generated/code/gravity.py:10 in construct                                │
+│ ❱ 10 │   │   │   self.play(ShowCreation(circle), run_time=tracker.duration)   │
+╰───────────────────────────────────────────────────────────────────────────────╯
+NameError: name 'ShowCreation' is not defined
+"""
+
+def test_distill_error():
+    """Test that tracebacks are reduced to the exception line."""
+    assert distill_error(RICH_TRACEBACK) == "NameError: name 'ShowCreation' is not defined"
+    assert distill_error("ERROR: Code must import all Manim classes") == "ERROR: Code must import all Manim classes"
+    assert distill_error("") == ""
+
+def test_show_creation_fix_preserves_formatting():
+    """Test that ShowCreation is renamed without touching the rest of the code."""
+    fixed, applied = apply_auto_fixes(SCENE_CODE, RICH_TRACEBACK)
+    assert applied == ["show_creation"]
+    assert "self.play(Create(circle), run_time=tracker.duration)" in fixed
+    assert "# A comment that must survive the fix" in fixed
+    assert fixed.replace("Create(circle)", "ShowCreation(circle)") == SCENE_CODE
+
+@pytest.mark.parametrize("error,expected", [
+    ("NameError: name 'LIGHT_BLUE' is not defined", "Circle(color=BLUE_B)"),
+    ("TypeError: Mobject.__init__() got an unexpected keyword argument 'size'", 'Text("Gravity", font_size=42)'),
+    ("ERROR: self.clear() removes the background. Use self.fade_out_scene() instead.", "self.fade_out_scene()"),
+])
+def test_rule_fixes(error, expected):
+    """Test the individual rules against their error signatures."""
+    fixed, applied = apply_auto_fixes(SCENE_CODE, error)
+    assert len(applied) == 1
+    assert expected in fixed
+
+def test_missing_imports():
+    """Test that missing imports are added."""
+    code = "class A(ManimVoiceoverBase):\n    def construct(self):\n        pass\n"
+    error = "ERROR: Code must import all Manim classes\nERROR: Code must import ManimVoiceoverBase"
+    fixed, applied = apply_auto_fixes(code, error)
+    assert applied == ["missing_manim_import", "missing_base_import"]
+    assert fixed.startswith("from manim import *\nfrom leap.templates.base_scene import ManimVoiceoverBase\n")
+
+def test_no_matching_rule():
+    """Test that unknown errors leave the code untouched."""
+    fixed, applied = apply_auto_fixes(SCENE_CODE, "ValueError: latex error converting to dvi")
+    assert applied == []
+    assert fixed == SCENE_CODE
+
+def test_auto_fix_node():
+    """Test that the node reports whether it changed the code."""
+    state = {
+        "user_input": "How does gravity work?",
+        "generated_code": SCENE_CODE,
+        "error": RICH_TRACEBACK,
+        "correction_attempts": 0
+    }
+    result = auto_fix_code(state, file_service=MagicMock())
+    assert result["auto_fix_applied"] is True
+    assert result["auto_fix_attempts"] == 1
+    assert result["error"] is None
+    assert "ShowCreation" not in result["generated_code"]
+
+    state["error"] = "RuntimeError: something unexpected"
+    result = auto_fix_code(state, file_service=MagicMock())
+    assert result["auto_fix_applied"] is False
+    assert result["error"] == state["error"]
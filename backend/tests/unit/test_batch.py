@@ -0,0 +1,98 @@
+"""
+Unit tests for batch generation.
+"""
+import json
+import threading
+import time
+import pytest
+from leap.core.concurrency import concurrency_slot
+from leap.workflow.batch import load_batch, run_batch, summarize_batch
+
+PROMPTS = [
+    {"prompt": "What is a derivative?", "level": "normal", "quality": "low"},
+    {"prompt": "Why is the sky blue?", "level": "ELI5"},
+    {"prompt": "How do magnets work?", "level": "advanced", "quality": "medium"},
+]
+
+@pytest.fixture
+def batch_file(tmp_path):
+    path = tmp_path / "prompts.jsonl"
+    path.write_text("\n".join(json.dumps(prompt) for prompt in PROMPTS) + "\n")
+    return path
+
+def _invoke(state):
+    if "magnets" in state["user_input"]:
+        return {"error": "Error executing code: NameError", "correction_attempts": 5, "node_timings": {"execute_code": 4.0}}
+    corrected = "sky" in state["user_input"]
+    return {
+        "execution_result": {"success": True, "output_file": "/tmp/video.mp4"},
+        "correction_attempts": 1 if corrected else 0,
+        "node_timings": {"generate_code": 2.0, "execute_code": 6.0}
+    }
+
+def test_load_batch_defaults_and_ids(batch_file, tmp_path):
+    """Test that missing fields get defaults and ids don't depend on the line order."""
+    items = load_batch(batch_file)
+    assert items[1]["quality"] == "low" and items[1]["tier"] == "standard"
+
+    reordered = tmp_path / "reordered.jsonl"
+    reordered.write_text("\n".join(json.dumps(prompt) for prompt in reversed(PROMPTS)))
+    assert [item["id"] for item in load_batch(reordered)] == [item["id"] for item in reversed(items)]
+
+    broken = tmp_path / "broken.jsonl"
+    broken.write_text('{"level": "normal"}\n')
+    with pytest.raises(ValueError):
+        load_batch(broken)
+
+def test_run_batch_report(batch_file, tmp_path):
+    """Test that every prompt is recorded and the report aggregates the results."""
+    results_path = tmp_path / "results.jsonl"
+    report = run_batch(load_batch(batch_file), results_path, invoke=_invoke, concurrency=2)
+
+    assert len(results_path.read_text().splitlines()) == 3
+    assert report["jobs"] == 3 and report["succeeded"] == 2
+    assert report["first_pass_success_rate"] == pytest.approx(1 / 3)
+    assert report["jobs_per_hour"] > 0
+    assert report["stages"]["execute_code"]["p95_seconds"] == 6.0
+
+def test_run_batch_resumes(batch_file, tmp_path):
+    """Test that recorded prompts are skipped, and failures rerun only when asked."""
+    results_path = tmp_path / "results.jsonl"
+    items = load_batch(batch_file)
+    run_batch(items[:1], results_path, invoke=_invoke)
+
+    calls = []
+    def invoke(state):
+        calls.append(state["user_input"])
+        return _invoke(state)
+
+    report = run_batch(items, results_path, invoke=invoke)
+    assert sorted(calls) == ["How do magnets work?", "Why is the sky blue?"]
+    assert report["ran_this_run"] == 2 and report["jobs"] == 3
+
+    calls.clear()
+    run_batch(items, results_path, invoke=invoke, retry_failed=True)
+    assert calls == ["How do magnets work?"]
+
+def test_llm_concurrency_limit(batch_file, tmp_path):
+    """Test that the LLM limit holds while several prompts are in flight."""
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def invoke(state):
+        with concurrency_slot("llm"):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+        return _invoke(state)
+
+    run_batch(load_batch(batch_file), tmp_path / "results.jsonl", invoke=invoke, concurrency=3, llm_concurrency=1)
+    assert peak[0] == 1
+
+def test_summarize_empty_batch():
+    """Test the report of a batch without results."""
+    report = summarize_batch([], wall_seconds=0, ran=0)
+    assert report["jobs"] == 0 and report["jobs_per_hour"] == 0.0
+    assert report["latency"]["p50_seconds"] is None
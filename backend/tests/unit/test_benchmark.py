@@ -0,0 +1,68 @@
+"""
+Unit tests for the pipeline benchmark.
+"""
+import os
+from leap.workflow.budget import timed_node
+from leap.services.llm_cassette import LLMCassette
+from leap.models import ScenePlanResponse
+from leap.tools.benchmark import summarize_runs, compare_results, bytes_written_since
+
+def _record(quality="low", success=True, corrections=0, render=6.0, total=10.0):
+    return {
+        "quality": quality,
+        "success": success,
+        "first_pass": success and not corrections,
+        "total_seconds": total,
+        "node_timings": {"generate_code": 2.0, "execute_code": render},
+        "node_calls": {"generate_code": 1, "execute_code": 1 + corrections, "correct_code": corrections}
+    }
+
+RECORDS = [_record(), _record(quality="medium", render=20.0, total=25.0), _record(success=False, corrections=2)]
+
+def test_summarize_runs():
+    """Test that node times, render times per quality and correction loops are aggregated."""
+    summary = summarize_runs(RECORDS)
+    assert summary["prompts"] == 3
+    assert summary["success_rate"] == 2 / 3
+    assert summary["nodes"]["generate_code"]["p50"] == 2.0
+    assert summary["render_seconds_by_quality"]["medium"]["p50"] == 20.0
+    assert summary["render_seconds_by_quality"]["low"]["mean"] == 6.0
+    assert summary["correction_loops"] == {"total": 2, "auto_fixes": 0, "max_per_prompt": 2}
+
+def test_compare_results():
+    """Test that only slowdowns past the threshold and success drops are regressions."""
+    baseline = {"summary": summarize_runs(RECORDS)}
+    slightly_slower = [{**record, "total_seconds": record["total_seconds"] * 1.1} for record in RECORDS]
+    assert compare_results({"summary": summarize_runs(slightly_slower)}, baseline, 0.2) == []
+
+    slower_render = [{**record, "node_timings": {"generate_code": 2.0, "execute_code": 30.0}} for record in RECORDS]
+    regressions = compare_results({"summary": summarize_runs(slower_render)}, baseline, 0.2)
+    assert len(regressions) == 1 and regressions[0].startswith("execute_code")
+
+    failing = [{**record, "success": False} for record in RECORDS]
+    assert any("success rate" in r for r in compare_results({"summary": summarize_runs(failing)}, baseline, 0.2))
+
+def test_timed_node_counts_calls():
+    """Test that every run of a node is counted."""
+    node = timed_node("correct_code", lambda state: {})
+    state = {"user_input": "test"}
+    for _ in range(3):
+        state.update(node(state))
+    assert state["node_calls"] == {"correct_code": 3}
+
+def test_cassette_key_ignores_run_specific_details():
+    """Test that timestamps and addresses don't change the replay key."""
+    key = LLMCassette.request_key
+    first = key("gpt-4o", ScenePlanResponse, "system", "Error in scene_20250101_120000.py at 0x7f3a2b")
+    second = key("gpt-4o", ScenePlanResponse, "system", "Error in scene_20260203_093015.py at 0x7f9c11")
+    assert first == second
+    assert first != key("gpt-4o", ScenePlanResponse, "system", "Error in other_20250101_120000.py at 0x7f3a2b")
+
+def test_bytes_written_since(tmp_path):
+    """Test that only files written during the run are counted."""
+    old = tmp_path / "old.mp4"
+    old.write_bytes(b"x" * 10)
+    os.utime(old, (0, 0))
+    (tmp_path / "videos").mkdir()
+    (tmp_path / "videos" / "new.mp4").write_bytes(b"x" * 25)
+    assert bytes_written_since(tmp_path, 1000) == 25
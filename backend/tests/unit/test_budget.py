@@ -0,0 +1,149 @@
+"""
+Unit tests for the per-job latency budget.
+"""
+import time
+import pytest
+from leap.core.config import (
+    MAX_ATTEMPTS, OPENAI_MODEL, FAST_OPENAI_MODEL, TTS_MODEL, FAST_TTS_MODEL, RENDER_TIMEOUT_MIN_SECONDS
+)
+from leap.workflow.budget import (
+    remaining_seconds,
+    select_model,
+    select_video_length,
+    select_rendering_quality,
+    select_tts_model,
+    max_correction_attempts,
+    render_timeout,
+    timed_node
+)
+from leap.workflow.latency import record_job_latency
+from leap.workflow.graph import create_workflow, create_scene_workflow, log_workflow_end
+
+def state_with_remaining(seconds, **kwargs):
+    """State whose latency budget has `seconds` left."""
+    return {"user_input": "What is entropy?", "latency_budget": 1800, "deadline": time.time() + seconds, **kwargs}
+
+def test_no_budget_keeps_defaults():
+    """Test that jobs without a budget use the default strategy."""
+    state = {"user_input": "What is entropy?", "rendering_quality": "high", "correction_attempts": 2}
+    assert remaining_seconds(state) is None
+    assert select_model(state) == OPENAI_MODEL
+    assert select_video_length(state) == "long"
+    assert select_rendering_quality(state) == "high"
+    assert select_tts_model(state) == TTS_MODEL
+    assert max_correction_attempts(state) == MAX_ATTEMPTS
+
+def test_generous_budget_keeps_defaults():
+    """Test that a large remaining budget doesn't degrade the job."""
+    state = state_with_remaining(3600, rendering_quality="medium")
+    assert select_model(state) == OPENAI_MODEL
+    assert select_video_length(state) == "long"
+    assert select_rendering_quality(state) == "medium"
+    assert max_correction_attempts(state) == MAX_ATTEMPTS
+
+def test_tight_budget_picks_cheaper_strategies():
+    """Test that a short remaining budget switches to faster choices."""
+    state = state_with_remaining(250, rendering_quality="high", correction_attempts=1)
+    assert select_model(state) == FAST_OPENAI_MODEL
+    assert select_video_length(state) == "short"
+    assert select_rendering_quality(state) == "low"
+    assert select_tts_model(state) == FAST_TTS_MODEL
+    # One correction (LLM call + low quality render) fits in the remaining time
+    assert max_correction_attempts(state) == 2
+
+def test_timed_node_records_time_and_sets_deadline():
+    """Test that node time is recorded and the deadline is fixed on the first node."""
+    node = timed_node("plan_scenes", lambda state: {**state, "plan": "1. Intro"})
+    result = node({"user_input": "What is entropy?", "latency_budget": 600})
+
+    assert result["plan"] == "1. Intro"
+    assert result["deadline"] == pytest.approx(time.time() + 600, abs=5)
+    assert set(result["node_timings"]) == {"plan_scenes"}
+
+def test_timed_node_stops_when_budget_is_spent():
+    """Test that nodes are skipped once the budget is spent, keeping the best code."""
+    calls = []
+    node = timed_node("correct_code", lambda state: calls.append(state) or state)
+    state = state_with_remaining(
+        -1,
+        generated_code="broken",
+        last_valid_code="validated",
+        error="Error executing code: boom"
+    )
+    result = node(state)
+
+    assert not calls
+    assert "exhausted before correct_code" in result["stop_reason"]
+    assert result["generated_code"] == "validated"
+    assert result["error"] == "Error executing code: boom"
+
+def test_workflow_ends_when_budget_is_spent():
+    """Test that the graph goes straight to the end once the budget is spent."""
+    result = create_workflow().invoke(state_with_remaining(-1))
+    assert "exhausted before validate_input" in result["stop_reason"]
+    assert not result.get("plan")
+
+def _scene_pipeline(monkeypatch, execution_errors, remaining_after_correction):
+    """Code pipeline whose executions fail with `execution_errors` in turn, and whose correction spends the budget."""
+    calls = []
+    def record(name, update):
+        def node(state, *args, **kwargs):
+            calls.append(name)
+            return {**state, **update(state)}
+        return node
+
+    def execute(state):
+        error = execution_errors[calls.count("execute_code") - 1]
+        return {"error": error, "execution_result": {"success": not error, "output_file": None if error else "/tmp/video.mp4"}}
+
+    monkeypatch.setattr("leap.workflow.graph.generate_code", record("generate_code", lambda state: {"generated_code": "code"}))
+    monkeypatch.setattr("leap.workflow.graph.validate_code", record("validate_code", lambda state: {"error": None}))
+    monkeypatch.setattr("leap.workflow.graph.execute_code", record("execute_code", execute))
+    monkeypatch.setattr("leap.workflow.graph.auto_fix_code", record("auto_fix", lambda state: {"auto_fix_applied": False}))
+    monkeypatch.setattr("leap.workflow.graph.error_correction", record("correct_code", lambda state: {
+        "generated_code": "fixed",
+        "error": None,
+        "correction_attempts": state.get("correction_attempts", 0) + 1,
+        "deadline": time.time() + remaining_after_correction
+    }))
+    return create_scene_workflow(), calls
+
+def test_correction_that_spends_the_budget_is_still_rendered(monkeypatch):
+    """Test that affordability is checked before a correction, and the correction that ran is validated and rendered."""
+    pipeline, calls = _scene_pipeline(monkeypatch, ["Error executing code: boom", None], remaining_after_correction=5)
+    result = pipeline.invoke(state_with_remaining(200, rendering_quality="low", correction_attempts=0))
+
+    assert calls == ["generate_code", "validate_code", "execute_code", "auto_fix", "correct_code", "validate_code", "execute_code"]
+    assert result["execution_result"]["output_file"] == "/tmp/video.mp4"
+    assert not result.get("stop_reason")
+
+def test_correction_is_not_started_without_time_for_it(monkeypatch):
+    """Test that no correction starts when it and its render don't fit in the remaining time."""
+    pipeline, calls = _scene_pipeline(monkeypatch, ["Error executing code: boom"], remaining_after_correction=5)
+    result = pipeline.invoke(state_with_remaining(100, rendering_quality="low", correction_attempts=0))
+
+    assert "correct_code" not in calls and "auto_fix" not in calls
+    assert result["error"] == "Error executing code: boom"
+
+def test_stopped_job_is_logged_as_failed(caplog):
+    """Test that a job stopped early, or ended without a video, isn't reported as a success."""
+    with caplog.at_level("INFO", logger="leap"):
+        log_workflow_end({"user_input": "What is entropy?", "stop_reason": "Latency budget of 60s exhausted"})
+        log_workflow_end({"user_input": "What is entropy?", "execution_result": {"success": False, "output_file": None}})
+    assert "Workflow stopped early: Latency budget of 60s exhausted" in caplog.text
+    assert "Workflow ended without producing a video" in caplog.text
+    assert "completed successfully" not in caplog.text
+
+def test_stopped_and_videoless_jobs_are_recorded_as_failures(tmp_path):
+    """Test that the latency records count a job as successful only when it produced a video."""
+    video = {"execution_result": {"success": True, "output_file": "/tmp/video.mp4"}}
+    assert record_job_latency(video, tmp_path)["success"]
+    assert record_job_latency({"cached_result": {"video_url": "https://example.com/v.mp4"}}, tmp_path)["success"]
+    assert not record_job_latency({**video, "stop_reason": "Latency budget of 60s exhausted"}, tmp_path)["success"]
+    assert not record_job_latency({"execution_result": {"success": False, "output_file": None}}, tmp_path)["success"]
+
+def test_render_timeout_stops_at_the_deadline():
+    """Test that a render started near the deadline may not run past it, but gets a minimum time."""
+    assert render_timeout({}, "high") > 600
+    assert render_timeout(state_with_remaining(300), "high") == pytest.approx(300, abs=1)
+    assert render_timeout(state_with_remaining(5), "high") == RENDER_TIMEOUT_MIN_SECONDS
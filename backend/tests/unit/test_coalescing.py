@@ -0,0 +1,140 @@
+"""
+Unit tests for coalescing identical in-flight animation requests.
+"""
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+import pytest
+from unittest.mock import MagicMock
+from leap.api.models.requests import AnimationRequest
+from leap.api.services.animation import AnimationService, make_request_key
+
+@pytest.fixture
+def service(monkeypatch):
+    """Animation service with a mocked workflow and the local (mock) job store."""
+    monkeypatch.setattr("leap.api.services.animation.COALESCE_POLL_SECONDS", 0.01)
+    service = AnimationService()
+    service.supabase.supabase = None
+    service.email_service = MagicMock()
+    return service
+
+def _invoke(state):
+    time.sleep(0.2)
+    return {"execution_result": {"success": True, "output_file": "/tmp/leap/derivatives.mp4"}}
+
+async def _submit(service, prompt, level="normal"):
+    response = await service.create_job(AnimationRequest(prompt=prompt, level=level, email="student@example.com"))
+    return uuid.UUID(response["job_id"])
+
+def test_identical_requests_share_one_run(service, monkeypatch):
+    """Test that concurrent identical requests run the workflow once and get the same video."""
+    invoke = MagicMock(side_effect=_invoke)
+    monkeypatch.setattr("leap.api.services.animation.workflow.invoke", invoke)
+
+    async def run():
+        first = await _submit(service, "What is a derivative?")
+        second = await _submit(service, "what is a derivative")
+        await asyncio.gather(
+            service.process_job(first, "What is a derivative?", "normal", email="student@example.com"),
+            service.process_job(second, "what is a derivative", "normal", email="student@example.com")
+        )
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert invoke.call_count == 1
+    assert service.jobs[first].status == service.jobs[second].status == "completed"
+    assert service.jobs[first].video_url == service.jobs[second].video_url
+    assert service.jobs[second].leader_id == first
+    assert service.email_service.send_animation_ready_notification.call_count == 2
+
+def test_different_levels_run_separately(service, monkeypatch):
+    """Test that requests for another level are not coalesced."""
+    invoke = MagicMock(side_effect=_invoke)
+    monkeypatch.setattr("leap.api.services.animation.workflow.invoke", invoke)
+
+    async def run():
+        first = await _submit(service, "What is a derivative?")
+        second = await _submit(service, "What is a derivative?", level="ELI5")
+        await asyncio.gather(
+            service.process_job(first, "What is a derivative?", "normal"),
+            service.process_job(second, "What is a derivative?", "ELI5")
+        )
+
+    asyncio.run(run())
+    assert invoke.call_count == 2
+
+def test_follower_runs_by_itself_when_the_leader_fails(service, monkeypatch):
+    """Test that a job sharing a failed run doesn't inherit the failure but runs the workflow itself."""
+    invoke = MagicMock(side_effect=_invoke)
+    monkeypatch.setattr("leap.api.services.animation.workflow.invoke", invoke)
+    service.supabase.set_job_leader = MagicMock()
+
+    async def run():
+        leader = await _submit(service, "What is a derivative?")
+        follower = await _submit(service, "What is a derivative?")
+        service.jobs[leader].status = "failed"
+        service.jobs[leader].error = "Latency budget of 600s exhausted before execute_code"
+        assert not await service._follow_leader(service.jobs[follower], follower, leader)
+        await service.process_job(follower, "What is a derivative?", "normal")
+        return leader, follower
+
+    leader, follower = asyncio.run(run())
+    assert invoke.call_count == 1
+    assert service.jobs[follower].status == "completed" and service.jobs[follower].error is None
+    # The job store knows which job a follower shares, so followers are never picked as leaders
+    assert service.supabase.set_job_leader.call_args_list[:2] == [
+        ((str(follower), str(leader)),), ((str(follower), None),)
+    ]
+
+def test_job_without_a_video_fails(service, monkeypatch):
+    """Test that a run stopped early or ending without a video fails the job instead of completing it."""
+    results = iter([
+        {"stop_reason": "Latency budget of 600s exhausted before execute_code"},
+        {"execution_result": {"success": False, "output_file": None}}
+    ])
+    monkeypatch.setattr("leap.api.services.animation.workflow.invoke", lambda state: next(results))
+
+    async def run():
+        stopped = await _submit(service, "What is a derivative?")
+        await service.process_job(stopped, "What is a derivative?", "normal")
+        empty = await _submit(service, "What is an integral?")
+        await service.process_job(empty, "What is an integral?", "normal")
+        return stopped, empty
+
+    stopped, empty = asyncio.run(run())
+    assert service.jobs[stopped].status == service.jobs[empty].status == "failed"
+    assert service.jobs[stopped].error == "Latency budget of 600s exhausted before execute_code"
+    assert service.jobs[empty].error == "The workflow finished without producing a video"
+    assert service.jobs[empty].video_url is None
+
+def test_different_long_prompts_run_separately(service, monkeypatch):
+    """Test that long prompts sharing their first words are not coalesced."""
+    invoke = MagicMock(side_effect=_invoke)
+    monkeypatch.setattr("leap.api.services.animation.workflow.invoke", invoke)
+    geometric = "Explain how to compute the average of a list of positive numbers using the geometric mean"
+    harmonic = "Explain how to compute the average of a list of positive numbers using the harmonic mean"
+    assert make_request_key(geometric, "normal") != make_request_key(harmonic, "normal")
+    assert make_request_key("What is a derivative?", "normal") == make_request_key(" what is a  derivative", "normal")
+
+    async def run():
+        first = await _submit(service, geometric)
+        second = await _submit(service, harmonic)
+        await asyncio.gather(
+            service.process_job(first, geometric, "normal"),
+            service.process_job(second, harmonic, "normal")
+        )
+        return second
+
+    second = asyncio.run(run())
+    assert invoke.call_count == 2
+    assert service.jobs[second].leader_id is None
+
+def test_followers_are_not_leader_candidates(service):
+    """Test that the in-flight query of the shared job store leaves out the jobs following another."""
+    client = MagicMock()
+    service.supabase.supabase = client
+    service.supabase.find_inflight_jobs("key", datetime.now(timezone.utc))
+    client.table.return_value.select.return_value.eq.return_value.in_.return_value.is_.assert_called_once_with(
+        "leader_id", "null"
+    )
@@ -0,0 +1,79 @@
+"""
+Unit tests for classifying unrecoverable environment errors.
+"""
+import pytest
+from unittest.mock import MagicMock
+from leap.core.config import ESTIMATED_RENDER_SECONDS
+from leap.workflow.budget import render_timeout
+from leap.workflow.errors import classify_error
+from leap.workflow.nodes.execution import execute_code
+
+@pytest.mark.parametrize("error,returncode,expected", [
+    ("! LaTeX Error: File `physics.sty' not found.", 1, "latex_missing"),
+    ("FileNotFoundError: [Errno 2] No such file or directory: 'latex'", 1, "latex_missing"),
+    ("openai.AuthenticationError: Error code: 401 - Incorrect API key provided", 1, "tts_credentials"),
+    ("FileNotFoundError: [Errno 2] No such file or directory: 'ffmpeg'", 1, "ffmpeg_missing"),
+    ("MemoryError", 1, "out_of_memory"),
+    ("", -9, "out_of_memory"),
+    ("Manim execution timed out after 180 seconds", None, "timeout"),
+    ("OSError: [Errno 28] No space left on device", 1, "disk_full"),
+    ("NameError: name 'ShowCreation' is not defined", 1, None),
+    ("ValueError: latex error converting to dvi. See log output above", 1, None),
+])
+def test_classify_error(error, returncode, expected):
+    """Test that environment failures are recognized and code errors are not."""
+    assert classify_error(error, returncode) == expected
+
+def test_execute_code_marks_unrecoverable_errors():
+    """Test that execution flags environment failures so correction is skipped."""
+    manim_service = MagicMock()
+    manim_service.execute_manim_code.return_value = {
+        "success": False,
+        "output": None,
+        "error": "! LaTeX Error: File `physics.sty' not found.",
+        "output_file": None,
+        "returncode": 1
+    }
+    state = {
+        "user_input": "Explain momentum",
+        "generated_code": "from manim import *",
+        "correction_attempts": 0
+    }
+
+    result = execute_code(state, file_service=MagicMock(), manim_service=manim_service)
+
+    assert result["failure_category"] == "latex_missing"
+    assert "LaTeX" in result["stop_reason"]
+    assert result["error"].startswith("Error executing code:")
+
+    manim_service.execute_manim_code.return_value["error"] = "NameError: name 'x' is not defined"
+    state = {"user_input": "Explain momentum", "generated_code": "from manim import *", "correction_attempts": 0}
+    result = execute_code(state, file_service=MagicMock(), manim_service=manim_service)
+    assert not result.get("failure_category")
+
+def test_render_timeout_scales_with_quality_and_length():
+    """Test that renders get at least their typical time with headroom, more for long videos."""
+    for quality, seconds in ESTIMATED_RENDER_SECONDS.items():
+        assert render_timeout({"video_length": "short"}, quality) > seconds
+        assert render_timeout({"video_length": "long"}, quality) > render_timeout({"video_length": "short"}, quality)
+    assert render_timeout({}, "high") > render_timeout({}, "medium") > render_timeout({}, "low")
+
+def test_timed_out_render_is_retried_at_lower_quality():
+    """Test that a timeout is only fatal once the render also timed out at the lowest quality."""
+    timed_out = {"success": False, "output": None, "error": "Manim execution timed out after 1080 seconds", "output_file": None}
+    manim_service = MagicMock()
+    manim_service.execute_manim_code.side_effect = [
+        timed_out, {"success": True, "output": "", "error": None, "output_file": "/tmp/video.mp4"}
+    ]
+    state = {"user_input": "Explain momentum", "generated_code": "from manim import *", "rendering_quality": "medium"}
+
+    result = execute_code(state, file_service=MagicMock(), manim_service=manim_service)
+    assert result["execution_result"]["output_file"] == "/tmp/video.mp4"
+    assert not result.get("failure_category")
+    qualities = [call.args[1] for call in manim_service.execute_manim_code.call_args_list]
+    assert qualities == ["medium", "low"]
+
+    manim_service.execute_manim_code.side_effect = [timed_out, timed_out]
+    state = {"user_input": "Explain momentum", "generated_code": "from manim import *", "rendering_quality": "medium"}
+    result = execute_code(state, file_service=MagicMock(), manim_service=manim_service)
+    assert result["failure_category"] == "timeout"
@@ -0,0 +1,86 @@
+"""
+Unit tests for the learned fix cache.
+"""
+import pytest
+from unittest.mock import MagicMock
+from leap.services.fix_cache_service import FixCacheService, compute_fix_hunks, apply_fix_hunks
+from leap.workflow.errors import fingerprint_error
+from leap.workflow.nodes.auto_fix import auto_fix_code
+
+FAILING_CODE = """from manim import *
+from leap.templates.base_scene import ManimVoiceoverBase
+
+class Waves(ManimVoiceoverBase):
+    def construct(self):
+        wave = FunctionGraph(lambda x: np.sin(x), x_min=-3, x_max=3)
+        self.play(Create(wave))"""
+
+FIXED_CODE = FAILING_CODE.replace("x_min=-3, x_max=3", "x_range=[-3, 3]")
+
+ERROR = "TypeError: FunctionGraph.__init__() got an unexpected keyword argument 'x_min'"
+
+@pytest.fixture
+def fix_cache(tmp_path):
+    """Fix cache backed by a temporary database."""
+    return FixCacheService(db_path=tmp_path / "fix_cache.db")
+
+def test_fingerprint_ignores_paths_and_numbers():
+    """Test that the same failure in different jobs has the same fingerprint."""
+    first = 'File "/tmp/a/scene_1.py", line 12\nIndexError: list index out of range at 3'
+    second = 'File "/tmp/b/scene_2.py", line 40\nIndexError: list index out of range at 7'
+    assert fingerprint_error(first) == fingerprint_error(second)
+    assert fingerprint_error(ERROR) != fingerprint_error("NameError: name 'x' is not defined")
+
+def test_hunks_replay_on_differently_indented_code():
+    """Test that hunks apply to other code containing the same snippet."""
+    hunks = compute_fix_hunks(FAILING_CODE, FIXED_CODE)
+    assert hunks == [{
+        "before": "        wave = FunctionGraph(lambda x: np.sin(x), x_min=-3, x_max=3)",
+        "after": "        wave = FunctionGraph(lambda x: np.sin(x), x_range=[-3, 3])"
+    }]
+
+    other = "def helper():\n    wave = FunctionGraph(lambda x: np.sin(x), x_min=-3, x_max=3)\n    return wave"
+    assert apply_fix_hunks(other, hunks) == (
+        "def helper():\n    wave = FunctionGraph(lambda x: np.sin(x), x_range=[-3, 3])\n    return wave"
+    )
+    assert apply_fix_hunks("print('unrelated')", hunks) is None
+
+def test_record_and_lookup(fix_cache):
+    """Test storing a fix and replaying it, with hit rate tracking."""
+    fingerprint = fingerprint_error(ERROR)
+    fix_id = fix_cache.record_fix(fingerprint, ERROR, compute_fix_hunks(FAILING_CODE, FIXED_CODE))
+    assert fix_id is not None
+
+    assert fix_cache.lookup(fingerprint_error("NameError: name 'x' is not defined"), FAILING_CODE) is None
+    assert fix_cache.lookup(fingerprint, FAILING_CODE) == (fix_id, FIXED_CODE)
+
+    stats = fix_cache.stats()
+    assert stats["entries"] == 1
+    assert stats["lookups"] == 2
+    assert stats["hits"] == 1
+    assert stats["hit_rate"] == 0.5
+
+def test_failing_fixes_are_aged_out(fix_cache):
+    """Test that a fix that keeps failing is removed."""
+    fingerprint = fingerprint_error(ERROR)
+    fix_id = fix_cache.record_fix(fingerprint, ERROR, compute_fix_hunks(FAILING_CODE, FIXED_CODE))
+    for _ in range(3):
+        fix_cache.record_outcome(fix_id, success=False)
+    assert fix_cache.stats()["entries"] == 0
+
+def test_auto_fix_replays_cached_fix(fix_cache):
+    """Test that the auto-fix node replays a cached fix before trying the rules."""
+    fingerprint = fingerprint_error(ERROR)
+    fix_id = fix_cache.record_fix(fingerprint, ERROR, compute_fix_hunks(FAILING_CODE, FIXED_CODE))
+
+    state = {
+        "user_input": "How do waves move?",
+        "generated_code": FAILING_CODE,
+        "error": f"Error executing code: {ERROR}",
+        "correction_attempts": 0
+    }
+    result = auto_fix_code(state, file_service=MagicMock(), fix_cache=fix_cache)
+
+    assert result["auto_fix_applied"] is True
+    assert result["generated_code"] == FIXED_CODE
+    assert result["pending_fixes"][0]["fix_id"] == fix_id
@@ -0,0 +1,135 @@
+"""
+Unit tests for hedged LLM requests.
+"""
+import time
+from unittest.mock import MagicMock
+import leap.workflow.nodes  # noqa: F401 (the services import the workflow package)
+from leap.core.hedging import LLMHedger
+from leap.services import LLMService
+from leap.models import ScenePlanResponse
+
+PLAN = ScenePlanResponse(plan="1. Light", reasoning="One scene")
+
+def trained_hedger(latency=0.05, samples=5, **kwargs):
+    """Hedger that has seen `samples` plan_scenes calls of `latency` seconds."""
+    hedger = LLMHedger(min_samples=samples, **kwargs)
+    for _ in range(samples):
+        hedger.record(("plan_scenes", "o3-mini"), latency)
+    return hedger
+
+def slow_then_fast_client(events):
+    """Client whose first streamed request hangs and the next ones answer at once."""
+    def create_partial(**kwargs):
+        slow = not events
+        events.append("started")
+        try:
+            for _ in range(50 if slow else 1):
+                if slow:
+                    time.sleep(0.05)
+                yield PLAN
+        finally:
+            if slow:
+                events.append("slow request stopped")
+
+    client = MagicMock()
+    client.chat.completions.create_partial.side_effect = create_partial
+    return client
+
+def test_hedger_delay_and_budget():
+    """Test that calls are only hedged with enough history and within the extra spend cap."""
+    hedger = LLMHedger(percentile=90, min_samples=10, max_extra=0.1)
+    for seconds in range(1, 10):
+        hedger.record("generate_code", seconds)
+    assert hedger.start("generate_code") is None
+    hedger.record("generate_code", 10)
+    assert hedger.start("generate_code") == 9
+
+    # 2 calls counted so far, 10% of them doesn't allow a duplicate yet
+    assert not hedger.allow_hedge()
+    for _ in range(8):
+        hedger.start("generate_code")
+    assert hedger.allow_hedge()
+    assert not hedger.allow_hedge()
+
+def test_slow_call_is_hedged():
+    """Test that a call slower than its node's percentile is sent again and the first answer wins."""
+    events = []
+    hedger = trained_hedger(max_extra=1.0)
+    service = LLMService(model="o3-mini", node="plan_scenes", client=slow_then_fast_client(events), hedger=hedger)
+
+    start = time.time()
+    assert service.generate_structured_response("system", "user", ScenePlanResponse) == PLAN
+    assert time.time() - start < 1.0
+    assert hedger.stats()["hedges"] == 1 and hedger.stats()["hedge_wins"] == 1
+
+    # The losing request stops at its next chunk
+    deadline = time.time() + 2
+    while "slow request stopped" not in events and time.time() < deadline:
+        time.sleep(0.01)
+    assert "slow request stopped" in events
+
+def test_no_hedge_over_budget():
+    """Test that the call just waits once the duplicate budget is spent."""
+    events = []
+    hedger = trained_hedger(max_extra=0.0)
+    service = LLMService(model="o3-mini", node="plan_scenes", client=slow_then_fast_client(events), hedger=hedger)
+
+    assert service.generate_structured_response("system", "user", ScenePlanResponse) == PLAN
+    assert events == ["started", "slow request stopped"]
+    assert hedger.stats()["hedges"] == 0
+
+def test_calls_without_history_are_not_streamed():
+    """Test that calls are sent normally, and timed, until the node has a latency history."""
+    client = MagicMock()
+    client.chat.completions.create.return_value = PLAN
+    hedger = LLMHedger(min_samples=5)
+    service = LLMService(model="o3-mini", node="plan_scenes", client=client, hedger=hedger)
+
+    service.generate_structured_response("system", "user", ScenePlanResponse)
+    client.chat.completions.create_partial.assert_not_called()
+    assert hedger.stats()["calls"] == 1
+    assert hedger.start(("plan_scenes", "o3-mini")) is None
+
+def test_hedge_records_the_call_latency():
+    """Test that a call won by its hedge records the time since the first request, not the hedge's own."""
+    events = []
+    hedger = trained_hedger(latency=0.2, max_extra=1.0)
+    service = LLMService(model="o3-mini", node="plan_scenes", client=slow_then_fast_client(events), hedger=hedger)
+
+    service.generate_structured_response("system", "user", ScenePlanResponse)
+    assert hedger.stats()["hedge_wins"] == 1
+    assert hedger._latencies[("plan_scenes", "o3-mini")][-1] >= 0.2
+
+def test_cancelled_request_is_not_sent():
+    """Test that a request still waiting for the rate limit when the other one answers is never sent."""
+    def create_partial(**kwargs):
+        time.sleep(0.2)
+        yield PLAN
+
+    client = MagicMock()
+    client.chat.completions.create_partial.side_effect = create_partial
+    acquired = []
+    rate_limiter = MagicMock()
+    rate_limiter.acquire.side_effect = lambda tokens, priority: acquired.append(tokens) or (
+        time.sleep(0.5) if len(acquired) > 1 else None
+    )
+    service = LLMService(model="o3-mini", node="plan_scenes", client=client,
+                         hedger=trained_hedger(max_extra=1.0), rate_limiter=rate_limiter)
+
+    assert service.generate_structured_response("system", "user", ScenePlanResponse) == PLAN
+    time.sleep(0.6)
+    assert len(acquired) == 2
+    assert client.chat.completions.create_partial.call_count == 1
+    rate_limiter.adjust.assert_any_call(-acquired[1])
+
+def test_latency_history_is_kept_per_model():
+    """Test that a node's calls on another model (an escalated correction) aren't hedged on its history."""
+    client = MagicMock()
+    client.chat.completions.create.return_value = PLAN
+    hedger = trained_hedger(latency=0.05)
+    service = LLMService(model="gpt-4o", node="plan_scenes", client=client, hedger=hedger)
+
+    service.generate_structured_response("system", "user", ScenePlanResponse)
+    client.chat.completions.create_partial.assert_not_called()
+    assert len(hedger._latencies[("plan_scenes", "gpt-4o")]) == 1
+    assert len(hedger._latencies[("plan_scenes", "o3-mini")]) == 5
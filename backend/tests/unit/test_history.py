@@ -0,0 +1,110 @@
+"""
+Unit tests for the correction attempt history and oscillation detection.
+"""
+import pytest
+from unittest.mock import MagicMock
+from leap.models import ManimCodeResponse, CodePatchResponse, CodeEdit
+from leap.workflow.history import (
+    hash_code,
+    record_attempt,
+    find_code_repeat,
+    count_error_repeats,
+    summarize_attempts,
+    NO_PREVIOUS_ATTEMPTS
+)
+from leap.workflow.nodes.correction import error_correction
+
+CODE_A = """from manim import *
+from leap.templates.base_scene import ManimVoiceoverBase
+
+class Demo(ManimVoiceoverBase):
+    def construct(self):
+        circle = Circle(colour=BLUE)
+        self.play(Create(circle))"""
+
+CODE_B = CODE_A.replace("Circle(colour=BLUE)", "Circle(fill_colour=BLUE)")
+CODE_C = CODE_A.replace("Circle(colour=BLUE)", "Circle(color=BLUE)")
+
+ERROR_A = "TypeError: Mobject.__init__() got an unexpected keyword argument 'colour'"
+ERROR_B = "TypeError: Mobject.__init__() got an unexpected keyword argument 'fill_colour'"
+
+def make_llm(patch_code=None, full_code=CODE_C):
+    """Mock LLM whose patch turns the current code into `patch_code`."""
+    def respond(system_content, user_content, response_model):
+        if response_model == CodePatchResponse:
+            return CodePatchResponse(
+                edits=[CodeEdit(start_line=6, end_line=6, replacement=patch_code.split("\n")[5])],
+                explanation="Patched the circle"
+            )
+        return ManimCodeResponse(code=full_code, explanation="Rewrote the scene", error_fixes=["Use color"])
+
+    mock = MagicMock()
+    mock.generate_structured_response.side_effect = respond
+    return mock
+
+def make_state(code, error, history=None):
+    return {
+        "user_input": "Show a circle",
+        "plan": "1. Draw a circle",
+        "generated_code": code,
+        "error": error,
+        "correction_attempts": len(history or []),
+        "attempt_history": history
+    }
+
+def test_hash_code_ignores_whitespace():
+    """Test that formatting-only differences hash the same."""
+    assert hash_code(CODE_A) == hash_code(CODE_A.replace("\n", "  \n\n") + "\n")
+    assert hash_code(CODE_A) != hash_code(CODE_B)
+
+def test_record_and_summarize():
+    """Test that attempts are recorded compactly and summarized for the prompt."""
+    assert summarize_attempts([]) == NO_PREVIOUS_ATTEMPTS
+
+    history = record_attempt(None, CODE_A, f"Error executing code: {ERROR_A}", strategy="generation")
+    history = record_attempt(history, CODE_B, ERROR_B, strategy="patch", summary="Renamed colour")
+
+    assert find_code_repeat(history, CODE_B)["strategy"] == "patch"
+    assert find_code_repeat(history, CODE_C) is None
+    assert count_error_repeats(history, ERROR_A) == 1
+    assert summarize_attempts(history) == (
+        f"1. Failed with: {ERROR_A}\n"
+        f"2. Failed with: {ERROR_B} (approach: Renamed colour)"
+    )
+
+def test_repeated_patch_falls_back_to_full_regeneration():
+    """Test that a patch reproducing earlier failing code is replaced by a full rewrite."""
+    history = record_attempt(None, CODE_A, ERROR_A)
+    llm = make_llm(patch_code=CODE_A)
+
+    result = error_correction(make_state(CODE_B, ERROR_B, history), llm_service=llm, file_service=MagicMock())
+
+    assert result["generated_code"] == CODE_C
+    assert result["last_correction"]["strategy"] == "full"
+    assert len(result["attempt_history"]) == 2
+    assert not result.get("stop_reason")
+    # The failed approach is listed in the prompt
+    prompt = llm.generate_structured_response.call_args_list[-1].kwargs["user_content"]
+    assert f"1. Failed with: {ERROR_A}" in prompt
+
+def test_repeated_full_regeneration_stops_early():
+    """Test that correction stops instead of rendering code that already failed."""
+    history = record_attempt(None, CODE_A, ERROR_A)
+    llm = make_llm(patch_code=CODE_A, full_code=CODE_A)
+
+    result = error_correction(make_state(CODE_B, ERROR_B, history), llm_service=llm, file_service=MagicMock())
+
+    assert "repeated code that already failed" in result["stop_reason"]
+    assert result["error"] == ERROR_B
+    assert result["generated_code"] == CODE_B
+
+def test_recurring_error_stops_without_calling_llm():
+    """Test that an error that keeps coming back ends correction."""
+    history = record_attempt(None, CODE_A, ERROR_A)
+    history = record_attempt(history, CODE_B, ERROR_A)
+    llm = make_llm(patch_code=CODE_C)
+
+    result = error_correction(make_state(CODE_C, ERROR_A, history), llm_service=llm, file_service=MagicMock())
+
+    assert "same error occurred 3 times" in result["stop_reason"]
+    llm.generate_structured_response.assert_not_called()
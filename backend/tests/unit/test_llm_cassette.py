@@ -0,0 +1,78 @@
+"""
+Unit tests for recording and replaying LLM calls.
+"""
+import pytest
+from unittest.mock import MagicMock, patch
+from leap.models import ScenePlanResponse, ManimCodeResponse
+from leap.workflow.nodes import plan_scenes
+from leap.services import LLMService
+from leap.services.llm_cassette import LLMCassette, CassetteMissError
+from leap.services.cache_service import CacheService, make_cache_key
+
+PLAN = ScenePlanResponse(plan="1. Light\n2. Scattering", reasoning="Two scenes are enough")
+
+@pytest.fixture
+def recording(tmp_path):
+    """LLM service recording to a temporary cassette, with a mocked OpenAI client."""
+    client = MagicMock()
+    client.chat.completions.create.return_value = PLAN
+    return LLMService(model="gpt-4o", cassette=LLMCassette("record", tmp_path), client=client)
+
+def test_record_then_replay(recording, tmp_path):
+    """Test that a recorded response is served back without a client."""
+    recorded = recording.generate_structured_response("system", "user", ScenePlanResponse)
+    assert recorded == PLAN
+    assert len(list(tmp_path.glob("*.json"))) == 1
+
+    replaying = LLMService(model="gpt-4o", cassette=LLMCassette("replay", tmp_path))
+    assert replaying.client is None
+    assert replaying.generate_structured_response("system", "user", ScenePlanResponse) == PLAN
+
+def test_replay_miss(recording, tmp_path):
+    """Test that requests differing in messages, model or response model aren't replayed."""
+    recording.generate_structured_response("system", "user", ScenePlanResponse)
+    replaying = LLMService(model="gpt-4o", cassette=LLMCassette("replay", tmp_path))
+
+    with pytest.raises(CassetteMissError):
+        replaying.generate_structured_response("system", "another question", ScenePlanResponse)
+    with pytest.raises(CassetteMissError):
+        replaying.generate_structured_response("system", "user", ManimCodeResponse)
+    with pytest.raises(CassetteMissError):
+        LLMService(model="gpt-4o-mini", cassette=LLMCassette("replay", tmp_path)).generate_structured_response("system", "user", ScenePlanResponse)
+
+def test_cached_responses_are_still_recorded(tmp_path):
+    """Test that a recording captures calls the response cache could answer, and replay doesn't need the cache."""
+    cache = CacheService("llm_responses", db_path=tmp_path / "cache.db")
+    cache.set(make_cache_key("gpt-4o", "ScenePlanResponse", "system", "user"), PLAN.model_dump(mode="json"))
+    client = MagicMock()
+    client.chat.completions.create.return_value = PLAN
+    cassettes = tmp_path / "cassettes"
+    recording = LLMService(model="gpt-4o", cassette=LLMCassette("record", cassettes), client=client, response_cache=cache)
+
+    assert recording.generate_structured_response("system", "user", ScenePlanResponse) == PLAN
+    assert len(list(cassettes.glob("*.json"))) == 1
+
+    replaying = LLMService(model="gpt-4o", cassette=LLMCassette("replay", cassettes),
+                           response_cache=CacheService("llm_responses", db_path=tmp_path / "empty.db"))
+    assert replaying.generate_structured_response("system", "user", ScenePlanResponse) == PLAN
+
+def test_replay_latency(tmp_path):
+    """Test that replay sleeps the scaled recorded latency."""
+    cassette = LLMCassette("record", tmp_path)
+    cassette.record("gpt-4o", ScenePlanResponse, "system", "user", PLAN, latency_seconds=4.0)
+
+    with patch("leap.services.llm_cassette.time.sleep") as sleep:
+        LLMCassette("replay", tmp_path, latency_scale=0.5).replay("gpt-4o", ScenePlanResponse, "system", "user")
+    sleep.assert_called_once_with(2.0)
+
+def test_node_runs_from_cassette(recording, tmp_path, sample_state):
+    """Test that a workflow node gives the same result when replayed."""
+    recorded = plan_scenes(sample_state, llm_service=recording)
+    replaying = LLMService(model="gpt-4o", cassette=LLMCassette("replay", tmp_path))
+    replayed = plan_scenes(sample_state, llm_service=replaying, stage_cache=MagicMock(get=MagicMock(return_value=None)))
+    assert replayed["plan"] == recorded["plan"]
+
+def test_invalid_mode(tmp_path):
+    """Test that unknown modes are rejected."""
+    with pytest.raises(ValueError):
+        LLMCassette("playback", tmp_path)
@@ -0,0 +1,66 @@
+"""
+Unit tests for the shared LLM client registry.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from unittest.mock import patch
+import leap.workflow.nodes  # noqa: F401 (the services import the workflow package)
+from leap.services import LLMService
+from leap.services.llm_clients import LLMClientRegistry
+
+class _OkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _OkHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    registry = LLMClientRegistry()
+    yield registry
+    registry.close()
+
+def test_clients_are_shared(registry):
+    """Test that every caller and thread gets the same clients."""
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        clients = list(pool.map(lambda _: registry.structured_client(), range(16)))
+    assert all(client is clients[0] for client in clients)
+    assert registry.sync_client() is registry.sync_client()
+    assert registry.sync_client()._client is registry.http_client()
+    assert registry.async_client() is registry.async_client()
+    with pytest.raises(ValueError):
+        registry.sync_client("unknown")
+
+def test_services_use_the_pooled_client(registry):
+    """Test that LLM services of any model share the registry's client."""
+    with patch("leap.services.llm_service.get_client_registry", return_value=registry):
+        first, second = LLMService(model="gpt-4o"), LLMService(model="gpt-4o-mini")
+    assert first.client is second.client is registry.structured_client()
+
+def test_connection_reuse_is_measured(registry, server):
+    """Test that sequential requests reuse one keep-alive connection."""
+    client = registry.http_client()
+    for _ in range(3):
+        assert client.get(server).text == "ok"
+
+    stats = registry.stats()
+    assert stats["requests"] == 3
+    assert stats["connections_opened"] == 1
+    assert stats["connection_reuse_rate"] == pytest.approx(2 / 3)
@@ -4,8 +4,8 @@ Unit tests for the logging module.
 import pytest
 import logging
 from pathlib import Path
+import leap.core.logging
 from leap.core.logging import setup_question_logger, _loggers
-from leap.core.config import LOGS_DIR
 from pythonjsonlogger.json import JsonFormatter
 
 @pytest.fixture
@@ -44,7 +44,7 @@ def test_setup_question_logger_basic(test_question):
     
     # Check log file location
     log_file_path = Path(file_handlers[0].baseFilename)
-    assert log_file_path.parent == LOGS_DIR
+    assert log_file_path.parent == leap.core.logging.LOGS_DIR
     assert "how_does_gravity_work" in log_file_path.name
 
 def test_logger_caching(test_question):
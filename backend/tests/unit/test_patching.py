@@ -0,0 +1,91 @@
+"""
+Unit tests for patch-based code correction.
+"""
+import pytest
+from unittest.mock import MagicMock
+from leap.models import CodeEdit, CodePatchResponse, ManimCodeResponse
+from leap.workflow.patching import PatchError, apply_code_edits, number_code_lines
+from leap.workflow.nodes.correction import error_correction
+
+ORIGINAL_CODE = """from manim import *
+from leap.templates.base_scene import ManimVoiceoverBase
+
+class GravityScene(ManimVoiceoverBase):
+    def construct(self):
+        with self.voiceover(text="Gravity") as tracker:
+            self.play(ShowCreation(Circle()), run_time=tracker.duration)"""
+
+def test_number_code_lines():
+    """Test that every line gets a line number prefix."""
+    numbered = number_code_lines("a = 1\nb = 2")
+    assert numbered.split("\n") == ["   1 | a = 1", "   2 | b = 2"]
+
+def test_apply_replacement():
+    """Test replacing a single line."""
+    edit = CodeEdit(
+        start_line=7,
+        end_line=7,
+        replacement="            self.play(Create(Circle()), run_time=tracker.duration)",
+        original="            self.play(ShowCreation(Circle()), run_time=tracker.duration)"
+    )
+    patched = apply_code_edits(ORIGINAL_CODE, [edit])
+    assert "Create(Circle())" in patched
+    assert "ShowCreation" not in patched
+    assert len(patched.split("\n")) == len(ORIGINAL_CODE.split("\n"))
+
+def test_apply_insert_and_delete():
+    """Test inserting lines and deleting lines in one patch."""
+    edits = [
+        CodeEdit(start_line=3, end_line=2, replacement="RADIUS = 2"),
+        CodeEdit(start_line=2, end_line=2, replacement=""),
+    ]
+    patched = apply_code_edits("from manim import *\nimport os\nx = 1", edits)
+    assert patched == "from manim import *\nRADIUS = 2\nx = 1"
+
+def test_rejects_mismatched_original():
+    """Test that an edit whose original text doesn't match is rejected."""
+    edit = CodeEdit(start_line=1, end_line=1, replacement="import numpy", original="import os")
+    with pytest.raises(PatchError):
+        apply_code_edits(ORIGINAL_CODE, [edit])
+
+def test_rejects_overlapping_and_out_of_range_edits():
+    """Test that overlapping or out of range edits are rejected."""
+    overlapping = [
+        CodeEdit(start_line=1, end_line=3, replacement="a = 1"),
+        CodeEdit(start_line=2, end_line=2, replacement="b = 2"),
+    ]
+    with pytest.raises(PatchError):
+        apply_code_edits(ORIGINAL_CODE, overlapping)
+
+    with pytest.raises(PatchError):
+        apply_code_edits(ORIGINAL_CODE, [CodeEdit(start_line=40, end_line=41, replacement="x = 1")])
+
+def test_rejects_syntax_errors():
+    """Test that a patch producing invalid Python is rejected."""
+    edit = CodeEdit(start_line=5, end_line=5, replacement="    def construct(self)")
+    with pytest.raises(PatchError):
+        apply_code_edits(ORIGINAL_CODE, [edit])
+
+def test_correction_falls_back_to_full_regeneration():
+    """Test that the correction node regenerates the code when the patch doesn't apply."""
+    full_code = ORIGINAL_CODE.replace("ShowCreation", "Create")
+    mock_llm = MagicMock()
+    mock_llm.generate_structured_response.side_effect = lambda system_content, user_content, response_model: (
+        CodePatchResponse(edits=[CodeEdit(start_line=99, end_line=99, replacement="x = 1")])
+        if response_model == CodePatchResponse
+        else ManimCodeResponse(code=full_code)
+    )
+
+    state = {
+        "user_input": "How does gravity work?",
+        "plan": "1. Show gravity",
+        "generated_code": ORIGINAL_CODE,
+        "error": "NameError: name 'ShowCreation' is not defined",
+        "correction_attempts": 0
+    }
+    result = error_correction(state, llm_service=mock_llm, file_service=MagicMock())
+
+    assert result["generated_code"] == full_code
+    assert result["correction_attempts"] == 1
+    assert not result.get("error")
+    assert mock_llm.generate_structured_response.call_count == 2
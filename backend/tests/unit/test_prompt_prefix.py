@@ -0,0 +1,81 @@
+"""
+Unit tests for static prompt prefixes and the LLM response cache.
+"""
+import pytest
+from unittest.mock import MagicMock
+from leap.workflow.nodes import generate_code
+from leap.models import ManimCodeResponse, ValidationResult
+from leap.prompts import (
+    CODE_GENERATION_PROMPTS, ERROR_CORRECTION_PROMPTS, ERROR_CORRECTION_PATCH_PROMPTS, SCENE_PLANNING_PROMPTS,
+    DURATION_INSTRUCTIONS
+)
+from leap.prompts.base import PromptTemplate, PromptVersion
+from leap.services import LLMService, CacheService
+
+def test_static_sections_come_first_verbatim():
+    """Test that static sections follow the system message unformatted, before the request's fields."""
+    template = PromptTemplate(
+        system="You are a teacher.",
+        user="Explain {topic}",
+        static_sections={"example": "EXAMPLE"}
+    )
+    formatted = template.format(topic="gravity", example="def f(): return {1: 2}")
+    assert formatted["system"] == "You are a teacher.\n\nEXAMPLE:\ndef f(): return {1: 2}"
+    assert formatted["user"] == "Explain gravity"
+    with pytest.raises(ValueError):
+        template.format(topic="gravity")
+
+@pytest.mark.parametrize("collection,params", [
+    (CODE_GENERATION_PROMPTS, {"plan": "p", "user_level_instruction": "l", "duration_instruction": "d",
+                               "code_template": "TEMPLATE", "example_code": "EXAMPLE CODE"}),
+    (ERROR_CORRECTION_PROMPTS, {"plan": "p", "generated_code": "c", "previous_attempts": "a",
+                                "manim_api_context": "API CHANGES"}),
+    (ERROR_CORRECTION_PATCH_PROMPTS, {"plan": "p", "numbered_code": "1 | c", "previous_attempts": "a",
+                                      "manim_api_context": "API CHANGES"}),
+])
+def test_production_prompts_share_a_static_prefix(collection, params):
+    """Test that requests differing only in their fields start with the same system message."""
+    template = collection.get(PromptVersion.PRODUCTION)
+    first = template.format(user_input="What is gravity?", error="NameError", **params)
+    second = template.format(user_input="Why is the sky blue?", error="TypeError", **{**params, "plan": "other"})
+    assert first["system"] == second["system"]
+    for name in template.static_sections:
+        assert params[name] in first["system"] and params[name] not in first["user"]
+
+def test_planning_prompt_has_a_static_system_message():
+    """Test that plans for other levels and lengths start with the same system message."""
+    template = SCENE_PLANNING_PROMPTS.get(PromptVersion.PRODUCTION)
+    first = template.format(user_input="What is gravity?", user_level_instruction="Explain it to a child.",
+                            duration_instruction=DURATION_INSTRUCTIONS["long"])
+    second = template.format(user_input="Why is the sky blue?", user_level_instruction="Explain it to an expert.",
+                             duration_instruction=DURATION_INSTRUCTIONS["short"])
+    assert first["system"] == second["system"]
+    assert "Explain it to a child." in first["user"] and DURATION_INSTRUCTIONS["long"] in first["user"]
+
+def test_generation_requests_share_the_prefix(sample_state):
+    """Test that generation calls for different questions send byte-identical system messages."""
+    llm_service = MagicMock()
+    llm_service.model = "gpt-4o"
+    llm_service.generate_structured_response.return_value = ManimCodeResponse(code="from manim import *", explanation="")
+    generate_code({**sample_state, "plan": "1. Falling apple"}, llm_service=llm_service)
+    generate_code({**sample_state, "user_input": "Why is the sky blue?", "plan": "1. Light"}, llm_service=llm_service)
+
+    first, second = [call.kwargs for call in llm_service.generate_structured_response.call_args_list]
+    assert first["system_content"] == second["system_content"]
+    assert first["user_content"] != second["user_content"]
+
+def test_response_cache_reuses_identical_calls(tmp_path):
+    """Test that an identical call is served from the response cache and counted as a hit."""
+    result = ValidationResult(classification="VALID", explanation="Clear", reformulated_question="What is gravity?")
+    client = MagicMock()
+    client.chat.completions.create.return_value = result
+    cache = CacheService("llm_responses", db_path=tmp_path / "cache.db", ttl_seconds=60)
+    service = LLMService(model="gpt-4o", client=client, response_cache=cache)
+
+    assert service.generate_structured_response("system", "What is gravity?", ValidationResult) == result
+    assert service.generate_structured_response("system", "What is gravity?", ValidationResult) == result
+    service.generate_structured_response("system", "Why is the sky blue?", ValidationResult)
+
+    assert client.chat.completions.create.call_count == 2
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2
@@ -0,0 +1,70 @@
+"""
+Unit tests for prompt token accounting and budgets.
+"""
+from unittest.mock import MagicMock
+import pytest
+from pydantic import ValidationError
+from leap.workflow.nodes import generate_code
+from leap.core.config import PROMPT_TOKEN_BUDGETS
+from leap.models import ManimCodeResponse
+from leap.prompts import PROMPT_COLLECTIONS
+from leap.prompts.base import PromptTemplate
+from leap.prompts.tokens import count_tokens, trim_text
+
+TEMPLATE = PromptTemplate(
+    system="You fix code.",
+    user="ERROR:\n{error}\n\nCODE:\n{code}\n\nPREVIOUS ATTEMPTS:\n{previous_attempts}",
+    trim_sections={"previous_attempts": "tail", "error": "tail"}
+)
+
+def test_trim_text_keeps_the_requested_end():
+    """Test that trimmed text fits its budget, keeps the requested end and says what was cut."""
+    text = " ".join(f"line{i}" for i in range(400))
+    head = trim_text(text, 50, keep="head")
+    tail = trim_text(text, 50, keep="tail")
+    assert count_tokens(head) <= 50 and count_tokens(tail) <= 50
+    assert head.startswith("line0 ") and "tokens trimmed" in head
+    assert tail.endswith("line399") and "tokens trimmed" in tail
+    assert trim_text("short", 50) == "short"
+    assert trim_text(text, 2) == ""
+
+def test_format_trims_the_lowest_priority_sections_first():
+    """Test that a prompt over its budget loses the lowest-priority sections, and never the others."""
+    params = {"error": "Traceback\n" * 100 + "NameError: x", "code": "x = 1\n" * 50, "previous_attempts": "attempt\n" * 400}
+    full = TEMPLATE.format(**params)
+    assert full.tokens["trimmed"] == {} and full.tokens["budget"] is None
+    assert full.tokens["sections"]["code"] == count_tokens(params["code"])
+
+    budget = full.tokens["total"] - full.tokens["sections"]["previous_attempts"] // 2
+    fitted = TEMPLATE.format(token_budget=budget, **params)
+    assert fitted.tokens["total"] <= budget
+    assert list(fitted.tokens["trimmed"]) == ["previous_attempts"]
+    assert fitted.params["error"] == params["error"] and fitted.params["code"] == params["code"]
+    assert fitted["user"] == TEMPLATE.format(**fitted.params)["user"]
+
+    tight = TEMPLATE.format(token_budget=count_tokens(params["code"]) + 100, **params)
+    assert list(tight.tokens["trimmed"]) == ["previous_attempts", "error"]
+    assert "NameError: x" in tight["user"] and params["code"] in tight["user"]
+
+def test_generation_records_its_prompt_tokens(sample_state, monkeypatch):
+    """Test that the generation node sends the trimmed prompt and records its token accounting."""
+    monkeypatch.setitem(PROMPT_TOKEN_BUDGETS, "generate_code", 2000)
+    llm_service = MagicMock()
+    llm_service.model = "gpt-4o"
+    llm_service.generate_structured_response.return_value = ManimCodeResponse(code="from manim import *", explanation="")
+    result = generate_code({**sample_state, "plan": "1. Falling apple"}, llm_service=llm_service)
+
+    tokens = result["prompts"]["generation"]["tokens"]
+    assert tokens["budget"] == 2000 and tokens["trimmed"]
+    assert set(tokens["trimmed"]) <= {"api_reference", "plan"}
+    kwargs = llm_service.generate_structured_response.call_args.kwargs
+    assert count_tokens(kwargs["system_content"]) + count_tokens(kwargs["user_content"]) == tokens["total"]
+
+def test_static_sections_are_never_trimmed():
+    """Test that a static section can't be trimmed, as trimming it would change the cached prefix."""
+    with pytest.raises(ValidationError, match="Static sections can't be trim sections: example"):
+        PromptTemplate(system="Rules.", user="{request}", static_sections={"example": "EXAMPLE"},
+                       trim_sections={"example": "head"})
+    for collection in PROMPT_COLLECTIONS.values():
+        for template in collection.templates.values():
+            PromptTemplate.model_validate(template.model_dump())
@@ -0,0 +1,70 @@
+"""
+Unit tests for the quick generation tier and per-tier latency tracking.
+"""
+import time
+import pytest
+from unittest.mock import MagicMock
+from leap.core.config import QUICK_MAX_ATTEMPTS, FAST_TTS_MODEL
+from leap.models import ScenePlanResponse, ManimCodeResponse
+from leap.workflow.budget import select_rendering_quality, select_tts_model, max_correction_attempts, select_video_length
+from leap.workflow.latency import record_job_latency, summarize_latency, percentile
+from leap.workflow.nodes import plan_scenes, generate_code
+
+@pytest.fixture
+def quick_state():
+    return {
+        "user_input": "Why is the sky blue?",
+        "tier": "quick",
+        "rendering_quality": "high",
+        "user_level": "normal"
+    }
+
+@pytest.fixture
+def mock_llm():
+    mock = MagicMock()
+    mock.generate_structured_response.side_effect = lambda system_content, user_content, response_model: (
+        ScenePlanResponse(plan="1. Question\n2. Scattering\n3. Takeaway")
+        if response_model == ScenePlanResponse
+        else ManimCodeResponse(code="from manim import *", explanation="Short scene")
+    )
+    return mock
+
+def test_quick_tier_strategy(quick_state):
+    """Test that the quick tier uses fast TTS, low quality and fewer corrections."""
+    assert select_video_length(quick_state) == "quick"
+    assert select_rendering_quality(quick_state) == "low"
+    assert select_tts_model(quick_state) == FAST_TTS_MODEL
+    assert max_correction_attempts(quick_state) == QUICK_MAX_ATTEMPTS
+
+def test_quick_tier_prompts(quick_state, mock_llm):
+    """Test that planning and generation use the quick-tier prompt variants."""
+    planned = plan_scenes(quick_state, llm_service=mock_llm)
+    system_prompt = mock_llm.generate_structured_response.call_args.kwargs["system_content"]
+    assert "30-60 seconds" in system_prompt
+    assert "at least 4 minutes" not in system_prompt
+    assert planned["video_length"] == "quick"
+
+    generate_code({**quick_state, **planned}, llm_service=mock_llm)
+    user_prompt = mock_llm.generate_structured_response.call_args.kwargs["user_content"]
+    assert "short video" in user_prompt
+    assert "at least 4 minutes" not in user_prompt
+
+def test_latency_is_recorded_per_tier(tmp_path):
+    """Test that job latencies are kept in separate files per tier."""
+    started = time.time() - 42
+    record_job_latency({"tier": "quick", "started_at": started, "node_timings": {"plan_scenes": 3.0},
+                        "execution_result": {"success": True, "output_file": "/tmp/video.mp4"}}, tmp_path)
+    record_job_latency({"tier": "quick", "started_at": started, "error": "boom"}, tmp_path)
+    record_job_latency({"started_at": started}, tmp_path)
+
+    quick = summarize_latency("quick", tmp_path)
+    assert quick["jobs"] == 2
+    assert quick["success_rate"] == 0.5
+    assert quick["p50_seconds"] == pytest.approx(42, abs=1)
+    assert summarize_latency("standard", tmp_path)["jobs"] == 1
+
+def test_percentile():
+    """Test nearest-rank percentiles."""
+    assert percentile([], 50) is None
+    assert percentile([5, 1, 3, 2, 4], 50) == 3
+    assert percentile(list(range(1, 101)), 95) == 95
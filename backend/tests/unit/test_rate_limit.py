@@ -0,0 +1,85 @@
+"""
+Unit tests for the shared LLM rate limit.
+"""
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock
+from openai import RateLimitError
+import leap.workflow.nodes  # noqa: F401 (the services import the workflow package)
+from leap.workflow.budget import job_priority
+from leap.services import LLMService
+from leap.core.rate_limit import RateLimiter, estimate_tokens
+from leap.models import ScenePlanResponse
+
+PLAN = ScenePlanResponse(plan="1. Light", reasoning="One scene")
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / "rate_limit.db"
+
+def test_estimate_tokens():
+    """Test that a call is estimated from its prompt size plus the expected output."""
+    assert estimate_tokens("x" * 400, "y" * 400, expected_output=100) == 300
+
+def test_requests_per_minute_wait(db_path):
+    """Test that calls over the budget wait for the bucket to refill instead of failing."""
+    limiter = RateLimiter(requests_per_minute=120, db_path=db_path, poll_seconds=0.05)
+    for _ in range(120):
+        assert limiter.acquire(1) < 0.5
+    # The bucket refills 2 requests per second
+    assert 0.3 < limiter.acquire(1) < 1.5
+
+def test_tokens_are_shared_between_limiters(db_path):
+    """Test that limiters on the same file (other processes) draw from the same budget."""
+    first = RateLimiter(tokens_per_minute=6000, db_path=db_path, poll_seconds=0.05)
+    second = RateLimiter(tokens_per_minute=6000, db_path=db_path, poll_seconds=0.05)
+    first.acquire(6000)
+    # 100 tokens per second refill
+    assert 0.3 < second.acquire(50) < 1.5
+
+def test_adjust_corrects_the_estimate(db_path):
+    """Test that actual usage lower than estimated gives the tokens back."""
+    limiter = RateLimiter(tokens_per_minute=6000, db_path=db_path, poll_seconds=0.05)
+    limiter.acquire(6000)
+    limiter.adjust(-3000)
+    assert limiter.acquire(3000) < 0.3
+
+def test_priority_order(db_path):
+    """Test that waiting calls are served by priority, then in arrival order."""
+    limiter = RateLimiter(requests_per_minute=60, db_path=db_path, poll_seconds=0.02)
+    for _ in range(60):
+        limiter.acquire(1)
+
+    served = []
+    def call(name, priority):
+        limiter.acquire(1, priority)
+        served.append(name)
+
+    threads = []
+    for name, priority in [("batch", 2), ("standard", 1), ("quick", 0)]:
+        threads.append(threading.Thread(target=call, args=(name, priority)))
+        threads[-1].start()
+        time.sleep(0.1)
+    for thread in threads:
+        thread.join(timeout=10)
+    # The first call may already be at the head when the others arrive
+    assert served[1:] == ["quick", "standard"] or served == ["quick", "standard", "batch"]
+
+def test_rate_limit_error_pauses_and_retries(db_path):
+    """Test that a 429 pauses the shared limiter and the call is sent again."""
+    limiter = RateLimiter(requests_per_minute=600, db_path=db_path, poll_seconds=0.05)
+    limiter.pause = MagicMock()
+    client = MagicMock()
+    error = RateLimitError("Rate limit reached", response=MagicMock(status_code=429), body=None)
+    client.chat.completions.create.side_effect = [error, PLAN]
+
+    service = LLMService(model="gpt-4o", client=client, rate_limiter=limiter)
+    assert service.generate_structured_response("system", "user", ScenePlanResponse) == PLAN
+    limiter.pause.assert_called_once()
+    assert client.chat.completions.create.call_count == 2
+
+def test_job_priority():
+    """Test that quick jobs come first and an explicit priority wins."""
+    assert job_priority({"tier": "quick"}) < job_priority({"tier": "standard"})
+    assert job_priority({"tier": "quick", "priority": 5}) == 5
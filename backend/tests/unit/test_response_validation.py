@@ -0,0 +1,108 @@
+"""
+Unit tests for the validation of structured responses while they are parsed.
+"""
+import json
+from unittest.mock import MagicMock
+import instructor
+import pytest
+from openai.types.chat import ChatCompletion
+from pydantic import ValidationError
+import leap.workflow.nodes  # noqa: F401 (the services import the workflow package)
+from leap.models import CHECK_CODE_CONTEXT, CodeEdit, CodePatchResponse, ManimCodeResponse
+from leap.services import LLMService
+
+VALID_CODE = """from manim import *
+from leap.templates.base_scene import ManimVoiceoverBase
+
+class Gravity(ManimVoiceoverBase):
+    def construct(self):
+        with self.voiceover(text="Things fall") as tracker:
+            self.play(Create(Circle()), run_time=tracker.duration)
+"""
+
+def completion(arguments):
+    """Chat completion calling the response model's tool with `arguments`."""
+    return ChatCompletion.model_validate({
+        "id": "completion", "object": "chat.completion", "created": 0, "model": "gpt-4o",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": None, "tool_calls": [
+            {"id": "call", "type": "function", "function": {"name": "ManimCodeResponse", "arguments": json.dumps(arguments)}}
+        ]}}],
+        "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150}
+    })
+
+def instructor_client(codes, requests):
+    """Instructor client whose successive requests answer the given codes (the last one repeats)."""
+    def create(**kwargs):
+        requests.append(kwargs["messages"])
+        return completion({"code": codes[min(len(requests), len(codes)) - 1], "explanation": "Done"})
+    return instructor.Instructor(client=None, create=instructor.patch(create=create, mode=instructor.Mode.TOOLS),
+                                 mode=instructor.Mode.TOOLS)
+
+def test_code_is_only_checked_with_the_context():
+    """Test that the code validators run for parsed LLM responses and not for responses built elsewhere."""
+    assert ManimCodeResponse(code="class A(Scene):\n    pass").code
+    assert ManimCodeResponse.model_validate({"code": VALID_CODE}, context=CHECK_CODE_CONTEXT).code == VALID_CODE
+
+    with pytest.raises(ValidationError, match="Syntax error on line 5"):
+        ManimCodeResponse.model_validate({"code": VALID_CODE.replace("def construct(self):", "def construct(self)")},
+                                         context=CHECK_CODE_CONTEXT)
+    with pytest.raises(ValidationError, match="must inherit from ManimVoiceoverBase"):
+        ManimCodeResponse.model_validate({"code": VALID_CODE.replace("(ManimVoiceoverBase):", "(Scene):")},
+                                         context=CHECK_CODE_CONTEXT)
+    # The generation node replaces Tex itself, no need to ask the model
+    tex_code = VALID_CODE.replace("Circle()", 'Tex("x")')
+    assert ManimCodeResponse.model_validate({"code": tex_code}, context=CHECK_CODE_CONTEXT).code == tex_code
+
+def test_patch_edits_must_apply_and_pass_checks():
+    """Test that patch responses are checked against the code their edits apply to."""
+    context = {**CHECK_CODE_CONTEXT, "original_code": VALID_CODE}
+    edit = {"start_line": 7, "end_line": 7, "replacement": "            self.play(Create(Square()), run_time=tracker.duration)"}
+    assert CodePatchResponse.model_validate({"edits": [edit]}, context=context).edits == [CodeEdit(**edit)]
+
+    with pytest.raises(ValidationError, match="can't be applied"):
+        CodePatchResponse.model_validate({"edits": [{**edit, "start_line": 40, "end_line": 40}]}, context=context)
+    with pytest.raises(ValidationError, match="must inherit from ManimVoiceoverBase"):
+        CodePatchResponse.model_validate(
+            {"edits": [{"start_line": 4, "end_line": 4, "replacement": "class Gravity(Scene):"}]}, context=context
+        )
+
+def test_failed_checks_are_fixed_within_the_call():
+    """Test that the model is sent its errors and asked again inside the same structured call."""
+    requests = []
+    service = LLMService(model="gpt-4o", client=instructor_client(["class A(Scene):\n    pass", VALID_CODE], requests),
+                         validation_context=CHECK_CODE_CONTEXT)
+    response = service.generate_structured_response("system", "user", ManimCodeResponse)
+
+    assert response.code == VALID_CODE
+    assert len(requests) == 2
+    assert "must inherit from ManimVoiceoverBase" in requests[1][-1]["content"]
+
+def test_code_still_failing_is_returned_unchecked():
+    """Test that the retries are bounded and the last response goes on to the workflow's own validation."""
+    requests = []
+    service = LLMService(model="gpt-4o", client=instructor_client(["class A(Scene):\n    pass"], requests),
+                         validation_context=CHECK_CODE_CONTEXT)
+    response = service.generate_structured_response("system", "user", ManimCodeResponse)
+
+    assert response.code == "class A(Scene):\n    pass"
+    assert len(requests) == 3
+
+    requests.clear()
+    LLMService(model="gpt-4o", client=instructor_client(["class A(Scene):\n    pass"], requests)).generate_structured_response(
+        "system", "user", ManimCodeResponse
+    )
+    assert len(requests) == 1
+
+def test_streamed_response_is_sent_back_with_its_errors():
+    """Test that a streamed response failing validation is fixed by a follow-up in the same conversation."""
+    client = MagicMock()
+    client.chat.completions.create_partial.return_value = iter([ManimCodeResponse(code="class A(Scene):\n    pass")])
+    client.chat.completions.create.return_value = ManimCodeResponse(code=VALID_CODE)
+    service = LLMService(model="gpt-4o", client=client, partial_check=lambda partial: None,
+                         validation_context=CHECK_CODE_CONTEXT)
+
+    assert service.generate_structured_response("system", "user", ManimCodeResponse).code == VALID_CODE
+    kwargs = client.chat.completions.create.call_args.kwargs
+    assert [message["role"] for message in kwargs["messages"]] == ["system", "user", "assistant", "user"]
+    assert "must inherit from ManimVoiceoverBase" in kwargs["messages"][-1]["content"]
+    assert kwargs["context"] == CHECK_CODE_CONTEXT and kwargs["max_retries"] == 2
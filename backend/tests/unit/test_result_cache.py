@@ -0,0 +1,75 @@
+"""
+Unit tests for the result cache of finished videos.
+"""
+import pytest
+from leap.workflow.nodes import check_result_cache
+from leap.workflow.result_cache import ResultCache, concept_key, math_terms, minhash_signature, estimate_similarity
+from leap.services.cache_service import CacheService
+
+VIDEO_URL = "https://storage.example.com/videos/derivatives.mp4"
+
+@pytest.fixture
+def result_cache(tmp_path):
+    """Result cache backed by a temporary database."""
+    return ResultCache(CacheService("results", db_path=tmp_path / "cache.db"))
+
+def test_similarity_of_paraphrases():
+    """Test that paraphrases of a question are near-duplicates and other topics aren't."""
+    derivative = minhash_signature("explain derivatives")
+    assert estimate_similarity(derivative, minhash_signature("What is a derivative?")) == 1.0
+    assert estimate_similarity(derivative, minhash_signature("What are integrals?")) < 0.5
+    assert estimate_similarity(minhash_signature("sine function"), minhash_signature("cosine function")) < 0.8
+
+def test_exact_match_by_concept(result_cache):
+    """Test that the same concept, level and tier is an exact match."""
+    result_cache.store("What is a derivative?", "normal", VIDEO_URL)
+
+    cached = result_cache.lookup_exact("what is a derivative", "normal")
+    assert cached["video_url"] == VIDEO_URL
+    assert cached["match"] == "exact"
+    assert result_cache.lookup_exact("what is a derivative", "ELI5") is None
+    assert result_cache.lookup_exact("what is a derivative", "normal", tier="quick") is None
+
+def test_near_duplicate_match(result_cache):
+    """Test that a reworded question is served by similarity above the threshold."""
+    result_cache.store("What is a derivative in calculus?", "normal", VIDEO_URL)
+
+    cached = result_cache.lookup("Explain derivatives in calculus", "normal")
+    assert cached["video_url"] == VIDEO_URL
+    assert cached["match"] == "similar"
+    assert result_cache.lookup("Explain integrals in calculus", "normal") is None
+
+    strict = ResultCache(result_cache.cache, similarity_threshold=1.01)
+    assert strict.lookup("Explain derivatives in calculus", "normal") is None
+
+def test_node_serves_cached_video(result_cache):
+    """Test that the workflow node returns the cached result on a hit."""
+    result_cache.store("What is a derivative?", "normal", VIDEO_URL)
+    state = {"user_input": "explain derivatives", "reformulated_input": "What are derivatives?", "user_level": "normal"}
+
+    hit = check_result_cache(state, result_cache=result_cache)
+    assert hit["cached_result"]["video_url"] == VIDEO_URL
+
+    miss = check_result_cache({**state, "reformulated_input": "How do magnets work?"}, result_cache=result_cache)
+    assert "cached_result" not in miss
+
+def test_long_questions_have_their_own_key(result_cache):
+    """Test that the exact key covers the whole question, not its first 50 characters."""
+    geometric = "Explain how to compute the average of a list of positive numbers using the geometric mean"
+    harmonic = "Explain how to compute the average of a list of positive numbers using the harmonic mean"
+    assert concept_key(geometric, "normal") != concept_key(harmonic, "normal")
+
+    result_cache.store(geometric, "normal", VIDEO_URL)
+    assert result_cache.lookup_exact(geometric, "normal")["video_url"] == VIDEO_URL
+    assert result_cache.lookup(harmonic, "normal") is None
+
+def test_questions_with_other_math_terms_are_not_near_duplicates(result_cache):
+    """Test that questions differing only in numbers, variables or operators don't share a video."""
+    assert estimate_similarity(minhash_signature("derivative of x^2"), minhash_signature("derivative of x^3")) >= 0.8
+    assert math_terms("What is the derivative of x^2?") == ["x", "^", "2"]
+
+    result_cache.store("What is the derivative of x^2?", "normal", VIDEO_URL)
+    assert result_cache.lookup("Explain derivatives of x^2", "normal")["match"] == "similar"
+    assert result_cache.lookup("What is the derivative of x^3?", "normal") is None
+    assert result_cache.lookup("What is the derivative of y^2?", "normal") is None
+    assert result_cache.lookup("What is the derivative of x*2?", "normal") is None
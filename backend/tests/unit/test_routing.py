@@ -0,0 +1,91 @@
+"""
+Unit tests for per-node model routing and LLM token accounting.
+"""
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+import leap.workflow.nodes  # noqa: F401 (the services import the workflow package)
+from leap.core.config import LLM_ROUTES, STRONG_OPENAI_MODEL, FAST_OPENAI_MODEL
+from leap.core.usage import track_llm_usage
+from leap.workflow.budget import max_output_tokens, select_route, timed_node
+from leap.services import LLMService
+from leap.models import ScenePlanResponse
+
+PLAN = ScenePlanResponse(plan="1. Light", reasoning="One scene")
+
+def test_route_per_node():
+    """Test that each node gets its own effort and output limit."""
+    assert select_route({}, "validate_input")["reasoning_effort"] == "low"
+    assert select_route({}, "generate_code") == {"node": "generate_code", **LLM_ROUTES["generate_code"]}
+    assert select_route({}, "unknown_node")["max_tokens"] is None
+
+def test_correction_escalates_after_failures():
+    """Test that corrections only move to more effort and a stronger model once earlier ones failed."""
+    first = select_route({"correction_attempts": 0}, "correct_code")
+    second = select_route({"correction_attempts": 1}, "correct_code")
+    later = select_route({"correction_attempts": 4}, "correct_code")
+    assert first["reasoning_effort"] == "low" and first["model"] != STRONG_OPENAI_MODEL
+    assert second["reasoning_effort"] == "high" and second["model"] != STRONG_OPENAI_MODEL
+    assert later["model"] == STRONG_OPENAI_MODEL
+    assert later["max_tokens"] == LLM_ROUTES["correct_code"]["max_tokens"]
+
+def test_short_budget_uses_fast_model():
+    """Test that the fast model wins over the route when time is short."""
+    state = {"latency_budget": 1800, "deadline": time.time() + 60, "correction_attempts": 4}
+    route = select_route(state, "correct_code")
+    assert route["model"] == FAST_OPENAI_MODEL
+    assert route["reasoning_effort"] is None
+
+def test_fast_model_output_limit_is_clamped():
+    """Test that switching to the fast model lowers the output limit to what that model accepts."""
+    state = {"latency_budget": 1800, "deadline": time.time() + 60}
+    assert LLM_ROUTES["generate_code"]["max_tokens"] > max_output_tokens(FAST_OPENAI_MODEL)
+    route = select_route(state, "generate_code")
+    assert route["model"] == FAST_OPENAI_MODEL
+    assert route["max_tokens"] == max_output_tokens(FAST_OPENAI_MODEL) == 16384
+    assert select_route(state, "validate_input")["max_tokens"] == LLM_ROUTES["validate_input"]["max_tokens"]
+
+    client = MagicMock()
+    client.chat.completions.create.return_value = PLAN
+    LLMService(**route, client=client).generate_structured_response("system", "user", ScenePlanResponse)
+    assert client.chat.completions.create.call_args.kwargs["max_completion_tokens"] == 16384
+    assert max_output_tokens("gpt-4o-mini-2024-07-18") == 16384 and max_output_tokens("unknown-model") is None
+
+def test_request_options():
+    """Test that the effort is only sent to reasoning models and the output limit always."""
+    client = MagicMock()
+    client.chat.completions.create.return_value = PLAN
+    LLMService(model="o3-mini", reasoning_effort="low", max_tokens=500, client=client).generate_structured_response(
+        "system", "user", ScenePlanResponse
+    )
+    kwargs = client.chat.completions.create.call_args.kwargs
+    assert kwargs["reasoning_effort"] == "low" and kwargs["max_completion_tokens"] == 500
+
+    LLMService(model="gpt-4o-mini", reasoning_effort="low", client=client).generate_structured_response(
+        "system", "user", ScenePlanResponse
+    )
+    assert "reasoning_effort" not in client.chat.completions.create.call_args.kwargs
+
+def test_node_tokens_are_recorded():
+    """Test that the tokens the API reports are added to the node that made the calls."""
+    response = PLAN.model_copy()
+    response._raw_response = SimpleNamespace(usage=SimpleNamespace(prompt_tokens=100, completion_tokens=20, total_tokens=120))
+    client = MagicMock()
+    client.chat.completions.create.return_value = response
+    service = LLMService(model="o3-mini", client=client)
+
+    def plan(state):
+        service.generate_structured_response("system", "user", ScenePlanResponse)
+        service.generate_structured_response("system", "user", ScenePlanResponse)
+        return state
+
+    result = timed_node("plan_scenes", plan)({"user_input": "What is light?", "node_tokens": {"validate_input": 5}})
+    assert result["node_tokens"] == {"validate_input": 5, "plan_scenes": 240}
+    result = timed_node("execute_code", lambda state: state)(result)
+    assert "execute_code" not in result["node_tokens"]
+
+    # Outside a node the calls aren't counted anywhere
+    with track_llm_usage() as usage:
+        pass
+    service.generate_structured_response("system", "user", ScenePlanResponse)
+    assert usage["calls"] == 0
@@ -0,0 +1,150 @@
+"""
+Unit tests for multi-scene lessons rendered in parallel.
+"""
+import pytest
+from unittest.mock import MagicMock, patch
+from leap.models import ManimCodeResponse
+from leap.workflow.nodes import generate_code, render_scenes
+from leap.services import ManimService
+from leap.workflow.scenes import use_multi_scene, build_scene_state
+from leap.workflow.budget import timed_node
+
+SCENES = [
+    {"title": "Introduction", "description": "Ask what a derivative is.", "target_seconds": 30},
+    {"title": "Slope", "description": "Show the tangent line getting closer.", "target_seconds": 90},
+    {"title": "Summary", "description": "Recap the definition.", "target_seconds": 30},
+]
+
+@pytest.fixture
+def lesson_state(sample_state):
+    return {**sample_state, "plan": "Full plan", "scenes": SCENES, "deadline": 1e12, "video_length": "long"}
+
+def _scene_result(state):
+    index = state["scene"]["index"]
+    return {
+        "generated_code": f"class Scene{index}: pass",
+        "correction_attempts": index,
+        "execution_result": {"success": True, "output_file": f"/tmp/scene_{index}.mp4"}
+    }
+
+def test_multi_scene_selection(lesson_state):
+    """Test that plans with several scenes use the parallel path, except in the quick tier."""
+    assert use_multi_scene(lesson_state)
+    assert not use_multi_scene({**lesson_state, "scenes": SCENES[:1]})
+    assert not use_multi_scene({**lesson_state, "tier": "quick"})
+    assert not use_multi_scene({**lesson_state, "scenes": None})
+
+def test_scene_state(lesson_state):
+    """Test that a scene's state carries the job settings and only its own part of the plan."""
+    scene_state = build_scene_state(lesson_state, 1)
+    assert scene_state["plan"].startswith("Slope")
+    assert scene_state["scene"]["index"] == 1 and scene_state["scene"]["count"] == 3
+    assert scene_state["deadline"] == lesson_state["deadline"]
+    assert "scenes" not in scene_state and scene_state["correction_attempts"] == 0
+
+def test_scene_generation_uses_scene_duration(lesson_state):
+    """Test that a scene is generated with its own target duration."""
+    llm = MagicMock()
+    llm.generate_structured_response.side_effect = lambda system_content, user_content, response_model: ManimCodeResponse(code="from manim import *")
+    generate_code(build_scene_state(lesson_state, 1), llm_service=llm)
+    user_prompt = llm.generate_structured_response.call_args.kwargs["user_content"]
+    assert "scene 2 of 3" in user_prompt
+    assert "about 90 seconds" in user_prompt
+
+def test_scenes_are_rendered_and_joined_in_order(lesson_state, tmp_path):
+    """Test that every scene runs its own pipeline and the clips are joined in plan order."""
+    scene_workflow = MagicMock()
+    scene_workflow.invoke.side_effect = _scene_result
+    manim_service = MagicMock(media_dir=tmp_path)
+    manim_service.concatenate_videos.return_value = {"success": True, "output_file": str(tmp_path / "lesson.mp4"), "error": None}
+
+    result = render_scenes(lesson_state, scene_workflow=scene_workflow, manim_service=manim_service)
+
+    assert scene_workflow.invoke.call_count == 3
+    clips = manim_service.concatenate_videos.call_args.args[0]
+    assert clips == ["/tmp/scene_0.mp4", "/tmp/scene_1.mp4", "/tmp/scene_2.mp4"]
+    assert result["error"] is None
+    assert result["execution_result"]["output_file"].endswith("lesson.mp4")
+    assert result["correction_attempts"] == 2
+    assert result["generated_code"].index("Scene0") < result["generated_code"].index("Scene2")
+
+def test_failed_scene_fails_the_lesson(lesson_state, tmp_path):
+    """Test that a scene that can't be fixed fails the lesson without joining the clips."""
+    def invoke(state):
+        if state["scene"]["index"] == 1:
+            return {"error": "Error executing code: NameError", "correction_attempts": 5}
+        return _scene_result(state)
+
+    scene_workflow = MagicMock()
+    scene_workflow.invoke.side_effect = invoke
+    manim_service = MagicMock(media_dir=tmp_path)
+
+    result = render_scenes(lesson_state, scene_workflow=scene_workflow, manim_service=manim_service)
+
+    assert result["error"].startswith("Scene 2 (Slope) failed")
+    assert [scene["success"] for scene in result["scene_results"]] == [True, False, True]
+    manim_service.concatenate_videos.assert_not_called()
+
+def test_concatenate_videos(tmp_path):
+    """Test that clips are joined with ffmpeg's concat demuxer without re-encoding."""
+    service = ManimService(media_dir=tmp_path)
+    with patch("leap.services.manim_service.subprocess.run") as run:
+        result = service.concatenate_videos(["/tmp/a.mp4", "/tmp/b.mp4"], str(tmp_path / "lesson.mp4"))
+
+    assert result["success"]
+    cmd = run.call_args.args[0]
+    assert cmd[:3] == ["ffmpeg", "-y", "-f"] and "copy" in cmd
+    assert (tmp_path / "lesson.txt").read_text().splitlines() == ["file '/tmp/a.mp4'", "file '/tmp/b.mp4'"]
+
+def test_clips_of_different_qualities_are_reencoded(lesson_state, tmp_path):
+    """Test that a lesson renders at one quality and a clip that came out lower is re-encoded to match."""
+    def invoke(state):
+        assert state["rendering_quality"] == "medium"
+        result = _scene_result(state)
+        # The second scene timed out and was rendered again at low quality
+        result["execution_result"]["quality"] = "low" if state["scene"]["index"] == 1 else "medium"
+        return result
+
+    scene_workflow = MagicMock()
+    scene_workflow.invoke.side_effect = invoke
+    manim_service = MagicMock(media_dir=tmp_path)
+    manim_service.concatenate_videos.return_value = {"success": True, "output_file": str(tmp_path / "lesson.mp4"), "error": None}
+
+    render_scenes({**lesson_state, "rendering_quality": "medium"}, scene_workflow=scene_workflow, manim_service=manim_service)
+    assert manim_service.concatenate_videos.call_args.kwargs["quality"] == "medium"
+
+    scene_workflow.invoke.side_effect = lambda state: {**_scene_result(state), "execution_result": {
+        "success": True, "output_file": "/tmp/clip.mp4", "quality": "medium"}}
+    render_scenes({**lesson_state, "rendering_quality": "medium"}, scene_workflow=scene_workflow, manim_service=manim_service)
+    assert manim_service.concatenate_videos.call_args.kwargs["quality"] is None
+
+def test_concatenate_videos_normalizes_clips(tmp_path):
+    """Test that clips joined at a quality are scaled and re-encoded to its resolution and frame rate."""
+    service = ManimService(media_dir=tmp_path)
+    with patch("leap.services.manim_service.subprocess.run") as run:
+        result = service.concatenate_videos(["/tmp/a.mp4", "/tmp/b.mp4"], str(tmp_path / "lesson.mp4"), quality="medium")
+
+    assert result["success"]
+    cmd = run.call_args.args[0]
+    assert "copy" not in cmd and cmd.count("-i") == 2
+    graph = cmd[cmd.index("-filter_complex") + 1]
+    assert graph.count("scale=1280:720") == 2 and graph.count("fps=30") == 2
+    assert graph.endswith("[v0][a0][v1][a1]concat=n=2:v=1:a=1[v][a]")
+
+def test_scene_counters_reach_the_job(lesson_state, tmp_path):
+    """Test that the LLM tokens, calls and node times of the scenes are added to the job's."""
+    def invoke(state):
+        return {**_scene_result(state), "node_timings": {"generate_code": 2.0}, "node_calls": {"generate_code": 1},
+                "node_tokens": {"generate_code": 1000}}
+
+    scene_workflow = MagicMock()
+    scene_workflow.invoke.side_effect = invoke
+    manim_service = MagicMock(media_dir=tmp_path)
+    manim_service.concatenate_videos.return_value = {"success": True, "output_file": str(tmp_path / "lesson.mp4"), "error": None}
+    state = {**lesson_state, "node_timings": {"plan_scenes": 5.0}, "node_tokens": {"plan_scenes": 500}}
+
+    result = timed_node("render_scenes", render_scenes)(state, scene_workflow=scene_workflow, manim_service=manim_service)
+    assert result["node_tokens"] == {"plan_scenes": 500, "generate_code": 3000}
+    assert result["node_calls"] == {"generate_code": 3, "render_scenes": 1}
+    assert result["node_timings"]["generate_code"] == 6.0 and result["node_timings"]["plan_scenes"] == 5.0
+    assert "render_scenes" in result["node_timings"]
@@ -0,0 +1,97 @@
+"""
+Unit tests for the cache service and stage-level memoization.
+"""
+import time
+import pytest
+from unittest.mock import MagicMock
+from leap.models import ScenePlanResponse, ManimCodeResponse
+from leap.workflow.nodes import plan_scenes, generate_code
+from leap.services.cache_service import CacheService
+from leap.workflow.stage_cache import discard_stage_result, stage_cache_key
+
+@pytest.fixture
+def stage_cache(tmp_path):
+    """Stage cache backed by a temporary database."""
+    return CacheService("stages", db_path=tmp_path / "cache.db")
+
+@pytest.fixture
+def mock_llm():
+    mock = MagicMock()
+    mock.model = "gpt-4o"
+    mock.generate_structured_response.side_effect = lambda system_content, user_content, response_model: (
+        ScenePlanResponse(plan="1. Light\n2. Scattering")
+        if response_model == ScenePlanResponse
+        else ManimCodeResponse(code="from manim import *", explanation="Scene")
+    )
+    return mock
+
+def test_cache_get_set_and_stats(stage_cache):
+    """Test storing, reading and counting hits and misses."""
+    assert stage_cache.get("a") is None
+    stage_cache.set("a", {"plan": "1. Intro"})
+    assert stage_cache.get("a") == {"plan": "1. Intro"}
+
+    stats = stage_cache.stats()
+    assert stats["entries"] == 1
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+def test_cache_expires_entries(tmp_path):
+    """Test that entries older than the TTL are not returned."""
+    cache = CacheService("stages", db_path=tmp_path / "cache.db", ttl_seconds=0.01)
+    cache.set("a", 1)
+    time.sleep(0.05)
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Test that the entry and byte limits evict the least recently used entries."""
+    cache = CacheService("stages", db_path=tmp_path / "cache.db", max_entries=2)
+    cache.set("a", 1)
+    time.sleep(0.01)
+    cache.set("b", 2)
+    time.sleep(0.01)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+    small = CacheService("small", db_path=tmp_path / "cache.db", max_bytes=20)
+    small.set("x", "a" * 15)
+    small.set("y", "b" * 15)
+    assert small.stats()["entries"] == 1
+
+def test_planning_and_generation_are_memoized(sample_state, mock_llm, stage_cache):
+    """Test that repeating a request with the same inputs doesn't call the LLM again."""
+    first = plan_scenes(sample_state, llm_service=mock_llm, stage_cache=stage_cache)
+    second = plan_scenes(sample_state, llm_service=mock_llm, stage_cache=stage_cache)
+    assert first["plan"] == second["plan"]
+    assert mock_llm.generate_structured_response.call_count == 1
+    assert "plan_scenes" in second["stage_cache_keys"]
+
+    generate_code({**sample_state, **first}, llm_service=mock_llm, stage_cache=stage_cache)
+    generate_code({**sample_state, **second}, llm_service=mock_llm, stage_cache=stage_cache)
+    assert mock_llm.generate_structured_response.call_count == 2
+
+    plan_scenes({**sample_state, "user_level": "ELI5"}, llm_service=mock_llm, stage_cache=stage_cache)
+    assert mock_llm.generate_structured_response.call_count == 3
+
+def test_broken_code_is_discarded(sample_state, mock_llm, stage_cache):
+    """Test that generated code that failed is dropped from the cache."""
+    state = {**sample_state, **plan_scenes(sample_state, llm_service=mock_llm, stage_cache=stage_cache)}
+    state = {**state, **generate_code(state, llm_service=mock_llm, stage_cache=stage_cache)}
+
+    remaining = discard_stage_result(state, "generate_code", stage_cache)
+    assert "generate_code" not in remaining and "plan_scenes" in remaining
+
+    generate_code(state, llm_service=mock_llm, stage_cache=stage_cache)
+    assert mock_llm.generate_structured_response.call_count == 3
+
+def test_key_covers_the_route():
+    """Test that a response made with a lower output limit or less reasoning isn't served to another route."""
+    prompt = {"system": "Plan.", "user": "Explain entropy"}
+    key = stage_cache_key("plan_scenes", "o3-mini", prompt, ScenePlanResponse, reasoning_effort="high", max_tokens=8000)
+    assert key == stage_cache_key("plan_scenes", "o3-mini", prompt, ScenePlanResponse, reasoning_effort="high", max_tokens=8000)
+    assert key != stage_cache_key("plan_scenes", "o3-mini", prompt, ScenePlanResponse, reasoning_effort="low", max_tokens=8000)
+    assert key != stage_cache_key("plan_scenes", "o3-mini", prompt, ScenePlanResponse, reasoning_effort="high", max_tokens=2000)
@@ -0,0 +1,91 @@
+"""
+Unit tests for streamed code generation with early checks.
+"""
+from unittest.mock import MagicMock
+from leap.workflow.nodes.validation import find_code_issues, find_fatal_issues
+from leap.workflow.streaming import CodeStreamCheck
+from leap.services import LLMService
+from leap.models import ManimCodeResponse
+from leap.core.usage import track_llm_usage
+from leap.prompts.tokens import count_tokens
+
+HEADER = "from manim import *\nfrom leap.templates.base_scene import ManimVoiceoverBase\n\n"
+GOOD_CODE = HEADER + "class Gravity(ManimVoiceoverBase):\n    def construct(self):\n        pass\n"
+BAD_CODE = HEADER + "class Gravity(Scene):\n    def construct(self):\n        pass\n"
+
+def stream(code, step=10):
+    """Return the partial responses of a streamed generation of `code`."""
+    return [ManimCodeResponse(code=code[:end]) for end in range(step, len(code) + step, step)]
+
+def test_fatal_issues_on_prefix():
+    """Test that only issues more code can't fix are reported for a prefix."""
+    assert find_fatal_issues(HEADER) == []
+    assert find_fatal_issues(HEADER + "class Gravity(ManimVoiceoverBase):\n") == []
+    assert [issue.message for issue in find_fatal_issues(HEADER + "class Gravity(ThreeDScene):\n")] == [
+        "Scene classes must inherit from ManimVoiceoverBase"
+    ]
+    assert find_fatal_issues(HEADER + "        self.camera.background_color = BLUE\n")
+
+def test_scene_base_is_validated():
+    """Test that the full validation also requires the base scene."""
+    messages = [issue.message for issue in find_code_issues(BAD_CODE)]
+    assert "Scene classes must inherit from ManimVoiceoverBase" in messages
+
+def test_stream_check_writes_draft(tmp_path):
+    """Test that the growing code is mirrored to the draft and bad code is reported once its line is complete."""
+    draft = tmp_path / "draft.py"
+    check = CodeStreamCheck(draft)
+    problems = [check(partial) for partial in stream(BAD_CODE)]
+    assert draft.read_text() == BAD_CODE
+    first = next(i for i, problem in enumerate(problems) if problem)
+    assert "class Gravity(Scene):\n" in stream(BAD_CODE)[first].code
+
+    # A new attempt replaces the draft
+    for partial in stream(GOOD_CODE):
+        assert check(partial) is None
+    assert draft.read_text() == GOOD_CODE
+
+def test_streamed_generation_restarts_early(tmp_path):
+    """Test that a generation with a fatal issue is abandoned and started again."""
+    consumed = []
+    def create_partial(**kwargs):
+        code = BAD_CODE if not consumed else GOOD_CODE
+        consumed.append(0)
+        for partial in stream(code):
+            consumed[-1] += 1
+            yield partial
+
+    client = MagicMock()
+    client.chat.completions.create_partial.side_effect = create_partial
+    service = LLMService(
+        model="gpt-4o", client=client, partial_check=CodeStreamCheck(tmp_path / "draft.py"), stream_restarts=2
+    )
+    response = service.generate_structured_response("system", "user", ManimCodeResponse)
+
+    assert response == ManimCodeResponse(code=GOOD_CODE)
+    assert len(consumed) == 2
+    assert consumed[0] < len(stream(BAD_CODE))
+    client.chat.completions.create.assert_not_called()
+
+def test_last_attempt_runs_to_the_end():
+    """Test that the last attempt isn't abandoned, so validation and correction handle it."""
+    client = MagicMock()
+    client.chat.completions.create_partial.side_effect = lambda **kwargs: iter(stream(BAD_CODE))
+    service = LLMService(model="gpt-4o", client=client, partial_check=CodeStreamCheck(), stream_restarts=1)
+
+    assert service.generate_structured_response("system", "user", ManimCodeResponse).code == BAD_CODE
+    assert client.chat.completions.create_partial.call_count == 2
+
+def test_streamed_generation_counts_its_tokens():
+    """Test that a streamed call, which reports no usage, still counts its tokens for the node and the rate limit."""
+    client = MagicMock()
+    client.chat.completions.create_partial.side_effect = lambda **kwargs: iter(stream(GOOD_CODE))
+    rate_limiter = MagicMock()
+    service = LLMService(model="gpt-4o", client=client, partial_check=CodeStreamCheck(), rate_limiter=rate_limiter)
+
+    with track_llm_usage() as usage:
+        service.generate_structured_response("system", "user", ManimCodeResponse)
+    assert usage["calls"] == 1
+    assert usage["completion_tokens"] >= count_tokens(GOOD_CODE)
+    assert usage["total_tokens"] == usage["prompt_tokens"] + usage["completion_tokens"]
+    rate_limiter.adjust.assert_called_once()